@@ -1,6 +1,6 @@
 from typing import Dict, Tuple, Callable
 import jax.flatten_util
-import os, time, tempfile, yaml, pickle
+import os, time, tempfile, yaml, shutil
 
 
 from diffrax import Solution, Euler, RESULTS
@@ -267,10 +267,10 @@ class ergoExo:
         else:
             self.adept_module = adept_module
 
-        # dump raw config
+        # dump raw config, with numpy scalars as python scalars so that it can be read back with ``yaml.safe_load``,
+        # and store its arrays before the derived quantities are added
         if log:
-            with open(os.path.join(td, "config.yaml"), "w") as fi:
-                yaml.dump(self.adept_module.cfg, fi)
+            self._save_raw_config_(td)
 
         # dump units
         quants_dict = self.adept_module.write_units()  # writes the units to the temporary directory
@@ -286,20 +286,73 @@ class ergoExo:
             with open(os.path.join(td, "derived_config.yaml"), "w") as fi:
                 yaml.dump(self.adept_module.cfg, fi)
 
-        # dump array config
         self.adept_module.get_solver_quantities()
-        if log:
-            with open(os.path.join(td, "array_config.pkl"), "wb") as fi:
-                pickle.dump(self.adept_module.cfg, fi)
 
         self.adept_module.init_state_and_args()
         self.adept_module.init_diffeqsolve()
+        self._setup_streaming_()
         modules = self.adept_module.init_modules()
 
         self.ran_setup = True
 
         return modules
 
+    def _save_raw_config_(self, td: str) -> None:
+        """
+        Writes the config as it was passed to the ``ADEPTModule`` to ``config.yaml``
+
+        Its arrays, e.g. one that was loaded from a file, cannot be rebuilt from ``config.yaml`` so they are stored in
+        the array config instead. The derived arrays are not stored because they are rebuilt from these.
+        ``mlflow.array_store`` is a directory that can be shared between runs so that identical arrays are only written
+        once
+
+        """
+        from adept.utils.array_config import save_array_config, strip_arrays
+
+        cfg = self.adept_module.cfg
+        with open(os.path.join(td, "config.yaml"), "w") as fi:
+            yaml.dump(
+                jax.tree_util.tree_map(lambda x: x.item() if isinstance(x, np.generic) else x, strip_arrays(cfg)), fi
+            )
+        save_array_config(cfg, td, cfg["mlflow"].get("array_store"))
+
+    def _setup_streaming_(self) -> None:
+        """
+        Wraps the save functions of the ``ADEPTModule`` so that the saves are written to disk during the solve
+        if the config has a ``stream`` section
+
+        """
+        from adept.utils.streaming import StreamingWriter
+
+        stream_cfg = self.adept_module.cfg.get("stream")
+        if stream_cfg is None:
+            self.writer = None
+        elif "ensemble" in self.adept_module.cfg:
+            raise ValueError("The saves cannot be streamed with an ensemble because its realizations are vmapped")
+        else:
+            stream_dir = stream_cfg.get("dir")
+            self.keep_stream = stream_dir is not None
+            if stream_dir is None:
+                stream_dir = tempfile.mkdtemp(dir=self.base_tempdir)
+
+            self.writer = StreamingWriter(stream_dir, max_queue_size=stream_cfg.get("max_queue_size", 8))
+            self.adept_module.diffeqsolve_quants["saveat"] = self.writer.wrap_saveat(
+                self.adept_module.diffeqsolve_quants["saveat"]
+            )
+
+    def _finish_streaming_(self, run_output: Dict) -> Dict:
+        """
+        Waits for the streamed saves to be written and puts them back in the run output
+
+        """
+        jax.block_until_ready(run_output)
+        self.writer.close()
+        run_output = self.writer.restore(run_output)
+        if not self.keep_stream:
+            shutil.rmtree(self.writer.stream_dir)
+
+        return run_output
+
     def __call__(self, modules: Dict = None) -> Tuple[Solution, Dict, str]:
         """
         This function is the main entry point for running a simulation. It takes a configuration dictionary and returns a
@@ -324,7 +377,11 @@ class ergoExo:
             run_id=self.mlflow_run_id, nested=self.mlflow_nested, log_system_metrics=True
         ) as mlflow_run:
             t0 = time.time()
+            if self.writer is not None:
+                self.writer.start()
             run_output = self.adept_module(modules, None)
+            if self.writer is not None:
+                run_output = self._finish_streaming_(run_output)
             mlflow.log_metrics({"run_time": round(time.time() - t0, 4)})  # logs the run time to mlflow
 
             t0 = time.time()
@@ -355,6 +412,12 @@ class ergoExo:
             The mlflow_run_id is the id of the mlflow run that was created during the setup call or passed in during the initialization
         """
         assert self.ran_setup, "You must run self.setup() before running the simulation"
+        if self.writer is not None:
+            # the streamed saves are replaced by the save times in the output of the solve that the loss is computed from
+            raise ValueError(
+                "The saves cannot be streamed when the gradient is taken. Remove the stream section of the config"
+            )
+
         with mlflow.start_run(
             run_id=self.mlflow_run_id, nested=self.mlflow_nested, log_system_metrics=True
         ) as mlflow_run:
@@ -1,10 +1,13 @@
 from typing import Dict
 import numpy as np
 from astropy.units import Quantity as _Q
-from diffrax import diffeqsolve, SaveAt, ODETerm
-from equinox import filter_jit
+from diffrax import ConstantStepSize, diffeqsolve, SaveAt, ODETerm
+import jax
+from jax import numpy as jnp, Array, lax
+from equinox import filter_eval_shape, filter_jit, filter_value_and_grad, filter_vmap
 
 from adept import ADEPTModule, Stepper
+from adept.utils.adaptive import AdaptiveStepper, CFLController, get_adaptive_cfg, get_max_steps, get_step_ts
 from adept.lpse2d.helpers import (
     write_units,
     post_process,
@@ -12,8 +15,13 @@ from adept.lpse2d.helpers import (
     get_solver_quantities,
     get_save_quantities,
     get_density_profile,
+    get_ensemble_keys,
+    get_ensemble_quants,
+    get_random_keys,
+    init_epw,
 )
 from adept.lpse2d.vector_field import SplitStep
+from adept.lpse2d.core.loss import LossAccumulators
 from adept.lpse2d.modules.driver import BandwidthModule
 
 
@@ -60,40 +68,47 @@ class BaseLPSE2D(ADEPTModule):
             "save_nt": self.cfg["grid"]["tmax"],
         }
 
+        split_step = SplitStep(self.cfg)
         self.diffeqsolve_quants = dict(
-            terms=ODETerm(SplitStep(self.cfg)),
+            terms=ODETerm(split_step),
             solver=Stepper(),
+            stepsize_controller=ConstantStepSize(),
             saveat=dict(ts=self.cfg["save"]["t"]["ax"], fn=self.cfg["save"]["func"]),
         )
 
-    def init_state_and_args(self) -> Dict:
-        if self.cfg["density"]["noise"]["type"] == "uniform":
-            random_amps = np.random.uniform(
-                self.cfg["density"]["noise"]["min"],
-                self.cfg["density"]["noise"]["max"],
-                (self.cfg["grid"]["nx"], self.cfg["grid"]["ny"]),
+        if "adaptive" in self.cfg["grid"]:
+            adaptive_cfg = self.cfg["grid"]["adaptive"]
+            step_ts = get_step_ts([self.cfg["save"]["t"]["ax"]])
+            self.cfg["grid"]["max_steps"] = get_max_steps(self.cfg["grid"]["tmax"], adaptive_cfg["dtmin"], step_ts)
+            self.time_quantities["max_steps"] = self.cfg["grid"]["max_steps"]
+            self.diffeqsolve_quants["solver"] = AdaptiveStepper()
+            self.diffeqsolve_quants["stepsize_controller"] = CFLController(
+                get_max_dt=split_step.get_max_dt,
+                get_amplitudes=lambda y: y["epw"],
+                dtmin=adaptive_cfg["dtmin"],
+                dtmax=adaptive_cfg["dtmax"],
+                max_change=adaptive_cfg["max_change"],
+                max_increase=adaptive_cfg["max_increase"],
+                step_ts=jnp.array(step_ts),
             )
 
-        elif self.cfg["density"]["noise"]["type"] == "normal":
-            loc = 0.5 * (self.cfg["density"]["noise"]["min"] + self.cfg["density"]["noise"]["max"])
-            scale = 1.0
-            random_amps = np.random.normal(loc, scale, (self.cfg["grid"]["nx"], self.cfg["grid"]["ny"]))
-
-        else:
-            raise NotImplementedError
+        if "ensemble" in self.cfg:
+            self.ensemble_quants = get_ensemble_quants(self.cfg, self.state)
 
-        random_phases = np.random.uniform(0, 2 * np.pi, (self.cfg["grid"]["nx"], self.cfg["grid"]["ny"]))
-        phi_noise = 1 * np.exp(1j * random_phases)
-        epw = 0 * phi_noise
+    def init_state_and_args(self) -> Dict:
+        keys = get_random_keys(self.cfg)
+        epw = init_epw(self.cfg, keys["noise"])
 
         background_density = get_density_profile(self.cfg)
         vte_sq = np.ones((self.cfg["grid"]["nx"], self.cfg["grid"]["ny"])) * self.cfg["units"]["derived"]["vte"] ** 2
         E0 = np.zeros((self.cfg["grid"]["nx"], self.cfg["grid"]["ny"], 2), dtype=np.complex128)
         state = {"background_density": background_density, "epw": epw, "E0": E0, "vte_sq": vte_sq}
+        if "loss" in self.cfg:
+            state["loss"] = LossAccumulators(self.cfg).init()
 
         # drivers = assemble_bandwidth(self.cfg)
         self.state = {k: v.view(dtype=np.float64) for k, v in state.items()}
-        self.args = {"drivers": {k: v["derived"] for k, v in self.cfg["drivers"].items()}}
+        self.args = {"drivers": {k: v["derived"] for k, v in self.cfg["drivers"].items()}, "keys": keys}
 
     @filter_jit
     def __call__(self, trainable_modules: Dict, args: Dict = None) -> Dict:
@@ -105,9 +120,19 @@ class BaseLPSE2D(ADEPTModule):
         for name, module in trainable_modules.items():
             state, args = module(self.state, args)
 
+        # the state is sharded over the devices if ``grid.sharding`` is in the config
+        state = self.diffeqsolve_quants["terms"].vector_field.fft.constrain(state)
+
+        if "E0" in args["drivers"]:
+            # the density is static so the spatial factors of the laser are computed once rather than every step
+            light = self.diffeqsolve_quants["terms"].vector_field.light
+            light_wave = light.get_static_light_wave(state["background_density"], args["drivers"]["E0"])
+            args = {**args, "drivers": {**args["drivers"], "E0": light_wave}}
+
         solver_result = diffeqsolve(
             terms=self.diffeqsolve_quants["terms"],
             solver=self.diffeqsolve_quants["solver"],
+            stepsize_controller=self.diffeqsolve_quants["stepsize_controller"],
             t0=self.time_quantities["t0"],
             t1=self.time_quantities["t1"],
             max_steps=self.cfg["grid"]["max_steps"],
@@ -118,3 +143,108 @@ class BaseLPSE2D(ADEPTModule):
         )
 
         return {"solver result": solver_result, "args": args}
+
+    def loss(self, run_output: Dict) -> Array:
+        """
+        The log10 of the electrostatic energy of the plasma waves summed over the saves, which is what the bandwidth of
+        the laser is chosen to reduce
+
+        If ``loss`` is in the config, the loss is that of the running sums at the last save instead (see
+        ``LossAccumulators``)
+
+        :param run_output: from ``__call__``
+        :return: loss
+        """
+        if "loss" in self.cfg:
+            split_step = self.diffeqsolve_quants["terms"].vector_field
+            return split_step.loss_accumulators.get_loss(run_output["solver result"].ys["loss"][-1])
+
+        save_cfg = self.cfg["save"]
+        kx = save_cfg["kx"] if "kx" in save_cfg else self.cfg["grid"]["kx"]
+        ky = save_cfg["ky"] if "ky" in save_cfg else self.cfg["grid"]["ky"]
+        dx = save_cfg["x"]["dx"] if "x" in save_cfg else self.cfg["grid"]["dx"]
+        dy = save_cfg["y"]["dy"] if "y" in save_cfg else self.cfg["grid"]["dy"]
+
+        phi_k = jnp.fft.fft2(run_output["solver result"].ys["epw"].view(jnp.complex128), axes=(1, 2))
+        k_sq = kx[:, None] ** 2.0 + ky[None, :] ** 2.0
+        e_sq = jnp.sum(k_sq[None] * jnp.abs(phi_k) ** 2.0) * dx * dy * save_cfg["t"]["dt"]
+
+        return jnp.log10(e_sq)
+
+    def vg(self, trainable_modules: Dict, args: Dict = None):
+        def _loss_(modules):
+            run_output = self(modules, args)
+            return self.loss(run_output), run_output
+
+        return filter_value_and_grad(_loss_, has_aux=True)(trainable_modules)
+
+    @filter_jit
+    def ensemble_vg(self, trainable_modules: Dict, args: Dict = None) -> Dict:
+        """
+        The mean and variance of the loss and of its gradient over realizations of the random laser phases and noise
+
+        The ``ensemble.num_realizations`` realizations are run in one compiled program. They are vmapped over in chunks
+        (see ``get_ensemble_quants``) and the chunks are run one after the other
+
+        :param trainable_modules:
+        :param args:
+        :return: a dictionary of the ``loss`` of each realization and of the ``mean`` and ``var`` of the loss and the
+            gradient
+        """
+        if args is None:
+            args = self.args
+
+        num_realizations = self.ensemble_quants["num_realizations"]
+        chunk_size = self.ensemble_quants["chunk_size"]
+        num_chunks = -(-num_realizations // chunk_size)
+
+        # the realizations do not depend on the chunking. The last chunk is padded with repeats of the last realization,
+        # which are run but have no weight
+        num_padded = num_chunks * chunk_size - num_realizations
+        keys = get_ensemble_keys(args["keys"], num_realizations)
+        keys = jax.tree_util.tree_map(
+            lambda k: jnp.concatenate([k, jnp.repeat(k[-1:], num_padded, axis=0)]).reshape(
+                num_chunks, chunk_size, *k.shape[1:]
+            ),
+            keys,
+        )
+        weights = (jnp.arange(num_chunks * chunk_size) < num_realizations).reshape(num_chunks, chunk_size)
+        weights = weights / num_realizations
+
+        def _loss_(modules, these_keys):
+            return self.loss(self(modules, {**args, "keys": these_keys}))
+
+        chunk_vg = filter_vmap(filter_value_and_grad(_loss_), in_axes=(None, 0))
+
+        def _add_chunk_(grad_moments, chunk):
+            these_keys, these_weights = chunk
+            losses, grads = chunk_vg(trainable_modules, these_keys)
+            grad_moments = jax.tree_util.tree_map(
+                lambda moments, g: (
+                    moments[0] + jnp.tensordot(these_weights, g, axes=1),
+                    moments[1] + jnp.tensordot(these_weights, g**2.0, axes=1),
+                ),
+                grad_moments,
+                grads,
+                is_leaf=lambda x: isinstance(x, tuple),
+            )
+            return grad_moments, losses
+
+        _, grad_shapes = filter_eval_shape(chunk_vg, trainable_modules, jax.tree_util.tree_map(lambda k: k[0], keys))
+        grad_moments = jax.tree_util.tree_map(
+            lambda g: (jnp.zeros(g.shape[1:], g.dtype), jnp.zeros(g.shape[1:], g.dtype)), grad_shapes
+        )
+        grad_moments, losses = lax.scan(_add_chunk_, grad_moments, (keys, weights))
+        losses = losses.reshape(-1)[:num_realizations]
+
+        is_moments = lambda x: isinstance(x, tuple)
+        grad_mean = jax.tree_util.tree_map(lambda moments: moments[0], grad_moments, is_leaf=is_moments)
+        grad_var = jax.tree_util.tree_map(
+            lambda moments: moments[1] - moments[0] ** 2.0, grad_moments, is_leaf=is_moments
+        )
+
+        return {
+            "loss": losses,
+            "mean": {"loss": jnp.mean(losses), "grad": grad_mean},
+            "var": {"loss": jnp.var(losses), "grad": grad_var},
+        }
@@ -7,7 +7,9 @@ from jax import numpy as jnp, Array
 import equinox as eqx
 import numpy as np
 from adept.theory import electrostatic
+from adept.utils.adaptive import get_step_size
 from adept.lpse2d.core.driver import Driver
+from adept.lpse2d.core.fft import PencilFFT
 from adept.lpse2d.core.trapper import ParticleTrapper
 
 
@@ -26,13 +28,14 @@ class SpectralPotential:
         self.boundary_envelope = cfg["grid"]["absorbing_boundaries"]
         self.dt = cfg["grid"]["dt"]
         self.cfg = cfg
-        self.amp_key, self.phase_key = jax.random.split(jax.random.PRNGKey(np.random.randint(2**20)), 2)
+        self.noise_key = jax.random.PRNGKey(cfg["density"]["noise"].get("seed", np.random.randint(2**20)))
         self.low_pass_filter = cfg["grid"]["low_pass_filter"]
         zero_mask = cfg["grid"]["zero_mask"]
         self.low_pass_filter = self.low_pass_filter * zero_mask
         self.nx = cfg["grid"]["nx"]
         self.ny = cfg["grid"]["ny"]
         self.driver = Driver(cfg)
+        self.fft = PencilFFT(cfg)
         # self.step_tpd = partial(
         #     diffrax.diffeqsolve,
         #     terms=diffrax.ODETerm(self.tpd),
@@ -43,6 +46,34 @@ class SpectralPotential:
         # )
         self.tpd_const = 1j * self.e / (8 * self.wp0 * self.me)
 
+        # the fields and phi are transformed to and from each other with one batched FFT
+        kx_ky = jnp.stack(jnp.meshgrid(self.kx, self.ky, indexing="ij"))
+        self.field_multipliers = -1j * kx_ky * self.low_pass_filter
+        self.phi_multipliers = 1j * kx_ky * self.one_over_ksq * self.low_pass_filter
+
+        # the spectra of ey and div E are transformed together and so are their products with E0. The constants and the
+        # low pass filter are applied to both products in the same spectral pass
+        self.tpd_field_multipliers = jnp.stack([-1j * self.ky[None, :] * self.low_pass_filter, self.k_sq])
+        self.tpd_source_multipliers = (
+            self.tpd_const
+            * self.low_pass_filter
+            * jnp.stack([jnp.ones_like(self.one_over_ksq), 1j * self.ky[None, :] * self.one_over_ksq])
+        )
+
+    def calc_fields_from_phi_k(self, phi_k: Array) -> Tuple[Array, Array]:
+        """
+        Calculates ex(x, y) and ey(x, y) from the spectrum of phi.
+
+        Args:
+            phi_k (Array): phi(kx, ky)
+
+        Returns:
+            A Tuple containing ex(x, y) and ey(x, y)
+        """
+        ex_ey = self.fft.ifft2(self.field_multipliers * phi_k[None])
+
+        return ex_ey[0], ex_ey[1]
+
     def calc_fields_from_phi(self, phi: Array) -> Tuple[Array, Array]:
         """
         Calculates ex(x, y) and ey(x, y) from phi.
@@ -53,13 +84,24 @@ class SpectralPotential:
         Returns:
             A Tuple containing ex(x, y) and ey(x, y)
         """
+        return self.calc_fields_from_phi_k(self.fft.fft2(phi))
+
+    def calc_phi_k_from_fields(self, ex: Array, ey: Array) -> Array:
+        """
+        calculates the spectrum of phi from ex and ey
+
+        Args:
+            ex (Array): ex(x, y)
+            ey (Array): ey(x, y)
+
+        Returns:
+            Array: phi(kx, ky)
+
+        """
 
-        phi_k = jnp.fft.fft2(phi)
-        phi_k *= self.low_pass_filter
+        ex_ey_k = self.fft.fft2(jnp.stack([ex, ey]))
 
-        ex_k = self.kx[:, None] * phi_k * self.low_pass_filter
-        ey_k = self.ky[None, :] * phi_k * self.low_pass_filter
-        return -1j * jnp.fft.ifft2(ex_k), -1j * jnp.fft.ifft2(ey_k)
+        return jnp.sum(self.phi_multipliers * ex_ey_k, axis=0)
 
     def calc_phi_from_fields(self, ex: Array, ey: Array) -> Array:
         """
@@ -73,47 +115,68 @@ class SpectralPotential:
             Array: phi(x, y)
 
         """
+        return self.fft.ifft2(self.calc_phi_k_from_fields(ex, ey))
 
-        ex_k = jnp.fft.fft2(ex)
-        ey_k = jnp.fft.fft2(ey)
-        divE_k = 1j * (self.kx[:, None] * ex_k + self.ky[None, :] * ey_k)
+    def get_dispersion(self, vte_sq: Array, dt: float) -> Array:
+        """
+        The k-space multiplier of the linear propagation over a step
 
-        phi_k = divE_k * self.one_over_ksq
-        phi = jnp.fft.ifft2(phi_k * self.low_pass_filter)
+        Args:
+            vte_sq (Array): vte_sq(x, y)
+            dt (float): the step size
 
-        return phi
+        Returns:
+            Array: the multiplier(kx, ky)
+        """
+        return jnp.exp(-1j * 1.5 * vte_sq[0, 0] / self.wp0 * self.k_sq * dt)
 
-    def tpd(self, t: float, y: Array, args: Dict) -> Array:
+    def get_density_gradient_phase(self, background_density: Array, dt: float) -> Array:
         """
-        Calculates the two plasmon decay term
+        The real-space multiplier of the fields from the density gradient over a step
+
+        Args:
+            background_density (Array): n(x, y)
+            dt (float): the step size
+
+        Returns:
+            Array: the multiplier(x, y)
+        """
+        return jnp.exp(-1j * self.wp0 / 2.0 * (1 - background_density / self.envelope_density) * dt)
+
+    def tpd_k(self, t: float, phi_k: Array, E0: Array) -> Array:
+        """
+        Calculates the spectrum of the two plasmon decay term
 
         Args:
             t (float): time
-            y (Array): phi(x, y)
-            args (Dict): dictionary containing E0
+            phi_k (Array): phi(kx, ky)
+            E0 (Array): E0(x, y)
 
         Returns:
-            Array: dphi(x, y)
+            Array: dphi(kx, ky)
 
         """
-        E0 = args["E0"]
-        phi = y
-        _, ey = self.calc_fields_from_phi(phi)
+        # ey and div E, stacked so that each pair of transforms is a single batched FFT
+        ey_divE = self.fft.ifft2(self.tpd_field_multipliers * phi_k[None])
+        E0_ey_divE_k = self.fft.fft2(E0[None, ..., 1] * jnp.conj(ey_divE))
+        tpd_k = jnp.sum(self.tpd_source_multipliers * E0_ey_divE_k, axis=0)
 
-        tpd1 = E0[..., 1] * jnp.conj(ey)
-        tpd1 = jnp.fft.ifft2(jnp.fft.fft2(tpd1) * self.low_pass_filter)
-        # tpd1 = E0_Ey
+        return jnp.exp(-1j * (self.w0 - 2 * self.wp0) * t) * tpd_k
 
-        divE_true = jnp.fft.ifft2(self.k_sq * jnp.fft.fft2(phi))
-        E0_divE_k = jnp.fft.fft2(E0[..., 1] * jnp.conj(divE_true))
-        tpd2 = 1j * self.ky[None, :] * self.one_over_ksq * E0_divE_k
-        tpd2 = jnp.fft.ifft2(tpd2 * self.low_pass_filter)
+    def tpd(self, t: float, y: Array, args: Dict) -> Array:
+        """
+        Calculates the two plasmon decay term
 
-        total_tpd = self.tpd_const * jnp.exp(-1j * (self.w0 - 2 * self.wp0) * t) * (tpd1 + tpd2)
+        Args:
+            t (float): time
+            y (Array): phi(x, y)
+            args (Dict): dictionary containing E0
 
-        dphi = total_tpd
+        Returns:
+            Array: dphi(x, y)
 
-        return dphi
+        """
+        return self.fft.ifft2(self.tpd_k(t, self.fft.fft2(y), args["E0"]))
 
     def calc_tpd1(self, t: float, y: Array, args: Dict) -> Array:
         """
@@ -151,40 +214,41 @@ class SpectralPotential:
         phi = y
         E0 = args["E0"]
 
-        divE_true = jnp.fft.ifft2(self.k_sq * jnp.fft.fft2(phi))
-        E0_divE_k = jnp.fft.fft2(E0[..., 1] * jnp.conj(divE_true))
+        divE_true = self.fft.ifft2(self.k_sq * self.fft.fft2(phi))
+        E0_divE_k = self.fft.fft2(E0[..., 1] * jnp.conj(divE_true))
 
         tpd2 = 1j * self.ky[None, :] * self.one_over_ksq * E0_divE_k
-        tpd2 = jnp.fft.ifft2(tpd2)
+        tpd2 = self.fft.ifft2(tpd2)
         return self.tpd_const * tpd2
 
+    def get_noise_k(self, key: Array = None):
+        amp_key, phase_key = jax.random.split(self.noise_key if key is None else key, 2)
+        random_amps = 1.0  # jax.random.uniform(amp_key, (self.nx, self.ny))
+        random_phases = 2 * np.pi * jax.random.uniform(phase_key, (self.nx, self.ny))
+        return random_amps * jnp.exp(1j * random_phases) * self.low_pass_filter
+
     def get_noise(self):
-        random_amps = 1.0  # jax.random.uniform(self.amp_key, (self.nx, self.ny))
-        random_phases = 2 * np.pi * jax.random.uniform(self.phase_key, (self.nx, self.ny))
-        return jnp.fft.ifft2(random_amps * jnp.exp(1j * random_phases) * self.low_pass_filter)
+        return self.fft.ifft2(self.get_noise_k())
 
     def __call__(self, t: float, y: Dict[str, Array], args: Dict) -> Array:
-        phi = y["epw"]
-        E0 = y["E0"]
-        background_density = y["background_density"]
-        vte_sq = y["vte_sq"]
+        phi_k = self.fft.fft2(y["epw"])
+        dt = get_step_size(args, self.dt)
 
         if self.cfg["terms"]["epw"]["linear"]:
             # linear propagation
-            phi = jnp.fft.ifft2(jnp.fft.fft2(phi) * jnp.exp(-1j * 1.5 * vte_sq[0, 0] / self.wp0 * self.k_sq * self.dt))
+            phi_k = phi_k * self.get_dispersion(y["vte_sq"], dt)
 
         # tpd
         if self.cfg["terms"]["epw"]["source"]["tpd"]:
-            phi = phi + self.dt * self.tpd(t, phi, args={"E0": E0})
+            phi_k = phi_k + dt * self.tpd_k(t, phi_k, y["E0"])
 
         # density gradient
         if self.cfg["terms"]["epw"]["density_gradient"]:
-            ex, ey = self.calc_fields_from_phi(phi)
-            ex *= jnp.exp(-1j * self.wp0 / 2.0 * (1 - background_density / self.envelope_density) * self.dt)
-            ey *= jnp.exp(-1j * self.wp0 / 2.0 * (1 - background_density / self.envelope_density) * self.dt)
-            phi = self.calc_phi_from_fields(ex, ey)
+            ex, ey = self.calc_fields_from_phi_k(phi_k)
+            density_gradient_phase = self.get_density_gradient_phase(y["background_density"], dt)
+            phi_k = self.calc_phi_k_from_fields(ex * density_gradient_phase, ey * density_gradient_phase)
 
         if self.cfg["terms"]["epw"]["source"]["noise"]:
-            phi += self.dt * self.get_noise()
+            phi_k = phi_k + dt * self.get_noise_k()
 
-        return phi
+        return self.fft.ifft2(phi_k)
@@ -0,0 +1,81 @@
+from typing import Callable, Dict
+
+import jax
+from jax import numpy as jnp, Array, lax
+from jax.experimental.shard_map import shard_map
+from jax.sharding import Mesh, NamedSharding, PartitionSpec as P
+import numpy as np
+
+
+class PencilFFT:
+    """
+    The 2D FFTs of the fields, which are (..., nx, ny)
+
+    If ``grid.sharding`` is in the config, the fields and their spectra are sharded along x (and kx) over
+    ``grid.sharding.num_devices`` devices. A 2D FFT is a 1D FFT along y of the rows on each device, an all-to-all that
+    transposes the fields so that each device has all of x for a slab of y, a 1D FFT along x and an all-to-all back.
+    The spectra are in the same layout as the fields so that the operators in real space and in k-space are local to
+    the devices.
+
+    Otherwise, they are ``jnp.fft.fft2`` and ``jnp.fft.ifft2`` and the state is not sharded
+
+    :param cfg:
+    """
+
+    axis_name = "x"
+
+    def __init__(self, cfg: Dict) -> None:
+        self.num_devices = cfg["grid"].get("sharding", {}).get("num_devices", 1)
+        if self.num_devices > 1:
+            self.mesh = Mesh(np.array(jax.devices()[: self.num_devices]), (self.axis_name,))
+        else:
+            self.mesh = None
+
+    def _pencil_(self, f: Array, transform: Callable) -> Array:
+        # along the last two axes, the second to last of which is sharded
+        spec = P(*(None,) * (f.ndim - 2), self.axis_name, None)
+        x_axis, y_axis = f.ndim - 2, f.ndim - 1
+
+        def _local_(block):
+            block = transform(block, axis=y_axis)
+            block = lax.all_to_all(block, self.axis_name, y_axis, x_axis, tiled=True)
+            block = transform(block, axis=x_axis)
+            return lax.all_to_all(block, self.axis_name, x_axis, y_axis, tiled=True)
+
+        return shard_map(_local_, mesh=self.mesh, in_specs=spec, out_specs=spec)(f)
+
+    def fft2(self, f: Array) -> Array:
+        if self.mesh is None:
+            return jnp.fft.fft2(f)
+        return self._pencil_(f, jnp.fft.fft)
+
+    def ifft2(self, f: Array) -> Array:
+        if self.mesh is None:
+            return jnp.fft.ifft2(f)
+        return self._pencil_(f, jnp.fft.ifft)
+
+    def get_sharding(self, v: Array) -> NamedSharding:
+        # the fields are sharded along their first axis and everything else is replicated
+        return NamedSharding(self.mesh, P(self.axis_name) if np.ndim(v) >= 2 else P())
+
+    def shard(self, y: Dict[str, Array]) -> Dict[str, Array]:
+        """
+        Places the state on the devices
+
+        :param y: the state
+        :return: the sharded state
+        """
+        if self.mesh is None:
+            return y
+        return {k: jax.device_put(v, self.get_sharding(v)) for k, v in y.items()}
+
+    def constrain(self, y: Dict[str, Array]) -> Dict[str, Array]:
+        """
+        The same as ``shard`` inside of a jitted function
+
+        :param y: the state
+        :return: the sharded state
+        """
+        if self.mesh is None:
+            return y
+        return {k: lax.with_sharding_constraint(v, self.get_sharding(v)) for k, v in y.items()}
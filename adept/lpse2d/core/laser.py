@@ -1,5 +1,6 @@
 from typing import Dict, Tuple
-from jax import numpy as jnp
+import jax
+from jax import numpy as jnp, lax
 import numpy as np
 
 
@@ -12,26 +13,84 @@ class Light:
         self.dE0x = jnp.zeros((cfg["grid"]["nx"], cfg["grid"]["ny"]))
         self.x = cfg["grid"]["x"]
 
+        # the number of colors whose spatial factors fit in the memory budget, in MB, of the laser
+        max_memory = cfg.get("drivers", {}).get("E0", {}).get("max_memory_mb", 1024) * 2**20
+        bytes_per_color = cfg["grid"]["nx"] * cfg["grid"]["ny"] * np.dtype(np.complex128).itemsize
+        self.colors_per_chunk = max(1, int(max_memory // bytes_per_color))
+
+    def get_spatial_factor(self, background_density: jnp.ndarray, delta_omega: jnp.ndarray) -> jnp.ndarray:
+        """
+        The part of the field of each color that does not depend on time
+
+        :param background_density: the background density (nx, ny)
+        :param delta_omega: the frequency shift of each color (num_colors,)
+        :return: the spatial factor (num_colors, nx, ny)
+        """
+        wpe = self.w0 * jnp.sqrt(background_density)[None]
+        delta_omega = delta_omega[:, None, None]
+        k0 = self.w0 / self.c * jnp.sqrt((1 + 0j + delta_omega) ** 2 - wpe**2 / self.w0**2)
+
+        return (
+            (1 + 0j - wpe**2.0 / (self.w0 * (1 + delta_omega)) ** 2) ** -0.25
+            * self.E0_source
+            * jnp.exp(1j * k0 * self.x[None, :, None])
+        )
+
+    def get_static_light_wave(self, background_density: jnp.ndarray, light_wave: Dict) -> Dict:
+        """
+        Adds the spatial factors of the colors to the driver so that they are computed once per solve rather than every
+        step. This is skipped if they do not fit in the memory budget, in which case they are computed every step in
+        chunks of colors
+
+        :param background_density: the background density (nx, ny), which is static
+        :param light_wave: the driver
+        :return: the driver
+        """
+        if light_wave["delta_omega"].shape[0] > self.colors_per_chunk:
+            return light_wave
+
+        return {**light_wave, "spatial_factor": self.get_spatial_factor(background_density, light_wave["delta_omega"])}
+
+    def _sum_colors_(self, background_density: jnp.ndarray, delta_omega: jnp.ndarray, coefficients: jnp.ndarray):
+        num_colors = delta_omega.shape[0]
+        if num_colors <= self.colors_per_chunk:
+            return jnp.tensordot(coefficients, self.get_spatial_factor(background_density, delta_omega), axes=1)
+
+        # the padded colors have no amplitude
+        num_chunks = -(-num_colors // self.colors_per_chunk)
+        pad = num_chunks * self.colors_per_chunk - num_colors
+        delta_omega = jnp.pad(delta_omega, (0, pad)).reshape(num_chunks, self.colors_per_chunk)
+        coefficients = jnp.pad(coefficients, (0, pad)).reshape(num_chunks, self.colors_per_chunk)
+
+        # the spatial factors are recomputed rather than stored for the backward pass
+        @jax.checkpoint
+        def _add_chunk_(field, chunk):
+            chunk_delta_omega, chunk_coefficients = chunk
+            spatial_factor = self.get_spatial_factor(background_density, chunk_delta_omega)
+            return field + jnp.tensordot(chunk_coefficients, spatial_factor, axes=1), None
+
+        field = jnp.zeros(background_density.shape, dtype=jnp.complex128)
+        field, _ = lax.scan(_add_chunk_, field, (delta_omega, coefficients))
+
+        return field
+
     def laser_update(self, t: float, y: jnp.ndarray, light_wave: Dict) -> Tuple[jnp.ndarray, jnp.ndarray]:
         """
         This function updates the laser field at time t
 
+        The field is the sum over the colors of the spatial factor times the amplitude, the initial phase and the
+        time-dependent phase. The sum is a matmul of the spatial factors with the vector of the other three.
+
         :param t: time
         :param y: state variables
         :return: updated laser field
         """
-        # if self.cfg["laser"]["time"] == "static":
-        wpe = self.w0 * jnp.sqrt(y["background_density"])[None]
-        k0 = self.w0 / self.c * jnp.sqrt((1 + 0j + light_wave["delta_omega"][:, None, None]) ** 2 - wpe**2 / self.w0**2)
-        E0_static = (
-            (1 + 0j - wpe**2.0 / (self.w0 * (1 + light_wave["delta_omega"][:, None, None])) ** 2) ** -0.25
-            * self.E0_source
-            * light_wave["amplitudes"][:, None, None]
-            * jnp.exp(1j * k0 * self.x[None, :, None] + 1j * light_wave["initial_phase"][:, None, None])
+        coefficients = light_wave["amplitudes"] * jnp.exp(
+            1j * light_wave["initial_phase"] - 1j * light_wave["delta_omega"] * self.w0 * t
         )
-        dE0y = E0_static * jnp.exp(-1j * light_wave["delta_omega"][:, None, None] * self.w0 * t)
-        E0 = jnp.stack([self.dE0x, jnp.sum(dE0y, axis=0)], axis=-1)
-        # else:
-        #     raise NotImplementedError
+        if "spatial_factor" in light_wave:
+            dE0y = jnp.tensordot(coefficients, light_wave["spatial_factor"], axes=1)
+        else:
+            dE0y = self._sum_colors_(y["background_density"], light_wave["delta_omega"], coefficients)
 
-        return E0
+        return jnp.stack([self.dE0x, dE0y], axis=-1)
@@ -0,0 +1,101 @@
+from typing import Dict
+
+from jax import numpy as jnp, Array
+import numpy as np
+
+
+class LossAccumulators:
+    """
+    Running sums over the solve that the loss is calculated from. They are carried in ``y["loss"]`` so that the loss and
+    its gradient do not need the fields at the saves
+
+    The terms of the loss are configured in ``loss.terms``
+
+    - ``e_sq``: the log10 of the time integral of the energy of the plasma waves, ``int dt int dx dy |E|^2``
+    - ``e_sq_k``: the same for the wavenumbers between ``kmin`` and ``kmax``, in units of ``w0 / c``
+    - ``growth_rate``: the growth rate of the amplitude of the plasma waves between ``tmin`` and ``tmax``, from a least
+      squares fit to the log of their energy
+
+    and the loss is the sum of the terms times their ``weight`` (default 1)
+
+    :param cfg:
+    """
+
+    # the number of running sums of each term
+    sizes = {"e_sq": 1, "e_sq_k": 1, "growth_rate": 5}
+
+    def __init__(self, cfg: Dict) -> None:
+        self.terms = cfg["loss"]["terms"]
+        self.slices = {}
+        start = 0
+        for name in self.terms:
+            self.slices[name] = slice(start, start + self.sizes[name])
+            start += self.sizes[name]
+        self.size = start
+
+        kx = cfg["grid"]["kx"][:, None]
+        ky = cfg["grid"]["ky"][None, :]
+        self.k_sq = kx**2.0 + ky**2.0
+        # the integral over space of |E|^2 from the spectrum of phi by Parseval's theorem
+        self.e_sq_norm = cfg["grid"]["dx"] * cfg["grid"]["dy"] / cfg["grid"]["nx"] / cfg["grid"]["ny"]
+        if "e_sq_k" in self.terms:
+            k = np.sqrt(self.k_sq) * cfg["units"]["derived"]["c"] / cfg["units"]["derived"]["w0"]
+            self.k_window = np.where(
+                (k >= self.terms["e_sq_k"]["kmin"]) & (k <= self.terms["e_sq_k"]["kmax"]), 1.0, 0.0
+            )
+
+    def init(self) -> np.ndarray:
+        return np.zeros(self.size)
+
+    def __call__(self, t: float, dt: float, accumulators: Array, phi_k: Array) -> Array:
+        """
+        Adds a step to the running sums
+
+        :param t: the time at the end of the step
+        :param dt: the step size
+        :param accumulators: the running sums
+        :param phi_k: phi(kx, ky) at the end of the step
+        :return: the running sums
+        """
+        e_sq_k = self.e_sq_norm * self.k_sq * jnp.abs(phi_k) ** 2.0
+        e_sq = jnp.sum(e_sq_k)
+
+        sums = []
+        for name in self.terms:
+            if name == "e_sq":
+                sums.append(jnp.atleast_1d(e_sq * dt))
+            elif name == "e_sq_k":
+                sums.append(jnp.atleast_1d(jnp.sum(self.k_window * e_sq_k) * dt))
+            elif name == "growth_rate":
+                # the steps that end in the window, to within half a step
+                tmin, tmax = self.terms[name]["tmin"] - 0.5 * dt, self.terms[name]["tmax"] + 0.5 * dt
+                weight = dt * ((t >= tmin) & (t <= tmax))
+                log_e_sq = jnp.log(e_sq + 1e-300)
+                sums.append(weight * jnp.array([1.0, t, t**2.0, log_e_sq, t * log_e_sq]))
+            else:
+                raise NotImplementedError(f"The loss term -- {name} -- has not been implemented")
+
+        return accumulators + jnp.concatenate(sums)
+
+    def get_terms(self, accumulators: Array) -> Dict[str, Array]:
+        """
+        The terms of the loss from the running sums at the end of the solve
+
+        :param accumulators: the running sums
+        :return: terms
+        """
+        terms = {}
+        for name, this_slice in self.slices.items():
+            sums = accumulators[..., this_slice]
+            if name in ["e_sq", "e_sq_k"]:
+                terms[name] = jnp.log10(sums[..., 0])
+            elif name == "growth_rate":
+                s_w, s_t, s_tt, s_y, s_ty = [sums[..., i] for i in range(5)]
+                # half the slope of the log of the energy
+                terms[name] = 0.5 * (s_w * s_ty - s_t * s_y) / (s_w * s_tt - s_t**2.0)
+
+        return terms
+
+    def get_loss(self, accumulators: Array) -> Array:
+        terms = self.get_terms(accumulators)
+        return sum(self.terms[name].get("weight", 1.0) * term for name, term in terms.items())
@@ -1,21 +1,26 @@
 import os
-from typing import Dict, Tuple
+from typing import Callable, Dict, List, Tuple
 from collections import defaultdict
 from functools import partial
 
 import matplotlib.pyplot as plt
 import yaml, mlflow
+import jax
 from jax import Array, numpy as jnp
 import numpy as np
 import equinox as eqx
 import xarray as xr
-import interpax
 
 from astropy.units import Quantity as _Q
 
 from adept.lpse2d import nn
+from adept.lpse2d.core.loss import LossAccumulators
 
 from adept import get_envelope
+from adept.utils.output import append_netcdf, decode, get_output_save_func, get_quantity_output
+from adept.utils.adaptive import get_adaptive_cfg
+from adept.utils.grid_sizing import get_fft_friendly_sizes
+from adept.utils.plotting import plot_job, run_plot_jobs
 
 
 def write_units(cfg: Dict) -> Dict:
@@ -195,6 +200,29 @@ def get_derived_quantities(cfg: Dict) -> Dict:
     cfg_grid["dy"] = cfg_grid["dx"]  # cfg_grid["ymax"] / cfg_grid["ny"]
     cfg_grid["ny"] = int(cfg_grid["ymax"] / cfg_grid["dy"]) + 1
 
+    num_devices = 1
+    if "sharding" in cfg_grid:
+        num_devices = int(cfg_grid["sharding"].get("num_devices", jax.device_count()))
+        if num_devices > jax.device_count():
+            raise ValueError(f"{num_devices} devices were requested but only {jax.device_count()} are available")
+        cfg_grid["sharding"]["num_devices"] = num_devices
+
+    if "fft_sizing" in cfg_grid:
+        # the sizes are rounded to ones without large prime factors and the cells are resized to keep the domain
+        sizes, cfg_grid["fft_sizing"]["speedup"] = get_fft_friendly_sizes(
+            {"nx": cfg_grid["nx"], "ny": cfg_grid["ny"]}, cfg_grid["fft_sizing"], multiple_of=num_devices
+        )
+        cfg_grid["dx"] *= cfg_grid["nx"] / sizes["nx"]
+        cfg_grid["dy"] *= cfg_grid["ny"] / sizes["ny"]
+        cfg_grid["nx"], cfg_grid["ny"] = sizes["nx"], sizes["ny"]
+
+    if cfg_grid["nx"] % num_devices or cfg_grid["ny"] % num_devices:
+        # the fields are sharded along x and are transposed to be sharded along y in the FFTs
+        raise ValueError(
+            f"The grid ({cfg_grid['nx']} x {cfg_grid['ny']}) must be divisible by the number of devices "
+            f"({num_devices}) in both directions to be sharded. grid.fft_sizing rounds the grid to such sizes"
+        )
+
     # midpt = (cfg_grid["xmax"] + cfg_grid["xmin"]) / 2
 
     # max_density = cfg["density"]["val at center"] + (cfg["grid"]["xmax"] - midpt) / L
@@ -212,6 +240,10 @@ def get_derived_quantities(cfg: Dict) -> Dict:
     else:
         cfg_grid["max_steps"] = cfg_grid["nt"] + 4
 
+    if "adaptive" in cfg_grid:
+        # the sources are first order in the phase of the plasma wave so they need a smaller cfl
+        cfg_grid["adaptive"] = get_adaptive_cfg(cfg_grid, to_code_units=lambda dt: _Q(dt).to("ps").value, cfl=0.1)
+
     # change driver parameters to the right units
     for k in cfg["drivers"].keys():
         cfg["drivers"][k]["derived"] = {}
@@ -229,11 +261,83 @@ def get_derived_quantities(cfg: Dict) -> Dict:
             cfg["drivers"][k]["derived"]["w0"] = cfg["drivers"][k]["w0"]
             cfg["drivers"][k]["derived"]["a0"] = cfg["drivers"][k]["a0"]
 
+    if "loss" in cfg and "growth_rate" in cfg["loss"]["terms"]:
+        growth_rate_cfg = cfg["loss"]["terms"]["growth_rate"]
+        growth_rate_cfg["tmin"] = _Q(growth_rate_cfg.get("tmin", "0ps")).to("ps").value
+        growth_rate_cfg["tmax"] = _Q(growth_rate_cfg.get("tmax", f"{cfg_grid['tmax']}ps")).to("ps").value
+
+    # the seeds of the random laser phases and of the noise are drawn once and logged so that a run can be reproduced
+    if "E0" in cfg["drivers"]:
+        cfg["drivers"]["E0"]["seed"] = int(cfg["drivers"]["E0"].get("seed", np.random.randint(2**20)))
+    cfg["density"]["noise"]["seed"] = int(cfg["density"]["noise"].get("seed", np.random.randint(2**20)))
+
     cfg["grid"] = cfg_grid
 
     return cfg
 
 
+def get_random_keys(cfg: Dict) -> Dict[str, Array]:
+    """
+    The PRNG keys of the random laser phases and of the noise. They are passed to the solve in ``args["keys"]`` so
+    that a solve can be vmapped over realizations of them
+
+    :param cfg:
+    :return: keys: Dict
+    """
+    return {
+        "phases": jax.random.PRNGKey(cfg["drivers"].get("E0", {}).get("seed", np.random.randint(2**20))),
+        "noise": jax.random.PRNGKey(cfg["density"]["noise"].get("seed", np.random.randint(2**20))),
+    }
+
+
+def get_random_phases(key: Array, num_colors: int) -> Array:
+    """
+    The initial phases of the colors of the laser
+
+    :param key: ``keys["phases"]`` from ``get_random_keys``
+    :param num_colors:
+    :return: initial_phase: (num_colors,)
+    """
+    return 2 * np.pi * jax.random.uniform(key, (num_colors,))
+
+
+def get_ensemble_keys(keys: Dict[str, Array], num_realizations: int) -> Dict[str, Array]:
+    """
+    Splits each key into one for every realization of an ensemble
+
+    :param keys: from ``get_random_keys``
+    :param num_realizations:
+    :return: keys: Dict of (num_realizations, 2) keys
+    """
+    return {k: jax.random.split(v, num_realizations) for k, v in keys.items()}
+
+
+def get_ensemble_quants(cfg: Dict, state: Dict) -> Dict:
+    """
+    The number of realizations of an ensemble and how many of them are vmapped at a time
+
+    ``ensemble.chunk_size`` sets the number of realizations in a chunk. Otherwise, it is as many as fit in
+    ``ensemble.max_memory_mb`` (default 1024). The memory of a realization is estimated from the saves and from the
+    ``sqrt(2 * max_steps)`` checkpoints of the state that the backward pass keeps
+
+    :param cfg:
+    :param state:
+    :return: ensemble_quants: Dict
+    """
+    ensemble_cfg = cfg["ensemble"]
+    num_realizations = int(ensemble_cfg["num_realizations"])
+
+    if "chunk_size" in ensemble_cfg:
+        chunk_size = int(ensemble_cfg["chunk_size"])
+    else:
+        state_bytes = sum(np.asarray(v).nbytes for v in state.values())
+        num_checkpoints = int(np.sqrt(2 * cfg["grid"]["max_steps"])) + 1
+        realization_bytes = state_bytes * (num_checkpoints + len(cfg["save"]["t"]["ax"]))
+        chunk_size = int(ensemble_cfg.get("max_memory_mb", 1024) * 2**20 // realization_bytes)
+
+    return {"num_realizations": num_realizations, "chunk_size": max(1, min(chunk_size, num_realizations))}
+
+
 def get_solver_quantities(cfg: Dict) -> Dict:
     """
     This function just updates the config with the derived quantities that are arrays
@@ -328,35 +432,49 @@ def get_solver_quantities(cfg: Dict) -> Dict:
     return cfg_grid
 
 
-def init_state(cfg: Dict, td=None) -> Tuple[Dict, Dict]:
+def init_epw(cfg: Dict, key: Array) -> np.ndarray:
     """
-    This function initializes the state for the PDE solve
-
-    The state is initialized using
-    random seeds
-    drivers
-
+    The initial plasma wave, which has the random phases of the noise and no amplitude
 
     :param cfg:
-    :return: state: Dict
+    :param key: ``keys["noise"]`` from ``get_random_keys``
+    :return: epw: (nx, ny)
     """
-
+    amp_key, phase_key = jax.random.split(key)
+    shape = (cfg["grid"]["nx"], cfg["grid"]["ny"])
     if cfg["density"]["noise"]["type"] == "uniform":
-        random_amps = np.random.uniform(
-            cfg["density"]["noise"]["min"], cfg["density"]["noise"]["max"], (cfg["grid"]["nx"], cfg["grid"]["ny"])
+        random_amps = jax.random.uniform(
+            amp_key, shape, minval=cfg["density"]["noise"]["min"], maxval=cfg["density"]["noise"]["max"]
         )
 
     elif cfg["density"]["noise"]["type"] == "normal":
         loc = 0.5 * (cfg["density"]["noise"]["min"] + cfg["density"]["noise"]["max"])
         scale = 1.0
-        random_amps = np.random.normal(loc, scale, (cfg["grid"]["nx"], cfg["grid"]["ny"]))
+        random_amps = loc + scale * jax.random.normal(amp_key, shape)
 
     else:
         raise NotImplementedError
 
-    random_phases = np.random.uniform(0, 2 * np.pi, (cfg["grid"]["nx"], cfg["grid"]["ny"]))
-    phi_noise = 1 * np.exp(1j * random_phases)
-    epw = 0 * phi_noise
+    random_phases = 2 * np.pi * jax.random.uniform(phase_key, shape)
+    phi_noise = 1 * np.exp(1j * np.asarray(random_phases))
+
+    return 0 * phi_noise
+
+
+def init_state(cfg: Dict, td=None) -> Tuple[Dict, Dict]:
+    """
+    This function initializes the state for the PDE solve
+
+    The state is initialized using
+    random seeds
+    drivers
+
+
+    :param cfg:
+    :return: state: Dict
+    """
+
+    epw = init_epw(cfg, get_random_keys(cfg)["noise"])
 
     background_density = get_density_profile(cfg)
     vte_sq = np.ones((cfg["grid"]["nx"], cfg["grid"]["ny"])) * cfg["units"]["derived"]["vte"] ** 2
@@ -387,7 +505,7 @@ def assemble_bandwidth(cfg: Dict) -> Dict:
         delta_omega = np.linspace(-delta_omega_max, delta_omega_max, num_colors)
 
         drivers["E0"]["delta_omega"] = delta_omega
-        drivers["E0"]["initial_phase"] = np.random.uniform(0, 2 * np.pi, num_colors)
+        drivers["E0"]["initial_phase"] = np.asarray(get_random_phases(get_random_keys(cfg)["phases"], num_colors))
 
         if cfg["drivers"]["E0"]["amplitude_shape"] == "uniform":
             drivers["E0"]["amplitudes"] = np.ones(num_colors)
@@ -493,58 +611,44 @@ def get_density_profile(cfg: Dict) -> Array:
     return nprof
 
 
-def plot_fields(fields, td):
-    t_skip = int(fields.coords["t (ps)"].data.size // 8)
+def _get_tslice_(fld: xr.DataArray) -> slice:
+    t_skip = int(fld.coords["t (ps)"].data.size // 8)
     t_skip = t_skip if t_skip > 1 else 1
-    tslice = slice(0, -1, t_skip)
-
-    dx = fields.coords["x (um)"].data[1] - fields.coords["x (um)"].data[0]
-    dy = fields.coords["y (um)"].data[1] - fields.coords["y (um)"].data[0]
-
-    for k, v in fields.items():
-        fld_dir = os.path.join(td, "plots", k)
-        os.makedirs(fld_dir)
-
-        np.abs(v[tslice]).T.plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(fld_dir, f"{k}_x.png"), bbox_inches="tight")
-        plt.close()
+    return slice(0, -1, t_skip)
 
-        np.real(v[tslice]).T.plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(fld_dir, f"{k}_x_r.png"), bbox_inches="tight")
-        plt.close()
 
-        # fig, ax = plt.subplots(1, 1, figsize=(10, 4))
-        # np.abs(v[:, 1, 0]).plot(ax=ax)
-        # fig.savefig(os.path.join(td, "plots", f"{k}_k1.png"))
-        # plt.close()
-        ymidpt = int(fields.coords["y (um)"].data.size // 2)
-        slice_dir = os.path.join(fld_dir, "slice-along-x")
-        os.makedirs(slice_dir)
-        np.log10(np.abs(v[tslice, :, ymidpt])).plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(slice_dir, f"log-{k}.png"))
-        plt.close()
+def _get_part_(fld: xr.DataArray, part: str) -> xr.DataArray:
+    if part == "abs":
+        return np.abs(fld)
+    elif part == "real":
+        return np.real(fld)
+    elif part == "log":
+        return np.log10(np.abs(fld))
+    else:
+        raise NotImplementedError
 
-        np.abs(v[tslice, :, ymidpt]).plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(slice_dir, f"{k}.png"))
-        plt.close()
 
-        np.real(v[tslice, :, ymidpt]).plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(slice_dir, f"real-{k}.png"))
-        plt.close()
+def plot_xy(v: xr.DataArray, path: str, part: str):
+    _get_part_(v[_get_tslice_(v)], part).T.plot(col="t (ps)", col_wrap=4)
+    plt.savefig(path, bbox_inches="tight")
+    plt.close()
 
-        np.log10(np.abs(v[:, :, ymidpt])).plot()
-        plt.savefig(os.path.join(slice_dir, f"spacetime-log-{k}.png"))
-        plt.close()
 
-        np.abs(v[:, :, ymidpt]).plot()
-        plt.savefig(os.path.join(slice_dir, f"spacetime-{k}.png"))
-        plt.close()
+def plot_x_slice(v: xr.DataArray, path: str, part: str, spacetime: bool):
+    ymidpt = int(v.coords["y (um)"].data.size // 2)
+    if spacetime:
+        _get_part_(v[:, :, ymidpt], part).plot()
+    else:
+        _get_part_(v[_get_tslice_(v), :, ymidpt], part).plot(col="t (ps)", col_wrap=4)
+    plt.savefig(path)
+    plt.close()
 
-        np.real(v[:, :, ymidpt]).plot()
-        plt.savefig(os.path.join(slice_dir, f"spacetime-real-{k}.png"))
-        plt.close()
 
+def plot_total_e_sq(fields: xr.Dataset, path: str):
     # plot total electric field energy in box vs time
+    dx = fields.coords["x (um)"].data[1] - fields.coords["x (um)"].data[0]
+    dy = fields.coords["y (um)"].data[1] - fields.coords["y (um)"].data[0]
+
     fig, ax = plt.subplots(1, 2, figsize=(10, 4), tight_layout=True)
     total_e_sq = np.abs(fields["ex"].data ** 2 + fields["ey"].data ** 2).sum(axis=(1, 2)) * dx * dy
     ax[0].plot(fields.coords["t (ps)"].data, total_e_sq)
@@ -558,43 +662,62 @@ def plot_fields(fields, td):
     ax[0].grid()
     ax[1].grid()
 
-    fig.savefig(os.path.join(td, "plots", "total_e_sq.png"))
+    fig.savefig(path)
     plt.close()
 
 
-def plot_kt(kfields, td):
-    t_skip = int(kfields.coords["t (ps)"].data.size // 8)
-    t_skip = t_skip if t_skip > 1 else 1
-    tslice = slice(0, -1, t_skip)
-
-    k_min = -2.5
-    k_max = 2.5
-
-    ikx_min = np.argmin(np.abs(kfields.coords["kx ($kc\omega_0^{-1}$)"].data - k_min))
-    ikx_max = np.argmin(np.abs(kfields.coords["kx ($kc\omega_0^{-1}$)"].data - k_max))
-    iky_min = np.argmin(np.abs(kfields.coords["ky ($kc\omega_0^{-1}$)"].data - k_min))
-    iky_max = np.argmin(np.abs(kfields.coords["ky ($kc\omega_0^{-1}$)"].data - k_max))
+def plot_k(v: xr.DataArray, path: str, part: str, ky_zero: bool, k_min: float = -2.5, k_max: float = 2.5):
+    kx = v.coords["kx ($kc\omega_0^{-1}$)"].data
+    ky = v.coords["ky ($kc\omega_0^{-1}$)"].data
+    kx_slice = slice(np.argmin(np.abs(kx - k_min)), np.argmin(np.abs(kx - k_max)))
+    ky_slice = 0 if ky_zero else slice(np.argmin(np.abs(ky - k_min)), np.argmin(np.abs(ky - k_max)))
 
-    kx_slice = slice(ikx_min, ikx_max)
-    ky_slice = slice(iky_min, iky_max)
-
-    for k, v in kfields.items():
-        fld_dir = os.path.join(td, "plots", k)
-        os.makedirs(fld_dir, exist_ok=True)
-
-        np.log10(np.abs(v[tslice, kx_slice, 0])).T.plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(fld_dir, f"log_{k}_kx.png"), bbox_inches="tight")
-        plt.close()
+    _get_part_(v[_get_tslice_(v), kx_slice, ky_slice], part).T.plot(col="t (ps)", col_wrap=4)
+    plt.savefig(path, bbox_inches="tight")
+    plt.close()
 
-        np.abs(v[tslice, kx_slice, ky_slice]).T.plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(fld_dir, f"{k}_kx_ky.png"), bbox_inches="tight")
-        plt.close()
 
-        np.log10(np.abs(v[tslice, kx_slice, ky_slice])).T.plot(col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(fld_dir, f"log_{k}_kx_ky.png"), bbox_inches="tight")
-        plt.close()
-        #
-        # kx = kfields.coords["kx"].data
+def get_field_plot_jobs(fields: xr.Dataset, file: str) -> List[Dict]:
+    jobs = []
+    for k in fields.keys():
+        fld_dir = os.path.join("plots", k)
+        slice_dir = os.path.join(fld_dir, "slice-along-x")
+        jobs += [
+            plot_job(plot_xy, file, os.path.join(fld_dir, f"{k}_x.png"), k, part="abs"),
+            plot_job(plot_xy, file, os.path.join(fld_dir, f"{k}_x_r.png"), k, part="real"),
+        ]
+        for part, prefix in zip(["log", "abs", "real"], ["log-", "", "real-"]):
+            jobs += [
+                plot_job(
+                    plot_x_slice, file, os.path.join(slice_dir, f"{prefix}{k}.png"), k, part=part, spacetime=False
+                ),
+                plot_job(
+                    plot_x_slice,
+                    file,
+                    os.path.join(slice_dir, f"spacetime-{prefix}{k}.png"),
+                    k,
+                    part == "abs",
+                    part=part,
+                    spacetime=True,
+                ),
+            ]
+
+    jobs.append(plot_job(plot_total_e_sq, file, os.path.join("plots", "total_e_sq.png"), thumbnail=True))
+
+    return jobs
+
+
+def get_kt_plot_jobs(kfields: xr.Dataset, file: str) -> List[Dict]:
+    jobs = []
+    for k in kfields.keys():
+        fld_dir = os.path.join("plots", k)
+        jobs += [
+            plot_job(plot_k, file, os.path.join(fld_dir, f"log_{k}_kx.png"), k, part="log", ky_zero=True),
+            plot_job(plot_k, file, os.path.join(fld_dir, f"{k}_kx_ky.png"), k, part="abs", ky_zero=False),
+            plot_job(plot_k, file, os.path.join(fld_dir, f"log_{k}_kx_ky.png"), k, True, part="log", ky_zero=False),
+        ]
+
+    return jobs
 
 
 def post_process(result, cfg: Dict, td: str, args) -> Tuple[xr.Dataset, xr.Dataset]:
@@ -630,17 +753,29 @@ def post_process(result, cfg: Dict, td: str, args) -> Tuple[xr.Dataset, xr.Datas
         plt.savefig(os.path.join(td, "learned_bandwidth.png"), bbox_inches="tight")
         plt.close()
 
+    metrics = {}
+    if "loss" in result.ys:
+        loss_accumulators = LossAccumulators(cfg)
+        loss_terms = loss_accumulators.get_terms(result.ys["loss"][-1])
+        metrics["loss"] = float(loss_accumulators.get_loss(result.ys["loss"][-1]))
+        metrics.update({f"loss_{k}": float(v) for k, v in loss_terms.items()})
+
+    if "epw" not in result.ys:
+        # only the loss is saved
+        return {"metrics": metrics}
+
     os.makedirs(os.path.join(td, "binary"))
     kfields, fields = make_xarrays(cfg, result.ts, result.ys, td)
 
-    plot_fields(fields, td)
-    plot_kt(kfields, td)
+    plot_jobs = get_field_plot_jobs(fields, os.path.join("binary", "fields.xr"))
+    if kfields is not None:
+        plot_jobs += get_kt_plot_jobs(kfields, os.path.join("binary", "k-fields.xr"))
+    run_plot_jobs(plot_jobs, td, cfg.get("plots", {}))
 
     dx = fields.coords["x (um)"].data[1] - fields.coords["x (um)"].data[0]
     dy = fields.coords["y (um)"].data[1] - fields.coords["y (um)"].data[0]
     dt = fields.coords["t (ps)"].data[1] - fields.coords["t (ps)"].data[0]
 
-    metrics = {}
     metrics["total_e_sq"] = float(
         np.sum(np.abs(fields["ex"][-20:].data) ** 2 + np.abs(fields["ey"][-20:].data ** 2) * dx * dy * dt)
     )
@@ -656,7 +791,68 @@ def post_process(result, cfg: Dict, td: str, args) -> Tuple[xr.Dataset, xr.Datas
     return {"k": kfields, "x": fields, "metrics": metrics}
 
 
+def _as_complex_(arr: np.ndarray, spec: Dict) -> np.ndarray:
+    """
+    The complex fields are saved as real views so they are viewed as complex128 if they are saved in double precision
+    and as complex64 otherwise
+
+    :param arr:
+    :param spec: from ``get_quantity_output``
+    :return:
+    """
+    arr = decode(arr, spec)
+    if arr.dtype == np.float64:
+        return arr.view(np.complex128)
+    else:
+        return arr.astype(np.float32).view(np.complex64)
+
+
+def get_spectral_fields_func(kx: np.ndarray, ky: np.ndarray, k_slices: Tuple[slice, slice], norm: float) -> Callable:
+    """
+    The jitted function that calculates the spectra of phi, ex and ey and the fields ex and ey from phi for a chunk
+    of the saves. Only the part of the shifted spectra in ``k_slices`` is returned
+
+    :param kx: (nx,)
+    :param ky: (ny,)
+    :param k_slices: of the shifted kx and ky
+    :param norm: of ex and ey
+    :return: ``f(phi (nt, nx, ny)) -> (k-fields, fields)``
+    """
+    kx, ky = jnp.array(kx), jnp.array(ky)
+
+    @jax.jit
+    def spectral_fields(phi):
+        phi_k = jnp.fft.fft2(phi.astype(jnp.complex128), axes=(1, 2))
+        e_k = jnp.stack([-1j * kx[None, :, None] * phi_k, -1j * ky[None, None, :] * phi_k])
+        e = jnp.fft.ifft2(e_k, axes=(2, 3)) * norm
+
+        k_fields = {}
+        for nm, fld in zip(["phi", "ex", "ey"], [phi_k, e_k[0], e_k[1]]):
+            k_fields[nm] = jnp.fft.fftshift(fld, axes=(1, 2))[:, k_slices[0], k_slices[1]]
+
+        return k_fields, {"ex": e[0], "ey": e[1]}
+
+    return spectral_fields
+
+
 def make_xarrays(cfg, this_t, state, td):
+    """
+    Writes the saved fields and their spectra to ``binary/fields.xr`` and ``binary/k-fields.xr``
+
+    The saves are post-processed and appended to the files in chunks in time so that the memory does not depend on the
+    number of saves. ``save.post_process`` can contain
+
+    - ``chunk_size``: the number of saves in a chunk. Otherwise, it is as many as fit in ``max_memory_mb`` (default 1024)
+    - ``k_fields``: whether to write the spectra (default true)
+    - ``k_window``: ``{"kx": [min, max], "ky": [min, max]}`` in units of ``w0 / c``, the wavenumbers of the spectra
+      that are written (default all)
+
+    :param cfg:
+    :param this_t: the save times
+    :param state: the saves
+    :param td: the run directory
+    :return: the datasets of the spectra (or None) and of the fields, which are read lazily from the files
+    """
     if "x" in cfg["save"]:
         kx = cfg["save"]["kx"]
         ky = cfg["save"]["ky"]
@@ -676,43 +872,71 @@ def make_xarrays(cfg, this_t, state, td):
     shift_kx = np.fft.fftshift(kx) * cfg["units"]["derived"]["c"] / cfg["units"]["derived"]["w0"]
     shift_ky = np.fft.fftshift(ky) * cfg["units"]["derived"]["c"] / cfg["units"]["derived"]["w0"]
 
-    tax_tuple = ("t (ps)", this_t)
-    xax_tuple = ("x (um)", xax)
-    yax_tuple = ("y (um)", yax)
+    post_process_cfg = cfg["save"].get("post_process", {})
+    k_slices = []
+    for k, shift_k in zip(["kx", "ky"], [shift_kx, shift_ky]):
+        kmin, kmax = post_process_cfg.get("k_window", {}).get(k, [-np.inf, np.inf])
+        inds = np.where((shift_k >= kmin) & (shift_k <= kmax))[0]
+        if inds.size == 0:
+            raise ValueError(
+                f"save.post_process.k_window.{k} = [{kmin}, {kmax}] does not contain any of the saved modes, "
+                f"which are between {shift_k[0]:.3f} and {shift_k[-1]:.3f} in units of w0 / c"
+            )
+        k_slices.append(slice(inds[0], inds[-1] + 1))
+    spectral_fields = get_spectral_fields_func(kx, ky, tuple(k_slices), 4.0 / nx / ny)
+    write_k_fields = post_process_cfg.get("k_fields", True)
 
-    phi_vs_t = state["epw"].view(np.complex128)
-    phi_k_np = np.fft.fft2(phi_vs_t, axes=(1, 2))
-    ex_k_np = -1j * kx[None, :, None] * phi_k_np
-    ey_k_np = -1j * ky[None, None, :] * phi_k_np
+    nt = len(this_t)
+    if "chunk_size" in post_process_cfg:
+        chunk_size = int(post_process_cfg["chunk_size"])
+    else:
+        # phi, its spectrum, the spectra and the fields of ex and ey, E0 and the density of a save in complex128
+        save_bytes = 9 * nx * ny * np.dtype(np.complex128).itemsize
+        chunk_size = int(post_process_cfg.get("max_memory_mb", 1024) * 2**20 // save_bytes)
+    chunk_size = max(1, min(chunk_size, nt))
 
-    phi_k = xr.DataArray(
-        np.fft.fftshift(phi_k_np, axes=(1, 2)),
-        coords=(tax_tuple, ("kx ($kc\omega_0^{-1}$)", shift_kx), ("ky ($kc\omega_0^{-1}$)", shift_ky)),
-    )
-    ex_k = xr.DataArray(
-        np.fft.fftshift(ex_k_np, axes=(1, 2)),
-        coords=(tax_tuple, ("kx ($kc\omega_0^{-1}$)", shift_kx), ("ky ($kc\omega_0^{-1}$)", shift_ky)),
-    )
-    ey_k = xr.DataArray(
-        np.fft.fftshift(ey_k_np, axes=(1, 2)),
-        coords=(tax_tuple, ("kx ($kc\omega_0^{-1}$)", shift_kx), ("ky ($kc\omega_0^{-1}$)", shift_ky)),
+    xax_tuple = ("x (um)", xax)
+    yax_tuple = ("y (um)", yax)
+    kax_tuples = (
+        ("kx ($kc\\omega_0^{-1}$)", shift_kx[k_slices[0]]),
+        ("ky ($kc\\omega_0^{-1}$)", shift_ky[k_slices[1]]),
     )
-    phi_x = xr.DataArray(phi_vs_t, coords=(tax_tuple, xax_tuple, yax_tuple))
-    ex = xr.DataArray(np.fft.ifft2(ex_k_np, axes=(1, 2)) / nx / ny * 4, coords=(tax_tuple, xax_tuple, yax_tuple))
-    ey = xr.DataArray(np.fft.ifft2(ey_k_np, axes=(1, 2)) / nx / ny * 4, coords=(tax_tuple, xax_tuple, yax_tuple))
-    e0x = xr.DataArray(state["E0"].view(np.complex128)[..., 0], coords=(tax_tuple, xax_tuple, yax_tuple))
-    e0y = xr.DataArray(state["E0"].view(np.complex128)[..., 1], coords=(tax_tuple, xax_tuple, yax_tuple))
 
-    background_density = xr.DataArray(state["background_density"], coords=(tax_tuple, xax_tuple, yax_tuple))
+    output_cfg = cfg["save"].get("output", {})
+    quantities = {"phi": "epw", "ex": "epw", "ey": "epw", "e0_x": "E0", "e0_y": "E0"}
+    paths = {nm: os.path.join(td, "binary", f"{nm}.xr") for nm in ["k-fields", "fields"]}
+    for it in range(0, nt, chunk_size):
+        tax_tuple = ("t (ps)", np.asarray(this_t[it : it + chunk_size]))
+        phi_vs_t = _as_complex_(state["epw"][it : it + chunk_size], get_quantity_output(output_cfg, "epw"))
+        # the last chunk is padded so that it is not compiled again
+        num_pad = chunk_size - phi_vs_t.shape[0]
+        k_fields, e_fields = spectral_fields(np.pad(phi_vs_t, ((0, num_pad), (0, 0), (0, 0))))
+        k_fields, e_fields = [
+            {nm: np.asarray(v)[: chunk_size - num_pad] for nm, v in flds.items()} for flds in [k_fields, e_fields]
+        ]
+        e0 = _as_complex_(state["E0"][it : it + chunk_size], get_quantity_output(output_cfg, "E0"))
+        background_density = decode(
+            state["background_density"][it : it + chunk_size], get_quantity_output(output_cfg, "background_density")
+        )
 
-    # delta = xr.DataArray(state["delta"], coords=(tax_tuple, xax_tuple, yax_tuple))
+        fields = xr.Dataset(
+            {
+                "phi": xr.DataArray(phi_vs_t, coords=(tax_tuple, xax_tuple, yax_tuple)),
+                "ex": xr.DataArray(e_fields["ex"], coords=(tax_tuple, xax_tuple, yax_tuple)),
+                "ey": xr.DataArray(e_fields["ey"], coords=(tax_tuple, xax_tuple, yax_tuple)),
+                "e0_x": xr.DataArray(e0[..., 0], coords=(tax_tuple, xax_tuple, yax_tuple)),
+                "e0_y": xr.DataArray(e0[..., 1], coords=(tax_tuple, xax_tuple, yax_tuple)),
+                "background_density": xr.DataArray(background_density, coords=(tax_tuple, xax_tuple, yax_tuple)),
+            }
+        )
+        append_netcdf(fields, paths["fields"], output_cfg, quantities, "t (ps)")
 
-    kfields = xr.Dataset({"phi": phi_k, "ex": ex_k, "ey": ey_k})
-    fields = xr.Dataset(
-        {"phi": phi_x, "ex": ex, "ey": ey, "e0_x": e0x, "e0_y": e0y, "background_density": background_density}
-    )
-    kfields.to_netcdf(os.path.join(td, "binary", "k-fields.xr"), engine="h5netcdf", invalid_netcdf=True)
-    fields.to_netcdf(os.path.join(td, "binary", "fields.xr"), engine="h5netcdf", invalid_netcdf=True)
+        if write_k_fields:
+            kfields = xr.Dataset({nm: xr.DataArray(v, coords=(tax_tuple,) + kax_tuples) for nm, v in k_fields.items()})
+            append_netcdf(kfields, paths["k-fields"], output_cfg, quantities, "t (ps)")
+
+    kfields = xr.open_dataset(paths["k-fields"], engine="h5netcdf") if write_k_fields else None
+    fields = xr.open_dataset(paths["fields"], engine="h5netcdf")
 
     return kfields, fields
 
@@ -744,6 +968,58 @@ def get_models(all_models_config: Dict) -> defaultdict[eqx.Module]:
     return models
 
 
+def get_interpolation_weights(x: np.ndarray, xq: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The linear interpolation from the uniform points x to the points xq as the index of the left neighbour of each point
+    and the weights of it and of the right neighbour. These are the nonzero entries of the interpolation matrix
+
+    A point of xq that is on one of x, to within a small fraction of the spacing, is copied from it exactly, e.g. for an
+    integer decimation. A point that is outside of x is nan, as in ``interpax.interp2d``
+
+    :param x: (n,)
+    :param xq: (nq,)
+    :return: index (nq,), weights (nq, 2)
+    """
+    x, xq = np.asarray(x), np.asarray(xq)
+    position = (xq - x[0]) / (x[1] - x[0])
+    # snap the points that are on the grid to it
+    nearest = np.round(position)
+    position = np.where(np.abs(position - nearest) < 1e-9, nearest, position)
+
+    ind = np.clip(np.floor(position).astype(int), 0, x.size - 2)
+    weights = np.stack([ind + 1 - position, position - ind], axis=-1)
+    weights[(position < 0) | (position > x.size - 1)] = np.nan
+
+    return ind, weights
+
+
+def get_resampler(x: np.ndarray, y: np.ndarray, xq: np.ndarray, yq: np.ndarray) -> Callable:
+    """
+    Resamples fields on the uniform grid (x, y) onto the grid (xq, yq) by linear interpolation along x and then along y.
+    The indices and weights are computed once so that each save is two gathers and two weighted sums
+
+    :param x: (nx,)
+    :param y: (ny,)
+    :param xq: (nxq,)
+    :param yq: (nyq,)
+    :return: ``f(nx, ny, ...) -> f(nxq, nyq, ...)``
+    """
+    x_ind, x_weights = get_interpolation_weights(x, xq)
+    y_ind, y_weights = get_interpolation_weights(y, yq)
+
+    def _interp_(f, ind, weights):
+        # along the first axis
+        weights = jnp.reshape(weights, weights.shape + (1,) * (f.ndim - 1))
+        return weights[:, 0] * f[ind] + weights[:, 1] * f[ind + 1]
+
+    def resample(f: Array) -> Array:
+        f = _interp_(f, x_ind, x_weights)
+        f = _interp_(jnp.moveaxis(f, 1, 0), y_ind, y_weights)
+        return jnp.moveaxis(f, 0, 1)
+
+    return resample
+
+
 def get_save_quantities(cfg: Dict) -> Dict:
     """
     This function updates the config with the quantities required for the diagnostics and saving routines
@@ -781,40 +1057,41 @@ def get_save_quantities(cfg: Dict) -> Dict:
         else:
             raise NotImplementedError("Must specify y in save")
 
-        xq, yq = jnp.meshgrid(cfg["save"]["x"]["ax"], cfg["save"]["y"]["ax"], indexing="ij")
-
-        interpolator = partial(
-            interpax.interp2d,
-            xq=jnp.reshape(xq, (nx * ny), order="F"),
-            yq=jnp.reshape(yq, (nx * ny), order="F"),
-            x=cfg["grid"]["x"],
-            y=cfg["grid"]["y"],
-            method="linear",
-        )
+        resample = get_resampler(cfg["grid"]["x"], cfg["grid"]["y"], cfg["save"]["x"]["ax"], cfg["save"]["y"]["ax"])
 
         def save_func(t, y, args):
+            # all the fields are resampled together as the real and imaginary parts of their components
+            fields = {k: v for k, v in y.items() if k != "loss"}
+            channels = []
+            for k, v in fields.items():
+                fld = v.view(jnp.complex128) if k in ["E0", "epw"] else v
+                fld = jnp.reshape(fld, fld.shape[:2] + (-1,))
+                channels.append(jnp.stack([jnp.real(fld), jnp.imag(fld)], axis=-1) if k in ["E0", "epw"] else fld)
+            sizes = [c.shape[2] * (c.shape[3] if c.ndim == 4 else 1) for c in channels]
+            stacked = jnp.concatenate([jnp.reshape(c, c.shape[:2] + (-1,)) for c in channels], axis=-1)
+            resampled = jnp.split(resample(stacked), np.cumsum(sizes)[:-1], axis=-1)
+
             save_y = {}
-            for k, v in y.items():
+            for (k, v), fld in zip(fields.items(), resampled):
                 if k == "E0":
-                    cmplx_fld = v.view(jnp.complex128)
-                    save_y[k] = jnp.concatenate(
-                        [
-                            jnp.reshape(interpolator(f=cmplx_fld[..., ivec]), (nx, ny), order="F")[..., None]
-                            for ivec in range(2)
-                        ],
-                        axis=-1,
-                    ).view(jnp.float64)
+                    fld = jnp.reshape(fld, (nx, ny, 2, 2))
+                    save_y[k] = (fld[..., 0] + 1j * fld[..., 1]).view(jnp.float64)
                 elif k == "epw":
-                    cmplx_fld = v.view(jnp.complex128)
-                    save_y[k] = jnp.reshape(interpolator(f=cmplx_fld), (nx, ny), order="F").view(jnp.float64)
+                    save_y[k] = (fld[..., 0] + 1j * fld[..., 1]).view(jnp.float64)
                 else:
-                    save_y[k] = jnp.reshape(interpolator(f=v), (nx, ny), order="F")
+                    save_y[k] = jnp.reshape(fld, (nx, ny) + v.shape[2:])
+            if "loss" in y:
+                save_y["loss"] = y["loss"]
 
             return save_y
 
     else:
         save_func = lambda t, y, args: y
 
-    cfg["save"]["func"] = save_func
+    if not cfg.get("loss", {}).get("save_fields", True):
+        # so that a gradient does not need the fields at the saves
+        save_func = lambda t, y, args: {"loss": y["loss"]}
+
+    cfg["save"]["func"] = get_output_save_func(save_func, cfg["save"].get("output", {}), "state")
 
     return cfg
@@ -4,6 +4,7 @@ from jax import numpy as jnp, Array
 import equinox as eqx
 import numpy as np
 
+from adept.lpse2d.helpers import get_random_keys, get_random_phases
 from adept.lpse2d.modules.nn import driver as driver_nn
 
 
@@ -29,11 +30,14 @@ class BandwidthModule(eqx.Module):
             self.amplitudes = np.ones(1)
 
         else:
-            delta_omega_max = self.cfg["drivers"]["E0"]["delta_omega_max"]
+            delta_omega_max = cfg["drivers"]["E0"]["delta_omega_max"]
             self.delta_omega = jnp.linspace(-delta_omega_max, delta_omega_max, self.num_colors)
-            self.initial_phase = np.random.uniform(0, 2 * np.pi, self.num_colors)
+            self.initial_phase = get_random_phases(get_random_keys(cfg)["phases"], self.num_colors)
             self.amplitudes = np.ones(self.num_colors)
-            if self.amplitude_shape == "gaussian":
+            if self.amplitude_shape == "uniform":
+                pass
+
+            elif self.amplitude_shape == "gaussian":
                 amplitudes = (
                     2
                     * np.log(2)
@@ -101,9 +105,15 @@ class BandwidthModule(eqx.Module):
         else:
             amp = self.amplitudes
 
+        initial_phase = self.initial_phase
+        if self.num_colors > 1 and "keys" in args:
+            # so that the phases are a realization of the key, e.g. of an ensemble
+            initial_phase = get_random_phases(args["keys"]["phases"], self.num_colors)
+
+        args = {**args, "drivers": {**args["drivers"]}}
         args["drivers"]["E0"] = {
             "delta_omega": self.delta_omega,
-            "initial_phase": self.initial_phase,
+            "initial_phase": initial_phase,
             "amplitudes": amp,
             "xr": self.envelope["xr"],
             "yr": self.envelope["yr"],
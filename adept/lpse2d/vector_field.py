@@ -1,10 +1,12 @@
 from typing import Dict
 
-from jax import numpy as jnp, Array
+from jax import numpy as jnp, Array, lax
 import numpy as np
 
 from adept import get_envelope
+from adept.utils.adaptive import get_step_size
 from adept.lpse2d.core import epw, laser
+from adept.lpse2d.core.loss import LossAccumulators
 
 
 class SplitStep:
@@ -23,6 +25,7 @@ class SplitStep:
         self.dt = cfg["grid"]["dt"]
         self.wp0 = cfg["units"]["derived"]["wp0"]
         self.epw = epw.SpectralPotential(cfg)
+        self.fft = self.epw.fft
         self.light = laser.Light(cfg)
         self.complex_state_vars = ["E0", "epw"]
         self.boundary_envelope = cfg["grid"]["absorbing_boundaries"]
@@ -31,6 +34,20 @@ class SplitStep:
         self.low_pass_filter = cfg["grid"]["low_pass_filter"]
 
         self.nu_coll = cfg["units"]["derived"]["nu_coll"]
+        self.loss_accumulators = LossAccumulators(cfg) if "loss" in cfg else None
+
+        # the temperature is static unless the state is changed so the damping is precomputed at the initial temperature
+        self.vte_sq = cfg["units"]["derived"]["vte"] ** 2.0
+        self.damping_rate = self._get_damping_rate_(self.vte_sq)
+        self.damping_multiplier = jnp.exp(-self.damping_rate * self.dt)
+
+        landau_table = cfg["terms"]["epw"]["damping"].get("landau_table")
+        if landau_table is None:
+            self.vte_sq_table = None
+        else:
+            # the damping rate at each of the tabulated temperatures for a spatially varying temperature
+            self.vte_sq_table = self.vte_sq * np.linspace(landau_table["min"], landau_table["max"], landau_table["num"])
+            self.damping_rate_table = jnp.stack([self._get_damping_rate_(vte_sq) for vte_sq in self.vte_sq_table])
 
     def _unpack_y_(self, y: Dict[str, Array]) -> Dict[str, Array]:
         new_y = {}
@@ -69,7 +86,30 @@ class SplitStep:
 
         return y
 
-    def landau_damping(self, epw: Array, vte_sq: float):
+    def get_max_dt(self, y: Dict[str, Array]) -> Array:
+        """
+        The step size at which the dispersion and the density gradient advance the phase of the plasma wave by ``cfl``
+        radians per step, for the adaptive step size
+
+        The dispersion is exact in k-space so its phase is that of the energy weighted wavenumber of the plasma wave
+        rather than that of the largest wavenumber on the grid. It limits the step because the sources are not exact.
+
+        :param y: the (packed) state
+        :return:
+        """
+        cfl = self.cfg["grid"]["adaptive"]["cfl"]
+        phase_rate = jnp.array(0.0)
+        if self.cfg["terms"]["epw"]["linear"]:
+            ek_sq = self.epw.k_sq * jnp.abs(self.fft.fft2(y["epw"].view(jnp.complex128))) ** 2.0
+            mean_k_sq = jnp.sum(ek_sq * self.epw.k_sq) / (jnp.sum(ek_sq) + 1e-30)
+            phase_rate = 1.5 * jnp.max(y["vte_sq"]) / self.wp0 * mean_k_sq
+        if self.cfg["terms"]["epw"]["density_gradient"]:
+            density_rate = self.wp0 / 2.0 * jnp.max(jnp.abs(1 - y["background_density"] / self.epw.envelope_density))
+            phase_rate = jnp.maximum(phase_rate, density_rate)
+
+        return cfl / (phase_rate + 1e-30)
+
+    def _get_damping_rate_(self, vte_sq: float) -> Array:
         gammaLandauEpw = (
             np.sqrt(np.pi / 8)
             * self.wp0**4
@@ -78,31 +118,108 @@ class SplitStep:
             * jnp.exp(-self.wp0**2.0 * self.one_over_ksq / (2 * vte_sq))
         )
 
-        return jnp.fft.ifft2(jnp.fft.fft2(epw) * jnp.exp(-(gammaLandauEpw + self.nu_coll) * self.dt))
+        return gammaLandauEpw + self.nu_coll
+
+    def landau_damping(self, vte_sq: Array, dt: float) -> Array:
+        """
+        The k-space multiplier of the Landau and collisional damping over a step for a uniform temperature
+
+        The multiplier at the initial temperature and the config step size is precomputed and is only recomputed if the
+        temperature of the state is different
+
+        :param vte_sq: vte_sq(x, y)
+        :param dt: the step size
+        :return: the multiplier(kx, ky)
+        """
+        vte_sq = vte_sq[0, 0]
+
+        def _cached_():
+            if isinstance(dt, float) and dt == self.dt:
+                return self.damping_multiplier
+            return jnp.exp(-self.damping_rate * dt)
+
+        def _recompute_():
+            return jnp.exp(-self._get_damping_rate_(vte_sq) * dt)
+
+        return lax.cond(vte_sq == jnp.asarray(self.vte_sq, dtype=vte_sq.dtype), _cached_, _recompute_)
+
+    def tabulated_landau_damping(self, phi_k: Array, vte_sq: Array, dt: float) -> Array:
+        """
+        The Landau and collisional damping over a step for a spatially varying temperature
+
+        The potential is damped at each of the tabulated temperatures and the damped potentials are linearly interpolated
+        to the local temperature in real space
+
+        :param phi_k: phi(kx, ky)
+        :param vte_sq: vte_sq(x, y)
+        :param dt: the step size
+        :return: the damped phi(kx, ky)
+        """
+        d_vte_sq = self.vte_sq_table[1] - self.vte_sq_table[0]
+        vte_sq = jnp.clip(vte_sq, self.vte_sq_table[0], self.vte_sq_table[-1])
+        weights = jnp.maximum(0.0, 1.0 - jnp.abs(vte_sq[None] - self.vte_sq_table[:, None, None]) / d_vte_sq)
+        damped_phi = self.fft.ifft2(jnp.exp(-self.damping_rate_table * dt) * phi_k[None])
+
+        return self.fft.fft2(jnp.sum(weights * damped_phi, axis=0))
+
+    def get_damping_multiplier(self, vte_sq: Array, dt: float) -> Array:
+        """
+        The k-space multiplier of a step that is applied after the sources, i.e. the damping at a uniform temperature, the
+        zero mask and the low pass filter
+
+        :param vte_sq: vte_sq(x, y)
+        :param dt: the step size
+        :return: the multiplier(kx, ky)
+        """
+        multiplier = self.zero_mask * self.low_pass_filter
+        if self.cfg["terms"]["epw"]["damping"]["landau"] and self.vte_sq_table is None:
+            multiplier = multiplier * self.landau_damping(vte_sq, dt)
+
+        return multiplier
 
     def __call__(self, t, y, args):
+        dt = get_step_size(args, self.dt)
+        # the absorption of the boundaries is per step of the config
+        boundary_envelope = self.boundary_envelope if "dt" not in args else self.boundary_envelope ** (dt / self.dt)
+
         # unpack y into complex128
-        new_y = self._unpack_y_(y)
+        new_y = self.fft.constrain(self._unpack_y_(y))
 
         # split step
         new_y = self.light_split_step(t, new_y, args["drivers"])
 
+        phi = new_y["epw"]
         if "E2" in args["drivers"]:
-            new_y["epw"] += self.dt * self.epw.driver(args["drivers"]["E2"], t)
-        new_y["epw"] = self.epw(t, new_y, args)
+            phi = phi + dt * self.epw.driver(args["drivers"]["E2"], t)
+
+        # the potential stays in k-space for the propagation, the sources and the damping, and is only transformed to
+        # the fields for the operators that are local in real space
+        phi_k = self.fft.fft2(phi)
+        if self.cfg["terms"]["epw"]["linear"]:
+            phi_k = phi_k * self.epw.get_dispersion(new_y["vte_sq"], dt)
+        if self.cfg["terms"]["epw"]["source"]["tpd"]:
+            phi_k = phi_k + dt * self.epw.tpd_k(t, phi_k, new_y["E0"])
+        if self.cfg["terms"]["epw"]["density_gradient"]:
+            density_gradient_phase = self.epw.get_density_gradient_phase(new_y["background_density"], dt)
+            ex, ey = self.epw.calc_fields_from_phi_k(phi_k)
+            phi_k = self.epw.calc_phi_k_from_fields(ex * density_gradient_phase, ey * density_gradient_phase)
+        if self.cfg["terms"]["epw"]["source"]["noise"]:
+            phi_k = phi_k + dt * self.epw.get_noise_k(args["keys"]["noise"] if "keys" in args else None)
 
         # landau and collisional damping
-        if self.cfg["terms"]["epw"]["damping"]["landau"]:
-            new_y["epw"] = self.landau_damping(epw=new_y["epw"], vte_sq=y["vte_sq"])
+        phi_k = phi_k * self.get_damping_multiplier(new_y["vte_sq"], dt)
+        if self.cfg["terms"]["epw"]["damping"]["landau"] and self.vte_sq_table is not None:
+            phi_k = self.tabulated_landau_damping(phi_k, new_y["vte_sq"], dt)
 
         # boundary damping
-        ex, ey = self.epw.calc_fields_from_phi(new_y["epw"])
-        ex = ex * self.boundary_envelope
-        ey = ey * self.boundary_envelope
-        new_y["epw"] = self.epw.calc_phi_from_fields(ex, ey)
-        new_y["epw"] = jnp.fft.ifft2(self.zero_mask * self.low_pass_filter * jnp.fft.fft2(new_y["epw"]))
+        ex, ey = self.epw.calc_fields_from_phi_k(phi_k)
+        phi_k = self.epw.calc_phi_k_from_fields(ex * boundary_envelope, ey * boundary_envelope)
+        new_y["epw"] = self.fft.ifft2(phi_k)
+
+        if self.loss_accumulators is not None:
+            new_y["loss"] = self.loss_accumulators(t + dt, dt, new_y["loss"], phi_k)
 
         # pack y into float64
         y, new_y = self._pack_y_(y, new_y)
 
-        return new_y
+        return self.fft.constrain(new_y)
@@ -6,7 +6,7 @@ import equinox as eqx
 import jax
 from jax import numpy as jnp
 import numpy as np
-from adept.sh2d.solvers.tridiagonal import TridiagonalSolver
+from adept.utils.tridiagonal import TridiagonalSolver
 
 
 class IsotropicCollisions(eqx.Module):
@@ -42,7 +42,7 @@ class Shkarofsky(eqx.Module):
         self.v = cfg["grid"]["v"]
         self.nv = cfg["grid"]["nv"]
         self.nuee_dt = cfg["grid"]["dt"] * cfg["units"]["nuee_norm"]
-        self.td_solve = TridiagonalSolver(cfg)
+        self.td_solve = TridiagonalSolver(num_unroll=16)
         self.calc_i2 = functools.partial(calc_i, v=self.v, j=2)
         self.calc_i0 = functools.partial(calc_i, v=self.v, j=0)
         self.calc_jm1 = functools.partial(calc_j, v=self.v, j=-1)
@@ -84,7 +84,7 @@ class ChangCooper(eqx.Module):
         self.v = cfg["grid"]["v"]
         self.dv = cfg["grid"]["dv"]
         self.nuee_dt = cfg["grid"]["dt"] * cfg["units"]["derived"]["nuee_norm"].magnitude
-        self.td_solve = TridiagonalSolver(cfg)
+        self.td_solve = TridiagonalSolver(num_unroll=16)
         self.zeros = jnp.zeros((cfg["grid"]["nx"], cfg["grid"]["ny"], 1))
 
     def calc_c(self, f00):
@@ -167,7 +167,7 @@ class AnisotropicCollisions(eqx.Module):
         self.dv = self.v[1] - self.v[0]
         self.dv_sq = self.dv**2.0
         self.lms = defaultdict(dict)
-        self.td_solve = TridiagonalSolver(cfg)
+        self.td_solve = TridiagonalSolver(num_unroll=16)
         self.Y_dt = (
             4
             * np.pi
@@ -7,7 +7,9 @@ from jax import numpy as jnp, tree_util as jtu
 
 from adept import ADEPTModule
 from adept.tf1d.vector_field import VF
-from adept.tf1d.storage import save_arrays, plot_xrs
+from adept.tf1d.storage import save_arrays, get_plot_jobs, get_spectral_plot_jobs
+from adept.utils.plotting import run_plot_jobs
+from adept.utils.spectral import SpectralAccumulator, store_spectral
 
 
 class BaseTwoFluid1D(ADEPTModule):
@@ -25,19 +27,30 @@ class BaseTwoFluid1D(ADEPTModule):
         # result = run_output
 
         os.makedirs(os.path.join(td, "binary"))
-        os.makedirs(os.path.join(td, "plots"))
 
         datasets = {}
+        plot_jobs = []
         if any(x in ["x", "kx"] for x in self.cfg["save"]):
             if "x" in self.cfg["save"].keys():
                 datasets["x"] = save_arrays(solver_result["solver result"], td, self.cfg, label="x")
-                plot_xrs("x", td, datasets["x"])
+                plot_jobs += get_plot_jobs("x", datasets["x"])
             if "kx" in self.cfg["save"].keys():
                 datasets["kx"] = save_arrays(solver_result["solver result"], td, self.cfg, label="kx")
-                plot_xrs("kx", td, datasets["kx"])
+                plot_jobs += get_plot_jobs("kx", datasets["kx"])
         else:
             datasets["full"] = save_arrays(solver_result["solver result"], td, self.cfg, label=None)
-            plot_xrs("x", td, datasets["full"])
+            plot_jobs += get_plot_jobs("x", datasets["full"])
+
+        if "spectral" in self.cfg["save"]:
+            datasets["spectral"] = store_spectral(
+                SpectralAccumulator(self.cfg["save"]["spectral"], self.cfg["grid"]),
+                self.cfg["save"]["t"]["ax"],
+                solver_result["solver result"].ys["spectral"],
+                os.path.join(td, "binary", "spectral.nc"),
+            )
+            plot_jobs += get_spectral_plot_jobs(datasets["spectral"])
+
+        run_plot_jobs(plot_jobs, td, self.cfg.get("plots", {}))
 
         return datasets
 
@@ -180,11 +193,20 @@ class BaseTwoFluid1D(ADEPTModule):
                 delta=jnp.zeros(self.cfg["grid"]["nx"]),
             )
 
+        if "spectral" in self.cfg["save"]:
+            self.state["spectral"] = SpectralAccumulator(self.cfg["save"]["spectral"], self.cfg["grid"]).init_state()
+
     def get_save_func(self) -> Callable:
         """
         This function returns the function that saves the processed state and args to memory during the diffeqsolve
 
         """
+        if "spectral" in self.cfg["save"]:
+            spectral_accumulator = SpectralAccumulator(self.cfg["save"]["spectral"], self.cfg["grid"])
+
+        def _get_species_(y):
+            return {species: y[species] for species in ["ion", "electron"]}
+
         if any(x in ["x", "kx"] for x in self.cfg["save"]):
             if "x" in self.cfg["save"].keys():
                 dx = (self.cfg["save"]["x"]["xmax"] - self.cfg["save"]["x"]["xmin"]) / self.cfg["save"]["x"]["nx"]
@@ -209,12 +231,19 @@ class BaseTwoFluid1D(ADEPTModule):
             def save_func(t, y, args):
                 save_dict = {}
                 if "x" in self.cfg["save"].keys():
-                    save_dict["x"] = jtu.tree_map(save_x, y)
+                    save_dict["x"] = jtu.tree_map(save_x, _get_species_(y))
                 if "kx" in self.cfg["save"].keys():
-                    save_dict["kx"] = jtu.tree_map(save_kx, y)
+                    save_dict["kx"] = jtu.tree_map(save_kx, _get_species_(y))
+                if "spectral" in self.cfg["save"].keys():
+                    save_dict["spectral"] = spectral_accumulator(y["spectral"])
 
                 return save_dict
 
+        elif "spectral" in self.cfg["save"]:
+
+            def save_func(t, y, args):
+                return {**_get_species_(y), "spectral": spectral_accumulator(y["spectral"])}
+
         else:
             save_func = None
 
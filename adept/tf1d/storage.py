@@ -1,10 +1,12 @@
-from typing import Dict
+from typing import Dict, List
 
 import os, xarray as xr
 from flatdict import FlatDict
 from diffrax import Solution
 from matplotlib import pyplot as plt
 
+from adept.utils.plotting import plot_job, plot_spectrum
+
 
 def save_arrays(result: Solution, td: str, cfg: Dict, label: str) -> xr.Dataset:
     """
@@ -13,7 +15,7 @@ def save_arrays(result: Solution, td: str, cfg: Dict, label: str) -> xr.Dataset:
     """
     if label is None:
         label = "x"
-        flattened_dict = dict(FlatDict(result.ys, delimiter="-"))
+        flattened_dict = dict(FlatDict({k: v for k, v in result.ys.items() if k != "spectral"}, delimiter="-"))
         save_ax = cfg["grid"]["x"]
     else:
         flattened_dict = dict(FlatDict(result.ys[label], delimiter="-"))
@@ -27,42 +29,60 @@ def save_arrays(result: Solution, td: str, cfg: Dict, label: str) -> xr.Dataset:
     return saved_arrays_xr
 
 
-def plot_xrs(which: str, td: str, xrs: Dict):
+def plot_field(v: xr.DataArray, path: str):
+    fig, ax = plt.subplots(1, 1, figsize=(7, 4), tight_layout=True)
+    v.plot(ax=ax, cmap="gist_ncar")
+    ax.grid()
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def plot_modes(v: xr.DataArray, path: str, log: bool):
+    # only plot
+    if v.coords["kx"].size > 8:
+        hue_skip = v.coords["kx"].size // 8
+    else:
+        hue_skip = 1
+
+    fig, ax = plt.subplots(1, 1, figsize=(7, 4), tight_layout=True)
+    v[:, ::hue_skip].plot(ax=ax, hue="kx")
+    ax.set_yscale("log" if log else "linear")
+    ax.grid()
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def get_plot_jobs(which: str, xrs: xr.Dataset) -> List[Dict]:
     """
-    This function plots the xarray datasets
+    This function returns the plot jobs for the xarray datasets
 
 
     """
-    os.makedirs(os.path.join(td, "plots", which))
-    os.makedirs(os.path.join(td, "plots", which, "ion"))
-    os.makedirs(os.path.join(td, "plots", which, "electron"))
-
-    for k, v in xrs.items():
-        fname = f"{'-'.join(k.split('-')[1:])}.png"
-        fig, ax = plt.subplots(1, 1, figsize=(7, 4), tight_layout=True)
-        v.plot(ax=ax, cmap="gist_ncar")
-        ax.grid()
-        fig.savefig(os.path.join(td, "plots", which, k.split("-")[0], fname), bbox_inches="tight")
-        plt.close(fig)
+    file = os.path.join("binary", f"state_vs_{which}.nc")
+    jobs = []
+    for k in xrs.keys():
+        species, fname = k.split("-")[0], "-".join(k.split("-")[1:])
+        jobs.append(plot_job(plot_field, file, os.path.join("plots", which, species, f"{fname}.png"), k, True))
 
         if which == "kx":
-            os.makedirs(os.path.join(td, "plots", which, "ion", "hue"), exist_ok=True)
-            os.makedirs(os.path.join(td, "plots", which, "electron", "hue"), exist_ok=True)
-            # only plot
-            if v.coords["kx"].size > 8:
-                hue_skip = v.coords["kx"].size // 8
-            else:
-                hue_skip = 1
-
             for log in [True, False]:
-                fig, ax = plt.subplots(1, 1, figsize=(7, 4), tight_layout=True)
-                v[:, ::hue_skip].plot(ax=ax, hue="kx")
-                ax.set_yscale("log" if log else "linear")
-                ax.grid()
-                fig.savefig(
-                    os.path.join(
-                        td, "plots", which, k.split("-")[0], f"hue", f"{'-'.join(k.split('-')[1:])}-log-{log}.png"
-                    ),
-                    bbox_inches="tight",
+                jobs.append(
+                    plot_job(
+                        plot_modes,
+                        file,
+                        os.path.join("plots", which, species, "hue", f"{fname}-log-{log}.png"),
+                        k,
+                        log=log,
+                    )
                 )
-                plt.close(fig)
+
+    return jobs
+
+
+def get_spectral_plot_jobs(spectral_xr: xr.Dataset) -> List[Dict]:
+    """
+    This function returns the plot jobs for the spectrum at the last save
+
+    """
+    file = os.path.join("binary", "spectral.nc")
+    return [plot_job(plot_spectrum, file, os.path.join("plots", "spectral", f"{k}.png"), k, True) for k in spectral_xr]
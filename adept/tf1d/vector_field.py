@@ -3,6 +3,7 @@ import jax.numpy as jnp
 import equinox as eqx
 
 from adept.tf1d import pushers
+from adept.utils.spectral import SpectralAccumulator
 
 
 class VF(eqx.Module):
@@ -21,6 +22,7 @@ class VF(eqx.Module):
     pusher_dict: Dict
     push_driver: Callable
     poisson_solver: Callable
+    spectral_accumulator: SpectralAccumulator
 
     def __init__(self, cfg):
         super().__init__()
@@ -41,6 +43,10 @@ class VF(eqx.Module):
         # if "ey" in self.cfg["drivers"]:
         #     self.wave_solver = pushers.WaveSolver(cfg["grid"]["c"], cfg["grid"]["dx"], cfg["grid"]["dt"])
         self.poisson_solver = pushers.PoissonSolver(cfg["grid"]["one_over_kx"])
+        if "spectral" in cfg["save"]:
+            self.spectral_accumulator = SpectralAccumulator(cfg["save"]["spectral"], cfg["grid"])
+        else:
+            self.spectral_accumulator = None
 
     def __call__(self, t: float, y: Dict, args: Dict):
         """
@@ -95,4 +101,7 @@ class VF(eqx.Module):
             else:
                 dstate_dt[species_name]["delta"] = jnp.zeros(self.cfg["grid"]["nx"])
 
+        if self.spectral_accumulator is not None:
+            dstate_dt["spectral"] = self.spectral_accumulator.rate(t, e)
+
         return dstate_dt
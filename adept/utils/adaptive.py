@@ -0,0 +1,136 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from diffrax import AbstractStepSizeController, Euler, RESULTS
+from jax import numpy as jnp, Array, lax
+
+
+class AdaptiveStepper(Euler):
+    """
+    This is the dummy stepper for the split-step vector fields with an adaptive step size.
+
+    The vector field is called with ``args["dt"] = t1 - t0`` so that it can take a step of that size
+    """
+
+    def step(self, terms, t0, t1, y0, args, solver_state, made_jump):
+        del solver_state, made_jump
+        y1 = terms.vf(t0, y0, {**({} if args is None else args), "dt": t1 - t0})
+        dense_info = dict(y0=y0, y1=y1)
+        return y1, None, dense_info, None, RESULTS.successful
+
+
+def get_step_size(args: Dict, default: float):
+    """
+    Returns the size of this step, which is in ``args`` if the step size is adaptive
+
+    :param args: the args of the vector field
+    :param default: the fixed step size of the config
+    :return:
+    """
+    return args["dt"] if isinstance(args, dict) and "dt" in args else default
+
+
+def _relative_change_(amplitude0: Array, amplitude1: Array) -> Array:
+    return jnp.sqrt(jnp.sum(jnp.abs(amplitude1 - amplitude0) ** 2.0) / (jnp.sum(jnp.abs(amplitude0) ** 2.0) + 1e-30))
+
+
+class CFLController(AbstractStepSizeController):
+    """
+    Chooses the step size of a split-step solver from estimates of its stability and accuracy limits
+
+    The next step is the smallest of
+
+    - ``get_max_dt(y)``, the CFL limits of the pushers, e.g. ``cfl * dx / vmax`` and ``cfl * dv / max|E|``
+    - ``max_change * dt / change``, where ``change`` is the relative change in ``get_amplitudes(y)`` over the last step,
+      so that a growing or damped field does not change by more than ``max_change`` in one step
+    - ``max_increase * dt`` and ``dtmax``
+
+    and at least ``dtmin``. Steps are never rejected. Every step ends on the next time in ``step_ts`` that it would
+    otherwise step over so the saves land on the requested grid and are not interpolated.
+
+    The step size is not differentiated through, so the gradients of a solve are those of the same sequence of steps
+    with fixed sizes.
+
+    :param get_max_dt: ``y -> dt``
+    :param get_amplitudes: ``y -> array`` or None to not limit the growth
+    :param dtmin:
+    :param dtmax:
+    :param max_change: the largest relative change in the amplitudes in one step
+    :param max_increase: the largest factor by which the step size grows from one step to the next
+    :param step_ts: the times that steps must end on, e.g. the save times
+    """
+
+    get_max_dt: Callable
+    get_amplitudes: Optional[Callable]
+    dtmin: float
+    dtmax: float
+    max_change: float = 0.1
+    max_increase: float = 2.0
+    step_ts: Optional[Array] = None
+
+    def wrap(self, direction):
+        return self
+
+    def _next_t1_(self, t0, dt):
+        dt = lax.stop_gradient(jnp.clip(dt, self.dtmin, self.dtmax))
+        t1 = t0 + dt
+        if self.step_ts is not None and self.step_ts.size > 0:
+            # the first time that is after t0 by more than a small fraction of the smallest step
+            ind = jnp.searchsorted(self.step_ts, t0 + 1e-6 * self.dtmin, side="right")
+            next_ts = self.step_ts[jnp.minimum(ind, self.step_ts.size - 1)]
+            t1 = jnp.where((ind < self.step_ts.size) & (next_ts < t1), next_ts, t1)
+
+        # the state is the step size before it was shortened to land on a save
+        return t1, dt
+
+    def init(self, terms, t0, t1, y0, dt0, args, func, error_order) -> Tuple:
+        return self._next_t1_(t0, jnp.minimum(dt0, self.get_max_dt(y0)))
+
+    def adapt_step_size(self, t0, t1, y0, y1_candidate, args, y_error, error_order, controller_state) -> Tuple:
+        next_dt = jnp.minimum(self.get_max_dt(y1_candidate), self.max_increase * controller_state)
+        if self.get_amplitudes is not None:
+            change = _relative_change_(self.get_amplitudes(y0), self.get_amplitudes(y1_candidate))
+            next_dt = jnp.minimum(next_dt, self.max_change * (t1 - t0) / jnp.maximum(change, 1e-30))
+        next_t1, next_dt = self._next_t1_(t1, next_dt)
+
+        return jnp.array(True), t1, next_t1, jnp.array(False), next_dt, RESULTS.successful
+
+
+def get_step_ts(save_ts: List[np.ndarray]) -> np.ndarray:
+    """
+    Returns the sorted, unique times of all the saves
+
+    """
+    return np.unique(np.concatenate([np.zeros(0)] + [np.asarray(ts, dtype=float).reshape(-1) for ts in save_ts]))
+
+
+def get_adaptive_cfg(cfg_grid: Dict, to_code_units: Callable = float, cfl: float = 0.5) -> Dict:
+    """
+    Resolves ``grid.adaptive`` into code units
+
+    ``grid.adaptive`` contains ``cfl`` (default ``cfl``), ``max_change`` (``0.1``), ``max_increase`` (``2.0``), ``dtmin``
+    (defaults to ``grid.dt / 10``) and ``dtmax`` (``grid.dt * 10``). ``grid.dt`` is the first step.
+
+    :param cfg_grid: the grid, with ``dt`` in code units
+    :param to_code_units: converts ``dtmin`` and ``dtmax`` from the config to code units, e.g. from a string with units
+    :param cfl: the default ``cfl`` of the solver
+    :return: the adaptive parameters
+    """
+    adaptive_cfg = cfg_grid["adaptive"]
+    return {
+        "cfl": float(adaptive_cfg.get("cfl", cfl)),
+        "max_change": float(adaptive_cfg.get("max_change", 0.1)),
+        "max_increase": float(adaptive_cfg.get("max_increase", 2.0)),
+        "dtmin": float(to_code_units(adaptive_cfg["dtmin"]) if "dtmin" in adaptive_cfg else 0.1 * cfg_grid["dt"]),
+        "dtmax": float(to_code_units(adaptive_cfg["dtmax"]) if "dtmax" in adaptive_cfg else 10.0 * cfg_grid["dt"]),
+    }
+
+
+def get_max_steps(tmax: float, dtmin: float, step_ts: np.ndarray) -> int:
+    """
+    The most steps that an adaptive solve can take, i.e. steps of ``dtmin`` and one extra step per save
+
+    """
+    return int(tmax / dtmin) + step_ts.size + 4
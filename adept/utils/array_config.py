@@ -0,0 +1,161 @@
+import hashlib, os
+from typing import Dict, List, Tuple
+
+import h5py
+import jax
+import numpy as np
+import yaml
+
+
+def _flatten_arrays_(cfg: Dict, path: Tuple = ()) -> Dict[Tuple, np.ndarray]:
+    arrays = {}
+    for k, v in cfg.items():
+        if isinstance(v, dict):
+            arrays.update(_flatten_arrays_(v, path + (k,)))
+        elif isinstance(v, (np.ndarray, jax.Array)) and np.ndim(v) > 0:
+            arrays[path + (k,)] = np.asarray(v)
+
+    return arrays
+
+
+def get_array_hash(arr: np.ndarray) -> str:
+    """
+    Hashes the contents of an array so that identical arrays are only stored once
+
+    :param arr:
+    :return: the hex digest
+    """
+    arr = np.ascontiguousarray(arr)
+    hasher = hashlib.sha256(f"{arr.dtype.str}{arr.shape}".encode())
+    hasher.update(memoryview(arr).cast("B"))
+
+    return hasher.hexdigest()
+
+
+def strip_arrays(cfg: Dict) -> Dict:
+    """
+    A copy of the config without the arrays that ``save_array_config`` stores, so it can be written to ``config.yaml``
+
+    :param cfg:
+    :return: the config without the arrays
+    """
+    stripped = {}
+    for k, v in cfg.items():
+        if isinstance(v, dict):
+            stripped[k] = strip_arrays(v)
+        elif not (isinstance(v, (np.ndarray, jax.Array)) and np.ndim(v) > 0):
+            stripped[k] = v
+
+    return stripped
+
+
+def save_array_config(cfg: Dict, td: str, store_dir: str = None) -> Dict:
+    """
+    Stores the arrays in ``cfg`` that cannot be rebuilt from ``config.yaml``
+
+    ``cfg`` is the config as it is passed to the ``ADEPTModule``, i.e. before the derived quantities are added, so the
+    arrays in it are the inputs of the run, e.g. an array that was loaded from a file. The derived arrays are rebuilt
+    from these and ``config.yaml``. Each stored array is written to ``{hash}.h5``, which is compressed and chunked so it
+    can be read lazily. If ``store_dir`` is shared between runs, e.g. the runs of a sweep, an array that is already there
+    is not written again. Otherwise the arrays are written to ``td/arrays``
+
+    ``td/array_config.yaml`` lists the stored arrays by their path in the config
+
+    :param cfg: the config before ``write_units``
+    :param td: the directory that is logged to mlflow
+    :param store_dir: the directory that the arrays are written to
+    :return: the manifest
+    """
+    shared_store = None if store_dir is None else os.path.abspath(store_dir)
+    store_dir = os.path.join(td, "arrays") if store_dir is None else store_dir
+
+    manifest = {}
+    for path, arr in _flatten_arrays_(cfg).items():
+        array_hash = get_array_hash(arr)
+        file_path = os.path.join(store_dir, f"{array_hash}.h5")
+        if not os.path.exists(file_path):
+            os.makedirs(store_dir, exist_ok=True)
+            with h5py.File(file_path + ".tmp", "w") as fi:
+                compression = dict(chunks=True, compression="gzip", shuffle=True) if arr.size else {}
+                fi.create_dataset("array", data=arr, **compression)
+            os.replace(file_path + ".tmp", file_path)
+
+        manifest["/".join(map(str, path))] = {"path": list(path), "hash": array_hash}
+
+    with open(os.path.join(td, "array_config.yaml"), "w") as fi:
+        yaml.dump({"store": shared_store, "arrays": manifest}, fi)
+
+    return manifest
+
+
+class ArrayConfig(dict):
+    """
+    The config that is rebuilt by ``load_array_config``
+
+    If it was loaded lazily, it keeps the ``h5py`` files that the stored arrays are read from open. They are closed by
+    ``close`` or at the end of a ``with`` block
+
+    """
+
+    def __init__(self, cfg: Dict, files: List = None) -> None:
+        super().__init__(cfg)
+        self.files = [] if files is None else files
+
+    def close(self) -> None:
+        for fi in self.files:
+            fi.close()
+        self.files = []
+
+    def __enter__(self) -> "ArrayConfig":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def load_array_config(run_dir: str, store_dir: str = None, lazy: bool = False) -> ArrayConfig:
+    """
+    Rebuilds the config after ``get_solver_quantities`` from the artifacts of a run
+
+    The arrays listed in ``array_config.yaml`` are read from the store into ``config.yaml`` and the derived quantities
+    are recomputed from it
+
+    :param run_dir: the downloaded artifacts of the run
+    :param store_dir: the array store. Defaults to the shared store that the run was written to and then
+    ``run_dir/arrays``
+    :param lazy: if True, the stored arrays are ``h5py.Dataset`` s that are read when they are indexed. The files stay
+    open until the returned config is closed, e.g. ``with load_array_config(run_dir, lazy=True) as cfg: ...``
+    :return: the config
+    """
+    from adept import ergoExo
+
+    with open(os.path.join(run_dir, "config.yaml"), "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    with open(os.path.join(run_dir, "array_config.yaml"), "r") as fi:
+        array_config = yaml.safe_load(fi)
+
+    if store_dir is None:
+        store_dir = array_config["store"] if array_config["store"] is not None else os.path.join(run_dir, "arrays")
+
+    files = []
+    for v in array_config["arrays"].values():
+        fi = h5py.File(os.path.join(store_dir, f"{v['hash']}.h5"), "r")
+        if lazy:
+            arr = fi["array"]
+            files.append(fi)
+        else:
+            arr = fi["array"][...]
+            fi.close()
+
+        this_cfg = cfg
+        for k in v["path"][:-1]:
+            this_cfg = this_cfg.setdefault(k, {})
+        this_cfg[v["path"][-1]] = arr
+
+    adept_module = ergoExo()._get_adept_module_(cfg)
+    adept_module.write_units()
+    adept_module.get_derived_quantities()
+    adept_module.get_solver_quantities()
+
+    return ArrayConfig(adept_module.cfg, files)
@@ -0,0 +1,103 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+def get_fft_cost(n: int) -> float:
+    """
+    An estimate of the cost of a complex FFT of length n, as in pocketfft (which the CPU FFTs of XLA and numpy use)
+
+    The cost of a factor of n is the factor itself, with a penalty for the ones that are larger than 5. If n has a
+    large prime factor, the FFT is done with Bluestein's algorithm, which is two FFTs of a smooth length of at least
+    2n - 1
+
+    :param n:
+    :return: cost
+    """
+
+    def _mixed_radix_cost_(m):
+        cost, remainder = 0.0, m
+        for factor in [2, 3, 5]:
+            while remainder % factor == 0:
+                cost += factor
+                remainder //= factor
+        factor = 7
+        while factor * factor <= remainder:
+            while remainder % factor == 0:
+                cost += 1.1 * factor
+                remainder //= factor
+            factor += 2
+        if remainder > 1:
+            cost += 1.1 * remainder
+        return cost * m
+
+    bluestein_cost = 1.5 * 2 * _mixed_radix_cost_(get_smooth_size(2 * n - 1))
+
+    return min(_mixed_radix_cost_(n), bluestein_cost)
+
+
+def _is_smooth_(n: int) -> bool:
+    for factor in [2, 3, 5]:
+        while n % factor == 0:
+            n //= factor
+    return n == 1
+
+
+def get_smooth_size(n: int, policy: str = "up", tolerance: float = 0.05, multiple_of: int = 1) -> int:
+    """
+    A size close to n that is a multiple of ``multiple_of`` times a 2·3·5-smooth number
+
+    :param n: the size
+    :param policy: ``up`` for the smallest such size that is at least n and ``nearest`` for the closest one. A size
+        that is smaller than n is only chosen if it is within ``tolerance`` of n
+    :param tolerance: the largest relative decrease of the size for ``nearest``
+    :param multiple_of: e.g. the number of devices that the grid is sharded over
+    :return: the size
+    """
+    if policy not in ["up", "nearest"]:
+        raise NotImplementedError(f"The grid sizing policy -- {policy} -- has not been implemented")
+
+    m = -(-n // multiple_of)
+    up = m
+    while not _is_smooth_(up):
+        up += 1
+    size = up * multiple_of
+
+    if policy == "nearest":
+        down = n // multiple_of
+        while down > 1 and not _is_smooth_(down):
+            down -= 1
+        if down >= 1 and n - down * multiple_of < size - n and n - down * multiple_of <= tolerance * n:
+            size = down * multiple_of
+
+    return size
+
+
+def get_fft_friendly_sizes(sizes: Dict[str, int], sizing_cfg: Dict, multiple_of: int = 1) -> Tuple[Dict, float]:
+    """
+    Rounds the sizes of the dimensions of a grid that are transformed to FFT friendly sizes (see ``get_smooth_size``)
+    and prints them with the expected speedup of a transform of the whole grid
+
+    :param sizes: e.g. ``{"nx": 4001, "ny": 151}``
+    :param sizing_cfg: ``policy`` (default ``up``) and ``tolerance`` (default 0.05)
+    :param multiple_of: of each size
+    :return: the new sizes and the expected speedup
+    """
+    new_sizes = {
+        k: get_smooth_size(
+            n, sizing_cfg.get("policy", "up"), float(sizing_cfg.get("tolerance", 0.05)), multiple_of=multiple_of
+        )
+        for k, n in sizes.items()
+    }
+
+    # the cost of a multidimensional FFT is that of the 1D FFTs along each of the dimensions
+    def _cost_(these_sizes):
+        num_points = np.prod(list(these_sizes.values()))
+        return sum(num_points / n * get_fft_cost(n) for n in these_sizes.values())
+
+    speedup = float(_cost_(sizes) / _cost_(new_sizes))
+    for k in sizes:
+        print(f"FFT friendly grid sizing: {k} = {sizes[k]} -> {new_sizes[k]}")
+    print(f"FFT friendly grid sizing: expected speedup of the FFTs = {speedup:.2f}")
+
+    return new_sizes, speedup
@@ -0,0 +1,331 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+"""
+Dynamical low-rank integrators for distribution functions of the form
+
+.. math::
+
+    f(x, v) = \\sum_{ij} X_i(x) S_{ij} V_j(v)
+
+where ``x`` and ``v`` are (flattened) grids of any dimension. ``X`` and ``V`` have orthonormal columns and ``S`` is a
+small ``(rank, rank)`` matrix so that the memory and the cost of a step scale with ``rank * (nx + nv)``.
+
+Every split step of the solvers is of the form :math:`\\partial_t f = -(A \\otimes B) f`, where ``A`` acts on ``x``
+and ``B`` on ``v``, and is integrated with the rank-adaptive, augmented basis-update & Galerkin (BUG) integrator [1].
+The velocity basis is augmented with the moments that are conserved, e.g. ``1`` and ``v``, and only the part of the
+solution that is orthogonal to them is truncated [2], so that the density and momentum are not changed by the
+truncation.
+
+1. Ceruti, G., Kusch, J. & Lubich, C. A rank-adaptive robust integrator for dynamical low-rank approximation.
+BIT Numerical Mathematics 62, 1149–1174 (2022).
+
+2. Einkemmer, L. & Lubich, C. A quasi-conservative dynamical low-rank algorithm for the Vlasov equation.
+SIAM Journal on Scientific Computing 41, B1061–B1081 (2019).
+
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from jax import numpy as jnp, Array
+
+from adept.utils.tridiagonal import TridiagonalSolver
+
+
+class Multiply:
+    """
+    Pointwise multiplication by ``g``
+
+    :param g: the coefficient on the grid, of any shape
+    """
+
+    symmetric = True
+
+    def __init__(self, g: Array):
+        self.g = jnp.reshape(g, -1)
+
+    def apply(self, u: Array) -> Array:
+        return self.g[:, None] * u
+
+    def exp(self, u: Array, c: Array, dt: float) -> Array:
+        """
+        :param u: (n, r) columns
+        :param c: (r,) coefficients
+        :return: ``exp(-dt c_b g) u_b`` for every column ``b``
+        """
+        return jnp.exp(-dt * self.g[:, None] * c[None, :]) * u
+
+
+class Derivative:
+    """
+    The spectral derivative ``g d/dx`` along one axis of a grid of shape ``shape``. ``g`` must not depend on that
+    axis so that the operator is antisymmetric
+
+    :param k: the wavenumbers along the axis
+    :param shape: the shape of the grid
+    :param axis: the axis of the derivative
+    :param g: an optional coefficient that broadcasts against ``shape``
+    """
+
+    symmetric = False
+
+    def __init__(self, k: Array, shape: Tuple, axis: int, g: Array = None):
+        self.shape = tuple(shape)
+        self.axis = axis
+        k_shape = [1] * (len(shape) + 1)
+        k_shape[axis] = len(k)
+        self.ik = 1j * jnp.reshape(k, k_shape)
+        if g is not None:
+            self.ik = self.ik * jnp.broadcast_to(g, self.shape)[..., None]
+
+    def _spectral_(self, u: Array, multiplier: Array) -> Array:
+        uk = jnp.fft.fft(jnp.reshape(u, (*self.shape, -1)), axis=self.axis)
+        return jnp.reshape(jnp.fft.ifft(multiplier * uk, axis=self.axis), u.shape)
+
+    def apply(self, u: Array) -> Array:
+        return jnp.real(self._spectral_(u, self.ik))
+
+    def exp(self, u: Array, c: Array, dt: float) -> Array:
+        return self._spectral_(u, jnp.exp(-dt * c * self.ik))
+
+
+class Tridiagonal:
+    """
+    A tridiagonal operator along one axis of a grid of shape ``shape``, e.g. a discretized Fokker-Planck operator.
+    It is neither symmetric nor antisymmetric so it can only be integrated implicitly
+
+    :param lower: (n,) the coefficient of ``u[i - 1]`` in row ``i``
+    :param diagonal: (n,)
+    :param upper: (n,) the coefficient of ``u[i + 1]`` in row ``i``
+    :param shape: the shape of the grid
+    :param axis: the axis along which the operator acts
+    """
+
+    symmetric = None
+
+    def __init__(self, lower: Array, diagonal: Array, upper: Array, shape: Tuple, axis: int):
+        self.lower, self.diagonal, self.upper = lower, diagonal, upper
+        self.shape = tuple(shape)
+        self.axis = axis
+        self.td_solver = TridiagonalSolver()
+
+    def _to_system_axis_last_(self, u: Array) -> Array:
+        return jnp.moveaxis(jnp.reshape(u, (*self.shape, -1)), self.axis, -1)
+
+    def _from_system_axis_last_(self, u: Array, shape: Tuple) -> Array:
+        return jnp.reshape(jnp.moveaxis(u, -1, self.axis), shape)
+
+    def apply(self, u: Array) -> Array:
+        us = self._to_system_axis_last_(u)
+        zero = jnp.zeros_like(us[..., :1])
+        lower = jnp.concatenate([zero, us[..., :-1]], axis=-1)
+        upper = jnp.concatenate([us[..., 1:], zero], axis=-1)
+        return self._from_system_axis_last_(self.lower * lower + self.diagonal * us + self.upper * upper, u.shape)
+
+    def solve(self, u: Array, c: Array, dt: float) -> Array:
+        """
+        :param u: (n, r) columns
+        :param c: (r,) coefficients
+        :return: ``(1 + dt c_b T)^-1 u_b`` for every column ``b``
+        """
+        dtc = dt * c[:, None]
+        new_u = self.td_solver(
+            dtc * self.lower, 1.0 + dtc * self.diagonal, dtc * self.upper, self._to_system_axis_last_(u)
+        )
+        return self._from_system_axis_last_(new_u, u.shape)
+
+
+class Term:
+    """
+    One split step ``df/dt = -(A ⊗ B) f``
+
+    :param space: ``A``
+    :param velocity: ``B``
+    :param implicit: backward Euler instead of the exponential. ``A`` must be a ``Multiply``
+    """
+
+    def __init__(self, space, velocity, implicit: bool = False):
+        if implicit and not isinstance(space, Multiply):
+            raise NotImplementedError("The implicit low-rank steps need a pointwise operator in space")
+        if not implicit and velocity.symmetric is None:
+            raise NotImplementedError("The exponential low-rank steps need a symmetric or antisymmetric operator")
+        self.space = space
+        self.velocity = velocity
+        self.implicit = implicit
+
+
+def project(op, u: Array) -> Array:
+    """
+    :return: ``u^T op u``
+    """
+    return u.T @ op.apply(u)
+
+
+def _eig_(m: Array, symmetric: bool) -> Tuple[Array, Array]:
+    """
+    Diagonalizes a symmetric or an antisymmetric matrix so that ``m = q diag(lam) q^H``
+
+    """
+    if symmetric:
+        lam, q = jnp.linalg.eigh(0.5 * (m + m.T))
+        return lam + 0j, q + 0j
+    else:
+        mu, q = jnp.linalg.eigh(0.5j * (m - m.T))
+        return -1j * mu, q
+
+
+def _row_solve_(m: Array, g: Array, rows: Array, dt: float) -> Array:
+    """
+    :return: the rows of ``rows``, each multiplied by ``(1 + dt g_i m^T)^-1``
+    """
+    mats = jnp.eye(m.shape[0])[None] + dt * g[:, None, None] * m[None]
+    return jnp.linalg.solve(mats, rows[..., None])[..., 0]
+
+
+def k_step(k: Array, v: Array, term: Term, dt: float) -> Array:
+    """
+    Integrates ``dK/dt = -A K (V^T B V)^T`` for ``K = X S``
+    """
+    bv = project(term.velocity, v)
+    if term.implicit:
+        return _row_solve_(bv, term.space.g, k, dt)
+    else:
+        lam, q = _eig_(bv, term.velocity.symmetric)
+        return jnp.real(term.space.exp(k @ jnp.conj(q), lam, dt) @ q.T)
+
+
+def l_step(l: Array, x: Array, term: Term, dt: float) -> Array:
+    """
+    Integrates ``dL/dt = -B L (X^T A X)^T`` for ``L = V S^T``
+    """
+    alpha, p = _eig_(project(term.space, x), term.space.symmetric)
+    if term.implicit:
+        p = jnp.real(p)
+        return term.velocity.solve(l @ p, jnp.real(alpha), dt) @ p.T
+    else:
+        return jnp.real(term.velocity.exp(l @ jnp.conj(p), alpha, dt) @ p.T)
+
+
+def s_step(s: Array, x: Array, v: Array, term: Term, dt: float) -> Array:
+    """
+    Integrates the Galerkin system ``dS/dt = -(X^T A X) S (V^T B V)^T``
+    """
+    ax, bv = project(term.space, x), project(term.velocity, v)
+    alpha, p = _eig_(ax, term.space.symmetric)
+    if term.implicit:
+        p = jnp.real(p)
+        return p @ _row_solve_(bv, jnp.real(alpha), p.T @ s, dt)
+    else:
+        lam, q = _eig_(bv, term.velocity.symmetric)
+        s_tilde = jnp.conj(p).T @ s @ jnp.conj(q)
+        return jnp.real(p @ (jnp.exp(-dt * alpha[:, None] * lam[None, :]) * s_tilde) @ q.T)
+
+
+def get_conserved_basis(moments: List[np.ndarray]) -> np.ndarray:
+    """
+    :param moments: the velocity weights of the conserved moments, e.g. ``[1, v]``, on the velocity grid
+    :return: (nv, c) an orthonormal basis of their span
+    """
+    basis, _ = np.linalg.qr(np.stack([np.reshape(moment, -1) for moment in moments], axis=1))
+    return basis
+
+
+def truncate(x: Array, s: Array, v: Array, num_conserved: int, max_rank: int, tol: float) -> Tuple[Array, Array, Array]:
+    """
+    Truncates ``x s v^T`` to ``max_rank`` where the first ``num_conserved`` columns of ``v`` span the conserved
+    moments. Only ``s[:, num_conserved:]``, which has no conserved moments, is truncated so the moments are unchanged.
+
+    The singular values below ``tol * |s|`` are set to zero so that the rank adapts while the shapes stay fixed
+
+    :return: the new factors
+    """
+    num_kept = max_rank - num_conserved
+    u, sigma, wt = jnp.linalg.svd(s[:, num_conserved:], full_matrices=False)
+    sigma = jnp.where(sigma > tol * jnp.linalg.norm(s), sigma, 0.0)[:num_kept]
+    new_x, new_s = jnp.linalg.qr(jnp.concatenate([s[:, :num_conserved], u[:, :num_kept] * sigma], axis=1))
+    new_v = jnp.concatenate([v[:, :num_conserved], v[:, num_conserved:] @ wt[:num_kept].T], axis=1)
+
+    return x @ new_x, new_s, new_v
+
+
+def orthonormalize(*columns: Array) -> Array:
+    q, _ = jnp.linalg.qr(jnp.concatenate(columns, axis=1))
+    return q
+
+
+class LowRankStepper:
+    """
+    Steps the factors ``{"X", "S", "V"}`` of a distribution function through one split step
+
+    :param conserved: (nv, c) the orthonormal basis of the conserved moments from ``get_conserved_basis``
+    :param max_rank: the rank of the factors, which includes the conserved moments
+    :param tol: the relative tolerance of the singular values that are kept. ``0`` keeps all of them
+    """
+
+    def __init__(self, conserved: np.ndarray, max_rank: int, tol: float = 0.0):
+        self.conserved = jnp.array(conserved)
+        self.num_conserved = conserved.shape[1]
+        if max_rank <= self.num_conserved:
+            raise ValueError(f"The rank must be larger than the number of conserved moments, {self.num_conserved}")
+        if self.num_conserved + 2 * max_rank > conserved.shape[0]:
+            raise ValueError("The rank is too large for the size of the velocity grid")
+        self.max_rank = max_rank
+        self.tol = tol
+
+    def __call__(self, y: Dict[str, Array], term: Term, dt: float) -> Dict[str, Array]:
+        x, s, v = y["X"], y["S"], y["V"]
+
+        # update the bases
+        new_k = k_step(x @ s, v, term, dt)
+        new_l = l_step(v @ s.T, x, term, dt)
+        x_hat = orthonormalize(x, new_k)
+        v_hat = orthonormalize(self.conserved, v, new_l)
+
+        # Galerkin step in the augmented bases
+        s_hat = (x_hat.T @ x) @ s @ (v.T @ v_hat)
+        s_hat = s_step(s_hat, x_hat, v_hat, term, dt)
+
+        x, s, v = truncate(x_hat, s_hat, v_hat, self.num_conserved, self.max_rank, self.tol)
+
+        return {"X": x, "S": s, "V": v}
+
+    def from_full(self, f: np.ndarray) -> Dict[str, Array]:
+        """
+        :param f: (nx, nv) the distribution function
+        :return: the factors of its conservative truncation
+        """
+        conserved = np.asarray(self.conserved)
+        f_conserved = f @ conserved
+        u, sigma, wt = np.linalg.svd(f - f_conserved @ conserved.T, full_matrices=False)
+        num_kept = self.max_rank - self.num_conserved
+        x, s = np.linalg.qr(np.concatenate([f_conserved, u[:, :num_kept] * sigma[:num_kept]], axis=1))
+
+        return {
+            "X": jnp.array(x),
+            "S": jnp.array(s),
+            "V": jnp.array(np.concatenate([conserved, wt[:num_kept].T], axis=1)),
+        }
+
+
+def to_full(y: Dict[str, Array]) -> Array:
+    return y["X"] @ y["S"] @ y["V"].T
+
+
+def moments(y: Dict[str, Array], weights: Array) -> Array:
+    """
+    :param weights: (nv, m) velocity weights, including the quadrature weights
+    :return: (nx, m) the moments of the distribution function without forming it
+    """
+    return y["X"] @ (y["S"] @ (y["V"].T @ weights))
+
+
+def squared_norms(y: Dict[str, Array]) -> Array:
+    """
+    :return: (nx,) ``sum_v f^2`` at every ``x``, because ``V`` is orthonormal
+    """
+    return jnp.sum((y["X"] @ y["S"]) ** 2.0, axis=1)
+
+
+def effective_rank(y: Dict[str, Array], rtol: float = 1e-12) -> Array:
+    sigma = jnp.linalg.svd(y["S"], compute_uv=False)
+    return jnp.sum(sigma > rtol * sigma[0])
@@ -0,0 +1,189 @@
+import os
+from typing import Callable, Dict
+
+import h5netcdf
+import jax
+import numpy as np
+import xarray as xr
+from jax import numpy as jnp
+
+INT16_MAX = 32767
+
+
+def get_quantity_output(output_cfg: Dict, name: str) -> Dict:
+    """
+    Returns the output spec of one saved quantity
+
+    ``output_cfg`` is the ``output`` section of a save, e.g.
+
+    .. code-block:: yaml
+
+        output:
+          dtype: float32
+          quantities:
+            e: float16
+            n: {dtype: int16, scale: 1.0e-6}
+          compression: zlib
+          level: 4
+          shuffle: true
+
+    ``dtype`` is the default for every quantity in the save and ``quantities`` overrides it by name. ``int16`` needs a
+    ``scale``, which is the quantization step, so values up to ``32767 * scale`` can be represented
+
+    :param output_cfg:
+    :param name: the name of the quantity
+    :return: ``{"dtype": ..., "scale": ...}``
+    """
+    spec = output_cfg.get("quantities", {}).get(name, output_cfg.get("dtype", "float64"))
+    spec = {"dtype": spec} if isinstance(spec, str) else dict(spec)
+
+    if spec["dtype"] not in ["float64", "float32", "float16", "int16"]:
+        raise NotImplementedError(f"Output dtype {spec['dtype']} is not implemented")
+    if spec["dtype"] == "int16" and "scale" not in spec:
+        raise ValueError(f"{name} is saved as int16 so it needs a scale")
+
+    return spec
+
+
+def cast(arr: jax.Array, spec: Dict, name: str = "quantity") -> jax.Array:
+    """
+    Casts a saved quantity on device so that less data is transferred to the host
+
+    A complex quantity is kept complex, so ``float32`` is ``complex64``. It cannot be saved as ``int16`` or ``float16``,
+    which would drop its imaginary part
+
+    :param arr:
+    :param spec: from ``get_quantity_output``
+    :param name: the name of the quantity, for the error message
+    :return:
+    """
+    if jnp.iscomplexobj(arr):
+        if spec["dtype"] in ["int16", "float16"]:
+            raise ValueError(
+                f"{name} is complex so it cannot be saved as {spec['dtype']}, which would drop its imaginary part. "
+                "Save it as float32 or float64 instead"
+            )
+        return arr if spec["dtype"] == "float64" else arr.astype(jnp.complex64)
+    elif spec["dtype"] == "int16":
+        return jnp.clip(jnp.round(arr / spec["scale"]), -INT16_MAX, INT16_MAX).astype(jnp.int16)
+    elif spec["dtype"] == "float64":
+        return arr
+    else:
+        return arr.astype(spec["dtype"])
+
+
+def decode(arr: np.ndarray, spec: Dict) -> np.ndarray:
+    """
+    Undoes the int16 quantization so the saved quantity can be post-processed. Floats are left as they are
+
+    :param arr:
+    :param spec: from ``get_quantity_output``
+    :return:
+    """
+    if spec["dtype"] == "int16":
+        return np.asarray(arr, dtype=np.float32) * np.float32(spec["scale"])
+    else:
+        return np.asarray(arr)
+
+
+def _get_leaf_name_(path, default: str) -> str:
+    return str(getattr(path[-1], "key", getattr(path[-1], "idx", default))) if len(path) else default
+
+
+def get_output_save_func(save_func: Callable, output_cfg: Dict, name: str) -> Callable:
+    """
+    Wraps a save function so that every quantity it returns is cast to its output dtype on device
+
+    :param save_func: ``fn(t, y, args)``
+    :param output_cfg: the ``output`` section of the save
+    :param name: the name of the quantity if ``save_func`` returns a single array
+    :return:
+    """
+    if not output_cfg:
+        return save_func
+
+    def output_save_func(t, y, args):
+        def cast_leaf(path, arr):
+            leaf_name = _get_leaf_name_(path, name)
+            return cast(arr, get_quantity_output(output_cfg, leaf_name), leaf_name)
+
+        return jax.tree_util.tree_map_with_path(cast_leaf, save_func(t, y, args))
+
+    return output_save_func
+
+
+def get_encoding(output_cfg: Dict, spec: Dict, da: xr.DataArray) -> Dict:
+    """
+    Returns the netcdf encoding of one variable. Variables are chunked by time if they are compressed
+
+    :param output_cfg: the ``output`` section of the save
+    :param spec: from ``get_quantity_output``
+    :param da: the variable
+    :return:
+    """
+    encoding = {}
+    if spec["dtype"] == "int16" and not np.iscomplexobj(da.data):
+        encoding.update({"dtype": "int16", "scale_factor": spec["scale"], "_FillValue": -INT16_MAX - 1})
+
+    compression = output_cfg.get("compression")
+    if compression is not None:
+        level = output_cfg.get("level", 4)
+        if compression == "zlib":
+            encoding.update({"zlib": True, "complevel": level})
+        elif compression == "zstd":
+            try:
+                import hdf5plugin
+            except ImportError as e:
+                raise ImportError("zstd compression needs hdf5plugin, try `pip install hdf5plugin`") from e
+            encoding.update(dict(hdf5plugin.Zstd(clevel=level)))
+        else:
+            raise NotImplementedError(f"Compression {compression} is not implemented")
+
+        encoding["shuffle"] = output_cfg.get("shuffle", True)
+        encoding["chunksizes"] = (1,) + da.shape[1:] if da.ndim > 1 else da.shape
+
+    return encoding
+
+
+def to_netcdf(ds: xr.Dataset, path: str, output_cfg: Dict, quantities: Dict[str, str], **kwargs) -> None:
+    """
+    Writes a dataset with the output dtype and compression of each of its variables
+
+    :param ds:
+    :param path:
+    :param output_cfg: the ``output`` section of the save
+    :param quantities: the name of the saved quantity that each variable of ``ds`` comes from
+    :param kwargs: passed to ``xr.Dataset.to_netcdf``
+    :return:
+    """
+    encoding = {
+        k: get_encoding(output_cfg, get_quantity_output(output_cfg, quantities.get(k, k)), da) for k, da in ds.items()
+    }
+    ds.to_netcdf(path, encoding=encoding, **kwargs)
+
+
+def append_netcdf(ds: xr.Dataset, path: str, output_cfg: Dict, quantities: Dict[str, str], dim: str) -> None:
+    """
+    Appends a dataset to a file along ``dim``, e.g. a chunk of the saves in time, so that a dataset that is larger than
+    memory can be written a chunk at a time. The first chunk creates the file with ``to_netcdf``, with ``dim``
+    unlimited, and the output dtype and compression of each of its variables are applied to the other chunks
+
+    :param ds: a chunk of the dataset
+    :param path:
+    :param output_cfg: the ``output`` section of the save
+    :param quantities: the name of the saved quantity that each variable of ``ds`` comes from
+    :param dim: the dimension that the chunks are appended along
+    :return:
+    """
+    if not os.path.exists(path):
+        to_netcdf(ds, path, output_cfg, quantities, engine="h5netcdf", invalid_netcdf=True, unlimited_dims=[dim])
+        return
+
+    with h5netcdf.File(path, "a") as fi:
+        start = fi.dimensions[dim].size
+        fi.resize_dimension(dim, start + ds.sizes[dim])
+        fi.variables[dim][start:] = ds[dim].values
+        for k, da in ds.items():
+            variable = da.variable.copy(deep=False)
+            variable.encoding = get_encoding(output_cfg, get_quantity_output(output_cfg, quantities.get(k, k)), da)
+            fi.variables[k][start:] = xr.conventions.encode_cf_variable(variable, name=k).values
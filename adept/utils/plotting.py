@@ -0,0 +1,209 @@
+import argparse, importlib, multiprocessing, os, subprocess, sys
+from typing import Callable, Dict, List
+
+import numpy as np
+import xarray as xr
+import yaml
+from matplotlib import pyplot as plt
+
+
+def plot_job(func: Callable, file: str, out: str, var: str = None, thumbnail: bool = False, **kwargs) -> Dict:
+    """
+    Describes one figure so that it can be rendered in another process, or later, from the stored data
+
+    :param func: a module level function ``func(data, path, **kwargs)`` that draws and saves the figure
+    :param file: the netcdf file with the data, relative to the run directory
+    :param out: the path of the figure, relative to the run directory
+    :param var: the variable in ``file``. The whole dataset is passed to ``func`` if this is None
+    :param thumbnail: whether this figure is part of the thumbnail subset
+    :param kwargs: passed to ``func``
+    :return: the job
+    """
+    return {
+        "func": f"{func.__module__}:{func.__qualname__}",
+        "file": file,
+        "var": var,
+        "out": out,
+        "thumbnail": thumbnail,
+        "kwargs": kwargs,
+    }
+
+
+def render(run_dir: str, job: Dict, dpi: float = None) -> None:
+    """
+    Renders one plot job
+
+    :param run_dir: the directory that the paths in the job are relative to
+    :param job: from ``plot_job``
+    :param dpi: overrides the resolution of the figure
+    :return:
+    """
+    module, name = job["func"].split(":")
+    func = getattr(importlib.import_module(module), name)
+
+    with xr.open_dataset(os.path.join(run_dir, job["file"]), engine="h5netcdf") as ds:
+        data = (ds if job["var"] is None else ds[job["var"]]).load()
+
+    out = os.path.join(run_dir, job["out"])
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with plt.rc_context({} if dpi is None else {"savefig.dpi": dpi}):
+        func(data, out, **job["kwargs"])
+    plt.close("all")
+
+
+def render_all(run_dir: str, jobs: List[Dict], processes: int = None, dpi: float = None) -> None:
+    """
+    Renders the plot jobs in a pool of ``processes`` workers. The workers are spawned rather than forked so that they
+    do not inherit the state of JAX. Spawning re-imports ``__main__`` so this is only called from the command line
+    entry point of this module
+
+    :param run_dir:
+    :param jobs:
+    :param processes: defaults to the number of cpus
+    :param dpi:
+    :return:
+    """
+    import matplotlib
+
+    processes = min(os.cpu_count() if processes is None else processes, len(jobs))
+    if processes > 1:
+        with multiprocessing.get_context("spawn").Pool(
+            processes, initializer=matplotlib.use, initargs=("Agg",)
+        ) as pool:
+            pool.starmap(render, [(run_dir, job, dpi) for job in jobs])
+    else:
+        for job in jobs:
+            render(run_dir, job, dpi)
+
+
+def run_plot_jobs(jobs: List[Dict], td: str, plot_cfg: Dict) -> List[Dict]:
+    """
+    Renders the plot jobs that ``post_process`` returns according to the ``plots`` section of the config
+
+    - ``mode``: ``parallel`` (default) renders in a pool of ``processes`` workers, which defaults to the number of
+      cpus, ``serial`` renders in this process, ``defer`` renders nothing and ``skip`` neither renders nor stores the
+      jobs
+    - ``thumbnail``: if True, only the thumbnail subset is rendered at ``thumbnail_dpi`` (default 50)
+
+    The jobs that are not rendered are written to ``plots/jobs.yaml`` so that they can be rendered later by
+    ``python -m adept.utils.plotting``
+
+    :param jobs:
+    :param td: the run directory
+    :param plot_cfg: the ``plots`` section of the config
+    :return: the deferred jobs
+    """
+    mode = plot_cfg.get("mode", "parallel")
+    if mode not in ["parallel", "serial", "defer", "skip"]:
+        raise NotImplementedError(f"Plotting mode {mode} is not implemented")
+    if mode == "skip":
+        return []
+
+    dpi = None
+    if mode == "defer":
+        to_render, deferred = [], jobs
+    elif plot_cfg.get("thumbnail", False):
+        to_render = [job for job in jobs if job["thumbnail"]]
+        deferred = [job for job in jobs if not job["thumbnail"]]
+        dpi = plot_cfg.get("thumbnail_dpi", 50)
+    else:
+        to_render, deferred = jobs, []
+
+    os.makedirs(os.path.join(td, "plots"), exist_ok=True)
+    if deferred:
+        with open(os.path.join(td, "plots", "jobs.yaml"), "w") as fi:
+            yaml.dump(deferred, fi)
+
+    processes = plot_cfg.get("processes", os.cpu_count())
+    if mode == "serial" or min(processes, len(to_render)) < 2:
+        for job in to_render:
+            render(td, job, dpi)
+    else:
+        # the pool runs in its own process so that the caller does not need an ``if __name__ == "__main__"`` guard
+        jobs_path = os.path.join(td, "plots", "render-jobs.yaml")
+        with open(jobs_path, "w") as fi:
+            yaml.dump(to_render, fi)
+        command = [sys.executable, "-m", "adept.utils.plotting", td, "--jobs", jobs_path, "--processes", str(processes)]
+        command += [] if dpi is None else ["--dpi", str(dpi)]
+        try:
+            subprocess.run(command, check=True, env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+        finally:
+            os.remove(jobs_path)
+
+    return deferred
+
+
+def plot_spacetime(fld: xr.DataArray, path: str, log: bool = False) -> None:
+    (np.log10(np.abs(fld)) if log else fld).plot()
+    plt.savefig(path, bbox_inches="tight")
+    plt.close()
+
+
+def plot_lineouts(fld: xr.DataArray, path: str, t_dim: str, num: int = 8, **kwargs) -> None:
+    """
+    Plots ``num`` snapshots of ``fld``, or the time history of each mode if ``fld`` is a function of ``kx``
+
+    """
+    if "kx" in fld.dims:
+        fld.plot.line(x=t_dim, hue="kx")
+    else:
+        t_skip = max(int(fld.coords[t_dim].data.size // num), 1)
+        fld[slice(0, -1, t_skip)].T.plot(col=t_dim, col_wrap=4, **kwargs)
+    plt.savefig(path, bbox_inches="tight")
+    plt.close()
+
+
+def plot_scalar(srs: xr.DataArray, path: str) -> None:
+    fig, ax = plt.subplots(1, 2, figsize=(10, 4), tight_layout=True)
+    srs.plot(ax=ax[0])
+    ax[0].grid()
+    np.log10(np.abs(srs)).plot(ax=ax[1])
+    ax[1].grid()
+    ax[1].set_ylabel("$log_{10}$(|" + srs.name + "|)")
+    fig.savefig(path, bbox_inches="tight")
+    plt.close()
+
+
+def plot_spectrum(spc: xr.DataArray, path: str) -> None:
+    """
+    Plots the spectrum at the last save
+
+    """
+    fig, ax = plt.subplots(1, 1, figsize=(7, 4), tight_layout=True)
+    spc[-1].plot(ax=ax, hue="kx")
+    ax.grid()
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Renders the deferred plots of a run")
+    parser.add_argument("run", help="the run directory or, with --run-id, the mlflow run id")
+    parser.add_argument("--run-id", action="store_true", help="download the run from mlflow and log the plots to it")
+    parser.add_argument("--jobs", default=None, help="the plot jobs. Defaults to the deferred jobs of the run")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--dpi", type=float, default=None)
+    cli_args = parser.parse_args()
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    if cli_args.run_id:
+        import mlflow
+
+        run_dir = mlflow.artifacts.download_artifacts(run_id=cli_args.run)
+    else:
+        run_dir = cli_args.run
+
+    with open(os.path.join(run_dir, "plots", "jobs.yaml") if cli_args.jobs is None else cli_args.jobs, "r") as fi:
+        all_jobs = yaml.safe_load(fi)
+    render_all(run_dir, all_jobs, processes=cli_args.processes, dpi=cli_args.dpi)
+
+    if cli_args.run_id:
+        from mlflow import MlflowClient
+
+        for job in all_jobs:
+            MlflowClient().log_artifact(
+                cli_args.run, os.path.join(run_dir, job["out"]), artifact_path=os.path.dirname(job["out"])
+            )
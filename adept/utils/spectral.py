@@ -0,0 +1,126 @@
+from typing import Dict
+
+import numpy as np
+import xarray as xr
+import equinox as eqx
+from jax import numpy as jnp, Array
+
+
+def _get_ax_(spec, key: str) -> np.ndarray:
+    if isinstance(spec, dict):
+        return np.linspace(spec[f"{key}min"], spec[f"{key}max"], spec[f"n{key}"])
+    else:
+        return np.atleast_1d(np.array(spec, dtype=float))
+
+
+class SpectralAccumulator(eqx.Module):
+    """
+    Running windowed DFT of a periodic 1D field at selected (kx, w) pairs
+
+    This accumulates
+
+    .. math::
+        \\hat{E}(k, \\omega) = \\frac{\\int W(t) \\hat{E}(k, t) e^{i \\omega t} dt}{\\int W(t) dt}
+
+    during the solve so that the spectrum is available without saving the field history. ``spectral_cfg`` contains
+
+    - ``kx``: a list of wavenumbers or ``{kxmin, kxmax, nkx}``. These are moved to the closest Fourier modes of the grid
+    - ``w``: a list of frequencies or ``{wmin, wmax, nw}``
+    - ``window``: ``{tmin, tmax, type}`` where ``type`` is ``hann`` (default) or ``boxcar``. Defaults to the whole run
+
+    The accumulator is stored in the state as a real (2, nkx, nw) array. It is either integrated as part of the ODE
+    (``rate``) or summed every step (``update``). For a mode :math:`E = A \\cos(kx - \\omega_0 t)`, the magnitude at
+    :math:`(k, \\omega_0)` is :math:`A`.
+
+    :param spectral_cfg:
+    :param cfg_grid: needs ``nx``, ``kxr`` and ``tmax``
+    """
+
+    kx_inds: np.ndarray
+    kx: np.ndarray
+    w: Array
+    nx: int = eqx.field(static=True)
+    t0: float = eqx.field(static=True)
+    t1: float = eqx.field(static=True)
+    window_type: str = eqx.field(static=True)
+
+    def __init__(self, spectral_cfg: Dict, cfg_grid: Dict):
+        kxr = np.asarray(cfg_grid["kxr"])
+        kx = _get_ax_(spectral_cfg["kx"], "kx")
+        self.kx_inds = np.unique(np.argmin(np.abs(kxr[None, :] - kx[:, None]), axis=1))
+        self.kx = kxr[self.kx_inds]
+        self.w = jnp.array(_get_ax_(spectral_cfg["w"], "w"))
+        self.nx = cfg_grid["nx"]
+
+        window_cfg = spectral_cfg.get("window", {})
+        self.t0 = window_cfg.get("tmin", 0.0)
+        self.t1 = window_cfg.get("tmax", cfg_grid["tmax"])
+        self.window_type = window_cfg.get("type", "hann")
+        if self.window_type not in ["hann", "boxcar"]:
+            raise NotImplementedError(f"Window {self.window_type} is not implemented")
+
+    def init_state(self) -> Array:
+        return jnp.zeros((2, self.kx.size, self.w.size))
+
+    def window(self, t: float) -> float:
+        in_window = (t >= self.t0) & (t <= self.t1)
+        if self.window_type == "hann":
+            return jnp.where(in_window, jnp.sin(np.pi * (t - self.t0) / (self.t1 - self.t0)) ** 2.0, 0.0)
+        else:
+            return jnp.where(in_window, 1.0, 0.0)
+
+    def window_integral(self) -> float:
+        return (self.t1 - self.t0) * (0.5 if self.window_type == "hann" else 1.0)
+
+    def rate(self, t: float, field: Array) -> Array:
+        """
+        The time derivative of the accumulator
+
+        :param t:
+        :param field: the field on the x grid
+        :return: (2, nkx, nw)
+        """
+        field_k = jnp.fft.rfft(field)[self.kx_inds] * 2.0 / self.nx
+        integrand = self.window(t) * field_k[:, None] * jnp.exp(1j * self.w[None, :] * t)
+
+        return jnp.stack([jnp.real(integrand), jnp.imag(integrand)])
+
+    def update(self, acc: Array, t: float, field: Array, dt: float) -> Array:
+        """
+        Adds the contribution of one timestep
+
+        :param acc: the accumulator
+        :param t: the time of ``field``
+        :param field: the field on the x grid
+        :param dt:
+        :return:
+        """
+        return acc + dt * self.rate(t, field)
+
+    def __call__(self, acc: Array) -> Dict[str, Array]:
+        """
+        Normalizes the accumulator so it can be saved
+
+        :param acc:
+        :return: the magnitude and phase of the spectrum
+        """
+        spectrum = (acc[0] + 1j * acc[1]) / self.window_integral()
+
+        return {"mag": jnp.abs(spectrum), "ang": jnp.angle(spectrum)}
+
+
+def store_spectral(accumulator: SpectralAccumulator, this_t: np.ndarray, ys: Dict, path: str) -> xr.Dataset:
+    """
+    Stores the saved spectra to netcdf
+
+    :param accumulator:
+    :param this_t: save times
+    :param ys: the output of ``SpectralAccumulator.__call__``
+    :param path:
+    :return:
+    """
+    crds = (("t", this_t), ("kx", accumulator.kx), ("w", np.asarray(accumulator.w)))
+    spectral_xr = xr.Dataset({k: xr.DataArray(v, coords=crds) for k, v in ys.items()})
+    spectral_xr.to_netcdf(path)
+
+    return spectral_xr
@@ -0,0 +1,197 @@
+import os, queue, threading
+from functools import partial
+from typing import Callable, Dict
+
+import h5netcdf
+import jax
+from jax import numpy as jnp
+import equinox as eqx
+import numpy as np
+from diffrax import Solution, SubSaveAt
+
+
+def _get_leaf_names_(tree) -> list:
+    names = []
+    for path, _ in jax.tree_util.tree_flatten_with_path(tree)[0]:
+        name = "-".join(str(getattr(p, "key", getattr(p, "idx", getattr(p, "name", p)))) for p in path)
+        names.append(name if name else "value")
+
+    return names
+
+
+@jax.custom_jvp
+def _not_differentiable_(out):
+    return out
+
+
+@_not_differentiable_.defjvp
+def _not_differentiable_jvp_(primals, tangents):
+    raise ValueError(
+        "The saves are streamed to disk so they are not in the output of the solve and cannot be differentiated. "
+        "Remove the stream section of the config to take a gradient"
+    )
+
+
+class StreamingWriter:
+    """
+    Appends every save to a netCDF file with an unlimited time dimension while the solve is running
+
+    The save functions are wrapped so that they hand their output to the host through ``jax.debug.callback`` and only
+    return the time to ``diffeqsolve``. A background thread drains a bounded queue and writes each slice to disk, so
+    writing overlaps with the solve and device memory no longer scales with the number of saves.
+
+    A streamed solve cannot be vmapped, e.g. by ``BaseLPSE2D.ensemble_vg``, because every realization would write to the
+    same slot. Writing a slot twice between ``start`` and ``close`` is an error that ``close`` raises. It cannot be
+    differentiated either because the loss would be computed from the save times, so that is an error when it is traced.
+
+    :param stream_dir: directory that the files are written to. There is one file per ``SubSaveAt``
+    :param max_queue_size: number of saves that can be waiting to be written before the solve blocks
+    """
+
+    def __init__(self, stream_dir: str, max_queue_size: int = 8) -> None:
+        self.stream_dir = stream_dir
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.files = {}
+        self.treedefs = {}
+        self.leaf_names = {}
+        self.error = None
+        self.thread = None
+        self.written = set()
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.written = set()
+            os.makedirs(self.stream_dir, exist_ok=True)
+            self.thread = threading.Thread(target=self._write_loop_, daemon=True)
+            self.thread.start()
+
+    def _write_loop_(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write_(*item)
+            except Exception as e:  # surfaced on the main thread in self.close
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _write_(self, key: str, it: np.ndarray, t: np.ndarray, leaves: tuple) -> None:
+        if it.ndim > 0 or (key, int(it)) in self.written:
+            raise ValueError(
+                f"The save -- {key} -- was streamed more than once at t = {t}. This happens if the solve is vmapped, "
+                "which is not supported with streaming"
+            )
+        it = int(it)
+        self.written.add((key, it))
+
+        if key not in self.files:
+            fi = h5netcdf.File(os.path.join(self.stream_dir, f"{key}.nc"), "w")
+            fi.dimensions["t"] = None
+            fi.create_variable("t", ("t",), t.dtype)
+            for name, leaf in zip(self.leaf_names[key], leaves):
+                dims = tuple(f"{name}-{i}" for i in range(leaf.ndim))
+                for dim, size in zip(dims, leaf.shape):
+                    fi.dimensions[dim] = size
+                fi.create_variable(name, ("t",) + dims, leaf.dtype, chunks=(1,) + leaf.shape)
+            self.files[key] = fi
+
+        fi = self.files[key]
+        if it >= fi.dimensions["t"].size:
+            fi.resize_dimension("t", it + 1)
+        fi.variables["t"][it] = t
+        for name, leaf in zip(self.leaf_names[key], leaves):
+            fi.variables[name][it] = leaf
+        fi.flush()
+
+    def _put_(self, key: str, it, t, *leaves) -> None:
+        self.queue.put((key, np.asarray(it), np.asarray(t), tuple(np.array(leaf) for leaf in leaves)))
+
+    def wrap_save_func(self, key: str, ts: jnp.ndarray, save_func: Callable) -> Callable:
+        """
+        Returns a save function that streams the output of ``save_func`` to disk and only returns the time
+
+        :param key: name of the save, and the file
+        :param ts: the save times. Each save is written to the slot of the closest one so the order of the callbacks
+        does not matter
+        :param save_func: the original ``fn(t, y, args)``
+        :return:
+        """
+
+        def streaming_save_func(t, y, args):
+            out = _not_differentiable_(save_func(t, y, args))
+            leaves, self.treedefs[key] = jax.tree_util.tree_flatten(out)
+            self.leaf_names[key] = _get_leaf_names_(out)
+            it = jnp.argmin(jnp.abs(jnp.asarray(ts) - t))
+            # io_callback would be the natural choice but its effects are not allowed inside diffrax's checkpointed loop
+            jax.debug.callback(partial(self._put_, key), it, t, *leaves)
+
+            return t
+
+        return streaming_save_func
+
+    def wrap_saveat(self, saveat: Dict) -> Dict:
+        """
+        Wraps the save functions in the keyword arguments of a ``diffrax.SaveAt``
+
+        :param saveat: either ``{"ts": ..., "fn": ...}`` or ``{"subs": {key: SubSaveAt}}``
+        :return:
+        """
+        if "subs" in saveat:
+            subs = {
+                k: SubSaveAt(ts=sub.ts, fn=self.wrap_save_func(k, sub.ts, sub.fn)) for k, sub in saveat["subs"].items()
+            }
+            return {**saveat, "subs": subs}
+        else:
+            save_func = saveat["fn"] if saveat.get("fn") is not None else lambda t, y, args: y
+            return {**saveat, "fn": self.wrap_save_func("save", saveat["ts"], save_func)}
+
+    def close(self) -> None:
+        """
+        Waits for the queue to be written and closes the files
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        for fi in self.files.values():
+            fi.close()
+        self.files = {}
+
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Failed to stream the saves to disk") from error
+
+    def load(self, key: str):
+        """
+        Reads a streamed save back into the pytree that the save function returned
+
+        :param key:
+        :return:
+        """
+        with h5netcdf.File(os.path.join(self.stream_dir, f"{key}.nc"), "r") as fi:
+            leaves = [fi.variables[name][...] for name in self.leaf_names[key]]
+
+        return jax.tree_util.tree_unflatten(self.treedefs[key], leaves)
+
+    def restore(self, run_output: Dict) -> Dict:
+        """
+        Replaces the time-only ``ys`` of every ``diffrax.Solution`` in ``run_output`` with the streamed saves so that
+        ``post_process`` does not need to know that the run was streamed
+
+        :param run_output:
+        :return:
+        """
+
+        def _restore_(sol):
+            if not isinstance(sol, Solution):
+                return sol
+            if isinstance(sol.ys, dict) and set(sol.ys.keys()) <= set(self.treedefs.keys()):
+                ys = {k: self.load(k) for k in sol.ys.keys()}
+            else:
+                ys = self.load("save")
+
+            return eqx.tree_at(lambda s: s.ys, sol, ys)
+
+        return jax.tree_util.tree_map(_restore_, run_output, is_leaf=lambda x: isinstance(x, Solution))
@@ -0,0 +1,206 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import numpy as np
+from jax import numpy as jnp, Array
+from jax.lax import scan
+import equinox as eqx
+
+
+def _to_system_axis_first_(*arrs):
+    return [jnp.moveaxis(arr, -1, 0) for arr in arrs]
+
+
+def _shift_(arr: Array, s: int, fill: float) -> Array:
+    """
+    Returns ``arr[..., i - s]`` along the last axis, padded with ``fill`` where ``i - s`` is out of bounds.
+    A negative ``s`` shifts the other way
+
+    """
+    pad = jnp.full((*arr.shape[:-1], abs(s)), fill, dtype=arr.dtype)
+    if s > 0:
+        return jnp.concatenate([pad, arr[..., :-s]], axis=-1)
+    else:
+        return jnp.concatenate([arr[..., -s:], pad], axis=-1)
+
+
+def thomas(a: Array, b: Array, c: Array, d: Array, num_unroll: int = 8) -> Array:
+    """
+    Solves a batch of tridiagonal systems with the non-in-place Thomas algorithm.
+
+    The scan is serial along the system dimension and vectorized over the batch dimensions
+
+    :param a: (..., n) subdiagonal, ``a[..., 0]`` is ignored
+    :param b: (..., n) main diagonal
+    :param c: (..., n) superdiagonal, ``c[..., -1]`` is ignored
+    :param d: (..., n) right hand side
+    :param num_unroll: unroll factor of the scan over the system dimension
+    :return:
+    """
+
+    def _forward_(last_primes, x):
+        last_cp, last_dp = last_primes
+        this_a, this_b, this_c, this_d = x
+        denom = this_b - this_a * last_cp
+        new_primes = (this_c / denom, (this_d - this_a * last_dp) / denom)
+        return new_primes, new_primes
+
+    def _backward_(last_x, x):
+        this_cp, this_dp = x
+        new_x = this_dp - this_cp * last_x
+        return new_x, new_x
+
+    a, b, c, d = _to_system_axis_first_(*jnp.broadcast_arrays(a, b, c, d))
+    zeros = jnp.zeros(d.shape[1:], dtype=d.dtype)
+    _, (cp, dp) = scan(_forward_, (zeros, zeros), (a, b, c, d), unroll=num_unroll)
+    _, sol = scan(_backward_, zeros, (cp[::-1], dp[::-1]), unroll=num_unroll)
+    return jnp.moveaxis(sol[::-1], 0, -1)
+
+
+def _cyclic_reduction_steps_(a: Array, b: Array, c: Array, d: Array, num_steps: int):
+    """
+    Performs ``num_steps`` steps of parallel cyclic reduction.
+
+    After ``k`` steps, equation ``i`` only couples to equations ``i - 2**k`` and ``i + 2**k``
+
+    """
+    a = a.at[..., 0].set(0.0)
+    c = c.at[..., -1].set(0.0)
+    for k in range(num_steps):
+        s = 2**k
+        alpha = -a / _shift_(b, s, 1.0)
+        gamma = -c / _shift_(b, -s, 1.0)
+        new_b = b + alpha * _shift_(c, s, 0.0) + gamma * _shift_(a, -s, 0.0)
+        new_d = d + alpha * _shift_(d, s, 0.0) + gamma * _shift_(d, -s, 0.0)
+        a = alpha * _shift_(a, s, 0.0)
+        c = gamma * _shift_(c, -s, 0.0)
+        b, d = new_b, new_d
+
+    return a, b, c, d
+
+
+def parallel_cyclic_reduction(a: Array, b: Array, c: Array, d: Array) -> Array:
+    """
+    Solves a batch of tridiagonal systems with parallel cyclic reduction.
+
+    This takes ``ceil(log2(n))`` fully vectorized steps and is suited to small batches of (diagonally dominant) systems
+
+    :param a: (..., n) subdiagonal, ``a[..., 0]`` is ignored
+    :param b: (..., n) main diagonal
+    :param c: (..., n) superdiagonal, ``c[..., -1]`` is ignored
+    :param d: (..., n) right hand side
+    :return:
+    """
+    a, b, c, d = jnp.broadcast_arrays(a, b, c, d)
+    num_steps = int(np.ceil(np.log2(max(d.shape[-1], 2))))
+    _, b, _, d = _cyclic_reduction_steps_(a, b, c, d, num_steps)
+    return d / b
+
+
+def hybrid(a: Array, b: Array, c: Array, d: Array, num_pcr_steps: int, num_unroll: int = 8) -> Array:
+    """
+    Solves a batch of tridiagonal systems with a blocked PCR-Thomas hybrid.
+
+    ``num_pcr_steps`` steps of parallel cyclic reduction split every system into ``2**num_pcr_steps`` independent
+    interleaved systems, which are then solved together with the Thomas algorithm. This trades a little extra work
+    for a ``2**num_pcr_steps`` wider and shorter serial scan
+
+    :param a: (..., n) subdiagonal, ``a[..., 0]`` is ignored
+    :param b: (..., n) main diagonal
+    :param c: (..., n) superdiagonal, ``c[..., -1]`` is ignored
+    :param d: (..., n) right hand side
+    :param num_pcr_steps: number of cyclic reduction steps
+    :param num_unroll: unroll factor of the Thomas scans
+    :return:
+    """
+    a, b, c, d = jnp.broadcast_arrays(a, b, c, d)
+    n = d.shape[-1]
+    num_blocks = 2**num_pcr_steps
+    n_pad = int(np.ceil(n / num_blocks)) * num_blocks
+
+    # pad with decoupled identity rows so that the interleaved systems have the same length
+    c = c.at[..., -1].set(0.0)
+    a, c, d = [
+        jnp.concatenate([arr, jnp.zeros((*arr.shape[:-1], n_pad - n), dtype=arr.dtype)], axis=-1) for arr in (a, c, d)
+    ]
+    b = jnp.concatenate([b, jnp.ones((*b.shape[:-1], n_pad - n), dtype=b.dtype)], axis=-1)
+    a, b, c, d = _cyclic_reduction_steps_(a, b, c, d, num_pcr_steps)
+
+    # (..., n_pad) -> (..., num_blocks, n_pad // num_blocks) where block r holds the equations r, r + num_blocks, ...
+    def _split_(arr):
+        return jnp.swapaxes(arr.reshape(*arr.shape[:-1], n_pad // num_blocks, num_blocks), -1, -2)
+
+    sol = thomas(*[_split_(arr) for arr in (a, b, c, d)], num_unroll=num_unroll)
+    return jnp.swapaxes(sol, -1, -2).reshape(*d.shape[:-1], n_pad)[..., :n]
+
+
+class TridiagonalSolver(eqx.Module):
+    """
+    A batched tridiagonal solver shared by all the implicit collision operators.
+
+    All arrays are of shape (..., n) and the systems are solved along the last axis. The diagonals can be of any shape
+    that broadcasts against the right hand side. ``a[..., 0]`` and ``c[..., -1]`` are ignored.
+
+    ``method`` is one of
+
+    - ``"thomas"``: serial scan along the system, vectorized across the batch. Least work, best for large batches. This
+      is the default and is the same algorithm as the scan solvers that the collision operators used before
+    - ``"pcr"``: parallel cyclic reduction, ``log2(n)`` vectorized steps. Best for small batches of short systems
+    - ``"hybrid"``: a few PCR steps followed by Thomas on the resulting independent sub-systems
+    - ``"auto"``: picks one of the above from the system size and batch count. It is opt-in because the methods only
+      agree to round-off
+
+    :param method: the algorithm
+    :param num_unroll: unroll factor for the Thomas scans
+    :param min_batch: the batch count above which the Thomas algorithm is considered to saturate the hardware
+    """
+
+    method: str
+    num_unroll: int
+    min_batch: int
+
+    def __init__(self, method: str = "thomas", num_unroll: int = 8, min_batch: int = 256):
+        if method not in ["auto", "thomas", "pcr", "hybrid"]:
+            raise NotImplementedError(f"Tridiagonal solver: <{method}> has not been implemented")
+        self.method = method
+        self.num_unroll = num_unroll
+        self.min_batch = min_batch
+
+    def num_pcr_steps(self, n: int, batch: int) -> int:
+        """
+        The number of cyclic reduction steps for the hybrid solver is chosen so that the number of independent
+        systems reaches ``min_batch`` while keeping at least 8 unknowns per system
+
+        """
+        num_steps = int(np.ceil(np.log2(max(self.min_batch / max(batch, 1), 1.0))))
+        return max(min(num_steps, int(np.log2(max(n // 8, 1)))), 0)
+
+    def select_method(self, n: int, batch: int) -> str:
+        if self.method != "auto":
+            return self.method
+        elif batch >= self.min_batch:
+            return "thomas"
+        elif n <= 128:
+            return "pcr"
+        else:
+            return "hybrid"
+
+    def __call__(self, a: Array, b: Array, c: Array, d: Array) -> Array:
+        """
+        Solves a tridiagonal matrix system with diagonals a, b, c and RHS vector d.
+
+        :param a: (..., n) represents the subdiagonal of the linear operator
+        :param b: (..., n) represents the main diagonal of the linear operator
+        :param c: (..., n) represents the super diagonal of the linear operator
+        :param d: (..., n) represents the right hand side of the linear operator
+        :return:
+        """
+        n = d.shape[-1]
+        batch = int(np.prod(jnp.broadcast_shapes(a.shape, b.shape, c.shape, d.shape)[:-1]))
+        method = self.select_method(n, batch)
+
+        if method == "thomas":
+            return thomas(a, b, c, d, num_unroll=self.num_unroll)
+        elif method == "pcr":
+            return parallel_cyclic_reduction(a, b, c, d)
+        else:
+            return hybrid(a, b, c, d, num_pcr_steps=self.num_pcr_steps(n, batch), num_unroll=self.num_unroll)
@@ -2,10 +2,11 @@ from typing import Dict, Tuple
 
 import numpy as np
 from astropy import constants as csts, units as u
-from diffrax import diffeqsolve, SaveAt, ODETerm, SubSaveAt
+from diffrax import ConstantStepSize, diffeqsolve, SaveAt, ODETerm, SubSaveAt
 from jax import numpy as jnp, tree_util as jtu
 
 from adept import ADEPTModule, Stepper
+from adept.utils.adaptive import AdaptiveStepper, CFLController, get_adaptive_cfg, get_max_steps, get_step_ts
 from adept.vfp1d.vector_field import OSHUN1D
 from adept.vfp1d.helpers import _initialize_total_distribution_, calc_logLambda
 from adept.vfp1d.storage import get_save_quantities, post_process
@@ -131,6 +132,10 @@ class BaseVFP1D(ADEPTModule):
             cfg_grid["max_steps"] = cfg_grid["nt"] + 4
 
         cfg_grid["tmax"] = cfg_grid["dt"] * cfg_grid["nt"]
+
+        if "adaptive" in cfg_grid:
+            cfg_grid["adaptive"] = get_adaptive_cfg(cfg_grid)
+
         self.cfg["grid"] = cfg_grid
 
     def get_solver_quantities(self):
@@ -214,16 +219,35 @@ class BaseVFP1D(ADEPTModule):
             "save_t1": self.cfg["grid"]["tmax"],
             "save_nt": self.cfg["grid"]["tmax"],
         }
+        vector_field = OSHUN1D(self.cfg)
         self.diffeqsolve_quants = dict(
-            terms=ODETerm(OSHUN1D(self.cfg)),
+            terms=ODETerm(vector_field),
             solver=Stepper(),
+            stepsize_controller=ConstantStepSize(),
             saveat=dict(subs={k: SubSaveAt(ts=v["t"]["ax"], fn=v["func"]) for k, v in self.cfg["save"].items()}),
         )
 
+        if "adaptive" in self.cfg["grid"]:
+            adaptive_cfg = self.cfg["grid"]["adaptive"]
+            step_ts = get_step_ts([v["t"]["ax"] for v in self.cfg["save"].values()])
+            self.cfg["grid"]["max_steps"] = get_max_steps(self.cfg["grid"]["tmax"], adaptive_cfg["dtmin"], step_ts)
+            self.time_quantities["max_steps"] = self.cfg["grid"]["max_steps"]
+            self.diffeqsolve_quants["solver"] = AdaptiveStepper()
+            self.diffeqsolve_quants["stepsize_controller"] = CFLController(
+                get_max_dt=vector_field.get_max_dt,
+                get_amplitudes=lambda y: y["e"],
+                dtmin=adaptive_cfg["dtmin"],
+                dtmax=adaptive_cfg["dtmax"],
+                max_change=adaptive_cfg["max_change"],
+                max_increase=adaptive_cfg["max_increase"],
+                step_ts=jnp.array(step_ts),
+            )
+
     def __call__(self, trainable_modules: Dict, args: Dict):
         solver_result = diffeqsolve(
             terms=self.diffeqsolve_quants["terms"],
             solver=self.diffeqsolve_quants["solver"],
+            stepsize_controller=self.diffeqsolve_quants["stepsize_controller"],
             t0=self.time_quantities["t0"],
             t1=self.time_quantities["t1"],
             max_steps=self.cfg["grid"]["max_steps"],
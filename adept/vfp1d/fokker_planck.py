@@ -1,9 +1,9 @@
-from typing import Dict
+from typing import Dict, Tuple
 
 from jax import numpy as jnp, Array
-from jax import vmap
 import numpy as np
-import lineax as lx
+
+from adept.utils.tridiagonal import TridiagonalSolver
 
 
 class LenardBernstein:
@@ -27,46 +27,33 @@ class LenardBernstein:
         r_e = 2.8179402894e-13
         c_kpre = r_e * np.sqrt(4 * np.pi * cfg["units"]["derived"]["n0"].to("1/cm^3").value * r_e)
         self.nuee_coeff = 4.0 * np.pi / 3 * c_kpre * cfg["units"]["derived"]["logLambda_ee"]
+        self.td_solver = TridiagonalSolver()
 
-    def _solve_one_vslice_(self, nu: float, f0: Array, dt: float) -> Array:
-        """
-        Solves the Lenard-Bernstein collision operator at a single location in space
-
-        the shape of f0 is (nv,)
-
-        :param nu: collision frequency
-        :param f0: the distribution function at a single location in space (nv, )
-        :param dt: the time step
-
-        :return: the distribution function after the collision operator has been applied (nv,)
-        """
-        operator = self._get_operator_(nu, f0, dt)
-        refl_f0 = jnp.concatenate([f0[::-1], f0])
-        return lx.linear_solve(operator, refl_f0, solver=lx.Tridiagonal()).value[self.midpt :]
-
-    def _get_operator_(self, nu: float, f0: Array, dt: float) -> lx.TridiagonalLinearOperator:
+    def _get_operator_(self, nu: float, f0x: Array, dt: float) -> Tuple[Array, Array, Array]:
         """
         Returns the tridiagonal operator for the Lenard-Bernstein collision operator
 
-        This is called at each location in space because the f0 is different
+        This is different at each location in space because the f0 is different
 
         :param nu: collision frequency
-        :param f0: the distribution function at a single location in space (nv, )
+        :param f0x: the distribution function at all locations in space (nx, nv)
         :param dt: the time step
 
-        :return: the tridiagonal operator for the Lenard-Bernstein collision operator for use with `lineax`
+        :return: the lower, main and upper diagonals of the operator over the reflected velocity grid (nx, 2 * nv)
 
         """
         half_vth_sq = (
-            jnp.sum(f0 * (self.v[None, :]) ** 4.0, axis=1) / jnp.sum(f0 * (self.v[None, :]) ** 2.0, axis=1) / 3.0
-        )
+            jnp.sum(f0x * (self.v[None, :]) ** 4.0, axis=1) / jnp.sum(f0x * (self.v[None, :]) ** 2.0, axis=1) / 3.0
+        )[:, None]
 
-        lower_diagonal = self.nuee_coeff * dt * (-half_vth_sq / self.dv**2.0 + (self.refl_v[:-1]) / 2.0 / self.dv)
-        diagonal = 1.0 + self.nuee_coeff * dt * self.ones * (2.0 * half_vth_sq / self.dv**2.0)
-        upper_diagonal = self.nuee_coeff * dt * (-half_vth_sq / self.dv**2.0 - (self.refl_v[1:]) / 2.0 / self.dv)
-        return lx.TridiagonalLinearOperator(
-            diagonal=diagonal, upper_diagonal=upper_diagonal, lower_diagonal=lower_diagonal
+        lower_diagonal = (
+            self.nuee_coeff * dt * (-half_vth_sq / self.dv**2.0 + (jnp.roll(self.refl_v, 1)[None, :]) / 2.0 / self.dv)
         )
+        diagonal = 1.0 + self.nuee_coeff * dt * self.ones[None, :] * (2.0 * half_vth_sq / self.dv**2.0)
+        upper_diagonal = (
+            self.nuee_coeff * dt * (-half_vth_sq / self.dv**2.0 - (jnp.roll(self.refl_v, -1)[None, :]) / 2.0 / self.dv)
+        )
+        return lower_diagonal, diagonal, upper_diagonal
 
     def __call__(self, nu: float, f0x: Array, dt: float) -> Array:
         """
@@ -78,8 +65,9 @@ class LenardBernstein:
 
         :return: the distribution function after the collision operator has been applied (nx, nv)
         """
-
-        return vmap(self._solve_one_vslice_, in_axes=(None, 0, None))(nu, f0x, dt)
+        lower_diagonal, diagonal, upper_diagonal = self._get_operator_(nu, f0x, dt)
+        refl_f0x = jnp.concatenate([f0x[:, ::-1], f0x], axis=1)
+        return self.td_solver(lower_diagonal, diagonal, upper_diagonal, refl_f0x)[:, self.midpt :]
 
 
 class FLMCollisions:
@@ -107,6 +95,7 @@ class FLMCollisions:
         self.ee = cfg["terms"]["fokker_planck"]["flm"]["ee"]
 
         self.Z_nuei_scaling = (cfg["units"]["Z"] + 4.2) / (cfg["units"]["Z"] + 0.24)
+        self.td_solver = TridiagonalSolver()
 
         self.a1, self.a2, self.b1, self.b2, self.b3, self.b4 = (
             np.zeros(self.nl + 1),
@@ -182,7 +171,8 @@ class FLMCollisions:
 
         :param f0: the distribution function (nx, nv)
 
-        :return: tuple(diagonal, lower diagonal, upper diagonal) of shape (nx, nv), (nx, nv-1), (nx, nv-1)
+        :return: tuple(diagonal, lower diagonal, upper diagonal) each of shape (nx, nv). The first element of the lower
+        diagonal and the last element of the upper diagonal are zero
         """
         i0 = self.calc_ros_i(f0, power=0.0)
         jm1 = self.calc_ros_j(f0, power=-1.0)
@@ -206,14 +196,8 @@ class FLMCollisions:
         diag = diag_term1 - 2.0 * diag_d2dv2 + diag_angular
         upper = upper_d2dv2 + upper_ddv
 
-        return diag, lower[:, :-1], upper[:, 1:]
-
-    def _solve_one_x_tridiag_(self, diag: Array, upper: Array, lower: Array, f10: Array) -> Array:
-        """
-        Solves a tridiagonal system of equations
-        """
-        op = lx.TridiagonalLinearOperator(diagonal=diag, upper_diagonal=upper, lower_diagonal=lower)
-        return lx.linear_solve(op, f10, solver=lx.Tridiagonal()).value
+        zeros = jnp.zeros_like(diag[:, :1])
+        return diag, jnp.concatenate([zeros, lower[:, :-1]], axis=1), jnp.concatenate([upper[:, 1:], zeros], axis=1)
 
     def __call__(self, Z, ni, f0, f10, dt):
         """
@@ -244,7 +228,7 @@ class FLMCollisions:
                 lower = -dt * self.nuee_coeff * ee_lower
                 upper = -dt * self.nuee_coeff * ee_upper
 
-                new_f10 = vmap(self._solve_one_x_tridiag_, in_axes=(0, 0, 0, 0))(diag, upper, lower, f10)
+                new_f10 = self.td_solver(lower, diag, upper, f10)
 
                 new_f10 = new_f10 + dt * self.nuee_coeff * self.get_ee_offdiagonal_contrib(
                     None, f10, {"ddvf0": ddv, "d2dv2f0": d2dv2, "il": il}
@@ -1,13 +1,15 @@
 from typing import Dict, Tuple, Callable
 import os
 
-from matplotlib import pyplot as plt
 from diffrax import Solution
 from jax import numpy as jnp
 import numpy as np
 import xarray as xr
 from time import time
 
+from adept.utils.output import decode, get_output_save_func, get_quantity_output, to_netcdf
+from adept.utils.plotting import plot_job, plot_lineouts, plot_scalar, plot_spacetime, run_plot_jobs
+
 
 def calc_EH(this_Z: int, this_wt: float) -> float:
     """
@@ -99,8 +101,11 @@ def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, p
     xax = cfg["units"]["derived"]["x0"].to("micron").value * cfg["grid"]["x"]
     tax = this_t * cfg["units"]["derived"]["tp0"].to("ps").value
 
+    output_cfg = cfg["save"][prefix].get("output", {})
+    fields = {k: decode(v, get_quantity_output(output_cfg, k)) for k, v in fields.items()}
+
     if any(x in ["x", "kx"] for x in cfg["save"][prefix].keys()):
-        crds = set(cfg["save"][prefix].keys()) - {"t", "func"}
+        crds = set(cfg["save"][prefix].keys()) - {"t", "func", "output"}
         if {"x"} == crds:
             xnm = "x"
         elif {"kx"} == crds:
@@ -122,7 +127,8 @@ def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, p
     das[f"{prefix}-kappa_c"] = calc_kappa(cfg, das[f"{prefix}-T a.u."], das[f"{prefix}-q a.u."], das[f"{prefix}-n n_c"])
 
     fields_xr = xr.Dataset(das)
-    fields_xr.to_netcdf(os.path.join(binary_dir, f"{prefix}-t={round(tax[-1],4)}.nc"))
+    quantities = {nm: k for k in fields.keys() for nm in das.keys() if nm.split(" ")[0] == f"{prefix}-{k}"}
+    to_netcdf(fields_xr, os.path.join(binary_dir, f"{prefix}-t={round(tax[-1],4)}.nc"), output_cfg, quantities)
 
     return fields_xr
 
@@ -182,16 +188,17 @@ def store_f(cfg: Dict, this_t: Dict, td: str, ys: Dict) -> xr.Dataset:
     xax = cfg["units"]["derived"]["x0"].to("micron").value * cfg["grid"]["x"]
     tax = this_t["electron"] * cfg["units"]["derived"]["tp0"].to("ps").value
 
+    output_cfg = cfg["save"]["electron"].get("output", {})
     f_store = xr.Dataset(
         {
             dist: xr.DataArray(
-                ys["electron"][dist],
+                decode(ys["electron"][dist], get_quantity_output(output_cfg, dist)),
                 coords=(("t (ps)", this_t["electron"]), ("x (um)", xax), ("v (c)", cfg["grid"]["v"])),
             )
             for dist in ys["electron"].keys()
         }
     )
-    f_store.to_netcdf(os.path.join(td, "binary", "dist.nc"))
+    to_netcdf(f_store, os.path.join(td, "binary", "dist.nc"), output_cfg, quantities={})
 
     return f_store
 
@@ -209,38 +216,41 @@ def post_process(soln: Solution, cfg: Dict, td: str, args: Dict = None) -> Dict:
     """
 
     # t0 = time()
-    os.makedirs(os.path.join(td, "plots"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "fields"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "fields", "lineouts"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "fields", "logplots"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "scalars"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "dist"), exist_ok=True)
-
     binary_dir = os.path.join(td, "binary")
     os.makedirs(binary_dir)
 
     # merge
+    plot_jobs = []
     for k in soln.ys.keys():
         if k.startswith("field"):
             fields_xr = store_fields(cfg, binary_dir, soln.ys[k], soln.ts[k], k)
-            t_skip = int(fields_xr.coords["t (ps)"].data.size // 8)
-            t_skip = t_skip if t_skip > 1 else 1
-            tslice = slice(0, -1, t_skip)
-
-            for nm, fld in fields_xr.items():
-                fld.plot()
-                plt.savefig(os.path.join(td, "plots", "fields", f"spacetime-{nm[7:]}.png"), bbox_inches="tight")
-                plt.close()
-
-                np.log10(np.abs(fld)).plot()
-                plt.savefig(
-                    os.path.join(td, "plots", "fields", "logplots", f"spacetime-log-{nm[7:]}.png"), bbox_inches="tight"
-                )
-                plt.close()
-
-                fld[tslice].T.plot(col="t (ps)", col_wrap=4)
-                plt.savefig(os.path.join(td, "plots", "fields", "lineouts", f"{nm[7:]}.png"), bbox_inches="tight")
-                plt.close()
+            tax = soln.ts[k] * cfg["units"]["derived"]["tp0"].to("ps").value
+            fields_file = os.path.join("binary", f"{k}-t={round(tax[-1],4)}.nc")
+
+            for nm in fields_xr.keys():
+                plot_jobs += [
+                    plot_job(
+                        plot_spacetime,
+                        fields_file,
+                        os.path.join("plots", "fields", f"spacetime-{nm[7:]}.png"),
+                        nm,
+                        True,
+                    ),
+                    plot_job(
+                        plot_spacetime,
+                        fields_file,
+                        os.path.join("plots", "fields", "logplots", f"spacetime-log-{nm[7:]}.png"),
+                        nm,
+                        log=True,
+                    ),
+                    plot_job(
+                        plot_lineouts,
+                        fields_file,
+                        os.path.join("plots", "fields", "lineouts", f"{nm[7:]}.png"),
+                        nm,
+                        t_dim="t (ps)",
+                    ),
+                ]
 
         elif k.startswith("default"):
 
@@ -248,28 +258,31 @@ def post_process(soln: Solution, cfg: Dict, td: str, args: Dict = None) -> Dict:
             scalars_xr = xr.Dataset(
                 {k: xr.DataArray(v, coords=(("t (ps)", tax),)) for k, v in soln.ys["default"].items()}
             )
-            scalars_xr.to_netcdf(os.path.join(binary_dir, f"scalars-t={round(tax[-1], 4)}.nc"))
-
-            for nm, srs in scalars_xr.items():
-                fig, ax = plt.subplots(1, 2, figsize=(10, 4), tight_layout=True)
-                srs.plot(ax=ax[0])
-                ax[0].grid()
-                np.log10(np.abs(srs)).plot(ax=ax[1])
-                ax[1].grid()
-                ax[1].set_ylabel("$log_{10}$(|" + nm + "|)")
-                fig.savefig(os.path.join(td, "plots", "scalars", f"{nm}.png"), bbox_inches="tight")
-                plt.close()
+            scalars_file = os.path.join("binary", f"scalars-t={round(tax[-1], 4)}.nc")
+            scalars_xr.to_netcdf(os.path.join(td, scalars_file))
 
-    f_xr = store_f(cfg, soln.ts, td, soln.ys)
+            for nm in scalars_xr.keys():
+                plot_jobs.append(
+                    plot_job(plot_scalar, scalars_file, os.path.join("plots", "scalars", f"{nm}.png"), nm, True)
+                )
 
-    t_skip = int(f_xr.coords["t (ps)"].data.size // 4)
-    t_skip = t_skip if t_skip > 1 else 1
-    tslice = slice(0, -1, t_skip)
+    f_xr = store_f(cfg, soln.ts, td, soln.ys)
 
     for k in ["f0", "f10"]:
-        f_xr[k][tslice].plot(x="x (um)", y="v (c)", col="t (ps)", col_wrap=4)
-        plt.savefig(os.path.join(td, "plots", "dist", f"{k}.png"))
-        plt.close()
+        plot_jobs.append(
+            plot_job(
+                plot_lineouts,
+                os.path.join("binary", "dist.nc"),
+                os.path.join("plots", "dist", f"{k}.png"),
+                k,
+                t_dim="t (ps)",
+                num=4,
+                x="x (um)",
+                y="v (c)",
+            )
+        )
+
+    run_plot_jobs(plot_jobs, td, cfg.get("plots", {}))
 
     metrics = {
         "kappa": round(np.amax(fields_xr["fields-kappa_c"][-1].data), 4),
@@ -288,7 +301,7 @@ def get_field_save_func(cfg: Dict, k: str) -> Callable:
     :return: The save function
 
     """
-    if {"t"} == set(cfg["save"][k].keys()):
+    if {"t"} == set(cfg["save"][k].keys()) - {"output"}:
 
         def _calc_f0_moment_(f0):
             return 4 * jnp.pi * jnp.sum(f0 * cfg["grid"]["v"] ** 2.0, axis=1) * cfg["grid"]["dv"]
@@ -324,7 +337,7 @@ def get_dist_save_func(cfg: Dict, k: str) -> Callable:
     :return: The save function
 
     """
-    if {"t"} == set(cfg["save"][k].keys()):
+    if {"t"} == set(cfg["save"][k].keys()) - {"output"}:
 
         def dist_save_func(t, y, args):
             return {"f0": y["f0"], "f10": y["f10"]}
@@ -344,7 +357,9 @@ def get_save_quantities(cfg: Dict) -> Dict:
     """
     for k in cfg["save"].keys():  # this can be fields or electron or scalar?
         for k2 in cfg["save"][k].keys():  # this can be t, x, y, kx, ky (eventually)
-            if k2 == "x":
+            if k2 == "output":
+                continue
+            elif k2 == "x":
                 dx = (cfg["save"][k][k2][f"{k2}max"] - cfg["save"][k][k2][f"{k2}min"]) / cfg["save"][k][k2][f"n{k2}"]
                 cfg["save"][k][k2]["ax"] = np.linspace(
                     cfg["save"][k][k2][f"{k2}min"] + dx / 2.0,
@@ -358,10 +373,14 @@ def get_save_quantities(cfg: Dict) -> Dict:
                 )
 
         if k.startswith("fields"):
-            cfg["save"][k]["func"] = get_field_save_func(cfg, k)
+            cfg["save"][k]["func"] = get_output_save_func(
+                get_field_save_func(cfg, k), cfg["save"][k].get("output", {}), k
+            )
 
         elif k.startswith("electron"):
-            cfg["save"][k]["func"] = get_dist_save_func(cfg, k)
+            cfg["save"][k]["func"] = get_output_save_func(
+                get_dist_save_func(cfg, k), cfg["save"][k].get("output", {}), k
+            )
 
     cfg["save"]["default"] = {"t": {"ax": cfg["grid"]["t"]}, "func": get_default_save_func(cfg)}
 
@@ -3,6 +3,7 @@ from jax import numpy as jnp, Array
 import optimistix as optx
 import diffrax
 from adept.vfp1d.fokker_planck import LenardBernstein, FLMCollisions
+from adept.utils.adaptive import get_step_size
 
 
 class OSHUN1D:
@@ -82,7 +83,7 @@ class OSHUN1D:
         """
         return -4 * jnp.pi / 3.0 * jnp.sum(f1 * self.v[None, :] ** 3.0, axis=1) * self.dv
 
-    def implicit_e_solve(self, Z: Array, ni: Array, f0: Array, f10: Array, e: Array) -> Array:
+    def implicit_e_solve(self, Z: Array, ni: Array, f0: Array, f10: Array, e: Array, dt: float) -> Array:
         """
         This is the implicit solve for the electric field. It uses the "perturbed charge" method and is a direct solve.
 
@@ -92,6 +93,7 @@ class OSHUN1D:
             f0 (Array): f0(x, v)
             f10 (Array): f10(x, v)
             e (Array): e(x)
+            dt (float): the step size
 
         Returns:
             Array: new_e(x)
@@ -99,15 +101,15 @@ class OSHUN1D:
         """
 
         # calculate j without any e field
-        f10_after_coll = self.ei(Z=Z, ni=ni, f0=f0, f10=f10, dt=self.dt)
+        f10_after_coll = self.ei(Z=Z, ni=ni, f0=f0, f10=f10, dt=dt)
         j0 = self.calc_j(f10_after_coll)
 
         # get perturbation
         de = jnp.abs(e) * self.large_eps + self.eps
 
         # calculate effect of dex
-        _, f10_after_dex = self.push_edfdv(f0, f10, de)
-        f10_after_dex = self.ei(Z=Z, ni=ni, f0=f0, f10=f10_after_dex, dt=self.dt)
+        _, f10_after_dex = self.push_edfdv(f0, f10, de, dt)
+        f10_after_dex = self.ei(Z=Z, ni=ni, f0=f0, f10=f10_after_dex, dt=dt)
         jx_dx = self.calc_j(f10_after_dex)
         # jy_dx = 0.0
         # jz_dx = 0.0
@@ -127,19 +129,19 @@ class OSHUN1D:
 
         return new_e
 
-    def linear_implicit_e_f0_f1_operator(self, this_y):
+    def linear_implicit_e_f0_f1_operator(self, this_y, dt):
         """
         UNUSED
 
         """
         f0, f1, e = this_y["f0"], this_y["f1"], this_y["e"]
 
-        prev_f0_approx = f0 + self.dt * (-e[:, None] / 3 * (self.ddv_f1(f1) + 2 / self.v * f1))
+        prev_f0_approx = f0 + dt * (-e[:, None] / 3 * (self.ddv_f1(f1) + 2 / self.v * f1))
         # C_f1 = self.step_f10_coll(f1)
-        prev_f1_approx = f1 + self.dt * (-e[:, None] * self.ddv(f0) + self.ei.nuei_coeff * f1 / self.v[None, :] ** 3.0)
+        prev_f1_approx = f1 + dt * (-e[:, None] * self.ddv(f0) + self.ei.nuei_coeff * f1 / self.v[None, :] ** 3.0)
 
         j = -4 * jnp.pi / 3.0 * jnp.sum(f1 * self.v[None, :] ** 3.0, axis=1) * self.dv
-        prev_e_approx = e + self.dt * j
+        prev_e_approx = e + dt * j
 
         return {"f0": prev_f0_approx, "f1": prev_f1_approx, "e": prev_e_approx}
 
@@ -150,21 +152,20 @@ class OSHUN1D:
         """
         new_f0, new_f1, new_e = y["f0"], y["f1"], y["e"]
         old_f0, old_f1, old_e = args["f0"], args["f1"], args["e"]
+        dt = args["dt"]
 
-        res_f0 = (new_f0 - old_f0) / self.dt - new_e[:, None] / 3 * (self.ddv_f1(new_f1) + 2 / self.v * new_f1)
+        res_f0 = (new_f0 - old_f0) / dt - new_e[:, None] / 3 * (self.ddv_f1(new_f1) + 2 / self.v * new_f1)
         # C_f1 = self.step_f10_coll(f1)
-        res_f1 = (
-            (new_f1 - old_f1) / self.dt - new_e[:, None] * self.ddv(new_f0) + 1e-4 * new_f1 / self.v[None, :] ** 3.0
-        )
+        res_f1 = (new_f1 - old_f1) / dt - new_e[:, None] * self.ddv(new_f0) + 1e-4 * new_f1 / self.v[None, :] ** 3.0
 
         new_j = -4 * jnp.pi / 3.0 * jnp.sum(new_f1 * self.v[None, :] ** 3.0, axis=1) * self.dv
-        res_e = (new_e - old_e) / self.dt + new_j
+        res_e = (new_e - old_e) / dt + new_j
 
         # return {"f0": res_f0, "f1": res_f1, "e": res_e}
 
         return jnp.sum(jnp.square(res_f0)) + jnp.sum(jnp.square(res_f1)) + jnp.sum(jnp.square(res_e))
 
-    def implicit_e_f0_f1_solve(self, f0, f1, e):
+    def implicit_e_f0_f1_solve(self, f0, f1, e, dt):
         """
         UNUSED
 
@@ -177,7 +178,7 @@ class OSHUN1D:
             # optim=optax.adam(learning_rate=1e-2), rtol=1e-3, atol=1e-4, verbose=frozenset({"step", "loss"})
             # ),
             y0={"f0": f0, "f1": f1, "e": e},
-            args={"f0": f0, "f1": f1, "e": e},
+            args={"f0": f0, "f1": f1, "e": e, "dt": dt},
             max_steps=4096,
             throw=True,
         )
@@ -228,7 +229,7 @@ class OSHUN1D:
 
         return {"f0": df0dt_e, "f10": df10dt_e}
 
-    def push_edfdv(self, f0, f10, e):
+    def push_edfdv(self, f0, f10, e, dt):
         """
         This is the explicit solve for f0 and f1 given the electric field.
 
@@ -236,6 +237,7 @@ class OSHUN1D:
             f0 (Array): f0(x, v)
             f10 (Array): f10(x, v)
             e (Array): e(x)
+            dt (float): the step size
 
         Returns:
             Tuple[Array, Array]: new f0, new f10
@@ -244,8 +246,8 @@ class OSHUN1D:
             diffrax.ODETerm(self._edfdv_),
             solver=diffrax.Tsit5(),
             t0=0.0,
-            t1=self.dt,
-            dt0=self.dt,
+            t1=dt,
+            dt0=dt,
             y0={"f0": f0, "f10": f10},
             args={"e": e},
         )
@@ -273,13 +275,14 @@ class OSHUN1D:
 
         return {"f0": df0dt_sa, "f10": df10dt_sa}
 
-    def push_vdfdx(self, f0: Array, f10: Array) -> Array:
+    def push_vdfdx(self, f0: Array, f10: Array, dt: float) -> Array:
         """
         This is the explicit solve for f0 and f1 given the electric field.
 
         Args:
             f0 (Array): f0(x, v)
             f10 (Array): f10(x, v)
+            dt (float): the step size
 
         Returns:
             Tuple[Array, Array]: new f0, new f10
@@ -289,12 +292,29 @@ class OSHUN1D:
             diffrax.ODETerm(self._vdfdx_),
             solver=diffrax.Tsit5(),
             t0=0.0,
-            t1=self.dt,
-            dt0=self.dt,
+            t1=dt,
+            dt0=dt,
             y0={"f0": f0, "f10": f10},
         )
         return result.ys["f0"][-1], result.ys["f10"][-1]
 
+    def get_max_dt(self, y: Dict) -> Array:
+        """
+        The CFL limits of the advection in x and v, ``cfl * dx / vmax`` and ``cfl * dv / max|E|``, for the adaptive
+        step size
+
+        Args:
+            y (Dict): all variables
+
+        Returns:
+            Array: the largest stable step
+        """
+        cfl = self.cfg["grid"]["adaptive"]["cfl"]
+        dt_x = cfl * self.dx / self.v[-1]
+        dt_v = cfl * self.dv / (jnp.max(jnp.abs(y["e"])) + 1e-30)
+
+        return jnp.minimum(dt_x, dt_v)
+
     def __call__(self, t, y, args) -> Dict:
         """
         This is the main function that is called by the solver. It steps the distribution functions and the electric
@@ -314,30 +334,31 @@ class OSHUN1D:
         f10 = y["f10"]
         Z = y["Z"]
         ni = y["ni"]
+        dt = get_step_size(args, self.dt)
 
         # explicit push for v df/dx
-        f0_star, f10_star = self.push_vdfdx(f0, f10)
+        f0_star, f10_star = self.push_vdfdx(f0, f10, dt)
         # implicit solve f00 coll
-        f0_star = self.lb(None, f0_star, self.dt)
+        f0_star = self.lb(None, f0_star, dt)
 
         # implicit solve for E
         if self.e_solver == "oshun":  # implicit E, explicit f0, f1 with this Taylor expansion of J method
             # taylor expansion of j(E) method from Tzoufras 2013
-            new_e = self.implicit_e_solve(Z, ni, f0_star, f10_star, y["e"])
+            new_e = self.implicit_e_solve(Z, ni, f0_star, f10_star, y["e"], dt)
             # push e
-            new_f0, new_f10 = self.push_edfdv(f0_star, f10_star, new_e)
+            new_f0, new_f10 = self.push_edfdv(f0_star, f10_star, new_e, dt)
             # solve f10 coll
-            new_f10 = self.ei(Z=Z, ni=ni, f0=f0_star, f10=new_f10, dt=self.dt)
+            new_f10 = self.ei(Z=Z, ni=ni, f0=f0_star, f10=new_f10, dt=dt)
 
         elif self.e_solver == "edfdv-ampere-implicit":  # implicit E, f0, f1 using a nonlinear iterative inversion
-            new_f0, new_f10, new_e = self.implicit_e_f0_f1_solve(f0=f0_star, f1=f10_star, e=y["e"])
+            new_f0, new_f10, new_e = self.implicit_e_f0_f1_solve(f0=f0_star, f1=f10_star, e=y["e"], dt=dt)
 
         elif self.e_solver == "ampere":
-            new_e = y["e"] + self.dt * self.ampere_coeff * self.calc_j(f10_star)
+            new_e = y["e"] + dt * self.ampere_coeff * self.calc_j(f10_star)
             # push e
-            new_f0, new_f10 = self.push_edfdv(f0_star, f10_star, new_e)
+            new_f0, new_f10 = self.push_edfdv(f0_star, f10_star, new_e, dt)
             # solve f10 coll
-            new_f10 = self.ei(Z=Z, ni=ni, f0=new_f0, f10=new_f10, dt=self.dt)
+            new_f10 = self.ei(Z=Z, ni=ni, f0=new_f0, f10=new_f10, dt=dt)
 
         else:
             raise NotImplementedError
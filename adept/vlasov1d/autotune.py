@@ -0,0 +1,217 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import argparse, json, os, platform, time
+from typing import Callable, Dict, Tuple
+
+import jax
+import numpy as np
+from jax import numpy as jnp
+
+from adept.utils.tridiagonal import TridiagonalSolver
+from adept.vlasov1d.pushers import vlasov
+from adept.vlasov1d.pushers.fokker_planck import Dougherty
+
+EDFDV_CANDIDATES = ["exponential", "cubic-spline"]
+TRIDIAGONAL_CANDIDATES = (
+    [{"method": "thomas", "num_unroll": u} for u in [1, 4, 16, 64, 128]]
+    + [{"method": "hybrid", "num_unroll": u} for u in [1, 4, 16, 64]]
+    + [{"method": "pcr"}]
+)
+
+
+def get_cache_path() -> str:
+    """
+    The tuning cache is ``~/.cache/adept/vlasov1d-tuning.json`` unless ``ADEPT_TUNING_CACHE`` is set
+
+    """
+    default = os.path.join(os.path.expanduser("~"), ".cache", "adept", "vlasov1d-tuning.json")
+    return os.environ.get("ADEPT_TUNING_CACHE", default)
+
+
+def get_host_key() -> str:
+    device = jax.devices()[0]
+    return f"{platform.node()}-{device.platform}-{device.device_kind}-{os.cpu_count()}cpus"
+
+
+def get_shape_key(cfg_grid: Dict) -> str:
+    return f"nx={cfg_grid['nx']}-nv={cfg_grid['nv']}-{jnp.zeros(1).dtype}"
+
+
+def load_cache(path: str) -> Dict:
+    if os.path.exists(path):
+        with open(path, "r") as fi:
+            return json.load(fi)
+    else:
+        return {}
+
+
+def store_in_cache(path: str, host_key: str, shape_key: str, tuned: Dict) -> None:
+    cache = load_cache(path)
+    cache.setdefault(host_key, {})[shape_key] = tuned
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as fi:
+        json.dump(cache, fi, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _get_tuning_grid_(cfg_grid: Dict) -> Dict:
+    nx, nv, vmax = cfg_grid["nx"], cfg_grid["nv"], cfg_grid["vmax"]
+    dv = 2.0 * vmax / nv
+    dx = cfg_grid["xmax"] / nx
+
+    return {
+        "nx": nx,
+        "nv": nv,
+        "dv": dv,
+        "dt": cfg_grid["dt"],
+        "x": jnp.linspace(cfg_grid["xmin"] + dx / 2, cfg_grid["xmax"] - dx / 2, nx),
+        "v": jnp.linspace(-vmax + dv / 2, vmax - dv / 2, nv),
+        "kvr": jnp.fft.rfftfreq(nv, d=dv) * 2.0 * np.pi,
+    }
+
+
+def _run_(step: Callable, y, tune_cfg: Dict) -> Tuple[np.ndarray, float]:
+    """
+    Runs ``num_steps`` applications of ``step`` in a compiled loop, like the steps of a short run, and times it
+
+    :return: the result of the run and the best time per step over ``num_repeats`` runs
+    """
+    num_steps = tune_cfg.get("num_steps", 16)
+    run = jax.jit(lambda _y_: jax.lax.fori_loop(0, num_steps, lambda i, __y__: step(__y__), _y_))
+    result = jax.block_until_ready(run(y))
+
+    timings = []
+    for _ in range(tune_cfg.get("num_repeats", 3)):
+        t0 = time.perf_counter()
+        jax.block_until_ready(run(y))
+        timings.append((time.perf_counter() - t0) / num_steps)
+
+    return np.asarray(result), min(timings)
+
+
+def _pick_(candidates: Dict[str, Callable], y, reference: str, tune_cfg: Dict) -> Tuple[str, Dict]:
+    """
+    Times the candidates and returns the fastest of the ones that agree with the reference within ``rtol``
+
+    :param candidates: ``{name: step}``
+    :param y: the input of each step
+    :param reference: the candidate that the others are compared to
+    :param tune_cfg:
+    :return: the name of the fastest candidate and the timings in seconds per step
+    """
+    expected, timings = None, {}
+    for name in [reference] + [name for name in candidates if name != reference]:
+        actual, timings[name] = _run_(candidates[name], y, tune_cfg)
+        expected = actual if expected is None else expected
+        error = np.max(np.abs(actual - expected)) / np.max(np.abs(expected))
+        if error > tune_cfg.get("rtol", 1e-4):
+            print(f"autotune: skipping {name}, which differs from {reference} by {error:.2e}")
+            del timings[name]
+
+    return min(timings, key=timings.get), timings
+
+
+def tune_edfdv(cfg_grid: Dict, tune_cfg: Dict) -> Tuple[str, Dict]:
+    """
+    Times the velocity space pushers on a perturbed Maxwellian with a field that is close to the largest that is
+    expected, so that the check that the candidates agree is meaningful
+
+    :param cfg_grid: needs the scalars of the grid
+    :param tune_cfg: the ``autotune`` section of the config
+    :return: the fastest pusher and the timings
+    """
+    grid = _get_tuning_grid_(cfg_grid)
+    kx = 2.0 * np.pi / (grid["x"][-1] - grid["x"][0] + cfg_grid["xmax"] / cfg_grid["nx"])
+    f = jnp.exp(-grid["v"][None, :] ** 2.0) * (1.0 + 0.01 * jnp.cos(kx * grid["x"][:, None]))
+    e = 0.1 * jnp.sin(kx * grid["x"])
+
+    candidates = {}
+    for name in EDFDV_CANDIDATES:
+        push = vlasov.VelocityExponential({"grid": grid}) if name == "exponential" else None
+        push = vlasov.VelocityCubicSpline({"grid": grid}) if name == "cubic-spline" else push
+        candidates[name] = lambda _f_, _push_=push: _push_(f=_f_, e=e, dt=grid["dt"])
+
+    return _pick_(candidates, f, "exponential", tune_cfg)
+
+
+def tune_tridiagonal(cfg_grid: Dict, tune_cfg: Dict) -> Tuple[Dict, Dict]:
+    """
+    Times the tridiagonal solvers on the Dougherty operator of a Maxwellian
+
+    :param cfg_grid: needs the scalars of the grid
+    :param tune_cfg: the ``autotune`` section of the config
+    :return: the fastest solver parameters and the timings
+    """
+    grid = _get_tuning_grid_(cfg_grid)
+    f = jnp.exp(-grid["v"][None, :] ** 2.0) * jnp.ones((grid["nx"], 1)) / np.sqrt(np.pi)
+    a, b, c = Dougherty({"grid": grid})(nu=jnp.ones(grid["nx"]), f_xv=f, dt=grid["dt"])
+
+    candidates = {}
+    for params in TRIDIAGONAL_CANDIDATES:
+        solver = TridiagonalSolver(**params)
+        candidates[json.dumps(params, sort_keys=True)] = lambda _f_, _solver_=solver: _solver_(a, b, c, _f_)
+
+    best, timings = _pick_(candidates, f, json.dumps(TRIDIAGONAL_CANDIDATES[0], sort_keys=True), tune_cfg)
+
+    return json.loads(best), timings
+
+
+def apply_tuning(cfg: Dict) -> Dict:
+    """
+    Resolves ``terms: edfdv: auto`` and ``terms: fokker_planck: tridiagonal: auto`` from the tuning cache. If this
+    grid shape has not been tuned on this host, the candidates are timed and the winners are stored in the cache.
+
+    The optional ``autotune`` section of the config contains ``num_steps``, ``num_repeats``, ``rtol`` for the check
+    that the candidates agree, and ``retune`` to ignore the cache
+
+    :param cfg: needs the scalars of the grid
+    :return: the config with the tuned parameters
+    """
+    tune_edfdv_on = cfg["terms"]["edfdv"] == "auto"
+    tune_tridiagonal_on = cfg["terms"].get("fokker_planck", {}).get("tridiagonal") == "auto"
+    if not (tune_edfdv_on or tune_tridiagonal_on):
+        return cfg
+
+    tune_cfg = cfg.get("autotune", {})
+    path = get_cache_path()
+    host_key, shape_key = get_host_key(), get_shape_key(cfg["grid"])
+    tuned = {} if tune_cfg.get("retune", False) else load_cache(path).get(host_key, {}).get(shape_key, {})
+
+    if (tune_edfdv_on and "edfdv" not in tuned) or (tune_tridiagonal_on and "tridiagonal" not in tuned):
+        tuned = {**tuned, "timings": dict(tuned.get("timings", {}))}
+        if tune_edfdv_on and "edfdv" not in tuned:
+            tuned["edfdv"], tuned["timings"]["edfdv"] = tune_edfdv(cfg["grid"], tune_cfg)
+        if tune_tridiagonal_on and "tridiagonal" not in tuned:
+            tuned["tridiagonal"], tuned["timings"]["tridiagonal"] = tune_tridiagonal(cfg["grid"], tune_cfg)
+        store_in_cache(path, host_key, shape_key, tuned)
+
+    if tune_edfdv_on:
+        cfg["terms"]["edfdv"] = tuned["edfdv"]
+        print(f"autotune: using edfdv = {tuned['edfdv']} for {shape_key}")
+    if tune_tridiagonal_on:
+        cfg["terms"]["fokker_planck"]["tridiagonal"] = tuned["tridiagonal"]
+        print(f"autotune: using tridiagonal = {tuned['tridiagonal']} for {shape_key}")
+
+    return cfg
+
+
+if __name__ == "__main__":
+    import yaml
+
+    from adept.vlasov1d.base import BaseVlasov1D
+
+    parser = argparse.ArgumentParser(description="Tunes the vlasov-1d pushers for the grid of a config")
+    parser.add_argument("config")
+    parser.add_argument("--retune", action="store_true", help="ignore the tuning cache")
+    cli_args = parser.parse_args()
+
+    with open(cli_args.config, "r") as fi:
+        cli_cfg = yaml.safe_load(fi)
+    cli_cfg["terms"]["edfdv"] = "auto"
+    cli_cfg["terms"]["fokker_planck"]["tridiagonal"] = "auto"
+    cli_cfg["autotune"] = {**cli_cfg.get("autotune", {}), "retune": cli_args.retune}
+
+    # the grid is derived as it is for a run, e.g. dt depends on the drivers
+    module = BaseVlasov1D(cli_cfg)
+    module.write_units()
+    module.get_derived_quantities()
@@ -6,11 +6,21 @@ from typing import Dict
 import numpy as np
 import pint
 from jax import numpy as jnp
-from diffrax import ODETerm, SubSaveAt, diffeqsolve, SaveAt
+from diffrax import ConstantStepSize, ODETerm, SubSaveAt, diffeqsolve, SaveAt
 
 from adept import Stepper, ADEPTModule
+from adept.utils.adaptive import AdaptiveStepper, CFLController, get_adaptive_cfg, get_max_steps, get_step_ts
+from adept.utils.grid_sizing import get_fft_friendly_sizes
+from adept.utils.spectral import SpectralAccumulator
+from adept.vlasov1d.autotune import apply_tuning
+from adept.vlasov1d.pushers.hermite import get_hermite_quantities, get_velocity_basis
 from adept.vlasov1d.storage import get_save_quantities
-from adept.vlasov1d.helpers import _initialize_total_distribution_, post_process
+from adept.vlasov1d.helpers import (
+    _initialize_total_distribution_,
+    get_species_quantities,
+    is_species_batched,
+    post_process,
+)
 from adept.vlasov1d.vector_field import VlasovMaxwell
 
 
@@ -83,6 +93,14 @@ class BaseVlasov1D(ADEPTModule):
         """
         cfg_grid = self.cfg["grid"]
 
+        if "fft_sizing" in cfg_grid:
+            # nv is only transformed by the exponential edfdv pusher, which ``auto`` can resolve to
+            sizes = {"nx": cfg_grid["nx"]}
+            if get_velocity_basis(self.cfg) == "grid" and self.cfg["terms"]["edfdv"] in ["exponential", "auto"]:
+                sizes["nv"] = cfg_grid["nv"]
+            sizes, cfg_grid["fft_sizing"]["speedup"] = get_fft_friendly_sizes(sizes, cfg_grid["fft_sizing"])
+            cfg_grid.update(sizes)
+
         cfg_grid["dx"] = cfg_grid["xmax"] / cfg_grid["nx"]
         cfg_grid["dv"] = 2.0 * cfg_grid["vmax"] / cfg_grid["nv"]
 
@@ -101,6 +119,27 @@ class BaseVlasov1D(ADEPTModule):
         cfg_grid["tmax"] = cfg_grid["dt"] * cfg_grid["nt"]
         self.cfg["grid"] = cfg_grid
 
+        if "adaptive" in cfg_grid:
+            if len(self.cfg["drivers"]["ey"].keys()) > 0:
+                raise NotImplementedError("The wave solver needs a fixed dt so the ey drivers need a fixed dt")
+            for k in ["fokker_planck", "krook"]:
+                if self.cfg["terms"][k]["is_on"] and self.cfg["terms"][k].get("cadence", 1) != 1:
+                    raise ValueError(f"The {k} cadence must be 1 with an adaptive dt")
+            cfg_grid["adaptive"] = get_adaptive_cfg(cfg_grid)
+
+        if is_species_batched(self.cfg) and get_velocity_basis(self.cfg) == "hermite":
+            raise NotImplementedError("The batched species mode has not been implemented for the Hermite basis")
+
+        if get_velocity_basis(self.cfg) == "hermite":
+            # the basis is centered on the first species unless the config says otherwise
+            species = next(v for k, v in self.cfg["density"].items() if k.startswith("species-"))
+            velocity_cfg = self.cfg["terms"]["velocity"]
+            velocity_cfg["alpha"] = float(velocity_cfg.get("alpha", np.sqrt(2.0 * species["T0"])))
+            velocity_cfg["u"] = float(velocity_cfg.get("u", species["v0"]))
+
+        # resolves the pushers that are set to ``auto`` so that the tuned ones are logged
+        self.cfg = apply_tuning(self.cfg)
+
     def get_solver_quantities(self) -> Dict:
         """
         This function just updates the config with the derived quantities that are arrays
@@ -151,13 +190,23 @@ class BaseVlasov1D(ADEPTModule):
         # get_profile_with_mask(cfg["nu"]["time-profile"], t, cfg["nu"]["time-profile"]["bump_or_trough"])
         cfg_grid["ktprof"] = 1.0
         # get_profile_with_mask(cfg["krook"]["time-profile"], t, cfg["krook"]["time-profile"]["bump_or_trough"])
-        cfg_grid["n_prof_total"], cfg_grid["starting_f"] = _initialize_total_distribution_(self.cfg, cfg_grid)
+        if is_species_batched(self.cfg):
+            species = get_species_quantities(self.cfg, cfg_grid)
+            n_prof, cfg_grid["starting_f"] = species.pop("n_prof"), species.pop("starting_f")
+            cfg_grid["species"] = species
+            # the electron equivalent density of all the species
+            cfg_grid["n_prof_total"] = species["charge_weight"] @ n_prof
+        else:
+            cfg_grid["n_prof_total"], cfg_grid["starting_f"] = _initialize_total_distribution_(self.cfg, cfg_grid)
 
         cfg_grid["kprof"] = np.ones_like(cfg_grid["n_prof_total"])
         # get_profile_with_mask(cfg["krook"]["space-profile"], xs, cfg["krook"]["space-profile"]["bump_or_trough"])
 
         cfg_grid["ion_charge"] = np.zeros_like(cfg_grid["n_prof_total"]) + cfg_grid["n_prof_total"]
 
+        if get_velocity_basis(self.cfg) == "hermite":
+            cfg_grid["hermite"] = get_hermite_quantities(cfg_grid, self.cfg["terms"]["velocity"])
+
         cfg_grid["x_a"] = np.concatenate(
             [
                 [cfg_grid["x"][0] - cfg_grid["dx"]],
@@ -175,7 +224,12 @@ class BaseVlasov1D(ADEPTModule):
         :param cfg:
         :return:
         """
-        n_prof_total, f = _initialize_total_distribution_(self.cfg, self.cfg["grid"])
+        if is_species_batched(self.cfg):
+            f = jnp.array(self.cfg["grid"]["starting_f"])
+        else:
+            n_prof_total, f = _initialize_total_distribution_(self.cfg, self.cfg["grid"])
+        if get_velocity_basis(self.cfg) == "hermite":
+            f = f @ self.cfg["grid"]["hermite"]["from_grid"]
 
         state = {}
         for species in ["electron"]:
@@ -187,10 +241,15 @@ class BaseVlasov1D(ADEPTModule):
         for field in ["a", "da", "prev_a"]:
             state[field] = jnp.zeros(self.cfg["grid"]["nx"] + 2)  # need boundary cells
 
+        if "spectral" in self.cfg["save"]:
+            state["spectral"] = SpectralAccumulator(self.cfg["save"]["spectral"], self.cfg["grid"]).init_state()
+
         self.state = state
         self.args = {"drivers": self.cfg["drivers"], "terms": self.cfg["terms"]}
 
     def init_diffeqsolve(self):
+        # the scalars are saved every fixed timestep unless they have their own save grid
+        requested_saves = list(self.cfg["save"].keys())
         self.cfg = get_save_quantities(self.cfg)
         self.time_quantities = {
             "t0": 0.0,
@@ -200,18 +259,38 @@ class BaseVlasov1D(ADEPTModule):
             "save_t1": self.cfg["grid"]["tmax"],
             "save_nt": self.cfg["grid"]["tmax"],
         }
+        self.vlasov_maxwell = VlasovMaxwell(self.cfg)
         self.diffeqsolve_quants = dict(
-            terms=ODETerm(VlasovMaxwell(self.cfg)),
+            terms=ODETerm(self.vlasov_maxwell),
             solver=Stepper(),
+            stepsize_controller=ConstantStepSize(),
             saveat=dict(subs={k: SubSaveAt(ts=v["t"]["ax"], fn=v["func"]) for k, v in self.cfg["save"].items()}),
         )
 
+        if "adaptive" in self.cfg["grid"]:
+            adaptive_cfg = self.cfg["grid"]["adaptive"]
+            step_ts = get_step_ts([self.cfg["save"][k]["t"]["ax"] for k in requested_saves])
+            self.cfg["grid"]["max_steps"] = get_max_steps(self.cfg["grid"]["tmax"], adaptive_cfg["dtmin"], step_ts)
+            self.time_quantities["max_steps"] = self.cfg["grid"]["max_steps"]
+            self.diffeqsolve_quants["solver"] = AdaptiveStepper()
+            self.diffeqsolve_quants["stepsize_controller"] = CFLController(
+                get_max_dt=self.vlasov_maxwell.get_max_dt,
+                get_amplitudes=lambda y: y["e"],
+                dtmin=adaptive_cfg["dtmin"],
+                dtmax=adaptive_cfg["dtmax"],
+                max_change=adaptive_cfg["max_change"],
+                max_increase=adaptive_cfg["max_increase"],
+                step_ts=jnp.array(step_ts),
+            )
+
     def __call__(self, trainable_modules: Dict, args: Dict = None):
         if args is None:
             args = self.args
+        args = {**args, "nu_profiles": self.vlasov_maxwell.get_nu_profiles(args)}
         solver_result = diffeqsolve(
             terms=self.diffeqsolve_quants["terms"],
             solver=self.diffeqsolve_quants["solver"],
+            stepsize_controller=self.diffeqsolve_quants["stepsize_controller"],
             t0=self.time_quantities["t0"],
             t1=self.time_quantities["t1"],
             max_steps=self.cfg["grid"]["max_steps"],
@@ -10,9 +10,10 @@ import numpy as np
 import xarray, mlflow, pint
 from jax import numpy as jnp
 from diffrax import Solution
-from matplotlib import pyplot as plt
 
 from adept import get_envelope
+from adept.utils.plotting import plot_job, plot_lineouts, plot_scalar, plot_spacetime, plot_spectrum, run_plot_jobs
+from adept.utils.spectral import SpectralAccumulator, store_spectral
 from adept.vlasov1d.storage import store_f, store_fields
 
 gamma_da = xarray.open_dataarray(os.path.join(os.path.dirname(__file__), "gamma_func_for_sg.nc"))
@@ -90,159 +91,223 @@ def _initialize_distribution_(
     return f, vax
 
 
+def get_species_params(cfg: Dict) -> Dict[str, Dict]:
+    """
+    Returns the parameters of the ``species-*`` entries of the density config, by name
+
+    """
+    species = {name: params for name, params in cfg["density"].items() if name.startswith("species-")}
+    if len(species) == 0:
+        raise ValueError("No species found! Check the config")
+
+    return species
+
+
+def is_species_batched(cfg: Dict) -> bool:
+    """
+    Whether the species are kinetic species with their own charge, mass and velocity grid that are stacked along a
+    leading axis of f, rather than summed into one electron distribution
+
+    """
+    return cfg["terms"].get("species", "combined") == "batched"
+
+
+def _get_density_profile_(cfg, cfg_grid, species_params):
+    if species_params["basis"] == "uniform":
+        nprof = np.ones(cfg_grid["nx"])
+
+    elif species_params["basis"] == "linear":
+        left = species_params["center"] - species_params["width"] * 0.5
+        right = species_params["center"] + species_params["width"] * 0.5
+        rise = species_params["rise"]
+        mask = get_envelope(rise, rise, left, right, cfg_grid["x"])
+
+        ureg = pint.UnitRegistry()
+        _Q = ureg.Quantity
+
+        L = (
+            _Q(species_params["gradient scale length"]).to("nm").magnitude
+            / cfg["units"]["derived"]["x0"].to("nm").magnitude
+        )
+        nprof = species_params["val at center"] + (cfg_grid["x"] - species_params["center"]) / L
+        nprof = mask * nprof
+    elif species_params["basis"] == "exponential":
+        left = species_params["center"] - species_params["width"] * 0.5
+        right = species_params["center"] + species_params["width"] * 0.5
+        rise = species_params["rise"]
+        mask = get_envelope(rise, rise, left, right, cfg_grid["x"])
+
+        ureg = pint.UnitRegistry()
+        _Q = ureg.Quantity
+
+        L = (
+            _Q(species_params["gradient scale length"]).to("nm").magnitude
+            / cfg["units"]["derived"]["x0"].to("nm").magnitude
+        )
+        nprof = species_params["val at center"] * np.exp((cfg_grid["x"] - species_params["center"]) / L)
+        nprof = mask * nprof
+
+    elif species_params["basis"] == "tanh":
+        left = species_params["center"] - species_params["width"] * 0.5
+        right = species_params["center"] + species_params["width"] * 0.5
+        rise = species_params["rise"]
+        nprof = get_envelope(rise, rise, left, right, cfg_grid["x"])
+
+        if species_params["bump_or_trough"] == "trough":
+            nprof = 1 - nprof
+        nprof = species_params["baseline"] + species_params["bump_height"] * nprof
+
+    elif species_params["basis"] == "sine":
+        baseline = species_params["baseline"]
+        amp = species_params["amplitude"]
+        kk = species_params["wavenumber"]
+        nprof = baseline * (1.0 + amp * jnp.sin(kk * cfg_grid["x"]))
+    else:
+        raise NotImplementedError
+
+    return nprof
+
+
+def _initialize_species_distribution_(cfg, cfg_grid, species_params, vmax, mass=1.0):
+    nprof = _get_density_profile_(cfg, cfg_grid, species_params)
+
+    # the thermal speed of a species is sqrt(T0 / mass) in units of the electron thermal speed
+    f, _ = _initialize_distribution_(
+        nx=int(cfg_grid["nx"]),
+        nv=int(cfg_grid["nv"]),
+        v0=species_params["v0"],
+        m=species_params["m"],
+        T0=species_params["T0"] / mass,
+        vmax=vmax,
+        n_prof=nprof,
+        noise_val=species_params["noise_val"],
+        noise_seed=int(species_params["noise_seed"]),
+        noise_type=species_params["noise_type"],
+    )
+
+    return nprof, f
+
+
 def _initialize_total_distribution_(cfg, cfg_grid):
-    params = cfg["density"]
     n_prof_total = np.zeros([cfg_grid["nx"]])
     f = np.zeros([cfg_grid["nx"], cfg_grid["nv"]])
-    species_found = False
-    for name, species_params in cfg["density"].items():
-        if name.startswith("species-"):
-            v0 = species_params["v0"]
-            T0 = species_params["T0"]
-            m = species_params["m"]
-            if name in params:
-                if "v0" in params[name]:
-                    v0 = params[name]["v0"]
-
-                if "T0" in params[name]:
-                    T0 = params[name]["T0"]
-
-                if "m" in params[name]:
-                    m = params[name]["m"]
-
-            if species_params["basis"] == "uniform":
-                nprof = np.ones_like(n_prof_total)
-
-            elif species_params["basis"] == "linear":
-                left = species_params["center"] - species_params["width"] * 0.5
-                right = species_params["center"] + species_params["width"] * 0.5
-                rise = species_params["rise"]
-                mask = get_envelope(rise, rise, left, right, cfg_grid["x"])
-
-                ureg = pint.UnitRegistry()
-                _Q = ureg.Quantity
-
-                L = (
-                    _Q(species_params["gradient scale length"]).to("nm").magnitude
-                    / cfg["units"]["derived"]["x0"].to("nm").magnitude
-                )
-                nprof = species_params["val at center"] + (cfg_grid["x"] - species_params["center"]) / L
-                nprof = mask * nprof
-            elif species_params["basis"] == "exponential":
-                left = species_params["center"] - species_params["width"] * 0.5
-                right = species_params["center"] + species_params["width"] * 0.5
-                rise = species_params["rise"]
-                mask = get_envelope(rise, rise, left, right, cfg_grid["x"])
-
-                ureg = pint.UnitRegistry()
-                _Q = ureg.Quantity
-
-                L = (
-                    _Q(species_params["gradient scale length"]).to("nm").magnitude
-                    / cfg["units"]["derived"]["x0"].to("nm").magnitude
-                )
-                nprof = species_params["val at center"] * np.exp((cfg_grid["x"] - species_params["center"]) / L)
-                nprof = mask * nprof
-
-            elif species_params["basis"] == "tanh":
-                left = species_params["center"] - species_params["width"] * 0.5
-                right = species_params["center"] + species_params["width"] * 0.5
-                rise = species_params["rise"]
-                nprof = get_envelope(rise, rise, left, right, cfg_grid["x"])
-
-                if species_params["bump_or_trough"] == "trough":
-                    nprof = 1 - nprof
-                nprof = species_params["baseline"] + species_params["bump_height"] * nprof
-
-            elif species_params["basis"] == "sine":
-                baseline = species_params["baseline"]
-                amp = species_params["amplitude"]
-                kk = species_params["wavenumber"]
-                nprof = baseline * (1.0 + amp * jnp.sin(kk * cfg_grid["x"]))
-            else:
-                raise NotImplementedError
-
-            n_prof_total += nprof
-
-            # Distribution function
-            temp_f, _ = _initialize_distribution_(
-                nx=int(cfg_grid["nx"]),
-                nv=int(cfg_grid["nv"]),
-                v0=v0,
-                m=m,
-                T0=T0,
-                vmax=cfg_grid["vmax"],
-                n_prof=nprof,
-                noise_val=species_params["noise_val"],
-                noise_seed=int(species_params["noise_seed"]),
-                noise_type=species_params["noise_type"],
-            )
-            f += temp_f
-            species_found = True
-        else:
-            pass
-
-    if not species_found:
-        raise ValueError("No species found! Check the config")
+    for species_params in get_species_params(cfg).values():
+        nprof, temp_f = _initialize_species_distribution_(cfg, cfg_grid, species_params, vmax=cfg_grid["vmax"])
+        n_prof_total += nprof
+        f += temp_f
 
     return n_prof_total, f
 
 
-def post_process(result: Solution, cfg: Dict, td: str, args: Dict):
+def get_species_quantities(cfg: Dict, cfg_grid: Dict) -> Dict:
+    """
+    Returns the per-species quantities of the batched species mode, stacked along a leading species axis
 
-    t0 = time()
-    os.makedirs(os.path.join(td, "plots"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "fields"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "fields", "lineouts"), exist_ok=True)
-    os.makedirs(os.path.join(td, "plots", "fields", "logplots"), exist_ok=True)
+    Every species has ``nv`` velocity cells over its own ``[-vmax, vmax]``, which defaults to the ``vmax`` of the grid,
+    so that the distribution functions share one ``(num_species, nx, nv)`` array. ``charge`` and ``mass`` are in units of
+    the electron charge and mass and default to an electron
+
+    :param cfg:
+    :param cfg_grid: the grid with the spatial axis
+    :return: the stacked velocity grids, the weights of each species in the field equations, the initial density
+        profiles and distribution functions
+    """
+    keys = ["v", "dv", "kv", "kvr", "mass", "charge_weight", "plasma_weight", "force_scale", "n_prof", "starting_f"]
+    quantities = {k: [] for k in keys}
+    for species_params in get_species_params(cfg).values():
+        charge, mass = species_params.get("charge", -1.0), species_params.get("mass", 1.0)
+        vmax = species_params.get("vmax", cfg_grid["vmax"])
+        dv = 2.0 * vmax / cfg_grid["nv"]
+        nprof, f = _initialize_species_distribution_(cfg, cfg_grid, species_params, vmax=vmax, mass=mass)
+
+        quantities["v"].append(np.linspace(-vmax + dv / 2, vmax - dv / 2, cfg_grid["nv"]))
+        quantities["dv"].append(dv)
+        quantities["kv"].append(np.fft.fftfreq(cfg_grid["nv"], d=dv) * 2.0 * np.pi)
+        quantities["kvr"].append(np.fft.rfftfreq(cfg_grid["nv"], d=dv) * 2.0 * np.pi)
+        quantities["mass"].append(mass)
+        # the field equations are written for the electron density, so each species is weighted by -charge
+        quantities["charge_weight"].append(-charge)
+        # and the wave equation by its contribution to the plasma frequency
+        quantities["plasma_weight"].append(charge**2.0 / mass)
+        # the pushers are written for the force on an electron
+        quantities["force_scale"].append(-charge / mass)
+        quantities["n_prof"].append(nprof)
+        quantities["starting_f"].append(f)
+
+    return {k: jnp.array(np.stack(v)) for k, v in quantities.items()}
 
-    os.makedirs(os.path.join(td, "plots", "scalars"), exist_ok=True)
 
+def post_process(result: Solution, cfg: Dict, td: str, args: Dict):
+
+    t0 = time()
     binary_dir = os.path.join(td, "binary")
     os.makedirs(binary_dir)
     # merge
     # flds_paths = [os.path.join(flds_path, tf) for tf in flds_list]
     # arr = xarray.open_mfdataset(flds_paths, combine="by_coords", parallel=True)
+    plot_jobs = []
     for k in result.ys.keys():
         if k.startswith("field"):
             fields_xr = store_fields(cfg, binary_dir, result.ys[k], result.ts[k], k)
-            t_skip = int(fields_xr.coords["t"].data.size // 8)
-            t_skip = t_skip if t_skip > 1 else 1
-            tslice = slice(0, -1, t_skip)
-
-            for nm, fld in fields_xr.items():
-                fld.plot()
-                plt.savefig(os.path.join(td, "plots", "fields", f"spacetime-{nm[7:]}.png"), bbox_inches="tight")
-                plt.close()
-
-                np.log10(np.abs(fld)).plot()
-                plt.savefig(
-                    os.path.join(td, "plots", "fields", "logplots", f"spacetime-log-{nm[7:]}.png"), bbox_inches="tight"
+            fields_file = os.path.join("binary", f"{k}-t={round(result.ts[k][-1],4)}.nc")
+
+            for nm in fields_xr.keys():
+                plot_jobs += [
+                    plot_job(
+                        plot_spacetime,
+                        fields_file,
+                        os.path.join("plots", "fields", f"spacetime-{nm[7:]}.png"),
+                        nm,
+                        True,
+                    ),
+                    plot_job(
+                        plot_spacetime,
+                        fields_file,
+                        os.path.join("plots", "fields", "logplots", f"spacetime-log-{nm[7:]}.png"),
+                        nm,
+                        log=True,
+                    ),
+                    plot_job(
+                        plot_lineouts,
+                        fields_file,
+                        os.path.join("plots", "fields", "lineouts", f"{nm[7:]}.png"),
+                        nm,
+                        t_dim="t",
+                    ),
+                ]
+
+        elif k == "spectral":
+            spectral_file = os.path.join("binary", f"spectral-t={round(result.ts[k][-1], 4)}.nc")
+            spectral_xr = store_spectral(
+                SpectralAccumulator(cfg["save"][k], cfg["grid"]),
+                result.ts[k],
+                result.ys[k],
+                os.path.join(td, spectral_file),
+            )
+            for nm in spectral_xr.keys():
+                plot_jobs.append(
+                    plot_job(plot_spectrum, spectral_file, os.path.join("plots", "spectral", f"{nm}.png"), nm, True)
                 )
-                plt.close()
-
-                fld[tslice].T.plot(col="t", col_wrap=4)
-                plt.savefig(os.path.join(td, "plots", "fields", "lineouts", f"{nm[7:]}.png"), bbox_inches="tight")
-                plt.close()
 
         elif k.startswith("default"):
             scalars_xr = xarray.Dataset(
                 {k: xarray.DataArray(v, coords=(("t", result.ts["default"]),)) for k, v in result.ys["default"].items()}
             )
-            scalars_xr.to_netcdf(os.path.join(binary_dir, f"scalars-t={round(scalars_xr.coords['t'].data[-1], 4)}.nc"))
-
-            for nm, srs in scalars_xr.items():
-                fig, ax = plt.subplots(1, 2, figsize=(10, 4), tight_layout=True)
-                srs.plot(ax=ax[0])
-                ax[0].grid()
-                np.log10(np.abs(srs)).plot(ax=ax[1])
-                ax[1].grid()
-                ax[1].set_ylabel("$log_{10}$(|" + nm + "|)")
-                fig.savefig(os.path.join(td, "plots", "scalars", f"{nm}.png"), bbox_inches="tight")
-                plt.close()
+            scalars_file = os.path.join("binary", f"scalars-t={round(scalars_xr.coords['t'].data[-1], 4)}.nc")
+            scalars_xr.to_netcdf(os.path.join(td, scalars_file))
+
+            for nm in scalars_xr.keys():
+                plot_jobs.append(
+                    plot_job(plot_scalar, scalars_file, os.path.join("plots", "scalars", f"{nm}.png"), nm, True)
+                )
 
     f_xr = store_f(cfg, result.ts, td, result.ys)
+    run_plot_jobs(plot_jobs, td, cfg.get("plots", {}))
 
     mlflow.log_metrics({"postprocess_time_min": round((time() - t0) / 60, 3)})
 
-    return {"fields": fields_xr, "dists": f_xr, "scalars": scalars_xr}
+    datasets = {"fields": fields_xr, "dists": f_xr, "scalars": scalars_xr}
+    if "spectral" in result.ys:
+        datasets["spectral"] = spectral_xr
+
+    return datasets
@@ -101,45 +101,73 @@ class WaveSolver:
             return {"a": a, "prev_a": aold}
 
 
+def velocity_moment(f: jnp.ndarray, dv, charge_weights: jnp.ndarray = None) -> jnp.ndarray:
+    """
+    Integrates f over velocity. The species of a batched ``f[species, x, v]`` are summed with their charge weights, so
+    the result is the electron equivalent moment that the field equations are written for
+
+    :param f: distribution function
+    :param dv: the velocity grid spacing, one per species if batched
+    :param charge_weights: None, or the weight of each species if batched
+    :return:
+    """
+    if charge_weights is None:
+        return jnp.sum(f, axis=-1) * dv
+    else:
+        return jnp.einsum("s...v,s->...", f, charge_weights * dv)
+
+
 class SpectralPoissonSolver:
-    def __init__(self, ion_charge, one_over_kx, dv):
+    def __init__(self, ion_charge, one_over_kx, dv, charge_weights=None):
         super(SpectralPoissonSolver, self).__init__()
         self.ion_charge = ion_charge
         self.one_over_kx = one_over_kx
         self.dv = dv
+        self.charge_weights = charge_weights
 
     def compute_charges(self, f):
-        return jnp.sum(f, axis=1) * self.dv
+        return velocity_moment(f, self.dv, self.charge_weights)
 
     def __call__(self, f: jnp.ndarray, prev_ex: jnp.ndarray, dt: jnp.float64):
         return jnp.real(jnp.fft.ifft(1j * self.one_over_kx * jnp.fft.fft(self.ion_charge - self.compute_charges(f))))
 
 
+def get_velocity_quantities(cfg):
+    """
+    Returns the velocity grid, its spacing, and the charge weights of the species, with the velocity grid shaped to
+    broadcast against f
+
+    """
+    if "species" in cfg["grid"]:
+        species = cfg["grid"]["species"]
+        return species["v"][:, None, :], species["dv"], species["charge_weight"]
+    else:
+        return cfg["grid"]["v"][None, :], cfg["grid"]["dv"], None
+
+
 class AmpereSolver:
     def __init__(self, cfg):
         super(AmpereSolver, self).__init__()
-        self.vx = cfg["grid"]["v"]
-        self.dv = cfg["grid"]["dv"]
+        self.vx, self.dv, self.charge_weights = get_velocity_quantities(cfg)
 
     def vx_moment(self, f):
-        return jnp.sum(f, axis=1) * self.dv
+        return velocity_moment(f, self.dv, self.charge_weights)
 
     def __call__(self, f: jnp.ndarray, prev_ex: jnp.ndarray, dt: jnp.float64):
-        return prev_ex - dt * self.vx_moment(self.vx[None, :] * f)
+        return prev_ex - dt * self.vx_moment(self.vx * f)
 
 
 class HampereSolver:
     def __init__(self, cfg):
-        self.vx = cfg["grid"]["v"][None, :]
-        self.dv = cfg["grid"]["dv"]
+        self.vx, self.dv, self.charge_weights = get_velocity_quantities(cfg)
         self.kx = cfg["grid"]["kx"][:, None]
         self.one_over_ikx = cfg["grid"]["one_over_kx"] / 1j
 
     def __call__(self, f: jnp.ndarray, prev_ex: jnp.ndarray, dt: jnp.float64):
         prev_ek = jnp.fft.fft(prev_ex, axis=0)
-        fk = jnp.fft.fft(f, axis=0)
-        new_ek = (
-            prev_ek + self.one_over_ikx * jnp.sum(fk * (jnp.exp(-1j * self.kx * dt * self.vx) - 1), axis=1) * self.dv
+        fk = jnp.fft.fft(f, axis=-2)
+        new_ek = prev_ek + self.one_over_ikx * velocity_moment(
+            fk * (jnp.exp(-1j * self.kx * dt * self.vx) - 1), self.dv, self.charge_weights
         )
 
         return jnp.real(jnp.fft.ifft(new_ek))
@@ -150,8 +178,12 @@ class ElectricFieldSolver:
         super(ElectricFieldSolver, self).__init__()
 
         if cfg["terms"]["field"] == "poisson":
+            _, dv, charge_weights = get_velocity_quantities(cfg)
             self.es_field_solver = SpectralPoissonSolver(
-                ion_charge=cfg["grid"]["ion_charge"], one_over_kx=cfg["grid"]["one_over_kx"], dv=cfg["grid"]["dv"]
+                ion_charge=cfg["grid"]["ion_charge"],
+                one_over_kx=cfg["grid"]["one_over_kx"],
+                dv=dv,
+                charge_weights=charge_weights,
             )
             self.hampere = False
         elif cfg["terms"]["field"] == "ampere":
@@ -5,8 +5,76 @@ from typing import Dict, Tuple
 
 import numpy as np
 from jax import numpy as jnp
-
-from adept.vlasov2d.solver.tridiagonal import TridiagonalSolver
+from jax.lax import cond
+
+from adept import get_envelope
+from adept.utils.tridiagonal import TridiagonalSolver
+
+
+def get_nu_time(t, nu_args: Dict):
+    """
+    Evaluates the temporal envelope of a collision frequency profile
+
+    :param t: time (scalar or array)
+    :param nu_args: the `time` and `space` parameters of the collision operator
+    :return:
+    """
+    t_L = nu_args["time"]["center"] - nu_args["time"]["width"] * 0.5
+    t_R = nu_args["time"]["center"] + nu_args["time"]["width"] * 0.5
+    t_wL = nu_args["time"]["rise"]
+    t_wR = nu_args["time"]["rise"]
+
+    nu_time = get_envelope(t_wL, t_wR, t_L, t_R, t)
+    if nu_args["time"]["bump_or_trough"] == "trough":
+        nu_time = 1 - nu_time
+    return nu_args["time"]["baseline"] + nu_args["time"]["bump_height"] * nu_time
+
+
+def get_nu_space(x, nu_args: Dict):
+    """
+    Evaluates the spatial envelope of a collision frequency profile
+
+    :param x: spatial grid
+    :param nu_args: the `time` and `space` parameters of the collision operator
+    :return:
+    """
+    x_L = nu_args["space"]["center"] - nu_args["space"]["width"] * 0.5
+    x_R = nu_args["space"]["center"] + nu_args["space"]["width"] * 0.5
+    x_wL = nu_args["space"]["rise"]
+    x_wR = nu_args["space"]["rise"]
+
+    nu_prof = get_envelope(x_wL, x_wR, x_L, x_R, x)
+    if nu_args["space"]["bump_or_trough"] == "trough":
+        nu_prof = 1 - nu_prof
+    return nu_args["space"]["baseline"] + nu_args["space"]["bump_height"] * nu_prof
+
+
+def get_cadence(cfg: Dict, key: str) -> int:
+    """
+    Returns the number of timesteps between applications of a collision operator
+
+    The cadence is either an integer or ``"adaptive"``. In the adaptive mode, the cadence is chosen such that
+    the largest collision frequency in space and time satisfies ``cadence * max(nu) * dt <= max_nu_dt``
+
+    :param cfg: Configuration dictionary
+    :param key: ``"fokker_planck"`` or ``"krook"``
+    :return:
+    """
+    term_cfg = cfg["terms"][key]
+    cadence = term_cfg["cadence"] if "cadence" in term_cfg else 1
+
+    if cadence == "adaptive":
+        max_nu_dt = term_cfg["max_nu_dt"] if "max_nu_dt" in term_cfg else 0.1
+        max_nu = np.max(np.abs(get_nu_time(np.asarray(cfg["grid"]["t"]), term_cfg)))
+        max_nu *= np.max(np.abs(get_nu_space(np.asarray(cfg["grid"]["x"]), term_cfg)))
+        max_nu_x_dt = max_nu * cfg["grid"]["dt"]
+        cadence = int(max_nu_dt / max_nu_x_dt) if max_nu_x_dt > 0 else cfg["grid"]["nt"]
+        cadence = min(max(cadence, 1), cfg["grid"]["nt"])
+        print(f"applying {key} every {cadence} steps, max(nu * dt) = {max_nu_x_dt:.3e}")
+    elif int(cadence) < 1:
+        raise ValueError(f"{key} cadence must be a positive integer or adaptive, got {cadence}")
+
+    return int(cadence)
 
 
 class Collisions:
@@ -14,7 +82,10 @@ class Collisions:
         self.cfg = cfg
         self.fp = self.__init_fp_operator__()
         self.krook = Krook(self.cfg)
-        self.td_solver = TridiagonalSolver(self.cfg)
+        fp_cfg = self.cfg["terms"]["fokker_planck"]
+        self.td_solver = TridiagonalSolver(**(fp_cfg["tridiagonal"] if "tridiagonal" in fp_cfg else {}))
+        self.fp_cadence = get_cadence(self.cfg, "fokker_planck") if self.cfg["terms"]["fokker_planck"]["is_on"] else 1
+        self.krook_cadence = get_cadence(self.cfg, "krook") if self.cfg["terms"]["krook"]["is_on"] else 1
 
     def __init_fp_operator__(self):
         if self.cfg["terms"]["fokker_planck"]["type"].casefold() == "lenard_bernstein":
@@ -24,15 +95,35 @@ class Collisions:
         else:
             raise NotImplementedError
 
-    def __call__(self, nu_fp: jnp.ndarray, nu_K: jnp.ndarray, f: jnp.ndarray, dt: jnp.float64) -> jnp.ndarray:
+    def _fokker_planck_step_(self, nu_fp: jnp.ndarray, f: jnp.ndarray, dt: jnp.float64) -> jnp.ndarray:
+        # The three diagonals representing collision operator for all x
+        cee_a, cee_b, cee_c = self.fp(nu=nu_fp, f_xv=f, dt=dt)
+        # Solve over all x
+        return self.td_solver(cee_a, cee_b, cee_c, f)
+
+    @staticmethod
+    def _subcycle_(step_fn, cadence: int, step, f: jnp.ndarray, dt: jnp.float64) -> jnp.ndarray:
+        """
+        Applies ``step_fn`` with a ``cadence * dt`` step on the last step of every block of ``cadence`` steps
+
+        :param step_fn: the (implicit) collision step, a function of ``f`` and ``dt``
+        :param cadence: number of timesteps between applications
+        :param step: index of the current timestep
+        :param f: distribution function
+        :param dt: timestep
+        :return:
+        """
+        if cadence == 1:
+            return step_fn(f, dt)
+        else:
+            return cond((step + 1) % cadence == 0, lambda _f_: step_fn(_f_, cadence * dt), lambda _f_: _f_, f)
+
+    def __call__(self, nu_fp: jnp.ndarray, nu_K: jnp.ndarray, f: jnp.ndarray, dt: jnp.float64, step=0) -> jnp.ndarray:
         if self.cfg["terms"]["fokker_planck"]["is_on"]:
-            # The three diagonals representing collision operator for all x
-            cee_a, cee_b, cee_c = self.fp(nu=nu_fp, f_xv=f, dt=dt)
-            # Solve over all x
-            f = self.td_solver(cee_a, cee_b, cee_c, f)
+            f = self._subcycle_(partial(self._fokker_planck_step_, nu_fp), self.fp_cadence, step, f, dt)
 
         if self.cfg["terms"]["krook"]["is_on"]:
-            f = self.krook(nu_K, f, dt)
+            f = self._subcycle_(partial(self.krook, nu_K), self.krook_cadence, step, f, dt)
 
         return f
 
@@ -40,8 +131,9 @@ class Collisions:
 class Krook:
     def __init__(self, cfg):
         self.cfg = cfg
-        f_mx = np.exp(-self.cfg["grid"]["v"][None, :] ** 2.0 / 2.0)
-        self.f_mx = f_mx / np.trapz(f_mx, dx=self.cfg["grid"]["dv"], axis=1)[:, None]
+        # the velocity grid and the mass are traced when the species are batched
+        f_mx = jnp.exp(-self.cfg["grid"].get("mass", 1.0) * self.cfg["grid"]["v"][None, :] ** 2.0 / 2.0)
+        self.f_mx = f_mx / jnp.trapezoid(f_mx, dx=self.cfg["grid"]["dv"], axis=1)[:, None]
         self.dv = self.cfg["grid"]["dv"]
 
     def vx_moment(self, f_xv):
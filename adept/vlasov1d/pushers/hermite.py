@@ -0,0 +1,268 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+"""
+An asymmetrically weighted Hermite representation of the velocity space
+
+.. math::
+
+    f(x, v, t) = \\sum_n C_n(x, t) \\psi_n(\\xi), \\quad \\xi = (v - u) / \\alpha
+
+where :math:`\\psi_n(\\xi) = (\\pi 2^n n!)^{-1/2} H_n(\\xi) e^{-\\xi^2}` and the dual basis is
+:math:`\\psi^n(\\xi) = (2^n n!)^{-1/2} H_n(\\xi)`. The state is ``C`` with shape ``(nx, nh)`` instead of ``f`` with shape
+``(nx, nv)``. A Maxwellian with temperature ``alpha**2 / 2`` and drift ``u`` is represented by ``C_0`` alone.
+
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+from jax import numpy as jnp
+from jax.lax import fori_loop, scan
+
+from adept.vlasov1d.pushers import field
+from adept.vlasov1d.pushers.fokker_planck import Collisions, get_cadence
+
+
+def get_velocity_basis(cfg: Dict) -> str:
+    return cfg["terms"].get("velocity", {}).get("basis", "grid")
+
+
+def get_hermite_functions(xi: np.ndarray, nh: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluates the Hermite basis and its dual from the recurrence of the normalized Hermite functions, which does not
+    overflow for large ``n``
+
+    :param xi: (nv,)
+    :param nh: number of Hermite modes
+    :return: ``psi_n(xi)`` and ``psi^n(xi)``, each with shape (nh, nv)
+    """
+    phi = np.zeros((nh, xi.size))
+    phi[0] = np.pi**-0.25 * np.exp(-(xi**2.0) / 2.0)
+    if nh > 1:
+        phi[1] = np.sqrt(2.0) * xi * phi[0]
+    for n in range(1, nh - 1):
+        phi[n + 1] = np.sqrt(2.0 / (n + 1)) * xi * phi[n] - np.sqrt(n / (n + 1)) * phi[n - 1]
+
+    return np.pi**-0.25 * phi * np.exp(-(xi**2.0) / 2.0), np.pi**0.25 * phi * np.exp(xi**2.0 / 2.0)
+
+
+def get_filter(velocity_cfg: Dict, nh: int, dt: float) -> np.ndarray:
+    """
+    The filter that is applied to the Hermite modes every step to suppress recurrence
+
+    - ``hypercollision`` (default) damps mode ``n`` at a rate ``nu * (n / (nh - 1)) ** order``
+    - ``hou-li`` multiplies mode ``n`` by ``exp(-strength * (n / (nh - 1)) ** order)``
+    - ``none``
+
+    The first three modes are never filtered so that density, momentum and energy are conserved
+
+    :param velocity_cfg: the ``terms.velocity`` section of the config
+    :param nh:
+    :param dt:
+    :return: (nh,)
+    """
+    filter_cfg = {"type": "hypercollision", **velocity_cfg.get("filter", {})}
+    n_over_nh = np.arange(nh) / max(nh - 1, 1)
+
+    if filter_cfg["type"] == "hypercollision":
+        sigma = np.exp(-filter_cfg.get("nu", 10.0) * dt * n_over_nh ** filter_cfg.get("order", 6))
+    elif filter_cfg["type"] == "hou-li":
+        sigma = np.exp(-filter_cfg.get("strength", 36.0) * n_over_nh ** filter_cfg.get("order", 36))
+    elif filter_cfg["type"] == "none":
+        sigma = np.ones(nh)
+    else:
+        raise NotImplementedError(f"Hermite filter {filter_cfg['type']} has not been implemented")
+
+    sigma[:3] = 1.0
+
+    return sigma
+
+
+def get_hermite_quantities(cfg_grid: Dict, velocity_cfg: Dict) -> Dict:
+    """
+    Precomputes the arrays of the Hermite representation
+
+    The streaming operator couples mode ``n`` to ``n - 1`` and ``n + 1`` through a symmetric tridiagonal matrix. Its
+    eigendecomposition makes the ``v df/dx`` push exact for each ``kx`` with the ``C_nh = 0`` closure
+
+    :param cfg_grid: needs ``v``, ``dv`` and ``dt``
+    :param velocity_cfg: the ``terms.velocity`` section of the config after ``get_derived_quantities``
+    :return:
+    """
+    nh, alpha, u = velocity_cfg["nh"], velocity_cfg["alpha"], velocity_cfg["u"]
+    psi, psi_dual = get_hermite_functions((np.asarray(cfg_grid["v"]) - u) / alpha, nh)
+
+    off_diagonal = np.sqrt(np.arange(1, nh) / 2.0)
+    eigvals, eigvecs = np.linalg.eigh(np.diag(off_diagonal, 1) + np.diag(off_diagonal, -1))
+
+    return {
+        "to_grid": jnp.array(psi),
+        "from_grid": jnp.array(psi_dual.T * cfg_grid["dv"] / alpha),
+        "stream_eigvals": jnp.array(alpha * eigvals + u),
+        "stream_eigvecs": jnp.array(eigvecs),
+        "sqrt_2n_over_alpha": jnp.array(np.sqrt(2.0 * np.arange(nh)) / alpha),
+        "filter": jnp.array(get_filter(velocity_cfg, nh, cfg_grid["dt"])),
+    }
+
+
+def get_hermite_moments(f: jnp.ndarray, alpha: float, u: float) -> Tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    """
+    The density, flux and second moment of ``f``, which only depend on the first three modes
+
+    :param f: (nx, nh)
+    :param alpha:
+    :param u:
+    :return: the integrals of ``f``, ``v f`` and ``v**2 f`` over ``v``
+    """
+    c0, c1, c2 = f[:, 0], f[:, 1], f[:, 2]
+    n = alpha * c0
+    j = alpha * (alpha * c1 / np.sqrt(2.0) + u * c0)
+    m2 = alpha * (alpha**2.0 * (c2 / np.sqrt(2.0) + c0 / 2.0) + np.sqrt(2.0) * alpha * u * c1 + u**2.0 * c0)
+
+    return n, j, m2
+
+
+class HermiteSpace:
+    """
+    The exact ``v df/dx`` push of the Hermite modes in the eigenbasis of the streaming operator
+
+    """
+
+    def __init__(self, cfg):
+        self.kx_real = cfg["grid"]["kxr"]
+        self.eigvals = cfg["grid"]["hermite"]["stream_eigvals"]
+        self.eigvecs = cfg["grid"]["hermite"]["stream_eigvecs"]
+
+    def __call__(self, f, dt):
+        fk = jnp.fft.rfft(f, axis=0) @ self.eigvecs
+        fk = jnp.exp(-1j * self.kx_real[:, None] * dt * self.eigvals[None, :]) * fk
+        return jnp.fft.irfft(fk @ self.eigvecs.T, axis=0)
+
+
+class HermiteVelocity:
+    """
+    The exact ``e df/dv`` push of the Hermite modes
+
+    ``e df/dv`` couples mode ``n`` to ``n - 1`` only, so the operator is nilpotent and its exponential is the
+    ``nh``-term Taylor series
+
+    """
+
+    def __init__(self, cfg):
+        self.sqrt_2n_over_alpha = cfg["grid"]["hermite"]["sqrt_2n_over_alpha"]
+        self.nh = cfg["terms"]["velocity"]["nh"]
+
+    def __call__(self, f, e, dt):
+        s = (e * dt)[:, None]
+
+        def _add_term_(j, term_and_sum):
+            term, total = term_and_sum
+            term = s * self.sqrt_2n_over_alpha[None, :] * jnp.pad(term[:, :-1], ((0, 0), (1, 0))) / j
+            return term, total + term
+
+        _, f = fori_loop(1, self.nh, _add_term_, (f, f))
+
+        return f
+
+
+class HermitePoissonSolver(field.SpectralPoissonSolver):
+    def __init__(self, cfg):
+        super().__init__(
+            ion_charge=cfg["grid"]["ion_charge"], one_over_kx=cfg["grid"]["one_over_kx"], dv=cfg["grid"]["dv"]
+        )
+        self.alpha = cfg["terms"]["velocity"]["alpha"]
+
+    def compute_charges(self, f):
+        return self.alpha * f[:, 0]
+
+
+class HermiteAmpereSolver:
+    def __init__(self, cfg):
+        self.alpha = cfg["terms"]["velocity"]["alpha"]
+        self.u = cfg["terms"]["velocity"]["u"]
+
+    def __call__(self, f: jnp.ndarray, prev_ex: jnp.ndarray, dt: jnp.float64):
+        _, j, _ = get_hermite_moments(f, self.alpha, self.u)
+        return prev_ex - dt * j
+
+
+class HermiteFieldSolver(field.ElectricFieldSolver):
+    def __init__(self, cfg):
+        if cfg["terms"]["field"] == "poisson":
+            self.es_field_solver = HermitePoissonSolver(cfg)
+        elif cfg["terms"]["field"] == "ampere" and cfg["terms"]["time"] == "leapfrog":
+            self.es_field_solver = HermiteAmpereSolver(cfg)
+        else:
+            raise NotImplementedError(
+                f"{cfg['terms']['field']} + {cfg['terms']['time']} has not been implemented for the Hermite basis"
+            )
+        self.hampere = False
+        self.dx = cfg["grid"]["dx"]
+
+
+class HermiteKrook:
+    def __init__(self, cfg):
+        f_mx = np.exp(-np.asarray(cfg["grid"]["v"]) ** 2.0 / 2.0)
+        c_mx = f_mx @ np.asarray(cfg["grid"]["hermite"]["from_grid"])
+        self.alpha = cfg["terms"]["velocity"]["alpha"]
+        self.c_mx = jnp.array(c_mx / (self.alpha * c_mx[0]))[None, :]
+
+    def __call__(self, nu_K, f_xv, dt) -> jnp.ndarray:
+        exp_nuKxdt = jnp.exp(-dt * nu_K[:, None])
+        return f_xv * exp_nuKxdt + self.alpha * f_xv[:, :1] * self.c_mx * (1.0 - exp_nuKxdt)
+
+
+class HermiteCollisions(Collisions):
+    """
+    The Lenard-Bernstein and Dougherty operators in the Hermite basis, followed by the recurrence filter
+
+    In the basis, the operator with drift ``u_c`` and temperature ``T`` is
+
+    .. math::
+
+        \\partial_t C_n = \\nu [-n C_n - \\sqrt{2n} \\frac{u - u_c}{\\alpha} C_{n-1}
+        + (\\frac{2T}{\\alpha^2} - 1) \\sqrt{n(n-1)} C_{n-2}]
+
+    which is lower triangular, so the implicit step is a forward substitution over the modes. ``u_c = 0`` for the
+    Lenard-Bernstein operator and the local mean velocity for the Dougherty operator. The step conserves density, and
+    momentum and energy where the operator does
+
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.alpha = cfg["terms"]["velocity"]["alpha"]
+        self.u = cfg["terms"]["velocity"]["u"]
+        self.n = jnp.arange(cfg["terms"]["velocity"]["nh"], dtype=cfg["grid"]["hermite"]["filter"].dtype)
+        self.filter = cfg["grid"]["hermite"]["filter"]
+        self.krook = HermiteKrook(cfg)
+        fp_type = cfg["terms"]["fokker_planck"]["type"].casefold()
+        if fp_type not in ["lenard_bernstein", "dougherty"]:
+            raise NotImplementedError
+        self.conserve_momentum = fp_type == "dougherty"
+        self.fp_cadence = get_cadence(cfg, "fokker_planck") if cfg["terms"]["fokker_planck"]["is_on"] else 1
+        self.krook_cadence = get_cadence(cfg, "krook") if cfg["terms"]["krook"]["is_on"] else 1
+
+    def _fokker_planck_step_(self, nu_fp: jnp.ndarray, f: jnp.ndarray, dt: jnp.float64) -> jnp.ndarray:
+        n, j, m2 = get_hermite_moments(f, self.alpha, self.u)
+        u_c = j / n if self.conserve_momentum else jnp.zeros_like(n)
+        temperature = m2 / n - u_c**2.0
+
+        nu_dt = nu_fp * dt
+        drift = -nu_dt * (self.u - u_c) / self.alpha
+        spread = nu_dt * (2.0 * temperature / self.alpha**2.0 - 1.0)
+
+        def _substitute_(prev_two, f_and_n):
+            fn, nn = f_and_n
+            cnm1, cnm2 = prev_two
+            cn = (fn + drift * jnp.sqrt(2.0 * nn) * cnm1 + spread * jnp.sqrt(nn * (nn - 1.0)) * cnm2) / (
+                1.0 + nu_dt * nn
+            )
+            return (cn, cnm1), cn
+
+        _, new_f = scan(_substitute_, (jnp.zeros_like(n), jnp.zeros_like(n)), (f.T, self.n))
+
+        return new_f.T
+
+    def __call__(self, nu_fp: jnp.ndarray, nu_K: jnp.ndarray, f: jnp.ndarray, dt: jnp.float64, step=0) -> jnp.ndarray:
+        return super().__call__(nu_fp, nu_K, f, dt, step) * self.filter[None, :]
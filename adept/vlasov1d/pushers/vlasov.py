@@ -1,5 +1,5 @@
 from functools import partial
-from typing import Callable
+from typing import Callable, Dict
 
 import equinox as eqx
 from jax import numpy as jnp, vmap
@@ -76,3 +76,30 @@ class SpaceExponential:
         return jnp.real(
             jnp.fft.irfft(jnp.exp(-1j * self.kx_real[:, None] * dt * self.v[None, :]) * jnp.fft.rfft(f, axis=0), axis=0)
         )
+
+
+class SpeciesBatch:
+    """
+    Applies a single species pusher to every species of a batched ``f[species, x, v]`` in one vmapped call
+
+    The pusher is built inside the vmap from the spatial grid and the velocity grid of each species in
+    ``cfg["grid"]["species"]`` so the number of kernels and the compile time do not depend on the number of species.
+    The force ``e`` on an electron is scaled by ``-charge / mass`` of each species
+
+    :param pusher: the single species pusher class, which is built from a config
+    :param cfg: Configuration dictionary
+    """
+
+    def __init__(self, pusher: Callable, cfg: Dict):
+        self.pusher = pusher
+        self.cfg = cfg
+
+    def _push_(self, species_grid: Dict, f: jnp.ndarray, **kwargs) -> jnp.ndarray:
+        pusher = self.pusher({**self.cfg, "grid": {**self.cfg["grid"], **species_grid}})
+        if "e" in kwargs:
+            kwargs["e"] = species_grid["force_scale"] * kwargs["e"]
+
+        return pusher(f=f, **kwargs)
+
+    def __call__(self, f: jnp.ndarray, **kwargs) -> jnp.ndarray:
+        return vmap(partial(self._push_, **kwargs))(self.cfg["grid"]["species"], f)
@@ -1,12 +1,16 @@
 import itertools
-from typing import Dict
+from functools import partial
+from typing import Dict, Tuple
 import os
 
 # import interpax
-from jax import numpy as jnp
+from jax import numpy as jnp, vmap
 import numpy as np
 import xarray as xr
 
+from adept.utils.output import decode, get_output_save_func, get_quantity_output, to_netcdf
+from adept.utils.spectral import SpectralAccumulator
+
 
 def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, prefix: str) -> xr.Dataset:
     """
@@ -20,8 +24,11 @@ def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, p
     :return:
     """
 
+    output_cfg = cfg["save"][prefix].get("output", {})
+    fields = {k: decode(v, get_quantity_output(output_cfg, k)) for k, v in fields.items()}
+
     if any(x in ["x", "kx"] for x in cfg["save"][prefix].keys()):
-        crds = set(cfg["save"][prefix].keys()) - {"t", "func"}
+        crds = set(cfg["save"][prefix].keys()) - {"t", "func", "output"}
         if {"x"} == crds:
             xnm = "x"
         elif {"kx"} == crds:
@@ -50,14 +57,19 @@ def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, p
             das[f"{prefix}-em"] = xr.DataArray(em, coords=(("t", this_t), ("x", cfg["grid"]["x"])))
 
     fields_xr = xr.Dataset(das)
-    fields_xr.to_netcdf(os.path.join(binary_dir, f"{prefix}-t={round(this_t[-1],4)}.nc"))
+    to_netcdf(
+        fields_xr,
+        os.path.join(binary_dir, f"{prefix}-t={round(this_t[-1],4)}.nc"),
+        output_cfg,
+        quantities={f"{prefix}-{k}": k for k in fields.keys()},
+    )
 
     return fields_xr
 
 
-def store_f(cfg: Dict, this_t: Dict, td: str, ys: Dict) -> xr.Dataset:
+def store_f(cfg: Dict, this_t: Dict, td: str, ys: Dict) -> Dict[str, xr.Dataset]:
     """
-    Stores f to netcdf
+    Stores f to netcdf, one file per distribution function save
 
     :param cfg:
     :param this_t:
@@ -65,15 +77,49 @@ def store_f(cfg: Dict, this_t: Dict, td: str, ys: Dict) -> xr.Dataset:
     :param ys:
     :return:
     """
-    f_store = xr.Dataset(
-        {
-            spc: xr.DataArray(ys[spc], coords=(("t", this_t[spc]), ("x", cfg["grid"]["x"]), ("v", cfg["grid"]["v"])))
-            for spc in ["electron"]
-        }
-    )
-    f_store.to_netcdf(os.path.join(td, "binary", "dist.nc"))
+    f_stores = {}
+    for k in filter(lambda k: k.startswith("electron"), cfg["save"].keys()):
+        crds = [("t", this_t[k])]
+        if "species" in cfg["grid"]:
+            crds.append(("species", [nm for nm in cfg["density"].keys() if nm.startswith("species-")]))
+        if "kx" in cfg["save"][k]:
+            crds.append(("kx", cfg["save"][k]["kx"]["ax"]))
+        elif "x" not in cfg["save"][k]:
+            crds.append(("x", cfg["grid"]["x"]))
+        elif "ax" in cfg["save"][k]["x"]:
+            crds.append(("x", cfg["save"][k]["x"]["ax"]))
+        if "v" in cfg["save"][k]:
+            crds.append(("v", cfg["save"][k]["v"]["ax"]))
+        elif "species" in cfg["grid"]:
+            # each species has its own velocity grid, which is stored as the ``velocity`` coordinate
+            crds.append(("v", np.arange(cfg["grid"]["nv"])))
+        else:
+            crds.append(("v", cfg["grid"]["v"]))
+
+        output_cfg = cfg["save"][k].get("output", {})
+        if "kx" in cfg["save"][k]:
+            quantities = {f"{k}-{nm}": nm for nm in ys[k].keys()}
+            das = {
+                f"{k}-{nm}": xr.DataArray(decode(v, get_quantity_output(output_cfg, nm)), coords=crds)
+                for nm, v in ys[k].items()
+            }
+        else:
+            quantities = {k: k}
+            das = {k: xr.DataArray(decode(ys[k], get_quantity_output(output_cfg, k)), coords=crds)}
+
+        f_stores[k] = xr.Dataset(das)
+        if "species" in cfg["grid"] and "v" not in cfg["save"][k]:
+            f_stores[k] = f_stores[k].assign_coords(
+                velocity=(("species", "v"), np.asarray(cfg["grid"]["species"]["v"]))
+            )
+        to_netcdf(
+            f_stores[k],
+            os.path.join(td, "binary", "dist.nc" if k == "electron" else f"dist-{k}.nc"),
+            output_cfg,
+            quantities,
+        )
 
-    return f_store
+    return f_stores
 
 
 # def clean_td(td):
@@ -111,26 +157,103 @@ def store_f(cfg: Dict, this_t: Dict, td: str, ys: Dict) -> xr.Dataset:
 #         clean_td(td)
 
 
+def get_moment_matrix(v: jnp.ndarray, dv: float, max_power: int) -> jnp.ndarray:
+    """
+    Returns the (nv, max_power + 1) matrix whose k-th column is ``v**k * dv``
+
+    :param v: velocity grid
+    :param dv: velocity grid spacing
+    :param max_power: highest power of v
+    :return:
+    """
+    return jnp.stack([v**k for k in range(max_power + 1)], axis=1) * dv
+
+
+def calc_velocity_moments(f: jnp.ndarray, moment_matrix: jnp.ndarray) -> jnp.ndarray:
+    """
+    Computes all the velocity moments of f in a single (nx, nv) x (nv, k) matmul
+
+    :param f: distribution function (nx, nv)
+    :param moment_matrix: (nv, k) from ``get_moment_matrix``
+    :return: (nx, k) moments
+    """
+    return f @ moment_matrix
+
+
+def _calc_species_moments_(f: jnp.ndarray, moment_matrix: jnp.ndarray, dv) -> Dict[str, jnp.ndarray]:
+    n, j, m2, m3 = calc_velocity_moments(f, moment_matrix).T
+    flogf, f_sq = jnp.sum(f * jnp.stack([jnp.log(jnp.abs(f)), f]), axis=-1) * dv
+
+    # central moments about v = j, expanded in terms of the raw moments
+    return {
+        "n": n,
+        "v": j,
+        "p": m2 - 2.0 * j**2.0 + j**2.0 * n,
+        "q": m3 - 3.0 * j * m2 + 3.0 * j**3.0 - j**3.0 * n,
+        "-flogf": flogf,
+        "f^2": f_sq,
+    }
+
+
+def get_species_moments_func(cfg: Dict):
+    """
+    Returns the function that computes the moments of f. The moments of each species of a batched f are computed in
+    one vmapped call and are suffixed by the name of the species, e.g. ``n-species-ion``
+
+    """
+    if "species" in cfg["grid"]:
+        species = cfg["grid"]["species"]
+        names = [k for k in cfg["density"].keys() if k.startswith("species-")]
+        moment_matrices = vmap(partial(get_moment_matrix, max_power=3))(species["v"], species["dv"])
+        batched_moments = vmap(_calc_species_moments_)
+
+        def calc_moments(f):
+            moments = batched_moments(f, moment_matrices, species["dv"])
+            return {f"{nm}-{name}": v[i] for nm, v in moments.items() for i, name in enumerate(names)}
+
+    else:
+        moment_matrix = get_moment_matrix(cfg["grid"]["v"], cfg["grid"]["dv"], max_power=3)
+        calc_moments = partial(_calc_species_moments_, moment_matrix=moment_matrix, dv=cfg["grid"]["dv"])
+
+    return calc_moments
+
+
 def get_field_save_func(cfg, k):
-    if {"t"} == set(cfg["save"][k].keys()):
+    calc_moments = get_species_moments_func(cfg)
+
+    def _calc_fields_(y):
+        temp = calc_moments(y["electron"])
+        temp["e"] = y["e"]
+        temp["de"] = y["de"]
+        temp["a"] = y["a"]
+        temp["prev_a"] = y["prev_a"]
+        temp["pond"] = -0.5 * jnp.gradient(y["a"] ** 2.0, cfg["grid"]["dx"])[1:-1]
+
+        return temp
+
+    crds = set(cfg["save"][k].keys()) - {"output"}
+    if {"t"} == crds:
+
+        def fields_save_func(t, y, args):
+            return _calc_fields_(y)
 
-        def _calc_moment_(inp):
-            return jnp.sum(inp, axis=1) * cfg["grid"]["dv"]
+    elif {"t", "kx"} == crds:
+        # the amplitude and phase of the Fourier modes closest to the requested wavenumbers
+        kxr = np.asarray(cfg["grid"]["kxr"])
+        kx_inds = np.argmin(np.abs(kxr[None, :] - cfg["save"][k]["kx"]["ax"][:, None]), axis=1)
+        cfg["save"][k]["kx"]["ax"] = kxr[kx_inds]
 
         def fields_save_func(t, y, args):
-            temp = {"n": _calc_moment_(y["electron"]), "v": _calc_moment_(y["electron"] * cfg["grid"]["v"][None, :])}
-            v_m_vbar = cfg["grid"]["v"][None, :] - temp["v"][:, None]
-            temp["p"] = _calc_moment_(y["electron"] * v_m_vbar**2.0)
-            temp["q"] = _calc_moment_(y["electron"] * v_m_vbar**3.0)
-            temp["-flogf"] = _calc_moment_(y["electron"] * jnp.log(jnp.abs(y["electron"])))
-            temp["f^2"] = _calc_moment_(y["electron"] * y["electron"])
-            temp["e"] = y["e"]
-            temp["de"] = y["de"]
-            temp["a"] = y["a"]
-            temp["prev_a"] = y["prev_a"]
-            temp["pond"] = -0.5 * jnp.gradient(y["a"] ** 2.0, cfg["grid"]["dx"])[1:-1]
-
-            return temp
+            temp = _calc_fields_(y)
+            temp["a"], temp["prev_a"] = temp["a"][1:-1], temp["prev_a"][1:-1]
+
+            modes = {}
+            for nm, fld in temp.items():
+                fld_k = jnp.fft.rfft(fld)[kx_inds] * 2.0 / cfg["grid"]["nx"]
+                modes[f"{nm}-mag"] = jnp.abs(fld_k)
+                modes[f"{nm}-ang"] = jnp.angle(fld_k)
+
+            return modes
 
     else:
         raise NotImplementedError
@@ -138,28 +261,120 @@ def get_field_save_func(cfg, k):
     return fields_save_func
 
 
+def get_interp_quantities(ax: np.ndarray, grid_ax: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the indices and weights that linearly interpolate from ``grid_ax`` onto ``ax``
+
+    Points that land on the grid get a weight of exactly 0 so subsampling does not interpolate anything
+
+    :param ax: the axis to interpolate onto
+    :param grid_ax: the (uniform) simulation axis
+    :return: left indices and right weights
+    """
+    ax, grid_ax = np.asarray(ax), np.asarray(grid_ax)
+    d_ax = grid_ax[1] - grid_ax[0]
+    fractional_ind = np.clip((ax - grid_ax[0]) / d_ax, 0, grid_ax.size - 1)
+    inds = np.clip(np.floor(fractional_ind + 1e-8).astype(int), 0, grid_ax.size - 2)
+    weights = fractional_ind - inds
+    weights[np.abs(weights) < 1e-8] = 0.0
+
+    return inds, weights
+
+
+def _interp_(f: jnp.ndarray, inds: np.ndarray, weights: np.ndarray, axis: int) -> jnp.ndarray:
+    shape = [1, 1]
+    shape[axis] = weights.size
+    weights = jnp.array(weights).reshape(shape)
+
+    return jnp.take(f, inds, axis=axis) * (1.0 - weights) + jnp.take(f, inds + 1, axis=axis) * weights
+
+
 def get_dist_save_func(cfg, k):
-    if {"t"} == set(cfg["save"][k].keys()):
+    """
+    Returns the function that reduces f on device before it is saved
+
+    ``save.electron`` can contain, alongside ``t``,
 
-        def dist_save_func(t, y, args):
-            return y["electron"]
+    - ``v: {vmin, vmax, nv}`` - a velocity window, interpolated onto ``nv`` points
+    - ``x: {xmin, xmax, nx}`` - a spatial window, interpolated onto ``nx`` cell centers
+    - ``x: {average: true}`` - the spatially averaged f(v), optionally only over ``[xmin, xmax]``
+    - ``kx: {kxmin, kxmax, nkx}`` - the Fourier modes closest to the requested wavenumbers, saved as magnitude and phase
+
+    The species of a batched f are reduced in one vmapped call
+
+    :param cfg:
+    :param k:
+    :return:
+    """
+    save_cfg = cfg["save"][k]
+    crds = set(save_cfg.keys()) - {"t", "func", "output"}
 
-    elif {"t", "x", "y"} == set(cfg["save"][k].keys()):
-        pass
-    elif {"t", "kx", "y"} == set(cfg["save"][k].keys()):
-        pass
+    if not crds <= {"x", "kx", "v"} or {"x", "kx"} <= crds:
+        raise NotImplementedError(f"Cannot save {k} with coordinates {crds}")
 
-    elif {"t", "x", "ky"} == set(cfg["save"][k].keys()):
-        pass
+    reductions = []
+    batched = "species" in cfg["grid"]
 
-    elif {"t", "kx", "ky"} == set(cfg["save"][k].keys()):
-        pass
+    # every species of a batched f is interpolated from its own velocity grid
+    if "v" in crds and batched:
+        v_interp = [get_interp_quantities(save_cfg["v"]["ax"], v) for v in np.asarray(cfg["grid"]["species"]["v"])]
+        v_interp = tuple(np.stack(q) for q in zip(*v_interp))
+    elif "v" in crds:
+        v_interp = get_interp_quantities(save_cfg["v"]["ax"], cfg["grid"]["v"])
     else:
-        raise NotImplementedError
+        v_interp = None
+
+    if "x" in crds and save_cfg["x"].get("average", False):
+        x = np.asarray(cfg["grid"]["x"])
+        x_mask = (x >= save_cfg["x"].get("xmin", x[0])) & (x <= save_cfg["x"].get("xmax", x[-1]))
+        x_inds = np.argwhere(x_mask)[:, 0]
+        reductions.append(lambda f: jnp.mean(f[x_inds], axis=0))
+
+    elif "x" in crds:
+        x_inds, x_weights = get_interp_quantities(save_cfg["x"]["ax"], cfg["grid"]["x"])
+        reductions.append(partial(_interp_, inds=x_inds, weights=x_weights, axis=0))
+
+    elif "kx" in crds:
+        kxr = np.asarray(cfg["grid"]["kxr"])
+        kx_inds = np.argmin(np.abs(kxr[None, :] - save_cfg["kx"]["ax"][:, None]), axis=1)
+        save_cfg["kx"]["ax"] = kxr[kx_inds]
+
+        def save_kx(f):
+            fk = jnp.fft.rfft(f, axis=0)[kx_inds] * 2.0 / cfg["grid"]["nx"]
+            return {"mag": jnp.abs(fk), "ang": jnp.angle(fk)}
+
+        reductions.append(save_kx)
+
+    def reduce_f(f, v_interp):
+        if v_interp is not None:
+            f = _interp_(f, *v_interp, axis=1)
+        for reduce in reductions:
+            f = reduce(f)
+
+        return f
+
+    def dist_save_func(t, y, args):
+        if batched:
+            return vmap(reduce_f)(y["electron"], v_interp)
+        else:
+            return reduce_f(y["electron"], v_interp)
 
     return dist_save_func
 
 
+def _on_velocity_grid_(save_func, cfg: Dict):
+    """
+    Evaluates the distribution function on the velocity grid before it is passed to ``save_func`` if the state holds
+    the Hermite modes, so that the saves are the same for both representations
+
+    """
+    if "hermite" in cfg["grid"]:
+        to_grid = cfg["grid"]["hermite"]["to_grid"]
+        return lambda t, y, args: save_func(t, {**y, "electron": y["electron"] @ to_grid}, args)
+    else:
+        return save_func
+
+
 def get_save_quantities(cfg: Dict) -> Dict:
     """
     This function updates the config with the quantities required for the diagnostics and saving routines
@@ -168,8 +383,11 @@ def get_save_quantities(cfg: Dict) -> Dict:
     :return:
     """
     for k in cfg["save"].keys():  # this can be fields or electron or scalar?
-        for k2 in cfg["save"][k].keys():  # this can be t, x, y, kx, ky (eventually)
-            if k2 == "x":
+        for k2 in cfg["save"][k].keys():  # this can be t, x, v, kx
+            if not isinstance(cfg["save"][k][k2], dict) or f"n{k2}" not in cfg["save"][k][k2]:
+                # e.g. a spatial average or a list of wavenumbers
+                continue
+            elif k2 == "x":
                 dx = (cfg["save"][k][k2][f"{k2}max"] - cfg["save"][k][k2][f"{k2}min"]) / cfg["save"][k][k2][f"n{k2}"]
                 cfg["save"][k][k2]["ax"] = np.linspace(
                     cfg["save"][k][k2][f"{k2}min"] + dx / 2.0,
@@ -183,35 +401,95 @@ def get_save_quantities(cfg: Dict) -> Dict:
                 )
 
         if k.startswith("fields"):
-            cfg["save"][k]["func"] = get_field_save_func(cfg, k)
+            cfg["save"][k]["func"] = get_output_save_func(
+                _on_velocity_grid_(get_field_save_func(cfg, k), cfg), cfg["save"][k].get("output", {}), k
+            )
 
         elif k.startswith("electron"):
-            cfg["save"][k]["func"] = get_dist_save_func(cfg, k)
+            cfg["save"][k]["func"] = get_output_save_func(
+                _on_velocity_grid_(get_dist_save_func(cfg, k), cfg), cfg["save"][k].get("output", {}), k
+            )
+
+        elif k == "spectral":
+            spectral_accumulator = SpectralAccumulator(cfg["save"][k], cfg["grid"])
+            cfg["save"][k]["func"] = lambda t, y, args: spectral_accumulator(y["spectral"])
 
-    cfg["save"]["default"] = {"t": {"ax": cfg["grid"]["t"]}, "func": get_default_save_func(cfg)}
+    # the scalars are saved at every timestep unless a save grid is provided for them
+    if "default" in cfg["save"]:
+        cfg["save"]["default"]["func"] = _on_velocity_grid_(get_default_save_func(cfg), cfg)
+    else:
+        cfg["save"]["default"] = {
+            "t": {"ax": cfg["grid"]["t"]},
+            "func": _on_velocity_grid_(get_default_save_func(cfg), cfg),
+        }
 
     return cfg
 
 
+def _calc_mean_scalars_(f: jnp.ndarray, moment_matrix: jnp.ndarray, dv) -> Dict[str, jnp.ndarray]:
+    """
+    The spatial averages of the raw moments, of the entropy density ``-|f| log|f|`` and of ``f^2``
+
+    :param f: distribution function (nx, nv)
+    :param moment_matrix: (nv, 4) from ``get_moment_matrix``
+    :param dv: velocity grid spacing
+    :return:
+    """
+    mean_n, mean_j, mean_P, mean_q = jnp.mean(calc_velocity_moments(f, moment_matrix), axis=0)
+    abs_f = jnp.abs(f)
+    mean_flogf, mean_f2 = jnp.mean(jnp.sum(jnp.stack([-jnp.log(abs_f) * abs_f, f**2.0]), axis=-1) * dv, axis=1)
+
+    return {
+        "mean_P": mean_P,
+        "mean_j": mean_j,
+        "mean_n": mean_n,
+        "mean_q": mean_q,
+        "mean_-flogf": mean_flogf,
+        "mean_f2": mean_f2,
+    }
+
+
 def get_default_save_func(cfg):
-    v = cfg["grid"]["v"][None, :]
-    dv = cfg["grid"]["dv"]
+    if "species" in cfg["grid"]:
+        return _get_batched_default_save_func_(cfg)
 
-    def _calc_mean_moment_(inp):
-        return jnp.mean(jnp.sum(inp, axis=1) * dv)
+    moment_matrix = get_moment_matrix(cfg["grid"]["v"], cfg["grid"]["dv"], max_power=3)
 
     def save(t, y, args):
-        scalars = {
-            "mean_P": _calc_mean_moment_(y["electron"] * v**2.0),
-            "mean_j": _calc_mean_moment_(y["electron"] * v),
-            "mean_n": _calc_mean_moment_(y["electron"]),
-            "mean_q": _calc_mean_moment_(y["electron"] * v**3.0),
-            "mean_-flogf": _calc_mean_moment_(-jnp.log(jnp.abs(y["electron"])) * jnp.abs(y["electron"])),
-            "mean_f2": _calc_mean_moment_(y["electron"] * y["electron"]),
-            "mean_de2": jnp.mean(y["de"] ** 2.0),
-            "mean_e2": jnp.mean(y["e"] ** 2.0),
-            "mean_pond": jnp.mean(-0.5 * jnp.gradient(y["a"] ** 2.0, cfg["grid"]["dx"])[1:-1]),
-        }
+        scalars = _calc_mean_scalars_(y["electron"], moment_matrix, cfg["grid"]["dv"])
+        scalars.update(
+            {
+                "mean_de2": jnp.mean(y["de"] ** 2.0),
+                "mean_e2": jnp.mean(y["e"] ** 2.0),
+                "mean_pond": jnp.mean(-0.5 * jnp.gradient(y["a"] ** 2.0, cfg["grid"]["dx"])[1:-1]),
+            }
+        )
+
+        return scalars
+
+    return save
+
+
+def _get_batched_default_save_func_(cfg):
+    """
+    The scalars of a batched f are those of an unbatched f for each species, e.g. ``mean_n-species-ion``
+
+    """
+    species = cfg["grid"]["species"]
+    names = [k for k in cfg["density"].keys() if k.startswith("species-")]
+    moment_matrices = vmap(partial(get_moment_matrix, max_power=3))(species["v"], species["dv"])
+    batched_scalars = vmap(_calc_mean_scalars_)
+
+    def save(t, y, args):
+        species_scalars = batched_scalars(y["electron"], moment_matrices, species["dv"])
+        scalars = {f"{nm}-{name}": v[i] for nm, v in species_scalars.items() for i, name in enumerate(names)}
+        scalars.update(
+            {
+                "mean_de2": jnp.mean(y["de"] ** 2.0),
+                "mean_e2": jnp.mean(y["e"] ** 2.0),
+                "mean_pond": jnp.mean(-0.5 * jnp.gradient(y["a"] ** 2.0, cfg["grid"]["dx"])[1:-1]),
+            }
+        )
 
         return scalars
 
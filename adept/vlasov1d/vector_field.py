@@ -3,8 +3,10 @@ from typing import Tuple, Dict
 
 from jax import numpy as jnp, Array
 
-from adept import get_envelope
-from adept.vlasov1d.pushers import field, fokker_planck, vlasov
+from adept.utils.adaptive import get_step_size
+from adept.utils.spectral import SpectralAccumulator
+from adept.vlasov1d.helpers import is_species_batched
+from adept.vlasov1d.pushers import field, fokker_planck, hermite, vlasov
 
 
 class TimeIntegrator:
@@ -17,18 +19,29 @@ class TimeIntegrator:
     """
 
     def __init__(self, cfg: Dict):
-        self.field_solve = field.ElectricFieldSolver(cfg)
+        if hermite.get_velocity_basis(cfg) == "hermite":
+            self.field_solve = hermite.HermiteFieldSolver(cfg)
+            self.vdfdx = hermite.HermiteSpace(cfg)
+        elif is_species_batched(cfg):
+            self.field_solve = field.ElectricFieldSolver(cfg)
+            self.vdfdx = vlasov.SpeciesBatch(vlasov.SpaceExponential, cfg)
+        else:
+            self.field_solve = field.ElectricFieldSolver(cfg)
+            self.vdfdx = vlasov.SpaceExponential(cfg)
         self.edfdv = self.get_edfdv(cfg)
-        self.vdfdx = vlasov.SpaceExponential(cfg)
 
     def get_edfdv(self, cfg: Dict):
-        if cfg["terms"]["edfdv"] == "exponential":
-            return vlasov.VelocityExponential(cfg)
+        if hermite.get_velocity_basis(cfg) == "hermite":
+            return hermite.HermiteVelocity(cfg)
+        elif cfg["terms"]["edfdv"] == "exponential":
+            pusher = vlasov.VelocityExponential
         elif cfg["terms"]["edfdv"] == "cubic-spline":
-            return vlasov.VelocityCubicSpline(cfg)
+            pusher = vlasov.VelocityCubicSpline
         else:
             raise NotImplementedError(f"{cfg['terms']['edfdv']} has not been implemented")
 
+        return vlasov.SpeciesBatch(pusher, cfg) if is_species_batched(cfg) else pusher(cfg)
+
 
 class LeapfrogIntegrator(TimeIntegrator):
     """
@@ -40,16 +53,17 @@ class LeapfrogIntegrator(TimeIntegrator):
     def __init__(self, cfg: Dict):
         super().__init__(cfg)
         self.dt = cfg["grid"]["dt"]
-        self.dt_array = self.dt * jnp.array([0.0, 1.0])
+        # the times of the driver evaluations as fractions of the step
+        self.dt_fractions = jnp.array([0.0, 1.0])
 
-    def __call__(self, f: Array, a: Array, dex_array: Array, prev_ex: Array) -> Tuple[Array, Array]:
-        f_after_v = self.vdfdx(f=f, dt=self.dt)
+    def __call__(self, f: Array, a: Array, dex_array: Array, prev_ex: Array, dt: float) -> Tuple[Array, Array]:
+        f_after_v = self.vdfdx(f=f, dt=dt)
         if self.field_solve.hampere:
             f_for_field = f
         else:
             f_for_field = f_after_v
-        pond, e = self.field_solve(f=f_for_field, a=a, prev_ex=prev_ex, dt=self.dt)
-        f = self.edfdv(f=f_after_v, e=pond + e + dex_array[0], dt=self.dt)
+        pond, e = self.field_solve(f=f_for_field, a=a, prev_ex=prev_ex, dt=dt)
+        f = self.edfdv(f=f_after_v, e=pond + e + dex_array[0], dt=dt)
 
         return e, f
 
@@ -68,21 +82,17 @@ class SixthOrderHamIntegrator(TimeIntegrator):
         self.a1 = 0.168735950563437422448196
         self.a2 = 0.377851589220928303880766
         self.a3 = -0.093175079568731452657924
-        b1 = 0.049086460976116245491441
-        b2 = 0.264177609888976700200146
-        b3 = 0.186735929134907054308413
-        c1 = -0.000069728715055305084099
-        c2 = -0.000625704827430047189169
-        c3 = -0.002213085124045325561636
-        d2 = -2.916600457689847816445691e-6
-        d3 = 3.048480261700038788680723e-5
-        e3 = 4.985549387875068121593988e-7
-
-        self.D1 = b1 + 2.0 * c1 * self.dt**2.0
-        self.D2 = b2 + 2.0 * c2 * self.dt**2.0 + 4.0 * d2 * self.dt**4.0
-        self.D3 = b3 + 2.0 * c3 * self.dt**2.0 + 4.0 * d3 * self.dt**4.0 - 8.0 * e3 * self.dt**6.0
-
-        self.dt_array = self.dt * jnp.array(
+        self.b1 = 0.049086460976116245491441
+        self.b2 = 0.264177609888976700200146
+        self.b3 = 0.186735929134907054308413
+        self.c1 = -0.000069728715055305084099
+        self.c2 = -0.000625704827430047189169
+        self.c3 = -0.002213085124045325561636
+        self.d2 = -2.916600457689847816445691e-6
+        self.d3 = 3.048480261700038788680723e-5
+        self.e3 = 4.985549387875068121593988e-7
+
+        self.dt_fractions = jnp.array(
             [
                 0.0,
                 self.a1,
@@ -93,40 +103,44 @@ class SixthOrderHamIntegrator(TimeIntegrator):
             ]
         )
 
-    def __call__(self, f: Array, a: Array, dex_array: Array, prev_ex: Array) -> Tuple[Array, Array]:
+    def __call__(self, f: Array, a: Array, dex_array: Array, prev_ex: Array, dt: float) -> Tuple[Array, Array]:
+        D1 = self.b1 + 2.0 * self.c1 * dt**2.0
+        D2 = self.b2 + 2.0 * self.c2 * dt**2.0 + 4.0 * self.d2 * dt**4.0
+        D3 = self.b3 + 2.0 * self.c3 * dt**2.0 + 4.0 * self.d3 * dt**4.0 - 8.0 * self.e3 * dt**6.0
+
         ponderomotive_force, self_consistent_ex = self.field_solve(f=f, a=a, prev_ex=None, dt=None)
         force = ponderomotive_force + dex_array[0] + self_consistent_ex
-        f = self.edfdv(f=f, e=force, dt=self.D1 * self.dt)
+        f = self.edfdv(f=f, e=force, dt=D1 * dt)
 
-        f = self.vdfdx(f=f, dt=self.a1 * self.dt)
+        f = self.vdfdx(f=f, dt=self.a1 * dt)
         ponderomotive_force, self_consistent_ex = self.field_solve(f=f, a=a, prev_ex=None, dt=None)
         force = ponderomotive_force + dex_array[1] + self_consistent_ex
 
-        f = self.edfdv(f=f, e=force, dt=self.D2 * self.dt)
+        f = self.edfdv(f=f, e=force, dt=D2 * dt)
 
-        f = self.vdfdx(f=f, dt=self.a2 * self.dt)
+        f = self.vdfdx(f=f, dt=self.a2 * dt)
         ponderomotive_force, self_consistent_ex = self.field_solve(f=f, a=a, prev_ex=None, dt=None)
         force = ponderomotive_force + dex_array[2] + self_consistent_ex
 
-        f = self.edfdv(f=f, e=force, dt=self.D3 * self.dt)
+        f = self.edfdv(f=f, e=force, dt=D3 * dt)
 
-        f = self.vdfdx(f=f, dt=self.a3 * self.dt)
+        f = self.vdfdx(f=f, dt=self.a3 * dt)
         ponderomotive_force, self_consistent_ex = self.field_solve(f=f, a=a, prev_ex=None, dt=None)
         force = ponderomotive_force + dex_array[3] + self_consistent_ex
 
-        f = self.edfdv(f=f, e=force, dt=self.D3 * self.dt)
+        f = self.edfdv(f=f, e=force, dt=D3 * dt)
 
-        f = self.vdfdx(f=f, dt=self.a2 * self.dt)
+        f = self.vdfdx(f=f, dt=self.a2 * dt)
         ponderomotive_force, self_consistent_ex = self.field_solve(f=f, a=a, prev_ex=None, dt=None)
         force = ponderomotive_force + dex_array[4] + self_consistent_ex
 
-        f = self.edfdv(f=f, e=force, dt=self.D2 * self.dt)
+        f = self.edfdv(f=f, e=force, dt=D2 * dt)
 
-        f = self.vdfdx(f=f, dt=self.a1 * self.dt)
+        f = self.vdfdx(f=f, dt=self.a1 * dt)
         ponderomotive_force, self_consistent_ex = self.field_solve(f=f, a=a, prev_ex=None, dt=None)
         force = ponderomotive_force + dex_array[5] + self_consistent_ex
 
-        f = self.edfdv(f=f, e=force, dt=self.D1 * self.dt)
+        f = self.edfdv(f=f, e=force, dt=D1 * dt)
 
         return self_consistent_ex, f
 
@@ -151,13 +165,20 @@ class VlasovPoissonFokkerPlanck:
             self.dex_save = 0
         else:
             raise NotImplementedError
-        self.fp = fokker_planck.Collisions(cfg=cfg)
+        if hermite.get_velocity_basis(cfg) == "hermite":
+            self.fp = hermite.HermiteCollisions(cfg=cfg)
+        elif is_species_batched(cfg):
+            # the same collision frequency profiles are applied to every species
+            self.fp = vlasov.SpeciesBatch(fokker_planck.Collisions, cfg)
+        else:
+            self.fp = fokker_planck.Collisions(cfg=cfg)
 
     def __call__(
-        self, f: Array, a: Array, prev_ex: Array, dex_array: Array, nu_fp: Array, nu_K: Array
+        self, f: Array, a: Array, prev_ex: Array, dex_array: Array, nu_fp: Array, nu_K: Array, step=0, dt=None
     ) -> Tuple[Array, Array]:
-        e, f = self.vlasov_poisson(f, a, dex_array, prev_ex)
-        f = self.fp(nu_fp, nu_K, f, dt=self.dt)
+        dt = self.dt if dt is None else dt
+        e, f = self.vlasov_poisson(f, a, dex_array, prev_ex, dt)
+        f = self.fp(nu_fp=nu_fp, nu_K=nu_K, f=f, dt=dt, step=step)
 
         return e, f
 
@@ -177,31 +198,73 @@ class VlasovMaxwell:
         self.dt = self.cfg["grid"]["dt"]
         self.ey_driver = field.Driver(cfg["grid"]["x_a"], driver_key="ey")
         self.ex_driver = field.Driver(cfg["grid"]["x"], driver_key="ex")
+        self.collision_keys = [k for k in ["fokker_planck", "krook"] if cfg["terms"][k]["is_on"]]
+        # the steps are not on a fixed grid if the step size is adaptive
+        self.tabulate_nu_time = {
+            k: cfg["terms"][k].get("tabulate_time", True) and "adaptive" not in cfg["grid"] for k in self.collision_keys
+        }
+        if "spectral" in cfg["save"]:
+            self.spectral_accumulator = SpectralAccumulator(cfg["save"]["spectral"], cfg["grid"])
+        else:
+            self.spectral_accumulator = None
 
     def compute_charges(self, f):
-        return jnp.sum(f, axis=1) * self.cfg["grid"]["dv"]
-
-    def nu_prof(self, t, nu_args):
-        t_L = nu_args["time"]["center"] - nu_args["time"]["width"] * 0.5
-        t_R = nu_args["time"]["center"] + nu_args["time"]["width"] * 0.5
-        t_wL = nu_args["time"]["rise"]
-        t_wR = nu_args["time"]["rise"]
-        x_L = nu_args["space"]["center"] - nu_args["space"]["width"] * 0.5
-        x_R = nu_args["space"]["center"] + nu_args["space"]["width"] * 0.5
-        x_wL = nu_args["space"]["rise"]
-        x_wR = nu_args["space"]["rise"]
-
-        nu_time = get_envelope(t_wL, t_wR, t_L, t_R, t)
-        if nu_args["time"]["bump_or_trough"] == "trough":
-            nu_time = 1 - nu_time
-        nu_time = nu_args["time"]["baseline"] + nu_args["time"]["bump_height"] * nu_time
-
-        nu_prof = get_envelope(x_wL, x_wR, x_L, x_R, self.cfg["grid"]["x"])
-        if nu_args["space"]["bump_or_trough"] == "trough":
-            nu_prof = 1 - nu_prof
-        nu_prof = nu_args["space"]["baseline"] + nu_args["space"]["bump_height"] * nu_prof
-
-        return nu_time * nu_prof
+        if hermite.get_velocity_basis(self.cfg) == "hermite":
+            return self.cfg["terms"]["velocity"]["alpha"] * f[:, 0]
+        elif is_species_batched(self.cfg):
+            # the contribution of each species to the plasma frequency in the wave equation
+            species = self.cfg["grid"]["species"]
+            return field.velocity_moment(f, species["dv"], species["plasma_weight"])
+        else:
+            return jnp.sum(f, axis=1) * self.cfg["grid"]["dv"]
+
+    def get_max_dt(self, y: Dict) -> Array:
+        """
+        The CFL limits of the ``v df/dx`` and ``E df/dv`` pushes, ``cfl * dx / max|v|`` and ``cfl * dv / max|E|``, for
+        the adaptive step size
+
+        :param y: the state
+        :return:
+        """
+        cfl = self.cfg["grid"]["adaptive"]["cfl"]
+        max_e = jnp.max(jnp.abs(y["e"] + y["de"])) + 1e-30
+        if is_species_batched(self.cfg):
+            species = self.cfg["grid"]["species"]
+            dt_x = cfl * self.cfg["grid"]["dx"] / jnp.max(jnp.abs(species["v"]))
+            dt_v = cfl * jnp.min(species["dv"] / jnp.abs(species["force_scale"])) / max_e
+        else:
+            dt_x = cfl * self.cfg["grid"]["dx"] / self.cfg["grid"]["vmax"]
+            dt_v = cfl * self.cfg["grid"]["dv"] / max_e
+
+        return jnp.minimum(dt_x, dt_v)
+
+    def get_nu_profiles(self, args: Dict) -> Dict:
+        """
+        This function precomputes the separable collision frequency profiles once per solve.
+
+        The spatial profile is always precomputed. The temporal envelope is either tabulated at every timestep or
+        left to be evaluated as a scalar in every step. Both are computed from ``args`` so that they remain
+        differentiable with respect to the envelope parameters
+
+        :param args:
+        :return: a dictionary of the spatial and (optionally) temporal profiles of each collision operator
+        """
+        step_times = self.dt * jnp.arange(self.cfg["grid"]["max_steps"])
+        nu_profiles = {}
+        for k in self.collision_keys:
+            nu_profiles[k] = {"space": fokker_planck.get_nu_space(self.cfg["grid"]["x"], args["terms"][k])}
+            if self.tabulate_nu_time[k]:
+                nu_profiles[k]["time"] = fokker_planck.get_nu_time(step_times, args["terms"][k])
+
+        return nu_profiles
+
+    def nu_prof(self, t, step, key, args):
+        if self.tabulate_nu_time[key]:
+            nu_time = args["nu_profiles"][key]["time"][step]
+        else:
+            nu_time = fokker_planck.get_nu_time(t, args["terms"][key])
+
+        return nu_time * args["nu_profiles"][key]["space"]
 
     def __call__(self, t, y, args):
         """
@@ -214,25 +277,50 @@ class VlasovMaxwell:
         :return:
         """
 
-        dex = [self.ex_driver(t + dt, args) for dt in self.vpfp.vlasov_poisson.dt_array]
-        djy = self.ey_driver(t + self.vpfp.vlasov_poisson.dt_array[1], args)
+        dt = get_step_size(args, self.dt)
+        dt_array = dt * self.vpfp.vlasov_poisson.dt_fractions
+        dex = [self.ex_driver(t + this_dt, args) for this_dt in dt_array]
+        djy = self.ey_driver(t + dt_array[1], args)
+
+        step = jnp.round(t / self.dt).astype(int)
 
         if self.cfg["terms"]["fokker_planck"]["is_on"]:
-            nu_fp_prof = self.nu_prof(t=t, nu_args=args["terms"]["fokker_planck"])
+            nu_fp_prof = self.nu_prof(t=t, step=step, key="fokker_planck", args=args)
         else:
             nu_fp_prof = None
 
         if self.cfg["terms"]["krook"]["is_on"]:
-            nu_K_prof = self.nu_prof(t=t, nu_args=args["terms"]["krook"])
+            nu_K_prof = self.nu_prof(t=t, step=step, key="krook", args=args)
         else:
             nu_K_prof = None
 
         electron_density_n = self.compute_charges(y["electron"])
-        e, f = self.vpfp(f=y["electron"], a=y["a"], prev_ex=y["e"], dex_array=dex, nu_fp=nu_fp_prof, nu_K=nu_K_prof)
+        e, f = self.vpfp(
+            f=y["electron"],
+            a=y["a"],
+            prev_ex=y["e"],
+            dex_array=dex,
+            nu_fp=nu_fp_prof,
+            nu_K=nu_K_prof,
+            step=step,
+            dt=dt,
+        )
         electron_density_np1 = self.compute_charges(f)
 
         a = self.wave_solver(
             a=y["a"], aold=y["prev_a"], djy_array=djy, electron_charge=0.5 * (electron_density_n + electron_density_np1)
         )
 
-        return {"electron": f, "a": a["a"], "prev_a": a["prev_a"], "da": djy, "de": dex[self.vpfp.dex_save], "e": e}
+        new_state = {
+            "electron": f,
+            "a": a["a"],
+            "prev_a": a["prev_a"],
+            "da": djy,
+            "de": dex[self.vpfp.dex_save],
+            "e": e,
+        }
+
+        if self.spectral_accumulator is not None:
+            new_state["spectral"] = self.spectral_accumulator.update(y["spectral"], t + dt, e, dt)
+
+        return new_state
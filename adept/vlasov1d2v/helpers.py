@@ -13,7 +13,7 @@ from diffrax import ODETerm, SubSaveAt, diffeqsolve, SaveAt
 from matplotlib import pyplot as plt
 from equinox import filter_jit
 
-from adept.vlasov1d2v.integrator import VlasovMaxwell, Stepper
+from adept.vlasov1d2v.integrator import VlasovMaxwell, Stepper, get_low_rank_stepper
 from adept.vlasov1d2v.storage import store_f, store_fields, get_save_quantities
 from adept.tf1d.pushers import get_envelope
 
@@ -327,7 +327,10 @@ def init_state(cfg: Dict, td) -> Tuple[Dict, Dict]:
 
     state = {}
     for species in ["electron"]:
-        state[species] = f
+        if "low_rank" in cfg["terms"]:
+            state[species] = get_low_rank_stepper(cfg).from_full(np.reshape(f, (cfg["grid"]["nx"], -1)))
+        else:
+            state[species] = f
 
     for field in ["e", "de"]:
         state[field] = jnp.zeros(cfg["grid"]["nx"])
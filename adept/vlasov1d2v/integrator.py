@@ -1,12 +1,14 @@
-from typing import Tuple
+from typing import Dict, Tuple
 
 from functools import partial
 
+import numpy as np
 from jax import numpy as jnp
 import diffrax
 
 from adept.vlasov1d2v.pushers import field, fokker_planck, vlasov
 from adept.tf1d.pushers import get_envelope
+from adept.utils import low_rank
 
 
 class Stepper(diffrax.Euler):
@@ -65,6 +67,57 @@ class LeapfrogIntegrator(TimeIntegrator):
         return e, f
 
 
+def get_low_rank_stepper(cfg) -> low_rank.LowRankStepper:
+    """
+    The velocity basis is augmented by ``1``, ``v_x`` and ``v_y`` so that the density and momentum are conserved by
+    the truncation.
+
+    ``terms: low_rank: max_rank`` is the rank of the factors and ``tol``, if given, is the relative tolerance of the
+    singular values that are kept, which makes the rank adaptive
+
+    :param cfg:
+    :return:
+    """
+    vx, vy = np.meshgrid(cfg["grid"]["v"], cfg["grid"]["v"], indexing="ij")
+    return low_rank.LowRankStepper(
+        low_rank.get_conserved_basis([np.ones_like(vx), vx, vy]),
+        max_rank=cfg["terms"]["low_rank"]["max_rank"],
+        tol=cfg["terms"]["low_rank"].get("tol", 0.0),
+    )
+
+
+class LowRankLeapfrogIntegrator:
+    """
+    The leapfrog step on the low-rank factors ``{"X", "S", "V"}`` of the distribution function. Each split step is
+    a rank-adaptive BUG step so the memory and the cost of a step scale with ``rank * (nx + nv^2)``
+
+    :param cfg:
+    """
+
+    def __init__(self, cfg):
+        self.dt = cfg["grid"]["dt"]
+        self.dt_array = self.dt * jnp.array([0.0, 1.0])
+        self.field_solve = field.ElectricFieldSolver(cfg)
+
+        nx, nv = cfg["grid"]["nx"], cfg["grid"]["nv"]
+        vx = jnp.repeat(cfg["grid"]["v"][:, None], nv, axis=1)
+        self.stepper = get_low_rank_stepper(cfg)
+        self.vdfdx = low_rank.Term(low_rank.Derivative(cfg["grid"]["kx"], (nx,), axis=0), low_rank.Multiply(vx))
+        self.ddvx = low_rank.Derivative(cfg["grid"]["kv"], (nv, nv), axis=0)
+
+    def __call__(self, f, a, dex_array, prev_ex) -> Tuple[jnp.ndarray, Dict]:
+        f_after_v = self.stepper(f, self.vdfdx, dt=self.dt)
+        if self.field_solve.hampere:
+            f_for_field = f
+        else:
+            f_for_field = f_after_v
+        pond, e = self.field_solve(f=f_for_field, a=a, prev_ex=prev_ex, dt=self.dt)
+        edfdv = low_rank.Term(low_rank.Multiply(pond + e + dex_array[0]), self.ddvx)
+        f = self.stepper(f_after_v, edfdv, dt=self.dt)
+
+        return e, f
+
+
 class SixthOrderHamIntegrator(TimeIntegrator):
     """
 
@@ -151,14 +204,23 @@ class VlasovPoissonFokkerPlanck:
         self.dt = cfg["grid"]["dt"]
         self.v = cfg["grid"]["v"]
         if cfg["terms"]["time"] == "sixth":
+            if "low_rank" in cfg["terms"]:
+                raise NotImplementedError("The low-rank integrator is only implemented with the leapfrog scheme")
             self.vlasov_poisson = SixthOrderHamIntegrator(cfg)
             self.dex_save = 3
         elif cfg["terms"]["time"] == "leapfrog":
-            self.vlasov_poisson = LeapfrogIntegrator(cfg)
+            if "low_rank" in cfg["terms"]:
+                self.vlasov_poisson = LowRankLeapfrogIntegrator(cfg)
+            else:
+                self.vlasov_poisson = LeapfrogIntegrator(cfg)
             self.dex_save = 0
         else:
             raise NotImplementedError
-        self.fp = fokker_planck.Collisions(cfg=cfg)
+
+        if "low_rank" in cfg["terms"]:
+            self.fp = fokker_planck.LowRankCollisions(cfg=cfg, stepper=self.vlasov_poisson.stepper)
+        else:
+            self.fp = fokker_planck.Collisions(cfg=cfg)
 
     def __call__(
         self,
@@ -189,8 +251,11 @@ class VlasovMaxwell:
         self.dt = self.cfg["grid"]["dt"]
         self.ey_driver = field.Driver(cfg["grid"]["x_a"], driver_key="ey")
         self.ex_driver = field.Driver(cfg["grid"]["x"], driver_key="ex")
+        self.charge_weights = jnp.ones((cfg["grid"]["nv"] ** 2, 1)) * cfg["grid"]["dv"] * cfg["grid"]["dv"]
 
     def compute_charges(self, f):
+        if "low_rank" in self.cfg["terms"]:
+            return low_rank.moments(f, self.charge_weights)[:, 0]
         return jnp.sum(jnp.sum(f, axis=2), axis=1) * self.cfg["grid"]["dv"] * self.cfg["grid"]["dv"]
 
     def nu_prof(self, t, nu_args):
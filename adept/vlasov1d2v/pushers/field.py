@@ -7,6 +7,7 @@ from functools import partial
 from jax import numpy as jnp
 
 from adept.tf1d.pushers import get_envelope
+from adept.utils import low_rank
 
 
 class Driver:
@@ -148,24 +149,77 @@ class HampereSolver:
         return jnp.real(jnp.fft.ifft(new_ek))
 
 
+class LowRankPoissonSolver(SpectralPoissonSolver):
+    """
+    The charge is computed from the low-rank factors of the distribution function
+
+    """
+
+    def __init__(self, ion_charge, one_over_kx, dv, nv):
+        super(LowRankPoissonSolver, self).__init__(ion_charge, one_over_kx, dv)
+        self.weights = jnp.ones((nv * nv, 1)) * dv * dv
+
+    def compute_charges(self, f: Dict):
+        return low_rank.moments(f, self.weights)[:, 0]
+
+
+class LowRankAmpereSolver:
+    def __init__(self, cfg):
+        vx = jnp.repeat(cfg["grid"]["v"][:, None], cfg["grid"]["nv"], axis=1)
+        self.weights = jnp.reshape(vx, (-1, 1)) * cfg["grid"]["dv"] * cfg["grid"]["dv"]
+
+    def __call__(self, f: Dict, prev_ex: jnp.ndarray, dt: jnp.float64):
+        return prev_ex - dt * low_rank.moments(f, self.weights)[:, 0]
+
+
+class LowRankHampereSolver:
+    """
+    The velocity integral of the exact free-streaming current is computed on the velocity basis so that ``f`` is not
+    formed
+
+    """
+
+    def __init__(self, cfg):
+        self.vx = cfg["grid"]["v"][None, :]
+        self.dv = cfg["grid"]["dv"]
+        self.nv = cfg["grid"]["nv"]
+        self.kx = cfg["grid"]["kx"][:, None]
+        self.one_over_ikx = cfg["grid"]["one_over_kx"] / 1j
+
+    def __call__(self, f: Dict, prev_ex: jnp.ndarray, dt: jnp.float64):
+        prev_ek = jnp.fft.fft(prev_ex, axis=0)
+        xsk = jnp.fft.fft(f["X"], axis=0) @ f["S"]
+        v_vx = jnp.sum(jnp.reshape(f["V"], (self.nv, self.nv, -1)), axis=1)
+        kernel = (jnp.exp(-1j * self.kx * dt * self.vx) - 1) @ v_vx
+        new_ek = prev_ek + self.one_over_ikx * jnp.sum(xsk * kernel, axis=1) * self.dv * self.dv
+
+        return jnp.real(jnp.fft.ifft(new_ek))
+
+
 class ElectricFieldSolver:
     def __init__(self, cfg):
         super(ElectricFieldSolver, self).__init__()
+        is_low_rank = "low_rank" in cfg["terms"]
 
         if cfg["terms"]["field"] == "poisson":
-            self.es_field_solver = SpectralPoissonSolver(
-                ion_charge=cfg["grid"]["ion_charge"], one_over_kx=cfg["grid"]["one_over_kx"], dv=cfg["grid"]["dv"]
-            )
+            if is_low_rank:
+                self.es_field_solver = LowRankPoissonSolver(
+                    cfg["grid"]["ion_charge"], cfg["grid"]["one_over_kx"], cfg["grid"]["dv"], cfg["grid"]["nv"]
+                )
+            else:
+                self.es_field_solver = SpectralPoissonSolver(
+                    ion_charge=cfg["grid"]["ion_charge"], one_over_kx=cfg["grid"]["one_over_kx"], dv=cfg["grid"]["dv"]
+                )
             self.hampere = False
         elif cfg["terms"]["field"] == "ampere":
             if cfg["terms"]["time"] == "leapfrog":
-                self.es_field_solver = AmpereSolver(cfg)
+                self.es_field_solver = LowRankAmpereSolver(cfg) if is_low_rank else AmpereSolver(cfg)
                 self.hampere = False
             else:
                 raise NotImplementedError(f"ampere + {cfg['terms']['time']} has not yet been implemented")
         elif cfg["terms"]["field"] == "hampere":
             if cfg["terms"]["time"] == "leapfrog":
-                self.es_field_solver = HampereSolver(cfg)
+                self.es_field_solver = LowRankHampereSolver(cfg) if is_low_rank else HampereSolver(cfg)
                 self.hampere = True
             else:
                 raise NotImplementedError(f"ampere + {cfg['terms']['time']} has not yet been implemented")
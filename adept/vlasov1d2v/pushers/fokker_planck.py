@@ -6,9 +6,11 @@ from typing import Dict, Tuple
 import numpy as np
 from jax import numpy as jnp, vmap
 from jax.scipy.ndimage import map_coordinates as mp
-import lineax as lx
 from interpax import interp2d
 
+from adept.utils import low_rank
+from adept.utils.tridiagonal import TridiagonalSolver
+
 
 class Collisions:
     def __init__(self, cfg):
@@ -51,6 +53,48 @@ class Collisions:
         return f
 
 
+class LowRankCollisions:
+    """
+    The Dougherty operator acting on the low-rank factors of the distribution function
+
+    The drift velocity and the temperature are averaged over space so that the operator is the product of the
+    collision frequency profile and a velocity space operator and can be integrated without forming ``f``.
+    The boundaries are zero-flux so that the density and the momentum are conserved to round-off by the Galerkin steps
+
+    :param cfg:
+    :param stepper: the ``LowRankStepper`` of the Vlasov steps
+    """
+
+    def __init__(self, cfg, stepper: low_rank.LowRankStepper):
+        self.cfg = cfg
+        if self.cfg["terms"]["fokker_planck"]["nu_ei"]["is_on"]:
+            raise NotImplementedError("The electron-ion collision operator has not been implemented for low rank")
+        self.stepper = stepper
+        self.v = self.cfg["grid"]["v"]
+        self.dv = self.cfg["grid"]["dv"]
+        self.shape = (self.cfg["grid"]["nv"], self.cfg["grid"]["nv"])
+        vx, vy = jnp.meshgrid(self.v, self.v, indexing="ij")
+        self.moment_weights = jnp.stack([jnp.ones_like(vx), vx, vy, vx**2.0, vy**2.0], axis=-1).reshape(-1, 5)
+        self.moment_weights = self.moment_weights * self.dv * self.dv
+
+    def _get_term_(self, nu, vbar, v0t_sq, axis):
+        lower = v0t_sq / self.dv**2.0 - (jnp.roll(self.v, 1) - vbar) / 2.0 / self.dv
+        upper = v0t_sq / self.dv**2.0 + (jnp.roll(self.v, -1) - vbar) / 2.0 / self.dv
+        diagonal = -2.0 * v0t_sq / self.dv**2.0 * jnp.ones_like(self.v)
+        diagonal = diagonal.at[0].set(-lower[1]).at[-1].set(-upper[-2])
+        operator = low_rank.Tridiagonal(lower, diagonal, upper, self.shape, axis)
+        return low_rank.Term(low_rank.Multiply(-nu), operator, implicit=True)
+
+    def __call__(self, nu_ee: jnp.ndarray, nu_ei: jnp.ndarray, nu_K: jnp.ndarray, f: Dict, dt: jnp.float64) -> Dict:
+        if self.cfg["terms"]["fokker_planck"]["nu_ee"]["is_on"]:
+            n, jx, jy, m2x, m2y = jnp.sum(low_rank.moments(f, self.moment_weights), axis=0)
+            vxbar, vybar = jx / n, jy / n
+            f = self.stepper(f, self._get_term_(nu_ee, vxbar, m2x / n - vxbar**2.0, axis=0), dt)
+            f = self.stepper(f, self._get_term_(nu_ee, vybar, m2y / n - vybar**2.0, axis=1), dt)
+
+        return f
+
+
 class Krook:
     def __init__(self, cfg):
         self.cfg = cfg
@@ -75,11 +119,7 @@ class Dougherty:
         self.v = self.cfg["grid"]["v"]
         self.dv = self.cfg["grid"]["dv"]
         self.ones = jnp.ones(self.cfg["grid"]["nv"])
-        self.scan_over_vy = vmap(self._solve_one_vslice_, in_axes=(None, 1), out_axes=1)
-        self.scan_over_vx = vmap(self._solve_one_vslice_, in_axes=(None, 0), out_axes=0)
-
-    def _solve_one_vslice_(self, operator, f_vxvy):
-        return lx.linear_solve(operator, f_vxvy, solver=lx.Tridiagonal()).value
+        self.td_solver = TridiagonalSolver()
 
     def ddx(self, f_vxvy: jnp.ndarray):
         return jnp.gradient(f_vxvy, self.dv, axis=0)
@@ -100,12 +140,10 @@ class Dougherty:
 
     def _get_operator_(self, nu, vbar, v0t_sq, dt):
         # TODO
-        lower_diagonal = nu * dt * (-v0t_sq / self.dv**2.0 + (self.v[:-1] - vbar) / 2.0 / self.dv)
+        lower_diagonal = nu * dt * (-v0t_sq / self.dv**2.0 + (jnp.roll(self.v, 1) - vbar) / 2.0 / self.dv)
         diagonal = 1.0 + nu * dt * self.ones * (2.0 * v0t_sq / self.dv**2.0)
-        upper_diagonal = nu * dt * (-v0t_sq / self.dv**2.0 - (self.v[1:] - vbar) / 2.0 / self.dv)
-        return lx.TridiagonalLinearOperator(
-            diagonal=diagonal, upper_diagonal=upper_diagonal, lower_diagonal=lower_diagonal
-        )
+        upper_diagonal = nu * dt * (-v0t_sq / self.dv**2.0 - (jnp.roll(self.v, -1) - vbar) / 2.0 / self.dv)
+        return lower_diagonal, diagonal, upper_diagonal
 
     def implicit_vx(self, nu: jnp.float64, f_vxvy: jnp.ndarray, dt: jnp.float64) -> jnp.ndarray:
         """
@@ -117,8 +155,8 @@ class Dougherty:
         """
 
         vxbar, v0t_sq = self.get_init_quants_x(f_vxvy)
-        operator = self._get_operator_(nu, vxbar, v0t_sq, dt)
-        return self.scan_over_vy(operator, f_vxvy)
+        lower_diagonal, diagonal, upper_diagonal = self._get_operator_(nu, vxbar, v0t_sq, dt)
+        return self.td_solver(lower_diagonal, diagonal, upper_diagonal, f_vxvy.T).T
 
     def implicit_vy(self, nu: jnp.float64, f_vxvy: jnp.ndarray, dt: jnp.float64) -> jnp.ndarray:
         """
@@ -130,8 +168,8 @@ class Dougherty:
         """
 
         vybar, v0t_sq = self.get_init_quants_y(f_vxvy)
-        operator = self._get_operator_(nu, vybar, v0t_sq, dt)
-        return self.scan_over_vx(operator, f_vxvy)
+        lower_diagonal, diagonal, upper_diagonal = self._get_operator_(nu, vybar, v0t_sq, dt)
+        return self.td_solver(lower_diagonal, diagonal, upper_diagonal, f_vxvy)
 
     def explicit_vx(self, nu, f_vxvy, dt: jnp.float64):
         vxbar, v0t_sq = self.get_init_quants_x(f_vxvy)
@@ -171,6 +209,7 @@ class Banks:
         Nth = self.cfg["terms"]["fokker_planck"]["nu_ei"]["nth"]
         Nr = self.cfg["terms"]["fokker_planck"]["nu_ei"]["nr"]
         self.ones = jnp.ones(Nth)
+        self.td_solver = TridiagonalSolver()
 
         self.dth = dth = 2 * np.pi / Nth
         rmax = cfg["grid"]["vmax"]
@@ -240,17 +279,7 @@ class Banks:
     def solve_implicit(self, fth, nu, dt):
         c = self.nu_envelope[:, None] * nu * dt / self.dth**2.0
         rhs = jnp.concatenate([fth[:, :1] + c * fth[:, -1:], fth[:, 1:-1], fth[:, -1:] + c * fth[:, :1]], axis=1)
-        return vmap(self._solve_one_vr_, in_axes=(0, 0))(c, rhs)
-
-    def _solve_one_vr_(self, nu_coeff, rhs):
-        lower_diagonal = -nu_coeff * self.ones[:-1]
-        diagonal = 1.0 + 2.0 * nu_coeff * self.ones
-        upper_diagonal = -nu_coeff * self.ones[:-1]
-        op = lx.TridiagonalLinearOperator(
-            diagonal=diagonal, upper_diagonal=upper_diagonal, lower_diagonal=lower_diagonal
-        )
-
-        return lx.linear_solve(op, rhs, lx.Tridiagonal()).value
+        return self.td_solver(-c * self.ones[None, :], 1.0 + 2.0 * c * self.ones[None, :], -c * self.ones[None, :], rhs)
 
     def solve_azimuthal(self, f_vxvy, nu, dt):
 
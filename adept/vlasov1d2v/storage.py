@@ -8,6 +8,8 @@ from jax import numpy as jnp, vmap
 import numpy as np
 import xarray as xr
 
+from adept.utils import low_rank
+
 
 def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, prefix: str) -> xr.Dataset:
     """
@@ -124,26 +126,61 @@ def store_f(cfg: Dict, this_t: Dict, binary_dir: str, ys: Dict) -> Dict:
 #         clean_td(td)
 
 
+def _get_low_rank_moments_func_(cfg):
+    """
+    The moments of the low-rank factors of the distribution function, which are the same as the ones in
+    ``get_field_save_func`` except for the entropy, which cannot be computed without forming ``f``
+
+    """
+    vx, vy = np.meshgrid(cfg["grid"]["v"], cfg["grid"]["v"], indexing="ij")
+    vx, vy = vx.reshape(-1), vy.reshape(-1)
+    weights = np.stack([np.ones_like(vx), vx, vy, vx**2.0, vx**3.0, vy**2.0, vy**3.0], axis=1)
+    weights = jnp.array(weights * cfg["grid"]["dv"] * cfg["grid"]["dv"])
+
+    def _calc_moments_(f):
+        n, jx, jy, m2x, m3x, m2y, m3y = low_rank.moments(f, weights).T
+        return {
+            "n": n,
+            "vx": jx,
+            "vy": jy,
+            "px": m2x - 2.0 * jx * jx + jx**2.0 * n,
+            "qx": m3x - 3.0 * jx * m2x + 3.0 * jx**2.0 * jx - jx**3.0 * n,
+            "py": m2y - 2.0 * jy * jy + jy**2.0 * n,
+            "qy": m3y - 3.0 * jy * m2y + 3.0 * jy**2.0 * jy - jy**3.0 * n,
+            "f^2": low_rank.squared_norms(f) * cfg["grid"]["dv"] * cfg["grid"]["dv"],
+        }
+
+    return _calc_moments_
+
+
 def get_field_save_func(cfg, k):
     if {"t"} == set(cfg["save"][k].keys()):
 
         def _calc_moment_(inp):
             return jnp.sum(jnp.sum(inp, axis=2), axis=1) * cfg["grid"]["dv"] * cfg["grid"]["dv"]
 
-        def fields_save_func(t, y, args):
+        def _calc_moments_(f):
             temp = {
-                "n": _calc_moment_(y["electron"]),
-                "vx": _calc_moment_(y["electron"] * cfg["grid"]["v"][None, :, None]),
-                "vy": _calc_moment_(y["electron"] * cfg["grid"]["v"][None, None, :]),
+                "n": _calc_moment_(f),
+                "vx": _calc_moment_(f * cfg["grid"]["v"][None, :, None]),
+                "vy": _calc_moment_(f * cfg["grid"]["v"][None, None, :]),
             }
             vx_m_vxbar = cfg["grid"]["v"][None, :, None] - temp["vx"][:, None, None]
             vy_m_vybar = cfg["grid"]["v"][None, None, :] - temp["vy"][:, None, None]
-            temp["px"] = _calc_moment_(y["electron"] * vx_m_vxbar**2.0)
-            temp["qx"] = _calc_moment_(y["electron"] * vx_m_vxbar**3.0)
-            temp["py"] = _calc_moment_(y["electron"] * vy_m_vybar**2.0)
-            temp["qy"] = _calc_moment_(y["electron"] * vy_m_vybar**3.0)
-            temp["-flogf"] = _calc_moment_(y["electron"] * jnp.log(jnp.abs(y["electron"])))
-            temp["f^2"] = _calc_moment_(y["electron"] * y["electron"])
+            temp["px"] = _calc_moment_(f * vx_m_vxbar**2.0)
+            temp["qx"] = _calc_moment_(f * vx_m_vxbar**3.0)
+            temp["py"] = _calc_moment_(f * vy_m_vybar**2.0)
+            temp["qy"] = _calc_moment_(f * vy_m_vybar**3.0)
+            temp["-flogf"] = _calc_moment_(f * jnp.log(jnp.abs(f)))
+            temp["f^2"] = _calc_moment_(f * f)
+
+            return temp
+
+        if "low_rank" in cfg["terms"]:
+            _calc_moments_ = _get_low_rank_moments_func_(cfg)
+
+        def fields_save_func(t, y, args):
+            temp = _calc_moments_(y["electron"])
             temp["e"] = y["e"]
             temp["de"] = y["de"]
             temp["a"] = y["a"]
@@ -200,6 +237,8 @@ def get_dist_save_func(cfg, k):
         cfg["save"][k]["vy"]["ax"] = cfg["grid"]["v"]
 
         def dist_save_func(t, y, args):
+            if "low_rank" in cfg["terms"]:
+                return low_rank.to_full(y["electron"]).reshape(cfg["grid"]["nx"], cfg["grid"]["nv"], cfg["grid"]["nv"])
             return y["electron"]
 
     elif {"t", "x", "vx"} == set(cfg["save"][k].keys()):
@@ -221,7 +260,11 @@ def get_dist_save_func(cfg, k):
                 return fp
 
         def dist_save_func(t, y, args):
-            fxvx = jnp.sum(y["electron"], axis=2) * cfg["grid"]["dv"]
+            if "low_rank" in cfg["terms"]:
+                v_vx = jnp.sum(jnp.reshape(y["electron"]["V"], (cfg["grid"]["nv"], cfg["grid"]["nv"], -1)), axis=1)
+                fxvx = y["electron"]["X"] @ y["electron"]["S"] @ v_vx.T * cfg["grid"]["dv"]
+            else:
+                fxvx = jnp.sum(y["electron"], axis=2) * cfg["grid"]["dv"]
             f_interp_x = interp_x(fp=fxvx)
             f_interp_xv = interp_vx(fp=f_interp_x)
             return f_interp_xv
@@ -275,14 +318,31 @@ def get_default_save_func(cfg):
     def _calc_mean_moment_(inp):
         return jnp.mean(jnp.sum(jnp.sum(inp, axis=2), axis=1)) * dv * dv
 
+    def _calc_mean_moments_(f):
+        return {
+            "mean_P": _calc_mean_moment_(f * v**2.0),
+            "mean_j": _calc_mean_moment_(f * v),
+            "mean_n": _calc_mean_moment_(f),
+            "mean_q": _calc_mean_moment_(f * v**3.0),
+            "mean_-flogf": _calc_mean_moment_(-jnp.log(jnp.abs(f)) * jnp.abs(f)),
+            "mean_f2": _calc_mean_moment_(f * f),
+        }
+
+    if "low_rank" in cfg["terms"]:
+        vy = np.repeat(cfg["grid"]["v"][None, :], cfg["grid"]["nv"], axis=0).reshape(-1)
+        weights = jnp.array(np.stack([vy**2.0, vy, np.ones_like(vy), vy**3.0], axis=1) * dv * dv)
+
+        def _calc_mean_moments_(f):
+            mean_moments = jnp.mean(low_rank.moments(f, weights), axis=0)
+            return {
+                **{nm: mean_moments[i] for i, nm in enumerate(["mean_P", "mean_j", "mean_n", "mean_q"])},
+                "mean_f2": jnp.mean(low_rank.squared_norms(f)) * dv * dv,
+                "rank": low_rank.effective_rank(f),
+            }
+
     def save(t, y, args):
         scalars = {
-            "mean_P": _calc_mean_moment_(y["electron"] * v**2.0),
-            "mean_j": _calc_mean_moment_(y["electron"] * v),
-            "mean_n": _calc_mean_moment_(y["electron"]),
-            "mean_q": _calc_mean_moment_(y["electron"] * v**3.0),
-            "mean_-flogf": _calc_mean_moment_(-jnp.log(jnp.abs(y["electron"])) * jnp.abs(y["electron"])),
-            "mean_f2": _calc_mean_moment_(y["electron"] * y["electron"]),
+            **_calc_mean_moments_(y["electron"]),
             "mean_de2": jnp.mean(y["de"] ** 2.0),
             "mean_e2": jnp.mean(y["e"] ** 2.0),
             "mean_pond": jnp.mean(-0.5 * jnp.gradient(y["a"] ** 2.0, cfg["grid"]["dx"])[1:-1]),
@@ -355,7 +355,11 @@ def init_state(cfg: Dict, td) -> Tuple[Dict, Dict]:
 
     state = {}
     for species in ["electron"]:
-        state[species] = f
+        if "low_rank" in cfg["solver"]:
+            f_xv = np.reshape(f, (cfg["grid"]["nx"] * cfg["grid"]["ny"], -1))
+            state[species] = time_integrator.get_low_rank_stepper(cfg).from_full(f_xv)
+        else:
+            state[species] = f
 
     for field in ["ex", "ey", "bz", "dex", "dey"]:
         state[field] = jnp.zeros((cfg["grid"]["nx"], cfg["grid"]["ny"]))
@@ -371,7 +375,10 @@ def get_diffeqsolve_quants(cfg):
     # if cfg["solver"]["field"] == "poisson":
     #     VectorField = time_integrator.LeapfrogIntegrator(cfg)
     # elif cfg["solver"]["field"] == "maxwell":
-    VectorField = time_integrator.ChargeConservingMaxwell(cfg)
+    if "low_rank" in cfg["solver"]:
+        VectorField = time_integrator.LowRankChargeConservingMaxwell(cfg)
+    else:
+        VectorField = time_integrator.ChargeConservingMaxwell(cfg)
     # else:
     #     raise NotImplementedError
 
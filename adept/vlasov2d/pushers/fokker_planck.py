@@ -7,7 +7,7 @@ import numpy as np
 from jax import numpy as jnp
 import equinox as eqx
 
-from adept.vlasov2d.solver.tridiagonal import TridiagonalSolver
+from adept.utils.tridiagonal import TridiagonalSolver
 
 
 class Collisions(eqx.Module):
@@ -16,7 +16,7 @@ class Collisions(eqx.Module):
         self.cfg = cfg
         self.fp = self.__init_fp_operator__()
         self.krook = Krook(self.cfg)
-        self.td_solver = TridiagonalSolver(self.cfg)
+        self.td_solver = TridiagonalSolver()
 
     def __init_fp_operator__(self):
         if self.cfg["solver"]["fp_operator"] == "lenard_bernstein":
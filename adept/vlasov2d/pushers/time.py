@@ -1,8 +1,10 @@
 from typing import Dict, Tuple
 
+import numpy as np
 from jax import numpy as jnp
 import diffrax
 
+from adept.utils import low_rank
 from adept.vlasov2d.pushers import vlasov, field
 
 
@@ -120,3 +122,116 @@ class ChargeConservingMaxwell(VlasovFieldBase):
         e1n, e2n = jnp.real(jnp.fft.ifft2(exkp)), jnp.real(jnp.fft.ifft2(eykp))
 
         return {"electron": f2_xy, "ex": e1n, "ey": e2n, "bz": bzn, "dex": dex, "dey": dey}
+
+
+def get_low_rank_stepper(cfg: Dict) -> low_rank.LowRankStepper:
+    """
+    The velocity basis is augmented by ``1``, ``v_x`` and ``v_y`` so that the density and momentum are conserved by
+    the truncation.
+
+    ``solver: low_rank: max_rank`` is the rank of the factors and ``tol``, if given, is the relative tolerance of the
+    singular values that are kept, which makes the rank adaptive
+
+    :param cfg:
+    :return:
+    """
+    vx, vy = np.meshgrid(cfg["grid"]["vx"], cfg["grid"]["vy"], indexing="ij")
+    return low_rank.LowRankStepper(
+        low_rank.get_conserved_basis([np.ones_like(vx), vx, vy]),
+        max_rank=cfg["solver"]["low_rank"]["max_rank"],
+        tol=cfg["solver"]["low_rank"].get("tol", 0.0),
+    )
+
+
+class LowRankChargeConservingMaxwell(ChargeConservingMaxwell):
+    """
+    The same Hamiltonian splitting as ``ChargeConservingMaxwell`` on the low-rank factors ``{"X", "S", "V"}`` of the
+    distribution function, where ``X`` is on the ``(x, y)`` grid and ``V`` on the ``(vx, vy)`` grid. Each split step
+    is a rank-adaptive BUG step so the memory and the cost of a step scale with ``rank * (nx ny + nvx nvy)``
+
+    :param cfg:
+    :return:
+    """
+
+    def __init__(self, cfg: Dict):
+        super(LowRankChargeConservingMaxwell, self).__init__(cfg)
+        self.stepper = get_low_rank_stepper(cfg)
+        self.nvx, self.nvy = cfg["grid"]["nvx"], cfg["grid"]["nvy"]
+        self.dvx, self.dvy = cfg["grid"]["dvx"], cfg["grid"]["dvy"]
+        x_shape, v_shape = (cfg["grid"]["nx"], cfg["grid"]["ny"]), (self.nvx, self.nvy)
+        vx, vy = cfg["grid"]["vx"][:, None], cfg["grid"]["vy"][None, :]
+        self.vx_ax, self.vy_ax = cfg["grid"]["vx"][None, :], cfg["grid"]["vy"][None, :]
+
+        self.vdfdx = low_rank.Term(
+            low_rank.Derivative(self.kx, x_shape, axis=0), low_rank.Multiply(jnp.broadcast_to(vx, v_shape))
+        )
+        self.vdfdy = low_rank.Term(
+            low_rank.Derivative(self.ky, x_shape, axis=1), low_rank.Multiply(jnp.broadcast_to(vy, v_shape))
+        )
+        self.ddvx = low_rank.Derivative(cfg["grid"]["kvx"], v_shape, axis=0)
+        self.ddvy = low_rank.Derivative(cfg["grid"]["kvy"], v_shape, axis=1)
+        self.vy_ddvx = low_rank.Derivative(cfg["grid"]["kvx"], v_shape, axis=0, g=vy)
+        self.vx_ddvy = low_rank.Derivative(cfg["grid"]["kvy"], v_shape, axis=1, g=vx)
+
+        self.one_over_ikx = cfg["grid"]["one_over_kx"][:, None] / 1j
+        self.one_over_iky = cfg["grid"]["one_over_ky"][None, :] / 1j
+
+    def _xs_k_(self, f: Dict) -> jnp.ndarray:
+        return jnp.fft.fft2(jnp.reshape(f["X"] @ f["S"], (self.kx.size, self.ky.size, -1)), axes=(0, 1))
+
+    def hampere_e1(self, exk, f: Dict, dt):
+        """
+        ``field.FieldSolver.hampere_e1`` where the velocity integral of the exact free-streaming current is computed
+        on the velocity basis
+
+        """
+        v_vx = jnp.sum(jnp.reshape(f["V"], (self.nvx, self.nvy, -1)), axis=1)
+        kernel = (jnp.exp(-1j * self.kx[:, None] * dt * self.vx_ax) - 1) @ v_vx
+        return exk + self.one_over_ikx * jnp.sum(self._xs_k_(f) * kernel[:, None, :], axis=-1) * self.dvx * self.dvy
+
+    def hampere_e2(self, eyk, f: Dict, dt):
+        v_vy = jnp.sum(jnp.reshape(f["V"], (self.nvx, self.nvy, -1)), axis=0)
+        kernel = (jnp.exp(-1j * self.ky[:, None] * dt * self.vy_ax) - 1) @ v_vy
+        return eyk + self.one_over_iky * jnp.sum(self._xs_k_(f) * kernel[None, :, :], axis=-1) * self.dvx * self.dvy
+
+    def __call__(self, t: float, y: Dict, args: Dict) -> Dict:
+        ex, ey, bz, f = y["ex"], y["ey"], y["bz"], y["electron"]
+
+        dex, dey = self.driver(t, args)
+
+        # H_E
+        # update e df/dv, the two velocity shifts commute
+        fhe_xy = self.stepper(f, low_rank.Term(low_rank.Multiply(ex + dex), self.ddvx), dt=self.dt)
+        fhe_xy = self.stepper(fhe_xy, low_rank.Term(low_rank.Multiply(ey + dey), self.ddvy), dt=self.dt)
+
+        exk, eyk, bzk = jnp.fft.fft2(ex), jnp.fft.fft2(ey), jnp.fft.fft2(bz)
+
+        # update b
+        bzkp = self.field_solve.faraday(bzk=bzk, exk=exk, eyk=eyk, dt=self.dt)
+        bzn = jnp.real(jnp.fft.ifft2(bzkp))
+
+        # H_1f
+        # update vxB df/dv
+        fb1_xy = self.stepper(fhe_xy, low_rank.Term(low_rank.Multiply(bzn), self.vy_ddvx), dt=self.dt)
+
+        # update v1 df/dx1
+        f1_xy = self.stepper(fb1_xy, self.vdfdx, dt=self.dt)
+        # update e1
+        e1p = self.hampere_e1(exk=exk, f=fb1_xy, dt=self.dt)
+
+        # H_2f
+        # update vxB df/dv
+        fb2_xy = self.stepper(f1_xy, low_rank.Term(low_rank.Multiply(-bzn), self.vx_ddvy), dt=self.dt)
+
+        # update v2 df/dx2
+        f2_xy = self.stepper(fb2_xy, self.vdfdy, dt=self.dt)
+        # update e2
+        e2p = self.hampere_e2(eyk=eyk, f=fb2_xy, dt=self.dt)
+
+        # H_B
+        # update E -> dE/dt = curl B
+        exkp, eykp = self.field_solve.ampere(exk=e1p, eyk=e2p, bzk=bzkp, dt=self.dt)
+
+        e1n, e2n = jnp.real(jnp.fft.ifft2(exkp)), jnp.real(jnp.fft.ifft2(eykp))
+
+        return {"electron": f2_xy, "ex": e1n, "ey": e2n, "bz": bzn, "dex": dex, "dey": dey}
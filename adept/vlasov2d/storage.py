@@ -7,6 +7,8 @@ from jax import numpy as jnp
 import numpy as np
 import xarray as xr
 
+from adept.utils import low_rank
+
 
 def store_fields(cfg: Dict, binary_dir: str, fields: Dict, this_t: np.ndarray, prefix: str) -> xr.Dataset:
     """
@@ -181,6 +183,9 @@ def get_dist_save_func(cfg, k):
     if {"t"} == set(cfg["save"][k].keys()):
 
         def dist_save_func(t, y, args):
+            if "low_rank" in cfg["solver"]:
+                shape = (cfg["grid"]["nx"], cfg["grid"]["ny"], cfg["grid"]["nvx"], cfg["grid"]["nvy"])
+                return low_rank.to_full(y["electron"]).reshape(shape)
             return y["electron"]
 
     elif {"t", "x", "y"} == set(cfg["save"][k].keys()):
@@ -241,14 +246,31 @@ def get_default_save_func(cfg):
     def _calc_mean_moment_(inp):
         return jnp.mean(jnp.sum(jnp.sum(inp, axis=3), axis=2)) * dvy * dvx
 
+    def _calc_mean_moments_(f):
+        return {
+            "mean_P": _calc_mean_moment_(f * vx**2.0 * vy**2.0),
+            "mean_j": _calc_mean_moment_(f * vx * vy),
+            "mean_n": _calc_mean_moment_(f),
+            "mean_q": _calc_mean_moment_(f * vx**3.0 * vy**3.0),
+            "mean_-flogf": _calc_mean_moment_(-jnp.log(jnp.abs(f)) * jnp.abs(f)),
+            "mean_f2": _calc_mean_moment_(f * f),
+        }
+
+    if "low_rank" in cfg["solver"]:
+        vxvy = np.reshape(np.asarray(vx * vy), -1)
+        weights = jnp.array(np.stack([vxvy**2.0, vxvy, np.ones_like(vxvy), vxvy**3.0], axis=1) * dvx * dvy)
+
+        def _calc_mean_moments_(f):
+            mean_moments = jnp.mean(low_rank.moments(f, weights), axis=0)
+            return {
+                **{nm: mean_moments[i] for i, nm in enumerate(["mean_P", "mean_j", "mean_n", "mean_q"])},
+                "mean_f2": jnp.mean(low_rank.squared_norms(f)) * dvx * dvy,
+                "rank": low_rank.effective_rank(f),
+            }
+
     def save(t, y, args):
         scalars = {
-            "mean_P": _calc_mean_moment_(y["electron"] * vx**2.0 * vy**2.0),
-            "mean_j": _calc_mean_moment_(y["electron"] * vx * vy),
-            "mean_n": _calc_mean_moment_(y["electron"]),
-            "mean_q": _calc_mean_moment_(y["electron"] * vx**3.0 * vy**3.0),
-            "mean_-flogf": _calc_mean_moment_(-jnp.log(jnp.abs(y["electron"])) * jnp.abs(y["electron"])),
-            "mean_f2": _calc_mean_moment_(y["electron"] * y["electron"]),
+            **_calc_mean_moments_(y["electron"]),
             "mean_de2": jnp.mean(y["dex"] ** 2.0 + y["dey"] ** 2.0),
             "mean_e2": jnp.mean(y["ex"] ** 2.0 + y["ey"] ** 2.0),
         }
@@ -0,0 +1,131 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+"""
+Strong scaling of the sharded envelope-2d step over CPU devices.
+
+The host is split into ``--devices`` XLA CPU devices and the same grid is run on 1, 2, 4, ... of them. The pencil 2D FFT
+and a full step of ``SplitStep`` are timed for each and checked against the single device results.
+
+Usage:
+
+    python benchmarks/lpse2d_sharding.py --devices 8 --grid 2048x512
+
+"""
+
+import argparse
+import os
+import sys
+
+if __name__ == "__main__":
+    # the devices have to be forced before jax is imported
+    num_host_devices = int(sys.argv[sys.argv.index("--devices") + 1]) if "--devices" in sys.argv else 4
+    os.environ["XLA_FLAGS"] = (
+        os.environ.get("XLA_FLAGS", "") + f" --xla_force_host_platform_device_count={num_host_devices}"
+    )
+
+from time import perf_counter
+
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+import jax
+from jax import numpy as jnp, jit, block_until_ready
+
+from adept.lpse2d.base import BaseLPSE2D
+from adept.lpse2d.core.fft import PencilFFT
+
+
+def _time_(fn, args, num_repeats):
+    block_until_ready(fn(*args))
+    t0 = perf_counter()
+    for _ in range(num_repeats):
+        block_until_ready(fn(*args))
+    return (perf_counter() - t0) / num_repeats
+
+
+def get_module(nx, ny, num_devices):
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    # nx = int(xmax / dx) + 1 and ny = int(ymax / dx) + 1
+    dx = 0.05
+    L = (nx - 0.5) * dx * 0.25 / (cfg["density"]["max"] - cfg["density"]["min"])
+    cfg["density"]["gradient scale length"] = f"{L}um"
+    cfg["grid"].update({"dx": f"{dx}um", "ymax": f"{(ny - 0.5) * dx}um", "ymin": f"{-(ny - 0.5) * dx}um"})
+    cfg["drivers"]["E0"]["num_colors"] = 8
+    cfg["drivers"]["E0"]["seed"] = 42
+    cfg["density"]["noise"]["seed"] = 42
+    if num_devices > 1:
+        cfg["grid"]["sharding"] = {"num_devices": num_devices}
+
+    module = BaseLPSE2D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+    module.init_state_and_args()
+    module.init_diffeqsolve()
+    assert (module.cfg["grid"]["nx"], module.cfg["grid"]["ny"]) == (nx, ny)
+
+    return module
+
+
+def get_step(module):
+    split_step = module.diffeqsolve_quants["terms"].vector_field
+    modules = module.init_modules()
+    state, args = module.state, module.args
+    for this_module in modules.values():
+        state, args = this_module(state, args)
+    light_wave = split_step.light.get_static_light_wave(state["background_density"], args["drivers"]["E0"])
+    args = {**args, "drivers": {**args["drivers"], "E0": light_wave}}
+    state = split_step.fft.shard({k: jnp.asarray(v) for k, v in state.items()})
+
+    return jit(split_step), (12.3, state, args)
+
+
+def run(nx, ny, num_repeats):
+    rng = np.random.default_rng(42)
+    f = rng.normal(size=(nx, ny)) + 1j * rng.normal(size=(nx, ny))
+
+    num_devices, reference = 1, {}
+    print(f"{nx} x {ny} on {jax.device_count()} devices")
+    print(f"{'devices':>8} | {'fft2':>12} | {'step':>12} | {'step speedup':>12}")
+    while num_devices <= jax.device_count():
+        if nx % num_devices or ny % num_devices:
+            break
+
+        fft = PencilFFT({"grid": {"sharding": {"num_devices": num_devices}}})
+        sharded_f = fft.shard({"f": f})["f"]
+        fft2 = jit(fft.fft2)
+
+        step, step_args = get_step(get_module(nx, ny, num_devices))
+        new_y = step(*step_args)["epw"]
+
+        if num_devices == 1:
+            reference = {"fft2": fft2(sharded_f), "step": new_y}
+        np.testing.assert_allclose(
+            fft2(sharded_f), reference["fft2"], rtol=1e-10, atol=1e-10 * np.max(np.abs(reference["fft2"]))
+        )
+        np.testing.assert_allclose(new_y, reference["step"], rtol=1e-10, atol=1e-10 * np.max(np.abs(reference["step"])))
+
+        fft_time = _time_(fft2, (sharded_f,), num_repeats)
+        step_time = _time_(step, step_args, num_repeats)
+        if num_devices == 1:
+            reference["step time"] = step_time
+        print(
+            f"{num_devices:>8} | {1e3 * fft_time:>9.3f} ms | {1e3 * step_time:>9.3f} ms | "
+            f"{reference['step time'] / step_time:>12.2f}"
+        )
+        num_devices *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strong scaling of the sharded envelope-2d step")
+    parser.add_argument("--devices", type=int, default=4, help="the number of CPU devices the host is split into")
+    parser.add_argument("--grid", default="1024x256")
+    parser.add_argument("--repeats", type=int, default=10)
+    cli_args = parser.parse_args()
+
+    run(*(int(i) for i in cli_args.grid.split("x")), cli_args.repeats)
@@ -0,0 +1,84 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+"""
+Benchmarks the shared batched tridiagonal solver against the vmapped ``lineax.Tridiagonal`` solve that was previously
+used by the vfp-1d and vlasov-1d2v collision operators.
+
+The scan-based Thomas solvers that were used by vlasov-1d / vlasov-2d (``unroll=128``) and sh-2d (``unroll=16``) are
+reproduced by ``method="thomas"`` with the corresponding ``num_unroll``.
+
+Usage:
+
+    python benchmarks/tridiagonal.py --shapes 32x512 256x256 4096x64 4x4096
+
+"""
+
+import argparse
+from time import perf_counter
+
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import numpy as np
+import lineax as lx
+from jax import numpy as jnp, jit, vmap, block_until_ready
+
+from adept.utils.tridiagonal import TridiagonalSolver
+
+
+def _lineax_solve_(a, b, c, d):
+    def _solve_one_(a, b, c, d):
+        op = lx.TridiagonalLinearOperator(diagonal=b, upper_diagonal=c[:-1], lower_diagonal=a[1:])
+        return lx.linear_solve(op, d, solver=lx.Tridiagonal()).value
+
+    return vmap(_solve_one_)(a, b, c, d)
+
+
+def _time_(fn, args, num_repeats):
+    block_until_ready(fn(*args))
+    t0 = perf_counter()
+    for _ in range(num_repeats):
+        block_until_ready(fn(*args))
+    return (perf_counter() - t0) / num_repeats
+
+
+def get_candidates():
+    candidates = {
+        "lineax (vmap)": jit(_lineax_solve_),
+        "thomas, unroll=128": jit(TridiagonalSolver(method="thomas", num_unroll=128)),
+        "thomas, unroll=16": jit(TridiagonalSolver(method="thomas", num_unroll=16)),
+        "pcr": jit(TridiagonalSolver(method="pcr")),
+        "hybrid": jit(TridiagonalSolver(method="hybrid")),
+        "auto": jit(TridiagonalSolver(method="auto")),
+    }
+
+    return candidates
+
+
+def run(shapes, num_repeats):
+    candidates = get_candidates()
+    rng = np.random.default_rng(42)
+
+    print(f"{'batch x n':>12} | " + " | ".join(f"{k:>18}" for k in candidates.keys()))
+    for batch, n in shapes:
+        a, c = jnp.array(rng.uniform(-1, 0, (2, batch, n)))
+        b = 2.5 + jnp.array(rng.uniform(0, 1, (batch, n)))
+        d = jnp.array(rng.normal(size=(batch, n)))
+        reference = candidates["lineax (vmap)"](a, b, c, d)
+
+        timings = []
+        for nm, fn in candidates.items():
+            np.testing.assert_allclose(fn(a, b, c, d), reference, rtol=1e-8, atol=1e-10, err_msg=nm)
+            timings.append(_time_(fn, (a, b, c, d), num_repeats))
+
+        print(f"{f'{batch}x{n}':>12} | " + " | ".join(f"{1e3 * t:>15.3f} ms" for t in timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tridiagonal solver benchmark")
+    parser.add_argument("--shapes", nargs="+", default=["32x512", "512x512", "4096x64", "4x4096"])
+    parser.add_argument("--repeats", type=int, default=20)
+    cli_args = parser.parse_args()
+
+    run([tuple(int(i) for i in shape.split("x")) for shape in cli_args.shapes], cli_args.repeats)
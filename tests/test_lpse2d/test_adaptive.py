@@ -0,0 +1,46 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import copy
+
+import yaml
+import numpy as np
+
+from adept import ergoExo
+
+
+def _get_cfg_():
+    with open("tests/test_lpse2d/configs/epw.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    # a driven plasma wave on a small grid
+    cfg["drivers"]["E2"]["k0"] = 20.0
+    cfg["grid"].update({"xmax": "1.57um", "ymax": "0.5um", "ymin": "-0.5um", "tmax": "0.3ps", "dt": "2fs"})
+    cfg["save"]["t"].update({"tmax": "0.3ps", "dt": "50fs"})
+    cfg["mlflow"]["experiment"] = "lpse2d-test-adaptive"
+
+    return cfg
+
+
+def test_adaptive_matches_fixed():
+    cfg = _get_cfg_()
+    reference = copy.deepcopy(cfg)
+    reference["grid"]["dt"] = "0.5fs"
+    adaptive = copy.deepcopy(cfg)
+    adaptive["grid"]["adaptive"] = {"cfl": 0.1}
+
+    results = []
+    for this_cfg in [reference, cfg, adaptive]:
+        exo = ergoExo()
+        modules = exo.setup(this_cfg)
+        results.append(exo.adept_module(modules)["solver result"])
+
+    reference, fixed, adaptive = results
+    # the saves are on the requested grid and the step size adapts to at least as accurate as the fixed step
+    np.testing.assert_allclose(adaptive.ts, reference.ts, atol=1e-12)
+    epw_ref = reference.ys["epw"]
+    adaptive_error = np.max(np.abs(adaptive.ys["epw"] - epw_ref))
+    fixed_error = np.max(np.abs(fixed.ys["epw"] - epw_ref))
+    assert adaptive_error < fixed_error
+    assert adaptive_error < 0.1 * np.max(np.abs(epw_ref))
@@ -0,0 +1,71 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+
+from adept import ergoExo
+from adept.lpse2d.helpers import get_ensemble_keys
+
+
+def _get_cfg_(chunk_size=2):
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    # a small grid that still resolves the two plasmon decay and a laser that is on from the start
+    cfg["grid"].update({"dx": "50nm", "ymax": "1um", "ymin": "-1um", "tmax": "0.5ps", "dt": "0.005ps"})
+    cfg["density"]["gradient scale length"] = "50um"
+    cfg["units"]["laser intensity"] = "1e16W/cm^2"
+    cfg["drivers"]["E0"]["num_colors"] = 4
+    cfg["drivers"]["E0"]["envelope"]["tc"] = "10ps"
+    cfg["drivers"]["E0"]["seed"] = 42
+    cfg["density"]["noise"]["seed"] = 42
+    cfg["save"] = {"t": {"dt": "50fs", "tmin": "0ps", "tmax": "0.5ps"}}
+    cfg["ensemble"] = {"num_realizations": 3, "chunk_size": chunk_size}
+    cfg["mlflow"]["experiment"] = "lpse2d-test-ensemble"
+
+    return cfg
+
+
+def test_ensemble_vg():
+    exo = ergoExo()
+    modules = exo.setup(_get_cfg_())
+    module = exo.adept_module
+
+    ensemble = module.ensemble_vg(modules)
+
+    # the chunked ensemble is the same as running the realizations one at a time
+    keys = get_ensemble_keys(module.args["keys"], 3)
+    losses, grads = [], []
+    for i in range(3):
+        (loss, _), grad = module.vg(modules, {**module.args, "keys": {k: v[i] for k, v in keys.items()}})
+        losses.append(loss)
+        grads.append(grad["bandwidth"].amplitudes)
+    losses, grads = np.array(losses), np.array(grads)
+
+    np.testing.assert_allclose(ensemble["loss"], losses, rtol=1e-12)
+    np.testing.assert_allclose(ensemble["mean"]["loss"], np.mean(losses), rtol=1e-12)
+    np.testing.assert_allclose(ensemble["var"]["loss"], np.var(losses), rtol=1e-10)
+    np.testing.assert_allclose(ensemble["mean"]["grad"]["bandwidth"].amplitudes, np.mean(grads, 0), rtol=1e-10)
+    np.testing.assert_allclose(ensemble["var"]["grad"]["bandwidth"].amplitudes, np.var(grads, 0), rtol=1e-8)
+
+    # and the realizations differ
+    assert np.all(np.var(grads, 0) > 0)
+
+
+def test_ensemble_does_not_depend_on_chunking():
+    ensembles = []
+    for chunk_size in [2, 3]:
+        exo = ergoExo()
+        modules = exo.setup(_get_cfg_(chunk_size))
+        ensembles.append(exo.adept_module.ensemble_vg(modules))
+
+    # the same seed gives the same realizations whatever the memory budget
+    np.testing.assert_allclose(ensembles[0]["loss"], ensembles[1]["loss"], rtol=1e-12)
+    np.testing.assert_allclose(ensembles[0]["mean"]["loss"], ensembles[1]["mean"]["loss"], rtol=1e-12)
+    np.testing.assert_allclose(
+        ensembles[0]["mean"]["grad"]["bandwidth"].amplitudes,
+        ensembles[1]["mean"]["grad"]["bandwidth"].amplitudes,
+        rtol=1e-10,
+    )
@@ -0,0 +1,59 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+from jax import numpy as jnp
+
+from adept.lpse2d.base import BaseLPSE2D
+from adept.lpse2d.vector_field import SplitStep
+
+
+def _get_split_step_(landau_table=None):
+    with open("tests/test_lpse2d/configs/epw.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+    cfg["terms"]["epw"]["damping"]["landau"] = True
+    if landau_table is not None:
+        cfg["terms"]["epw"]["damping"]["landau_table"] = landau_table
+
+    module = BaseLPSE2D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+
+    return SplitStep(module.cfg)
+
+
+def test_cached_landau_damping():
+    split_step = _get_split_step_()
+    vte_sq = jnp.ones(split_step.one_over_ksq.shape) * split_step.vte_sq
+
+    # the cached multiplier at the initial temperature and a recomputed one at any other temperature
+    np.testing.assert_allclose(split_step.landau_damping(vte_sq, split_step.dt), split_step.damping_multiplier)
+    np.testing.assert_allclose(
+        split_step.landau_damping(1.5 * vte_sq, split_step.dt),
+        np.exp(-split_step._get_damping_rate_(1.5 * split_step.vte_sq) * split_step.dt),
+        rtol=1e-12,
+    )
+
+
+def test_tabulated_landau_damping():
+    split_step = _get_split_step_({"min": 0.5, "max": 2.0, "num": 31})
+    rng = np.random.default_rng(0)
+    phi_k = jnp.array(
+        rng.normal(size=split_step.one_over_ksq.shape) * split_step.zero_mask * split_step.low_pass_filter
+    )
+
+    # a uniform temperature on the table is damped at exactly that temperature
+    vte_sq = jnp.ones(phi_k.shape) * split_step.vte_sq
+    np.testing.assert_allclose(
+        split_step.tabulated_landau_damping(phi_k, vte_sq, split_step.dt),
+        split_step.damping_multiplier * phi_k,
+        atol=1e-12 * np.max(np.abs(phi_k)),
+    )
+
+    # and a temperature between the tabulated ones is damped at nearly that temperature
+    damped = split_step.tabulated_landau_damping(phi_k, 1.1 * vte_sq, split_step.dt)
+    expected = np.exp(-split_step._get_damping_rate_(1.1 * split_step.vte_sq) * split_step.dt) * phi_k
+    np.testing.assert_allclose(damped, expected, atol=1e-3 * np.max(np.abs(phi_k)))
@@ -0,0 +1,99 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+import jax
+from jax import numpy as jnp
+
+from adept.lpse2d.base import BaseLPSE2D
+from adept.lpse2d.core.laser import Light
+
+
+def _get_cfg_and_density_(num_colors=8):
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+    cfg["drivers"]["E0"]["num_colors"] = num_colors
+
+    module = BaseLPSE2D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+    module.init_state_and_args()
+
+    return module.cfg, module.state["background_density"]
+
+
+def _get_light_wave_(num_colors):
+    rng = np.random.default_rng(0)
+    return {
+        "delta_omega": jnp.linspace(-0.015, 0.015, num_colors),
+        "initial_phase": jnp.array(rng.uniform(0, 2 * np.pi, num_colors)),
+        "amplitudes": jnp.array(rng.uniform(0.5, 1.0, num_colors)),
+    }
+
+
+def _sum_over_colors_(light, t, background_density, light_wave):
+    # the field as a sum over the full (num_colors, nx, ny) tensor of the colors
+    wpe = light.w0 * jnp.sqrt(background_density)[None]
+    delta_omega = light_wave["delta_omega"][:, None, None]
+    k0 = light.w0 / light.c * jnp.sqrt((1 + 0j + delta_omega) ** 2 - wpe**2 / light.w0**2)
+    E0_static = (
+        (1 + 0j - wpe**2.0 / (light.w0 * (1 + delta_omega)) ** 2) ** -0.25
+        * light.E0_source
+        * light_wave["amplitudes"][:, None, None]
+        * jnp.exp(1j * k0 * light.x[None, :, None] + 1j * light_wave["initial_phase"][:, None, None])
+    )
+    return jnp.sum(E0_static * jnp.exp(-1j * delta_omega * light.w0 * t), axis=0)
+
+
+def test_laser_update():
+    num_colors = 7
+    cfg, background_density = _get_cfg_and_density_(num_colors)
+    light = Light(cfg)
+    light_wave = _get_light_wave_(num_colors)
+    y = {"background_density": background_density}
+
+    # a budget of 2 colors so that the colors are summed in 4 chunks, the last of which is padded
+    chunked_light = Light({**cfg, "drivers": {"E0": {"max_memory_mb": 2 * background_density.size * 16 / 2**20}}})
+    assert chunked_light.colors_per_chunk == 2
+
+    t = 123.4
+    expected = _sum_over_colors_(light, t, background_density, light_wave)
+    precomputed = light.laser_update(t, y, light.get_static_light_wave(background_density, light_wave))
+    for E0 in [precomputed, light.laser_update(t, y, light_wave), chunked_light.laser_update(t, y, light_wave)]:
+        np.testing.assert_allclose(E0[..., 1], expected, rtol=1e-12, atol=1e-12 * np.max(np.abs(expected)))
+        np.testing.assert_array_equal(E0[..., 0], 0.0)
+
+    # the chunked sum is not precomputed
+    assert "spatial_factor" not in chunked_light.get_static_light_wave(background_density, light_wave)
+
+
+def test_laser_gradient():
+    num_colors = 5
+    cfg, background_density = _get_cfg_and_density_(num_colors)
+    light = Light(cfg)
+    chunked_light = Light({**cfg, "drivers": {"E0": {"max_memory_mb": 2 * background_density.size * 16 / 2**20}}})
+    light_wave = _get_light_wave_(num_colors)
+    y = {"background_density": background_density}
+
+    def _get_loss_(this_light, precompute):
+        def _loss_(amplitudes, initial_phase):
+            this_light_wave = {**light_wave, "amplitudes": amplitudes, "initial_phase": initial_phase}
+            if precompute:
+                this_light_wave = this_light.get_static_light_wave(background_density, this_light_wave)
+            E0 = this_light.laser_update(12.3, y, this_light_wave)
+            return jnp.sum(jnp.abs(E0[..., 1] * jnp.sin(0.1 * light.x)[:, None]) ** 2.0)
+
+        return jax.grad(_loss_, argnums=(0, 1))(light_wave["amplitudes"], light_wave["initial_phase"])
+
+    def _expected_loss_(amplitudes, initial_phase):
+        this_light_wave = {**light_wave, "amplitudes": amplitudes, "initial_phase": initial_phase}
+        E0y = _sum_over_colors_(light, 12.3, background_density, this_light_wave)
+        return jnp.sum(jnp.abs(E0y * jnp.sin(0.1 * light.x)[:, None]) ** 2.0)
+
+    expected = jax.grad(_expected_loss_, argnums=(0, 1))(light_wave["amplitudes"], light_wave["initial_phase"])
+    for grads in [_get_loss_(light, True), _get_loss_(light, False), _get_loss_(chunked_light, False)]:
+        for grad, expected_grad in zip(grads, expected):
+            np.testing.assert_allclose(grad, expected_grad, rtol=1e-10, atol=1e-10 * np.max(np.abs(expected_grad)))
@@ -0,0 +1,70 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+from jax import numpy as jnp
+
+from adept import ergoExo
+
+
+def _get_cfg_(save_fields=True):
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    # a small grid that still resolves the two plasmon decay and a laser that is on from the start
+    cfg["grid"].update({"dx": "50nm", "ymax": "1um", "ymin": "-1um", "tmax": "0.5ps", "dt": "0.005ps"})
+    cfg["density"]["gradient scale length"] = "50um"
+    cfg["units"]["laser intensity"] = "1e16W/cm^2"
+    cfg["drivers"]["E0"]["num_colors"] = 4
+    cfg["drivers"]["E0"]["seed"] = 42
+    cfg["density"]["noise"]["seed"] = 42
+    cfg["drivers"]["E0"]["envelope"]["tc"] = "10ps"
+    # a save at every step, in the same units as the step so that the number of saves is not rounded down
+    cfg["save"] = {"t": {"dt": "0.005ps", "tmin": "0ps", "tmax": "0.5ps"}}
+    cfg["loss"] = {
+        "save_fields": save_fields,
+        "terms": {
+            "e_sq": {},
+            "e_sq_k": {"kmin": 0.5, "kmax": 1.5},
+            "growth_rate": {"tmin": "0.2ps", "tmax": "0.5ps", "weight": 0.1},
+        },
+    }
+    cfg["mlflow"]["experiment"] = "lpse2d-test-loss"
+
+    return cfg
+
+
+def test_loss_accumulators():
+    exo = ergoExo()
+    modules = exo.setup(_get_cfg_())
+    module = exo.adept_module
+    (loss, run_output), grad = module.vg(modules)
+
+    # the energy of the plasma waves at the end of each step from the saved fields
+    solver_result = run_output["solver result"]
+    cfg = module.cfg
+    phi_k = np.fft.fft2(np.asarray(solver_result.ys["epw"]).view(np.complex128), axes=(1, 2))
+    kx, ky = cfg["grid"]["kx"][:, None], cfg["grid"]["ky"][None, :]
+    e_sq_k = (kx**2.0 + ky**2.0) * np.abs(phi_k) ** 2.0 * cfg["grid"]["dx"] * cfg["grid"]["dy"] / phi_k[0].size
+    k = np.sqrt(kx**2.0 + ky**2.0) * cfg["units"]["derived"]["c"] / cfg["units"]["derived"]["w0"]
+    t, dt = np.asarray(solver_result.ts)[1:], cfg["grid"]["dt"]
+    e_sq = np.sum(e_sq_k, axis=(1, 2))[1:]
+    window_e_sq = np.sum(e_sq_k * ((k >= 0.5) & (k <= 1.5)), axis=(1, 2))[1:]
+    in_fit = (t >= 0.2 - 1e-9) & (t <= 0.5 + 1e-9)
+
+    terms = module.diffeqsolve_quants["terms"].vector_field.loss_accumulators.get_terms(solver_result.ys["loss"][-1])
+    np.testing.assert_allclose(terms["e_sq"], np.log10(np.sum(e_sq) * dt), rtol=1e-10)
+    np.testing.assert_allclose(terms["e_sq_k"], np.log10(np.sum(window_e_sq) * dt), rtol=1e-10)
+    np.testing.assert_allclose(terms["growth_rate"], 0.5 * np.polyfit(t[in_fit], np.log(e_sq[in_fit]), 1)[0], rtol=1e-6)
+    np.testing.assert_allclose(loss, terms["e_sq"] + terms["e_sq_k"] + 0.1 * terms["growth_rate"], rtol=1e-12)
+
+    # and the loss and its gradient are the same without saving the fields
+    exo = ergoExo()
+    modules = exo.setup(_get_cfg_(save_fields=False))
+    (loss_only, run_output), grad_only = exo.adept_module.vg(modules)
+    assert set(run_output["solver result"].ys.keys()) == {"loss"}
+    np.testing.assert_allclose(loss_only, loss, rtol=1e-12)
+    np.testing.assert_allclose(grad_only["bandwidth"].amplitudes, grad["bandwidth"].amplitudes, rtol=1e-10)
+    assert jnp.all(grad["bandwidth"].amplitudes != 0.0)
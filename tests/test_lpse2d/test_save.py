@@ -0,0 +1,102 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+import yaml
+
+from adept.lpse2d.base import BaseLPSE2D
+from adept.lpse2d.helpers import get_resampler, make_xarrays
+
+
+def _get_grid_(xmin, xmax, n):
+    dx = (xmax - xmin) / n
+    return np.linspace(xmin + dx / 2, xmax - dx / 2, n)
+
+
+def test_resampler():
+    rng = np.random.default_rng(0)
+    x, y = _get_grid_(-3.0, 5.0, 80), _get_grid_(-1.0, 1.0, 30)
+    xq, yq = _get_grid_(-3.0, 5.0, 33), np.linspace(-1.2, 0.9, 17)
+    f = rng.normal(size=(x.size, y.size, 3))
+
+    resampled = np.asarray(get_resampler(x, y, xq, yq)(f))
+    assert resampled.shape == (xq.size, yq.size, 3)
+
+    # linear interpolation along x and then along y, which is nan outside of the grid
+    expected = np.stack([np.stack([np.interp(xq, x, f[:, j, c]) for j in range(y.size)], 1) for c in range(3)], -1)
+    expected = np.stack([np.stack([np.interp(yq, y, expected[i, :, c]) for i in range(xq.size)]) for c in range(3)], -1)
+    outside = (yq < y[0]) | (yq > y[-1])
+    assert np.all(np.isnan(resampled[:, outside]))
+    np.testing.assert_allclose(resampled[:, ~outside], expected[:, ~outside], rtol=1e-12, atol=1e-12)
+
+
+def test_resampler_decimation():
+    rng = np.random.default_rng(1)
+    x, y = _get_grid_(0.0, 12.0, 120), _get_grid_(-2.0, 2.0, 40)
+    f = rng.normal(size=(x.size, y.size)) + 1j * rng.normal(size=(x.size, y.size))
+
+    # every other point in x and every fourth in y are a copy of the field
+    xq, yq = x[::2], y[1::4]
+    np.testing.assert_array_equal(np.asarray(get_resampler(x, y, xq, yq)(f)), f[::2, 1::4])
+
+
+def _get_module_():
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+    cfg["grid"].update({"dx": "50nm", "ymax": "1um", "ymin": "-1um"})
+    cfg["density"]["gradient scale length"] = "50um"
+    cfg["save"]["x"]["dx"] = "100nm"
+    cfg["save"]["y"]["dy"] = "100nm"
+
+    module = BaseLPSE2D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+    module.init_state_and_args()
+    module.init_diffeqsolve()
+
+    return module
+
+
+def test_make_xarrays_chunks(tmp_path):
+    module = _get_module_()
+    cfg = module.cfg
+
+    rng = np.random.default_rng(2)
+    ts = cfg["save"]["t"]["ax"][:7]
+    state = {k: v for k, v in module.state.items() if k != "loss"}
+    saves = [cfg["save"]["func"](t, {k: rng.normal(size=v.shape) for k, v in state.items()}, None) for t in ts]
+    ys = {k: np.stack([np.asarray(save[k]) for save in saves]) for k in saves[0]}
+
+    datasets = {}
+    for nm, post_process_cfg in zip(
+        ["one", "chunks"], [{"chunk_size": 7}, {"chunk_size": 3, "k_window": {"kx": [-1.0, 1.0], "ky": [0.0, 2.0]}}]
+    ):
+        td = os.path.join(tmp_path, nm)
+        os.makedirs(os.path.join(td, "binary"))
+        datasets[nm] = make_xarrays({**cfg, "save": {**cfg["save"], "post_process": post_process_cfg}}, ts, ys, td)
+
+    # the chunks are appended in time and the spectra are the part of them in the window
+    (kfields, fields), (windowed_kfields, chunked_fields) = datasets["one"], datasets["chunks"]
+    xr.testing.assert_identical(chunked_fields.load(), fields.load())
+    kx, ky = windowed_kfields.coords["kx ($kc\\omega_0^{-1}$)"], windowed_kfields.coords["ky ($kc\\omega_0^{-1}$)"]
+    assert kx.min() >= -1.0 and kx.max() <= 1.0 and ky.min() >= 0.0 and ky.max() <= 2.0
+    xr.testing.assert_allclose(windowed_kfields.load(), kfields.sel({kx.name: kx, ky.name: ky}).load(), rtol=1e-12)
+
+
+def test_make_xarrays_empty_k_window(tmp_path):
+    module = _get_module_()
+    cfg = module.cfg
+    ts = cfg["save"]["t"]["ax"][:2]
+    save = cfg["save"]["func"](ts[0], {k: v for k, v in module.state.items() if k != "loss"}, None)
+    ys = {k: np.stack([np.asarray(v)] * 2) for k, v in save.items()}
+
+    # a window that is between two modes or beyond the grid is a mistake in the config and is named as such
+    post_process_cfg = {"k_window": {"kx": [-1.0, 1.0], "ky": [1.0e3, 2.0e3]}}
+    with pytest.raises(ValueError, match="save.post_process.k_window.ky"):
+        make_xarrays({**cfg, "save": {**cfg["save"], "post_process": post_process_cfg}}, ts, ys, str(tmp_path))
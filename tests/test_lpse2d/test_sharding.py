@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+# the devices have to be forced before jax is imported so the sharded solve is run in a new process
+SCRIPT = """
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+import jax
+
+from adept.lpse2d.base import BaseLPSE2D
+from adept.lpse2d.core.fft import PencilFFT
+
+assert jax.device_count() == 4
+
+fft = PencilFFT({"grid": {"sharding": {"num_devices": 4}}})
+f = np.random.default_rng(0).normal(size=(3, 16, 12)) + 1j
+np.testing.assert_allclose(jax.jit(fft.fft2)(f), np.fft.fft2(f), rtol=1e-12, atol=1e-12)
+np.testing.assert_allclose(jax.jit(fft.ifft2)(f), np.fft.ifft2(f), rtol=1e-12, atol=1e-12)
+
+
+def _run_(sharding):
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+    cfg["grid"].update({"dx": "50nm", "ymax": "1.16um", "ymin": "-1.16um", "tmax": "0.1ps", "dt": "0.005ps"})
+    cfg["density"]["gradient scale length"] = "50um"
+    cfg["drivers"]["E0"]["num_colors"] = 4
+    cfg["drivers"]["E0"]["seed"] = 42
+    cfg["density"]["noise"]["seed"] = 42
+    cfg["drivers"]["E0"]["envelope"]["tc"] = "10ps"
+    cfg["save"] = {"t": {"dt": "50fs", "tmin": "0ps", "tmax": "0.1ps"}}
+    if sharding:
+        cfg["grid"]["sharding"] = {"num_devices": 4}
+
+    module = BaseLPSE2D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+    module.init_state_and_args()
+    module.init_diffeqsolve()
+    return module(module.init_modules())["solver result"].ys
+
+
+ys, sharded_ys = _run_(False), _run_(True)
+assert len(sharded_ys["epw"].sharding.device_set) == 4
+for k, v in ys.items():
+    np.testing.assert_allclose(sharded_ys[k], v, rtol=1e-10, atol=1e-10 * np.max(np.abs(v)))
+"""
+
+
+def test_sharded_solve():
+    env = {**os.environ, "XLA_FLAGS": "--xla_force_host_platform_device_count=4"}
+    result = subprocess.run([sys.executable, "-c", SCRIPT], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
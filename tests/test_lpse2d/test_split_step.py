@@ -0,0 +1,115 @@
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import yaml
+import numpy as np
+import jax
+from jax import numpy as jnp
+
+from adept.lpse2d.base import BaseLPSE2D
+from adept.lpse2d.vector_field import SplitStep
+
+
+def _get_split_step_():
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+    cfg["grid"].update({"dx": "50nm", "ymax": "1um", "ymin": "-1um"})
+    cfg["density"]["gradient scale length"] = "50um"
+
+    module = BaseLPSE2D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+    module.init_state_and_args()
+
+    return SplitStep(module.cfg), module.state
+
+
+def _unfused_step_(split_step, t, phi, E0, background_density, vte_sq, key):
+    """
+    The split step as one operator after the other with the real-space transforms between them
+
+    """
+    epw, dt = split_step.epw, split_step.dt
+    kx, ky, k_sq, one_over_ksq = epw.kx[:, None], epw.ky[None, :], epw.k_sq, epw.one_over_ksq
+    low_pass_filter = epw.low_pass_filter
+    fft2, ifft2 = jnp.fft.fft2, jnp.fft.ifft2
+
+    def fields_from_phi(phi):
+        phi_k = fft2(phi) * low_pass_filter
+        return -1j * ifft2(kx * phi_k * low_pass_filter), -1j * ifft2(ky * phi_k * low_pass_filter)
+
+    def phi_from_fields(ex, ey):
+        return ifft2(1j * (kx * fft2(ex) + ky * fft2(ey)) * one_over_ksq * low_pass_filter)
+
+    # linear propagation
+    phi = ifft2(fft2(phi) * jnp.exp(-1j * 1.5 * vte_sq[0, 0] / epw.wp0 * k_sq * dt))
+
+    # tpd
+    _, ey = fields_from_phi(phi)
+    tpd1 = ifft2(fft2(E0[..., 1] * jnp.conj(ey)) * low_pass_filter)
+    div_e = ifft2(k_sq * fft2(phi))
+    tpd2 = ifft2(1j * ky * one_over_ksq * fft2(E0[..., 1] * jnp.conj(div_e)) * low_pass_filter)
+    phi = phi + dt * epw.tpd_const * jnp.exp(-1j * (epw.w0 - 2 * epw.wp0) * t) * (tpd1 + tpd2)
+
+    # density gradient
+    ex, ey = fields_from_phi(phi)
+    phase = jnp.exp(-1j * epw.wp0 / 2.0 * (1 - background_density / epw.envelope_density) * dt)
+    phi = phi_from_fields(ex * phase, ey * phase)
+
+    # noise
+    _, phase_key = jax.random.split(key, 2)
+    random_phases = 2 * np.pi * jax.random.uniform(phase_key, phi.shape)
+    phi = phi + dt * ifft2(jnp.exp(1j * random_phases) * low_pass_filter)
+
+    # landau and collisional damping
+    phi = ifft2(fft2(phi) * jnp.exp(-split_step._get_damping_rate_(vte_sq[0, 0]) * dt))
+
+    # boundary damping
+    ex, ey = fields_from_phi(phi)
+    phi = phi_from_fields(ex * split_step.boundary_envelope, ey * split_step.boundary_envelope)
+
+    return ifft2(split_step.zero_mask * split_step.low_pass_filter * fft2(phi))
+
+
+def test_split_step_matches_unfused():
+    split_step, state = _get_split_step_()
+    nx, ny = state["vte_sq"].shape
+    rng = np.random.default_rng(42)
+    phi = rng.normal(size=(nx, ny)) + 1j * rng.normal(size=(nx, ny))
+    E0 = 1e3 * (rng.normal(size=(nx, ny, 2)) + 1j * rng.normal(size=(nx, ny, 2)))
+    key = jax.random.PRNGKey(7)
+
+    y = {**state, "epw": phi.view(np.float64), "E0": E0.view(np.float64)}
+    t = 0.3
+    new_phi = split_step(t, y, {"drivers": {}, "keys": {"noise": key}})["epw"].view(np.complex128)
+    expected = _unfused_step_(
+        split_step, t, phi, E0, state["background_density"], state["vte_sq"].view(np.float64), key
+    )
+
+    # every operator is applied in the same order so the steps agree to round-off
+    np.testing.assert_allclose(new_phi, expected, rtol=0, atol=1e-12 * np.max(np.abs(expected)))
+
+
+def test_batched_tpd_matches_unfused():
+    split_step, state = _get_split_step_()
+    epw = split_step.epw
+    nx, ny = state["vte_sq"].shape
+    rng = np.random.default_rng(0)
+    phi = rng.normal(size=(nx, ny)) + 1j * rng.normal(size=(nx, ny))
+    E0 = 1e3 * (rng.normal(size=(nx, ny, 2)) + 1j * rng.normal(size=(nx, ny, 2)))
+    t = 0.7
+
+    tpd_k = epw.tpd_k(t, jnp.fft.fft2(phi), E0)
+    unfused = epw.calc_tpd1(t, phi, {"E0": E0}) + epw.calc_tpd2(t, phi, {"E0": E0})
+    expected = jnp.exp(-1j * (epw.w0 - 2 * epw.wp0) * t) * epw.low_pass_filter * jnp.fft.fft2(unfused)
+
+    np.testing.assert_allclose(tpd_k, expected, rtol=0, atol=1e-12 * np.max(np.abs(expected)))
+    # and the real-space interface
+    np.testing.assert_allclose(
+        epw.tpd(t, phi, {"E0": E0}),
+        jnp.fft.ifft2(expected),
+        rtol=0,
+        atol=1e-12 * np.max(np.abs(jnp.fft.ifft2(expected))),
+    )
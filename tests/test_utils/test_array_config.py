@@ -0,0 +1,50 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import os
+
+import h5py
+import mlflow
+import numpy as np
+import yaml
+
+from adept import ergoExo
+from adept.utils.array_config import load_array_config
+
+
+def _setup_(noise, store_dir, dst_path):
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    # e.g. an array that was loaded from a file or was randomly generated
+    cfg["grid"]["noise"] = noise
+    cfg["mlflow"]["experiment"] = "test-array-config"
+    cfg["mlflow"]["array_store"] = store_dir
+
+    exo = ergoExo()
+    exo.setup(cfg)
+
+    return exo.adept_module.cfg, mlflow.artifacts.download_artifacts(run_id=exo.mlflow_run_id, dst_path=dst_path)
+
+
+def test_only_stores_what_is_not_reproducible(tmp_path):
+    noise = np.random.uniform(size=(64,))
+    store_dir = os.path.join(tmp_path, "store")
+
+    for run in ["run-0", "run-1"]:
+        cfg, run_dir = _setup_(noise, store_dir, os.path.join(tmp_path, run))
+        with open(os.path.join(run_dir, "array_config.yaml"), "r") as fi:
+            assert list(yaml.safe_load(fi)["arrays"].keys()) == ["grid/noise"]
+
+    # the arrays are deduplicated across runs
+    assert len(os.listdir(store_dir)) == 1
+
+    loaded = load_array_config(run_dir)
+    np.testing.assert_array_equal(loaded["grid"]["noise"], noise)
+    np.testing.assert_array_equal(loaded["grid"]["v"], cfg["grid"]["v"])
+
+    with load_array_config(run_dir, lazy=True) as loaded:
+        dataset = loaded["grid"]["noise"]
+        assert isinstance(dataset, h5py.Dataset)
+        np.testing.assert_array_equal(dataset[:8], noise[:8])
+    # the files are closed at the end of the block
+    assert not dataset.id.valid
@@ -0,0 +1,36 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import copy
+
+import yaml
+
+from adept import ergoExo
+from adept.utils.grid_sizing import get_fft_cost, get_smooth_size
+
+
+def test_smooth_size():
+    assert [get_smooth_size(n) for n in [1, 7, 97, 151, 1000, 4001]] == [1, 8, 100, 160, 1000, 4050]
+    # smaller sizes are only chosen within the tolerance
+    assert get_smooth_size(4001, "nearest") == 4000
+    assert get_smooth_size(97, "nearest", tolerance=0.01) == 100
+    assert get_smooth_size(401, multiple_of=7) == 420
+    # a prime is much slower than the smooth size after it
+    assert get_fft_cost(4001) > 4 * get_fft_cost(4050)
+
+
+def test_vlasov1d_sizing():
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+    cfg["grid"].update({"nx": 61, "nv": 509})
+    cfg["terms"]["edfdv"] = "exponential"
+    cfg["grid"]["fft_sizing"] = {"policy": "nearest", "tolerance": 0.05}
+
+    adept_module = ergoExo()._get_adept_module_(copy.deepcopy(cfg))
+    adept_module.write_units()
+    adept_module.get_derived_quantities()
+
+    cfg_grid = adept_module.cfg["grid"]
+    assert (cfg_grid["nx"], cfg_grid["nv"]) == (60, 512)
+    assert cfg_grid["dx"] * cfg_grid["nx"] == cfg_grid["xmax"]
+    assert cfg_grid["dv"] * cfg_grid["nv"] == 2.0 * cfg_grid["vmax"]
+    assert cfg_grid["fft_sizing"]["speedup"] > 1.0
@@ -0,0 +1,118 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import yaml
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import jax
+from jax import numpy as jnp
+
+from adept.utils import low_rank
+from adept.vlasov1d2v import helpers
+from adept.vlasov1d2v.integrator import VlasovMaxwell, get_low_rank_stepper
+from adept.vlasov1d2v.pushers.fokker_planck import LowRankCollisions
+
+
+def _get_1d2v_cfg_(low_rank_cfg=None):
+    with open("configs/vlasov-1d2v/epw.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    cfg["grid"].update({"nx": 16, "nv": 48, "tmax": 20.0, "dt": 0.2, "beta": 0.1})
+    cfg["terms"]["time"] = "leapfrog"
+    cfg["terms"]["fokker_planck"]["nu_ee"]["is_on"] = False
+    cfg["terms"]["fokker_planck"]["nu_ei"]["is_on"] = False
+    cfg["drivers"]["ex"]["0"].update({"a0": 0.05, "t_center": 10.0, "t_width": 10.0})
+    if low_rank_cfg is not None:
+        cfg["terms"]["low_rank"] = low_rank_cfg
+
+    cfg = helpers.get_derived_quantities(cfg)
+    cfg["grid"] = helpers.get_solver_quantities(cfg)
+    cfg["save"] = {}
+
+    return cfg
+
+
+def test_low_rank_vlasov_converges_with_rank():
+    nx, nv, dt = 32, 64, 0.2
+    x = np.linspace(0, 4.0 * np.pi, nx, endpoint=False)
+    dv = 12.0 / nv
+    v = np.linspace(-6.0 + dv / 2.0, 6.0 - dv / 2.0, nv)
+    kx = np.fft.fftfreq(nx, d=x[1]) * 2.0 * np.pi
+    kv = np.fft.fftfreq(nv, d=dv) * 2.0 * np.pi
+    e = 0.05 * np.sin(0.5 * x)
+    f = np.exp(-(v[None, :] ** 2.0) / 2.0) * (1.0 + 0.1 * np.cos(0.5 * x[:, None]))
+
+    expected = f
+    for _ in range(20):
+        expected = np.real(
+            np.fft.ifft(np.exp(-1j * kx[:, None] * dt * v[None, :]) * np.fft.fft(expected, axis=0), axis=0)
+        )
+        expected = np.real(
+            np.fft.ifft(np.exp(-1j * kv[None, :] * dt * e[:, None]) * np.fft.fft(expected, axis=1), axis=1)
+        )
+
+    vdfdx = low_rank.Term(low_rank.Derivative(kx, (nx,), axis=0), low_rank.Multiply(v))
+    edfdv = low_rank.Term(low_rank.Multiply(e), low_rank.Derivative(kv, (nv,), axis=0))
+    errors = []
+    for max_rank in [6, 10, 16]:
+        stepper = low_rank.LowRankStepper(low_rank.get_conserved_basis([np.ones(nv), v]), max_rank=max_rank)
+        y = stepper.from_full(f)
+        step = jax.jit(lambda _y_: stepper(stepper(_y_, vdfdx, dt), edfdv, dt))
+        for _ in range(20):
+            y = step(y)
+        errors.append(np.max(np.abs(low_rank.to_full(y) - expected)))
+
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[2] < 1e-6
+
+
+def test_low_rank_1d2v_matches_full():
+    cfg = _get_1d2v_cfg_()
+    cfg_lr = _get_1d2v_cfg_({"max_rank": 12, "tol": 1e-10})
+    args = {"drivers": cfg["drivers"], "terms": cfg["terms"]}
+
+    ys = []
+    for this_cfg in [cfg, cfg_lr]:
+        y, _ = helpers.init_state(this_cfg, None)
+        vector_field = VlasovMaxwell(this_cfg)
+        step = jax.jit(lambda t, _y_: vector_field(t, _y_, args))
+        for i in range(100):
+            y = step(i * this_cfg["grid"]["dt"], y)
+        ys.append(y)
+
+    full, factors = ys
+    np.testing.assert_allclose(factors["e"], full["e"], atol=1e-3 * np.max(np.abs(full["e"])))
+    f = np.reshape(full["electron"], (cfg["grid"]["nx"], -1))
+    np.testing.assert_allclose(low_rank.to_full(factors["electron"]), f, atol=1e-4 * np.max(f))
+
+
+def test_low_rank_dougherty_conserves():
+    cfg = _get_1d2v_cfg_({"max_rank": 10, "tol": 1e-8})
+    cfg["terms"]["fokker_planck"]["nu_ee"]["is_on"] = True
+    v, x, dv = cfg["grid"]["v"], cfg["grid"]["x"], cfg["grid"]["dv"]
+
+    # a drifting Maxwellian with a different temperature in each direction
+    f = np.exp(
+        -((v[None, :, None] - 0.5 * np.sin(0.3 * x[:, None, None])) ** 2.0 + v[None, None, :] ** 2.0 / 1.5) / 2.0
+    )
+    f = f / np.sum(f, axis=(1, 2), keepdims=True) / dv / dv
+
+    stepper = get_low_rank_stepper(cfg)
+    collisions = LowRankCollisions(cfg, stepper)
+    y = stepper.from_full(np.reshape(f, (cfg["grid"]["nx"], -1)))
+
+    vx, vy = np.meshgrid(v, v, indexing="ij")
+    weights = np.stack([np.ones(vx.size), vx.reshape(-1), vy.reshape(-1)], axis=1) * dv * dv
+    before = low_rank.moments(y, weights)
+    step = jax.jit(lambda _y_: collisions(jnp.ones(cfg["grid"]["nx"]), None, None, _y_, 0.5))
+    for _ in range(50):
+        y = step(y)
+    after = low_rank.moments(y, weights)
+
+    # the density at every x and the total momentum are conserved and the drift relaxes to the mean
+    np.testing.assert_allclose(after[:, 0], before[:, 0], rtol=1e-10)
+    np.testing.assert_allclose(np.sum(after[:, 1:], axis=0), np.sum(before[:, 1:], axis=0), atol=1e-9)
+    np.testing.assert_allclose(after[:, 1], 0.0, atol=1e-6)
+    assert low_rank.effective_rank(y) < 10
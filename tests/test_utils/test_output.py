@@ -0,0 +1,62 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+from jax import numpy as jnp
+
+from adept.utils.output import decode, get_output_save_func, get_quantity_output, to_netcdf
+
+
+def test_quantity_output():
+    output_cfg = {"dtype": "float32", "quantities": {"e": "float16", "n": {"dtype": "int16", "scale": 1e-3}}}
+    assert get_quantity_output(output_cfg, "e") == {"dtype": "float16"}
+    assert get_quantity_output(output_cfg, "v") == {"dtype": "float32"}
+    assert get_quantity_output({}, "v") == {"dtype": "float64"}
+
+    with pytest.raises(ValueError):
+        get_quantity_output({"dtype": "int16"}, "v")
+
+
+def test_cast_and_write(tmp_path):
+    scale = 1e-3
+    output_cfg = {"dtype": "float16", "quantities": {"n": {"dtype": "int16", "scale": scale}}, "compression": "zlib"}
+
+    t = np.linspace(0, 1, 16)
+    x = np.linspace(0, 1, 256)
+    fields = {"n": 1.0 + 0.1 * np.sin(2 * np.pi * (x[None, :] - t[:, None])), "e": np.cos(x[None, :] + t[:, None])}
+
+    save_func = get_output_save_func(lambda t, y, args: {k: jnp.array(v) for k, v in y.items()}, output_cfg, "fields")
+    saved = save_func(0.0, fields, None)
+    assert saved["n"].dtype == jnp.int16
+    assert saved["e"].dtype == jnp.float16
+
+    decoded = {k: decode(v, get_quantity_output(output_cfg, k)) for k, v in saved.items()}
+    np.testing.assert_array_less(np.abs(decoded["n"] - fields["n"]), scale / 2 + 1e-6)
+    np.testing.assert_allclose(decoded["e"], fields["e"], atol=1e-3)
+
+    ds = xr.Dataset({f"fields-{k}": xr.DataArray(v, coords=(("t", t), ("x", x))) for k, v in decoded.items()})
+    to_netcdf(ds, os.path.join(tmp_path, "small.nc"), output_cfg, quantities={f"fields-{k}": k for k in fields})
+    full = xr.Dataset({f"fields-{k}": xr.DataArray(v, coords=(("t", t), ("x", x))) for k, v in fields.items()})
+    full.to_netcdf(os.path.join(tmp_path, "full.nc"))
+    assert os.path.getsize(os.path.join(tmp_path, "small.nc")) < os.path.getsize(os.path.join(tmp_path, "full.nc")) / 2
+
+    with xr.open_dataset(os.path.join(tmp_path, "small.nc")) as small:
+        np.testing.assert_array_less(np.abs(small["fields-n"].values - fields["n"]), scale / 2 + 1e-6)
+
+
+def test_cast_complex():
+    rng = np.random.default_rng(0)
+    field = jnp.array(rng.normal(size=(4, 8)) + 1j * rng.normal(size=(4, 8)))
+
+    # a complex quantity keeps its imaginary part in single precision
+    saved = get_output_save_func(lambda t, y, args: y, {"dtype": "float32"}, "epw")(0.0, field, None)
+    assert saved.dtype == jnp.complex64
+    np.testing.assert_allclose(saved, field, rtol=1e-6)
+
+    # and cannot be quantized, which would drop it
+    for output_cfg in [{"dtype": "float16"}, {"quantities": {"epw": {"dtype": "int16", "scale": 1e-3}}}]:
+        with pytest.raises(ValueError, match="epw is complex"):
+            get_output_save_func(lambda t, y, args: {"epw": y}, output_cfg, "fields")(0.0, field, None)
@@ -0,0 +1,59 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+import yaml
+
+from adept.utils.plotting import plot_job, plot_scalar, plot_spacetime, render_all, run_plot_jobs
+
+
+def _get_jobs_(td):
+    os.makedirs(os.path.join(td, "binary"))
+    t, x = np.linspace(0, 1, 16), np.linspace(0, 1, 32)
+    ds = xr.Dataset(
+        {
+            "e": xr.DataArray(np.sin(2 * np.pi * (x[None, :] - t[:, None])), coords=(("t", t), ("x", x))),
+            "n": xr.DataArray(1.0 + t, coords=(("t", t),)),
+        }
+    )
+    ds.to_netcdf(os.path.join(td, "binary", "data.nc"))
+
+    return [
+        plot_job(plot_spacetime, os.path.join("binary", "data.nc"), os.path.join("plots", "e.png"), "e", True),
+        plot_job(
+            plot_spacetime, os.path.join("binary", "data.nc"), os.path.join("plots", "log", "e.png"), "e", log=True
+        ),
+        plot_job(plot_scalar, os.path.join("binary", "data.nc"), os.path.join("plots", "n.png"), "n"),
+    ]
+
+
+def _get_pngs_(td):
+    return sorted(os.path.relpath(os.path.join(r, f), td) for r, _, fs in os.walk(td) for f in fs if f.endswith(".png"))
+
+
+@pytest.mark.parametrize("plot_cfg", [{"mode": "serial"}, {"mode": "parallel", "processes": 2}])
+def test_render(tmp_path, plot_cfg):
+    td = str(tmp_path)
+    assert run_plot_jobs(_get_jobs_(td), td, plot_cfg) == []
+    assert _get_pngs_(td) == [
+        os.path.join("plots", "e.png"),
+        os.path.join("plots", "log", "e.png"),
+        os.path.join("plots", "n.png"),
+    ]
+
+
+def test_thumbnail_and_defer(tmp_path):
+    td = str(tmp_path)
+    jobs = _get_jobs_(td)
+
+    deferred = run_plot_jobs(jobs, td, {"mode": "serial", "thumbnail": True})
+    assert _get_pngs_(td) == [os.path.join("plots", "e.png")]
+    assert len(deferred) == 2
+
+    # the deferred jobs can be rendered later from the stored data
+    with open(os.path.join(td, "plots", "jobs.yaml"), "r") as fi:
+        render_all(td, yaml.safe_load(fi), processes=1)
+    assert len(_get_pngs_(td)) == 3
@@ -0,0 +1,40 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import numpy as np
+import pytest
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from jax import numpy as jnp, lax
+
+from adept.utils.spectral import SpectralAccumulator
+
+
+@pytest.mark.parametrize("window", ["hann", "boxcar"])
+def test_recovers_mode(window):
+    nx, xmax, dt, tmax = 64, 20.0, 0.05, 400.0
+    amp, w0, phase = 0.3, 1.2, 0.4
+    x = np.linspace(0, xmax, nx, endpoint=False)
+    cfg_grid = {"nx": nx, "kxr": np.fft.rfftfreq(nx, d=xmax / nx) * 2.0 * np.pi, "tmax": tmax}
+    k0 = cfg_grid["kxr"][3]
+    spectral_cfg = {
+        "kx": [0.0, k0 + 0.01],
+        "w": {"wmin": 1.0, "wmax": 1.4, "nw": 41},
+        "window": {"tmin": 100.0, "type": window},
+    }
+    accumulator = SpectralAccumulator(spectral_cfg, cfg_grid)
+    np.testing.assert_allclose(accumulator.kx, [0.0, k0])
+
+    def _step_(acc, t):
+        field = amp * jnp.cos(k0 * x - w0 * t + phase)
+        return accumulator.update(acc, t, field, dt), None
+
+    acc, _ = lax.scan(_step_, accumulator.init_state(), dt * jnp.arange(1, int(tmax / dt) + 1))
+    spectrum = accumulator(acc)
+
+    i_w0 = np.argmin(np.abs(accumulator.w - w0))
+    np.testing.assert_allclose(spectrum["mag"][1, i_w0], amp, rtol=1e-2)
+    np.testing.assert_allclose(spectrum["ang"][1, i_w0], phase, atol=1e-2)
+    assert np.argmax(spectrum["mag"][1]) == i_w0
+    assert np.max(spectrum["mag"][0]) < 1e-10
@@ -0,0 +1,128 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import os
+
+import numpy as np
+import pytest
+import yaml
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import jax
+from jax import numpy as jnp
+from diffrax import diffeqsolve, ODETerm, SaveAt, SubSaveAt
+
+from adept import Stepper, ergoExo
+from adept.utils.streaming import StreamingWriter
+
+
+def _solve_(saveat):
+    def vf(t, y, args):
+        return {"a": y["a"] * 0.99 + jnp.sin(t), "b": y["b"] + 1.0}
+
+    y0 = {"a": jnp.ones((3, 4)), "b": jnp.zeros(2)}
+    return diffeqsolve(ODETerm(vf), Stepper(), t0=0.0, t1=9.0, dt0=1.0, y0=y0, saveat=SaveAt(**saveat), max_steps=20)
+
+
+def test_streamed_saves_match(tmp_path):
+    saveat = {
+        "subs": {
+            "fields": SubSaveAt(
+                ts=jnp.linspace(0, 9, 10), fn=lambda t, y, args: {"a": y["a"], "nested": {"b": y["b"]}}
+            ),
+            "default": SubSaveAt(ts=jnp.linspace(0, 9, 4), fn=lambda t, y, args: jnp.sum(y["a"])),
+        }
+    }
+    expected = _solve_(saveat)
+
+    # a queue size of 1 makes the solve wait on the writer
+    writer = StreamingWriter(str(tmp_path), max_queue_size=1)
+    writer.start()
+    streamed = _solve_(writer.wrap_saveat(saveat))
+    jax.block_until_ready(streamed)
+    writer.close()
+
+    # only the times are kept in memory
+    assert streamed.ys["fields"].shape == (10,)
+    assert sorted(os.listdir(tmp_path)) == ["default.nc", "fields.nc"]
+
+    restored = writer.restore({"solver result": streamed})["solver result"]
+    jax.tree_util.tree_map(np.testing.assert_array_equal, restored.ys, expected.ys)
+
+
+def test_vmapped_solve_raises(tmp_path):
+    writer = StreamingWriter(str(tmp_path))
+    writer.start()
+    saveat = writer.wrap_saveat({"ts": jnp.linspace(0, 9, 4), "fn": lambda t, y, args: y["a"]})
+
+    def _vmapped_solve_(scale):
+        def vf(t, y, args):
+            return {"a": y["a"] * 0.99 + jnp.sin(t), "b": y["b"] + 1.0}
+
+        y0 = {"a": scale * jnp.ones((3, 4)), "b": jnp.zeros(2)}
+        return diffeqsolve(
+            ODETerm(vf), Stepper(), t0=0.0, t1=9.0, dt0=1.0, y0=y0, saveat=SaveAt(**saveat), max_steps=20
+        )
+
+    # every realization would be written to the same slots
+    jax.block_until_ready(jax.vmap(_vmapped_solve_)(jnp.array([1.0, 2.0])))
+    with pytest.raises(RuntimeError) as exc_info:
+        writer.close()
+    assert "vmapped" in str(exc_info.value.__cause__)
+
+
+def test_differentiated_solve_raises(tmp_path):
+    writer = StreamingWriter(str(tmp_path))
+    saveat = writer.wrap_saveat({"ts": jnp.linspace(0, 9, 4), "fn": lambda t, y, args: y})
+
+    def _loss_(decay):
+        solution = diffeqsolve(
+            ODETerm(lambda t, y, args: y * decay),
+            Stepper(),
+            t0=0.0,
+            t1=9.0,
+            dt0=1.0,
+            y0=jnp.ones(3),
+            saveat=SaveAt(**saveat),
+            max_steps=20,
+        )
+        return jnp.sum(solution.ys)
+
+    # the saves are replaced by the save times, so the loss would be their sum and its gradient would be zero
+    with pytest.raises(ValueError, match="cannot be differentiated"):
+        jax.value_and_grad(_loss_)(0.99)
+
+
+def _get_lpse2d_cfg_(stream):
+    with open("tests/test_lpse2d/configs/tpd.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    cfg["grid"].update({"dx": "50nm", "ymax": "1um", "ymin": "-1um", "tmax": "0.1ps", "dt": "0.005ps"})
+    cfg["density"]["gradient scale length"] = "50um"
+    cfg["drivers"]["E0"]["num_colors"] = 4
+    cfg["drivers"]["E0"]["seed"] = 42
+    cfg["density"]["noise"]["seed"] = 42
+    cfg["save"]["t"].update({"dt": "0.02ps", "tmax": "0.1ps"})
+    cfg["mlflow"]["experiment"] = "test-streaming"
+    if stream:
+        cfg["stream"] = {}
+
+    return cfg
+
+
+def test_val_and_grad_with_and_without_streaming():
+    exo = ergoExo()
+    modules = exo.setup(_get_lpse2d_cfg_(stream=False))
+    val, grad, _ = exo.val_and_grad(modules)
+    assert np.isfinite(val)
+    assert jnp.any(grad["bandwidth"].amplitudes != 0.0)
+
+    # the same run with streamed saves would silently give a loss of the save times and no gradient
+    exo = ergoExo()
+    modules = exo.setup(_get_lpse2d_cfg_(stream=True))
+    with pytest.raises(ValueError, match="cannot be streamed when the gradient is taken"):
+        exo.val_and_grad(modules)
+    # and so does the gradient of the module itself
+    with pytest.raises(ValueError, match="cannot be differentiated"):
+        exo.adept_module.vg(modules, None)
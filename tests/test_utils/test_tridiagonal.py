@@ -0,0 +1,78 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import pytest
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from jax import numpy as jnp
+from jax.lax import scan
+from scipy.linalg import solve_banded
+
+from adept.utils.tridiagonal import TridiagonalSolver
+
+
+def _get_system_(batch, n):
+    rng = np.random.default_rng(420)
+    a, c = rng.uniform(-1.0, 1.0, (2, batch, n))
+    b = 3.0 + rng.uniform(0.0, 1.0, (batch, n))
+    d = rng.normal(size=(batch, n))
+
+    # scipy's banded storage ignores a[0] and c[-1] as well
+    expected = np.stack(
+        [solve_banded((1, 1), np.stack([np.roll(c[i], 1), b[i], np.roll(a[i], -1)]), d[i]) for i in range(batch)]
+    )
+
+    return [jnp.array(arr) for arr in (a, b, c, d)], expected
+
+
+@pytest.mark.parametrize("method", ["thomas", "pcr", "hybrid", "auto"])
+@pytest.mark.parametrize("batch, n", [(3, 7), (2, 64), (5, 1000), (2000, 33), (1, 257)])
+def test_methods(method, batch, n):
+    (a, b, c, d), expected = _get_system_(batch, n)
+    solver = TridiagonalSolver(method=method, min_batch=64)
+
+    np.testing.assert_allclose(solver(a, b, c, d), expected, rtol=1e-12, atol=1e-12)
+
+
+def _baseline_thomas_(a, b, c, d):
+    """
+    The scan solver that the vlasov-1d Fokker-Planck operator used before the shared solver
+    """
+
+    def compute_primes(last_primes, x):
+        last_cp, last_dp = last_primes
+        a, b, c, d = x
+        cp = c / (b - a * last_cp)
+        dp = (d - a * last_dp) / (b - a * last_cp)
+        new_primes = jnp.stack((cp, dp))
+        return new_primes, new_primes
+
+    def backsubstitution(last_x, x):
+        cp, dp = x
+        new_x = dp - cp * last_x
+        return new_x, new_x
+
+    diags_stacked = jnp.stack([arr.transpose((1, 0)) for arr in (a, b, c, d)], axis=1)
+    _, primes = scan(compute_primes, jnp.zeros((2, *a.shape[:-1])), diags_stacked, unroll=128)
+    _, sol = scan(backsubstitution, jnp.zeros(a.shape[:-1]), primes[::-1], unroll=128)
+    return sol[::-1].transpose((1, 0))
+
+
+@pytest.mark.parametrize("batch, n", [(3, 7), (2, 64), (32, 512)])
+def test_default_is_baseline_thomas(batch, n):
+    (a, b, c, d), _ = _get_system_(batch, n)
+
+    # the default does not change the collision numerics of existing configs
+    assert TridiagonalSolver().method == "thomas"
+    np.testing.assert_allclose(TridiagonalSolver()(a, b, c, d), _baseline_thomas_(a, b, c, d), rtol=1e-15, atol=0.0)
+
+
+def test_broadcast_diagonals():
+    (a, b, c, d), _ = _get_system_(16, 64)
+    solver = TridiagonalSolver()
+
+    np.testing.assert_allclose(
+        solver(a[0], b[0], c[0], d), solver(*[jnp.broadcast_to(arr[0], d.shape) for arr in (a, b, c)], d)
+    )
@@ -0,0 +1,66 @@
+import copy, os
+
+import numpy as np
+import pytest
+import yaml
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from adept import ergoExo
+
+
+def _get_cfg_(tmax=2000.0):
+    with open(f"{os.path.join(os.getcwd(), 'tests/test_vfp1d/epp-short')}.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    cfg["grid"].update({"nv": 64, "tmax": tmax})
+    for save in cfg["save"].values():
+        save["t"]["tmax"] = tmax
+    cfg["mlflow"]["experiment"] = "vfp1d-test-adaptive"
+
+    return cfg
+
+
+def _get_module_(cfg):
+    exo = ergoExo()
+    exo.setup(cfg)
+    return exo.adept_module
+
+
+@pytest.mark.parametrize("e_solver", ["oshun", "ampere", "edfdv-ampere-implicit"])
+def test_step_size_from_args(e_solver):
+    cfg = _get_cfg_()
+    cfg["terms"]["e_solver"] = e_solver
+    fixed_cfg = copy.deepcopy(cfg)
+    fixed_cfg["grid"]["dt"] = 50.0
+
+    # a step of the size in args is the same as a step of the same size from the config
+    module, fixed_module = _get_module_(cfg), _get_module_(fixed_cfg)
+    adaptive_step = module.diffeqsolve_quants["terms"].vector_field(0.0, module.state, {"dt": 50.0})
+    fixed_step = fixed_module.diffeqsolve_quants["terms"].vector_field(0.0, fixed_module.state, {})
+
+    assert np.max(np.abs(fixed_step["f0"] - module.state["f0"])) > 0.0
+    for k in ["f0", "f10", "e"]:
+        np.testing.assert_allclose(adaptive_step[k], fixed_step[k], rtol=1e-12, atol=0.0)
+
+
+def test_adaptive_matches_fixed():
+    cfg = _get_cfg_()
+    reference = copy.deepcopy(cfg)
+    reference["grid"]["dt"] = 5.0
+    adaptive = copy.deepcopy(cfg)
+    adaptive["grid"]["adaptive"] = {"cfl": 0.5}
+
+    results = []
+    for this_cfg in [reference, adaptive]:
+        module = _get_module_(this_cfg)
+        results.append(module(None, module.args)["solver result"])
+
+    reference, adaptive = results
+    # the saves are on the requested grid
+    np.testing.assert_allclose(adaptive.ts["fields"], reference.ts["fields"], atol=1e-9)
+    # the electric field is a small residual of the heat flow so it has the largest relative error
+    for k, rtol in [("T", 1e-6), ("n", 1e-6), ("e", 2e-2)]:
+        ref = np.asarray(reference.ys["fields"][k])
+        assert np.max(np.abs(adaptive.ys["fields"][k] - ref)) < rtol * np.max(np.abs(ref))
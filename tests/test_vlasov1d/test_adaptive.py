@@ -0,0 +1,73 @@
+import copy
+
+import yaml
+
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import jax
+from jax import numpy as jnp
+
+from adept import ergoExo
+
+
+def _get_cfg_(tmax=80.0, nv=256):
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as file:
+        defaults = yaml.safe_load(file)
+
+    defaults["terms"]["edfdv"] = "exponential"
+    defaults["grid"].update({"nv": nv, "tmax": tmax, "dt": 0.1})
+    defaults["drivers"]["ex"]["0"]["a0"] = 1.0e-2
+    defaults["save"] = {"fields": {"t": {"tmin": 0.0, "tmax": tmax, "nt": int(tmax) + 1}}}
+    defaults["mlflow"]["experiment"] = "vlasov1d-test-adaptive"
+
+    return defaults
+
+
+def test_adaptive_matches_fixed():
+    cfg = _get_cfg_()
+    reference = copy.deepcopy(cfg)
+    reference["grid"]["dt"] = 0.025
+    adaptive = copy.deepcopy(cfg)
+    adaptive["grid"]["adaptive"] = {"cfl": 1.0}
+
+    results = []
+    for this_cfg in [reference, cfg, adaptive]:
+        exo = ergoExo()
+        exo.setup(this_cfg)
+        result, datasets, run_id = exo(None)
+        results.append(result["solver result"])
+
+    reference, fixed, adaptive = results
+    # the saves are on the requested grid and the step size adapts to at least as accurate as the fixed step
+    np.testing.assert_allclose(adaptive.ts["fields"], np.linspace(0.0, 80.0, 81), atol=1e-12)
+    e_ref = reference.ys["fields"]["e"]
+    adaptive_error = np.max(np.abs(adaptive.ys["fields"]["e"] - e_ref))
+    fixed_error = np.max(np.abs(fixed.ys["fields"]["e"] - e_ref))
+    assert adaptive_error < fixed_error
+    assert adaptive_error < 0.1 * np.max(np.abs(e_ref))
+
+
+def test_adaptive_gradient():
+    grads = []
+    for adaptive in [False, True]:
+        cfg = _get_cfg_(tmax=20.0, nv=64)
+        if adaptive:
+            cfg["grid"]["adaptive"] = {"cfl": 1.0}
+        exo = ergoExo()
+        exo.setup(cfg)
+        module = exo.adept_module
+
+        def loss(a0):
+            drivers = copy.deepcopy(module.args["drivers"])
+            drivers["ex"]["0"]["a0"] = a0
+            result = module(None, {**module.args, "drivers": drivers})["solver result"]
+            return jnp.sum(result.ys["fields"]["e"][-1] ** 2.0)
+
+        grads.append(jax.grad(loss)(1.0e-2))
+
+    # the step sizes are not differentiated through so the gradient is that of the sequence of steps taken
+    assert np.isfinite(grads[1])
+    np.testing.assert_allclose(grads[1], grads[0], rtol=5e-2)
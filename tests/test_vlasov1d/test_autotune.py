@@ -0,0 +1,43 @@
+import json
+
+import yaml
+
+from adept.vlasov1d import autotune
+from adept.vlasov1d.base import BaseVlasov1D
+
+
+def _get_cfg_():
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as file:
+        cfg = yaml.safe_load(file)
+
+    cfg["terms"]["edfdv"] = "auto"
+    cfg["terms"]["fokker_planck"]["tridiagonal"] = "auto"
+    cfg["autotune"] = {"num_steps": 2, "num_repeats": 1}
+
+    return cfg
+
+
+def test_autotune(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "tuning.json")
+    monkeypatch.setenv("ADEPT_TUNING_CACHE", cache_path)
+
+    module = BaseVlasov1D(_get_cfg_())
+    module.write_units()
+    module.get_derived_quantities()
+    assert module.cfg["terms"]["edfdv"] in autotune.EDFDV_CANDIDATES
+    assert module.cfg["terms"]["fokker_planck"]["tridiagonal"] in autotune.TRIDIAGONAL_CANDIDATES
+
+    with open(cache_path, "r") as fi:
+        cache = json.load(fi)
+    tuned = cache[autotune.get_host_key()][autotune.get_shape_key(module.cfg["grid"])]
+    assert set(tuned["timings"]["edfdv"]) == set(autotune.EDFDV_CANDIDATES)
+
+    # the second run of the same shape on the same host reads the cache
+    tuned["edfdv"] = "exponential" if tuned["edfdv"] == "cubic-spline" else "cubic-spline"
+    with open(cache_path, "w") as fi:
+        json.dump(cache, fi)
+
+    module = BaseVlasov1D(_get_cfg_())
+    module.write_units()
+    module.get_derived_quantities()
+    assert module.cfg["terms"]["edfdv"] == tuned["edfdv"]
@@ -0,0 +1,97 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import numpy as np
+import pytest
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from jax import numpy as jnp, jit
+
+from adept.vlasov1d.pushers.fokker_planck import Collisions
+
+
+def _get_cfg_(cadence, fp_is_on=True, krook_is_on=False):
+    nx, nv, vmax, dt, nt = 4, 256, 6.4, 0.5, 129
+    dv = 2.0 * vmax / nv
+    profile = {
+        "time": {
+            "baseline": 1.0,
+            "bump_or_trough": "bump",
+            "center": 0.0,
+            "rise": 25.0,
+            "bump_height": 0.0,
+            "width": 1e5,
+        },
+        "space": {
+            "baseline": 1.0e-2,
+            "bump_or_trough": "bump",
+            "center": 0.0,
+            "rise": 25.0,
+            "bump_height": 0.0,
+            "width": 1e5,
+        },
+    }
+    return {
+        "grid": {
+            "nx": nx,
+            "nv": nv,
+            "dv": dv,
+            "dt": dt,
+            "nt": nt,
+            "x": np.linspace(0, 1, nx),
+            "t": np.linspace(0, dt * (nt - 1), nt),
+            "v": np.linspace(-vmax + dv / 2, vmax - dv / 2, nv),
+        },
+        "terms": {
+            "fokker_planck": {"is_on": fp_is_on, "type": "Dougherty", "cadence": cadence, **profile},
+            "krook": {"is_on": krook_is_on, "cadence": cadence, **profile},
+        },
+    }
+
+
+def _run_collisions_(cfg, nsteps):
+    collisions = Collisions(cfg)
+    v = cfg["grid"]["v"]
+    f = np.exp(-(v[None, :] ** 2.0) / 2.0) + 0.2 * np.exp(-((v[None, :] - 3.0) ** 2.0) / 0.5)
+    f = jnp.array(np.repeat(f / np.sum(f, axis=1, keepdims=True) / cfg["grid"]["dv"], cfg["grid"]["nx"], axis=0))
+    nu = 1.0e-2 * jnp.ones(cfg["grid"]["nx"])
+
+    @jit
+    def _step_(f, step):
+        return collisions(nu, nu, f, dt=cfg["grid"]["dt"], step=step)
+
+    for step in range(nsteps):
+        f = _step_(f, step)
+
+    return f, collisions
+
+
+@pytest.mark.parametrize("fp_is_on, krook_is_on", [(True, False), (False, True)])
+def test_subcycled_collisions_converge(fp_is_on, krook_is_on):
+    nsteps = 128
+    reference, _ = _run_collisions_(_get_cfg_(1, fp_is_on, krook_is_on), nsteps)
+
+    errors = []
+    for cadence in [16, 8, 4, 2]:
+        f, _ = _run_collisions_(_get_cfg_(cadence, fp_is_on, krook_is_on), nsteps)
+        errors.append(float(jnp.linalg.norm(f - reference) / jnp.linalg.norm(reference)))
+        # particle number is (nearly) conserved by both operators regardless of cadence
+        np.testing.assert_allclose(np.sum(f, axis=1), np.sum(reference, axis=1), rtol=1e-5)
+
+    print(f"relative error for cadence 16, 8, 4, 2: {errors}")
+    if fp_is_on:
+        assert all(e_coarse > e_fine for e_coarse, e_fine in zip(errors[:-1], errors[1:]))
+        assert errors[-1] < 1e-3
+    else:
+        # the Krook step is an exact exponential so subcycling is exact for a constant frequency
+        assert max(errors) < 1e-10
+
+
+def test_adaptive_cadence():
+    cfg = _get_cfg_("adaptive")
+    cfg["terms"]["fokker_planck"]["max_nu_dt"] = 0.05
+    _, collisions = _run_collisions_(cfg, 1)
+
+    # max(nu * dt) = 5e-3 so the operator is applied every 10 steps
+    assert collisions.fp_cadence == 10
@@ -0,0 +1,65 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from jax import numpy as jnp
+
+from adept.vlasov1d.storage import get_save_quantities
+
+
+def _get_cfg_and_f_(electron_save):
+    nx, nv, xmax, vmax = 64, 128, 20.0, 6.4
+    dx, dv = xmax / nx, 2.0 * vmax / nv
+    cfg = {
+        "grid": {
+            "nx": nx,
+            "nv": nv,
+            "dx": dx,
+            "dv": dv,
+            "t": np.linspace(0, 1, 2),
+            "x": np.linspace(dx / 2, xmax - dx / 2, nx),
+            "v": np.linspace(-vmax + dv / 2, vmax - dv / 2, nv),
+            "kxr": np.fft.rfftfreq(nx, d=dx) * 2.0 * np.pi,
+        },
+        "save": {"electron": {"t": {"tmin": 0.0, "tmax": 1.0, "nt": 2}, **electron_save}},
+    }
+    x, v = cfg["grid"]["x"][:, None], cfg["grid"]["v"][None, :]
+    f = (1.0 + 0.1 * np.cos(2.0 * np.pi * 3 * x / xmax)) * np.exp(-((v - 0.1 * np.sin(x)) ** 2.0) / 2.0)
+    return get_save_quantities(cfg), jnp.array(f)
+
+
+def _save_(cfg, f):
+    return cfg["save"]["electron"]["func"](0.0, {"electron": f}, {})
+
+
+def test_subsampled_window():
+    # every other cell in the first half of the box, and every other velocity in |v| < 3.2
+    cfg, f = _get_cfg_and_f_({"x": {"xmin": 0.0, "xmax": 10.0, "nx": 16}, "v": {"vmin": -3.15, "vmax": 3.15, "nv": 64}})
+    saved = _save_(cfg, f)
+
+    x_inds = np.arange(0, 32, 2) + 0.5
+    np.testing.assert_allclose(cfg["save"]["electron"]["x"]["ax"], cfg["grid"]["x"][0] + x_inds * cfg["grid"]["dx"])
+    expected = 0.5 * (f[:-1] + f[1:])[np.floor(x_inds).astype(int)][:, 32:96]
+    np.testing.assert_allclose(saved, expected, rtol=1e-12)
+
+
+def test_x_average():
+    cfg, f = _get_cfg_and_f_({"x": {"average": True}})
+    np.testing.assert_allclose(_save_(cfg, f), np.mean(f, axis=0), rtol=1e-12)
+
+    cfg, f = _get_cfg_and_f_({"x": {"average": True, "xmin": 5.0, "xmax": 15.0}})
+    np.testing.assert_allclose(_save_(cfg, f), np.mean(f[16:48], axis=0), rtol=1e-12)
+
+
+def test_kx_modes():
+    cfg, f = _get_cfg_and_f_({"kx": {"kxmin": 0.0, "kxmax": 2.0 * np.pi * 3 / 20.0, "nkx": 4}})
+    saved = _save_(cfg, f)
+
+    np.testing.assert_allclose(cfg["save"]["electron"]["kx"]["ax"], cfg["grid"]["kxr"][:4])
+    fk = np.fft.rfft(f, axis=0)[:4] * 2.0 / cfg["grid"]["nx"]
+    np.testing.assert_allclose(saved["mag"], np.abs(fk), rtol=1e-10, atol=1e-12)
+    # only the seeded mode is present
+    assert np.all(np.argmax(saved["mag"][1:], axis=0) == 2)
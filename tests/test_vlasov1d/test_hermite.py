@@ -0,0 +1,73 @@
+import yaml, pytest
+
+import numpy as np
+from jax import config, numpy as jnp
+
+config.update("jax_enable_x64", True)
+
+from adept.theory import electrostatic
+from adept import ergoExo
+from adept.vlasov1d.base import BaseVlasov1D
+from adept.vlasov1d.pushers.hermite import HermiteCollisions, get_hermite_moments
+from tests.test_vlasov1d.test_landau_damping import _modify_defaults_
+
+
+def _get_cfg_(nh=32):
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as file:
+        defaults = yaml.safe_load(file)
+    defaults["terms"]["velocity"] = {"basis": "hermite", "nh": nh}
+
+    return defaults
+
+
+@pytest.mark.parametrize("real_or_imag", ["real", "imag"])
+def test_hermite_resonance(real_or_imag):
+    mod_defaults, root = _modify_defaults_(
+        _get_cfg_(), np.random.default_rng(), real_or_imag, "leapfrog", "poisson", "exponential"
+    )
+
+    exo = ergoExo()
+    exo.setup(mod_defaults)
+    result, datasets, run_id = exo(None)
+    result = result["solver result"]
+    ek1 = 2.0 / mod_defaults["grid"]["nx"] * np.fft.fft(result.ys["fields"]["e"], axis=1)[:, 1]
+    dt = result.ts["fields"][1] - result.ts["fields"][0]
+
+    if real_or_imag == "imag":
+        frslc = slice(-100, -50)
+        measured = np.mean(np.gradient(np.abs(ek1[frslc]), dt) / np.abs(ek1[frslc]))
+        np.testing.assert_almost_equal(measured, np.imag(root), decimal=2)
+    else:
+        env, freq = electrostatic.get_nlfs(ek1, dt)
+        np.testing.assert_almost_equal(np.mean(freq[-480:-240]), np.real(root), decimal=2)
+
+
+def test_hermite_dougherty_conserves():
+    cfg = _get_cfg_()
+    cfg["terms"]["fokker_planck"]["cadence"] = 1
+    module = BaseVlasov1D(cfg)
+    module.write_units()
+    module.get_derived_quantities()
+    module.get_solver_quantities()
+    cfg = module.cfg
+
+    # a drifting and heated Maxwellian with a distortion
+    v = cfg["grid"]["v"]
+    f = np.exp(-((v - 0.3) ** 2.0) / 2.0 / 1.3) * (1.0 + 0.1 * v**3.0 * np.exp(-(v**2.0)))
+    f = np.repeat(f[None, :] / np.sum(f) / cfg["grid"]["dv"], cfg["grid"]["nx"], axis=0)
+    c = jnp.array(f) @ cfg["grid"]["hermite"]["from_grid"]
+
+    collisions = HermiteCollisions(cfg)
+    new_c = collisions._fokker_planck_step_(jnp.ones(cfg["grid"]["nx"]), c, 0.5)
+
+    alpha, u = cfg["terms"]["velocity"]["alpha"], cfg["terms"]["velocity"]["u"]
+    for before, after in zip(get_hermite_moments(c, alpha, u), get_hermite_moments(new_c, alpha, u)):
+        np.testing.assert_allclose(after, before, rtol=1e-12)
+
+    # relaxes to the Maxwellian with the same moments
+    for _ in range(100):
+        new_c = collisions._fokker_planck_step_(jnp.ones(cfg["grid"]["nx"]), new_c, 0.5)
+    n, j, m2 = (np.mean(moment) for moment in get_hermite_moments(c, alpha, u))
+    f_mx = np.exp(-((v - j / n) ** 2.0) / 2.0 / (m2 / n - (j / n) ** 2.0))
+    f_mx = n * f_mx / np.sum(f_mx) / cfg["grid"]["dv"]
+    np.testing.assert_allclose(np.asarray(new_c[0] @ cfg["grid"]["hermite"]["to_grid"]), f_mx, atol=1e-6)
@@ -0,0 +1,63 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from jax import numpy as jnp
+
+from adept.vlasov1d.storage import get_default_save_func, get_field_save_func
+
+
+def _get_cfg_and_state_():
+    nx, nv, vmax = 16, 128, 6.4
+    dv = 2.0 * vmax / nv
+    dx = 2.0 * np.pi / nx
+    x = np.linspace(dx / 2, 2.0 * np.pi - dx / 2, nx)
+    v = np.linspace(-vmax + dv / 2, vmax - dv / 2, nv)
+    cfg = {"grid": {"nx": nx, "nv": nv, "dv": dv, "dx": dx, "x": x, "v": v}, "save": {"fields": {"t": {}}}}
+
+    rng = np.random.default_rng(42)
+    u = 0.3 * np.sin(x)[:, None]
+    f = (1.0 + 0.1 * np.cos(x)[:, None]) * np.exp(-((v[None, :] - u) ** 2.0) / 2.0) / np.sqrt(2.0 * np.pi)
+    f *= 1.0 + 0.01 * rng.uniform(size=f.shape)
+    y = {
+        "electron": jnp.array(f),
+        "e": jnp.array(rng.normal(size=nx)),
+        "de": jnp.array(rng.normal(size=nx)),
+        "a": jnp.array(rng.normal(size=nx + 2)),
+        "prev_a": jnp.array(rng.normal(size=nx + 2)),
+    }
+    return cfg, y
+
+
+def test_fused_moments():
+    cfg, y = _get_cfg_and_state_()
+    f, v, dv = np.asarray(y["electron"]), cfg["grid"]["v"][None, :], cfg["grid"]["dv"]
+
+    n = np.sum(f, axis=1) * dv
+    j = np.sum(f * v, axis=1) * dv
+    expected = {
+        "n": n,
+        "v": j,
+        "p": np.sum(f * (v - j[:, None]) ** 2.0, axis=1) * dv,
+        "q": np.sum(f * (v - j[:, None]) ** 3.0, axis=1) * dv,
+        "-flogf": np.sum(f * np.log(np.abs(f)), axis=1) * dv,
+        "f^2": np.sum(f**2.0, axis=1) * dv,
+    }
+    fields = get_field_save_func(cfg, "fields")(0.0, y, {})
+    for k, val in expected.items():
+        np.testing.assert_allclose(fields[k], val, rtol=1e-10, atol=1e-12, err_msg=k)
+
+    expected_scalars = {
+        "mean_n": np.mean(n),
+        "mean_j": np.mean(j),
+        "mean_P": np.mean(np.sum(f * v**2.0, axis=1) * dv),
+        "mean_q": np.mean(np.sum(f * v**3.0, axis=1) * dv),
+        "mean_-flogf": np.mean(np.sum(-np.log(np.abs(f)) * np.abs(f), axis=1) * dv),
+        "mean_f2": np.mean(np.sum(f**2.0, axis=1) * dv),
+    }
+    scalars = get_default_save_func(cfg)(0.0, y, {})
+    for k, val in expected_scalars.items():
+        np.testing.assert_allclose(scalars[k], val, rtol=1e-10, atol=1e-12, err_msg=k)
@@ -0,0 +1,97 @@
+import copy
+
+import yaml
+
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from adept import ergoExo, get_envelope
+
+
+def _get_cfg_():
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as file:
+        defaults = yaml.safe_load(file)
+
+    tmax = 20.0
+    defaults["grid"].update({"nv": 64, "tmax": tmax, "dt": 0.1})
+    defaults["save"] = {"fields": {"t": {"tmin": 0.0, "tmax": tmax, "nt": int(tmax) + 1}}}
+    defaults["mlflow"]["experiment"] = "vlasov1d-test-nu-profiles"
+
+    # a collision frequency that turns on and off in time and is localized in space
+    for k, bump_or_trough in [("fokker_planck", "bump"), ("krook", "trough")]:
+        defaults["terms"][k]["time"].update(
+            {"bump_or_trough": bump_or_trough, "center": 10.0, "rise": 2.0, "bump_height": 1.0e-2, "width": 8.0}
+        )
+        defaults["terms"][k]["space"].update({"center": 10.0, "rise": 1.0, "bump_height": 1.0, "width": 5.0})
+
+    return defaults
+
+
+def _analytic_(ax, profile):
+    envelope = get_envelope(
+        profile["rise"],
+        profile["rise"],
+        profile["center"] - 0.5 * profile["width"],
+        profile["center"] + 0.5 * profile["width"],
+        ax,
+    )
+    if profile["bump_or_trough"] == "trough":
+        envelope = 1 - envelope
+    return profile["baseline"] + profile["bump_height"] * envelope
+
+
+def _get_module_(cfg):
+    exo = ergoExo()
+    exo.setup(cfg)
+    return exo.adept_module
+
+
+def test_tabulated_nu_profiles():
+    cfg = _get_cfg_()
+    module = _get_module_(cfg)
+    vector_field = module.vlasov_maxwell
+    args = {**module.args, "nu_profiles": vector_field.get_nu_profiles(module.args)}
+
+    dt = module.cfg["grid"]["dt"]
+    step_times = dt * np.arange(module.cfg["grid"]["max_steps"])
+    x = module.cfg["grid"]["x"]
+    for k in ["fokker_planck", "krook"]:
+        assert vector_field.tabulate_nu_time[k]
+        nu_time = _analytic_(step_times, cfg["terms"][k]["time"])
+        nu_space = _analytic_(x, cfg["terms"][k]["space"])
+        # the envelope switches on and off within the solve
+        assert np.ptp(nu_time) > 0.5 * cfg["terms"][k]["time"]["bump_height"]
+        np.testing.assert_allclose(args["nu_profiles"][k]["time"], nu_time, rtol=1e-12, atol=0.0)
+        np.testing.assert_allclose(args["nu_profiles"][k]["space"], nu_space, rtol=1e-12, atol=0.0)
+
+        # the profile that is looked up in each step is the analytic one at the time of the step
+        for step in [0, 37, 100, 163, module.cfg["grid"]["max_steps"] - 1]:
+            np.testing.assert_allclose(
+                vector_field.nu_prof(step * dt, step, k, args), nu_time[step] * nu_space, rtol=1e-12, atol=0.0
+            )
+
+
+def test_adaptive_nu_profiles():
+    cfg = _get_cfg_()
+    cfg["grid"]["adaptive"] = {"cfl": 1.0}
+    module = _get_module_(copy.deepcopy(cfg))
+    vector_field = module.vlasov_maxwell
+    args = {**module.args, "nu_profiles": vector_field.get_nu_profiles(module.args)}
+
+    x = module.cfg["grid"]["x"]
+    for k in ["fokker_planck", "krook"]:
+        # the steps are not on a fixed grid so there is no table to index
+        assert not vector_field.tabulate_nu_time[k]
+        assert "time" not in args["nu_profiles"][k]
+
+        # and the envelope is evaluated at the time of the step, however far it is from a multiple of dt
+        nu_space = _analytic_(x, cfg["terms"][k]["space"])
+        for t in [0.0, 6.37, 9.05, 13.999]:
+            np.testing.assert_allclose(
+                vector_field.nu_prof(t, 0, k, args),
+                _analytic_(t, cfg["terms"][k]["time"]) * nu_space,
+                rtol=1e-12,
+                atol=0.0,
+            )
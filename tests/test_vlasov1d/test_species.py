@@ -0,0 +1,96 @@
+import copy
+
+import yaml
+
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+from adept import ergoExo
+
+
+def _get_cfg_():
+    with open("tests/test_vlasov1d/configs/resonance.yaml", "r") as file:
+        defaults = yaml.safe_load(file)
+
+    defaults["terms"]["edfdv"] = "exponential"
+    defaults["grid"].update({"nv": 256, "tmax": 80.0})
+    defaults["drivers"]["ex"]["0"]["a0"] = 1.0e-2
+    defaults["terms"]["fokker_planck"]["is_on"] = False
+    defaults["terms"]["krook"]["is_on"] = False
+    defaults["save"] = {"fields": {"t": {"tmin": 0.0, "tmax": 80.0, "nt": 81}}}
+    defaults["mlflow"]["experiment"] = "vlasov1d-test-species"
+
+    return defaults
+
+
+def _run_(cfg):
+    exo = ergoExo()
+    exo.setup(cfg)
+    result, datasets, run_id = exo(None)
+
+    return result["solver result"]
+
+
+def test_batched_species_match_combined():
+    cfg = _get_cfg_()
+    combined = _run_(copy.deepcopy(cfg))
+
+    # the same electrons, split into two batched species
+    cfg["terms"]["species"] = "batched"
+    background = cfg["density"].pop("species-background")
+    for name in ["species-a", "species-b"]:
+        cfg["density"][name] = {**background, "basis": "sine", "baseline": 0.5, "amplitude": 0.0, "wavenumber": 0.3}
+    batched = _run_(cfg)
+
+    np.testing.assert_allclose(batched.ys["fields"]["e"], combined.ys["fields"]["e"], atol=1e-10)
+    np.testing.assert_allclose(
+        batched.ys["fields"]["n-species-a"] + batched.ys["fields"]["n-species-b"],
+        combined.ys["fields"]["n"],
+        atol=1e-10,
+    )
+
+
+def test_kinetic_ions():
+    cfg = _get_cfg_()
+    static_ions = _run_(copy.deepcopy(cfg))
+
+    cfg["terms"]["species"] = "batched"
+    cfg["density"]["species-electron"] = cfg["density"].pop("species-background")
+    cfg["density"]["species-ion"] = {
+        **cfg["density"]["species-electron"],
+        "charge": 1.0,
+        "mass": 1836.0,
+        "vmax": float(6.4 / np.sqrt(1836.0)),
+    }
+    kinetic_ions = _run_(cfg)
+
+    # the ions respond to the field but are too slow to change the electron plasma wave in this time
+    ion_density = kinetic_ions.ys["fields"]["n-species-ion"]
+    assert 0.0 < np.max(np.abs(ion_density - 1.0)) < 1e-3
+    np.testing.assert_allclose(np.mean(ion_density, axis=1), 1.0, rtol=1e-10)
+    np.testing.assert_allclose(
+        kinetic_ions.ys["fields"]["e"],
+        static_ions.ys["fields"]["e"],
+        atol=1e-2 * np.max(np.abs(static_ions.ys["fields"]["e"])),
+    )
+
+
+def test_batched_scalars_match_combined():
+    cfg = _get_cfg_()
+    cfg["grid"].update({"nv": 64, "tmax": 20.0})
+    cfg["save"] = {"fields": {"t": {"tmin": 0.0, "tmax": 20.0, "nt": 21}}}
+    combined = _run_(copy.deepcopy(cfg))
+
+    # the same electrons as a single batched species
+    cfg["terms"]["species"] = "batched"
+    batched = _run_(cfg)
+
+    # the scalars of a species are those of the unbatched f, with the same names and definitions
+    for k in ["mean_P", "mean_j", "mean_n", "mean_q", "mean_-flogf", "mean_f2"]:
+        # the current is close to zero so it is compared to the round-off of the density
+        np.testing.assert_allclose(
+            batched.ys["default"][f"{k}-species-background"], combined.ys["default"][k], rtol=1e-8, atol=1e-14
+        )
+    assert np.all(batched.ys["default"]["mean_-flogf-species-background"] > 0.0)
@@ -0,0 +1,56 @@
+#  Copyright (c) Ergodic LLC 2023
+#  research@ergodic.io
+import copy
+
+import yaml
+import numpy as np
+from jax import config
+
+config.update("jax_enable_x64", True)
+
+import jax
+
+from adept.vlasov2d import helpers
+from adept.vlasov2d.storage import get_save_quantities
+
+
+def _get_cfg_(low_rank_cfg=None):
+    with open("tests/test_vlasov2d/configs/damping.yaml", "r") as fi:
+        cfg = yaml.safe_load(fi)
+
+    # a short driven Landau damping run on a small grid
+    cfg["grid"].update({"nx": 16, "ny": 4, "nvx": 32, "nvy": 32, "xmax": float(2.0 * np.pi / 0.3), "tmax": 20.0})
+    cfg["drivers"]["ex"]["0"].update({"a0": 1.0e-2, "t_center": 10.0, "t_width": 10.0})
+    cfg["save"] = {"electron": {"t": {"tmin": 0.0, "tmax": 20.0, "nt": 3}}}
+    if low_rank_cfg is not None:
+        cfg["solver"]["low_rank"] = low_rank_cfg
+
+    cfg = helpers.get_derived_quantities(cfg)
+    cfg["grid"] = helpers.get_solver_quantities(cfg)
+
+    return get_save_quantities(cfg)
+
+
+def test_low_rank_2d2v_matches_full():
+    cfg = _get_cfg_()
+    cfg_lr = _get_cfg_({"max_rank": 16, "tol": 1e-10})
+
+    energies, ys = [], []
+    for this_cfg in [cfg, cfg_lr]:
+        y, args = helpers.init_state(this_cfg, None)
+        vector_field = helpers.get_diffeqsolve_quants(this_cfg)["terms"].vector_field
+        step = jax.jit(lambda t, _y_: vector_field(t, _y_, args))
+        save = jax.jit(lambda _y_: this_cfg["save"]["default"]["func"](None, _y_, args))
+        these_energies = []
+        for i in range(this_cfg["grid"]["nt"] - 1):
+            y = step(i * this_cfg["grid"]["dt"], y)
+            these_energies.append(save(y)["mean_e2"])
+        energies.append(np.array(these_energies))
+        ys.append(this_cfg["save"]["electron"]["func"](None, y, args))
+
+    full, factors = energies
+    # the field energy of the low-rank solve follows that of the full grid through the drive and the damping
+    assert np.max(full) > 1e-8
+    np.testing.assert_allclose(factors, full, rtol=0, atol=1e-4 * np.max(full))
+    # and so does the distribution function that is saved from the factors
+    np.testing.assert_allclose(ys[1], ys[0], rtol=0, atol=1e-6 * np.max(ys[0]))